@@ -0,0 +1,6 @@
+"""
+Reproducible throughput benchmarks run against the local Graph and SFTP emulators.
+
+Run ``python -m benchmarks.run --output results.json`` from the project folder and
+compare result files between versions with ``--baseline``.
+"""
@@ -0,0 +1,99 @@
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.scenarios import SCENARIOS
+
+
+def git_revision():
+    """Returns the current commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenarios(names, scale=1.0):
+    """
+    Runs the named scenarios and returns the report written to JSON.
+
+    Args:
+        names (list): Keys of ``SCENARIOS``
+        scale (float): Multiplier for file sizes and counts; 1.0 is the full suite
+
+    Returns:
+        dict: Run metadata and one result per scenario
+    """
+    results = []
+    for name in names:
+        logging.warning(f"Running {name} (scale {scale})...")
+        result = SCENARIOS[name](scale=scale)
+        logging.warning(f"  {name}: {result['seconds']:.2f}s, "
+                        f"{result['throughput_bps'] / (1024 * 1024):.2f} MB/s")
+        results.append(result)
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "scenarios": results,
+    }
+
+
+def compare(report, baseline):
+    """Returns lines comparing throughput with a previous report."""
+    previous = {s["name"]: s for s in baseline.get("scenarios", [])}
+    lines = []
+    for scenario in report["scenarios"]:
+        old = previous.get(scenario["name"])
+        if not old or not old.get("throughput_bps"):
+            continue
+        change = scenario["throughput_bps"] / old["throughput_bps"] - 1
+        lines.append(f"{scenario['name']:<12} {old['throughput_bps'] / 1048576:>9.2f} -> "
+                     f"{scenario['throughput_bps'] / 1048576:>9.2f} MB/s ({change:+.1%})")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run transfer benchmarks against local emulators")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                       help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--scale", type=float, default=1.0,
+                       help="Multiplier for file sizes and counts, e.g. 0.01 for a quick run")
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Previous JSON report to compare throughput against")
+    parser.add_argument("--verbose", action="store_true", help="Show uploader logging")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    # Configure logging before main.py is imported so its INFO handlers stay inactive
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+    report = run_scenarios(names, args.scale)
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        for line in compare(report, json.loads(Path(args.baseline).read_text())):
+            logging.warning(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
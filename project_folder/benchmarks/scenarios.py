@@ -0,0 +1,185 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.journal import TransferJournal
+from core.progress import HeadlessProgressTracker
+from core.ssh_copy import RemoteFetcher
+from core.throttle import ThrottleController
+from core.transport import SharedTransport
+from core.uploader import SharePointUploader
+from emulator import FaultInjector, GraphEmulator, SFTPEmulator
+
+MiB = 1024 * 1024
+
+
+class Workspace:
+    """Temporary directory with an uploader configuration pointing at an emulator."""
+
+    def __init__(self):
+        self.path = Path(tempfile.mkdtemp(prefix="sharepoint_bench_"))
+
+    def config_for(self, graph):
+        config_path = self.path / "bench.json"
+        config_path.write_text(json.dumps({
+            "SITE_ID": "bench-site",
+            "DRIVE_ID": "bench-drive",
+            "TENANT_ID": "bench-tenant",
+            "GRAPH_BASE_URL": graph.base_url,
+        }))
+        return str(config_path)
+
+    def make_uploader(self, graph, concurrency=16):
+        return SharePointUploader(
+            "bench-token",
+            self.config_for(graph),
+            journal=TransferJournal(self.path / "journal.db"),
+            throttle=ThrottleController(max_concurrency=concurrency),
+            transport=SharedTransport(pool_maxsize=concurrency),
+        )
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def write_file(path, size, block=MiB):
+    """Writes ``size`` bytes of incompressible data, reusing one random block."""
+    pattern = os.urandom(block)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            n = min(block, remaining)
+            f.write(pattern[:n])
+            remaining -= n
+    return path
+
+
+def _upload_result(name, params, graph, uploader, seconds, files):
+    stats = uploader.stats()
+    return {
+        "name": name,
+        "params": params,
+        "seconds": seconds,
+        "files": files,
+        "bytes": stats["bytes_sent"],
+        "throughput_bps": stats["bytes_sent"] / seconds if seconds > 0 else 0.0,
+        "uploader": stats,
+        "server": dict(graph.stats),
+    }
+
+
+def huge_file(scale=1.0):
+    """One large file uploaded in 4 MiB chunks over a fast link."""
+    size = max(MiB, int(1024 * MiB * scale))
+    params = {"file_size": size, "chunk_size": SharePointUploader.CHUNK_SIZE}
+    workspace = Workspace()
+    try:
+        source = write_file(workspace.path / "huge.bin", size)
+        with GraphEmulator(store_content=False) as graph:
+            uploader = workspace.make_uploader(graph)
+            started = time.perf_counter()
+            uploader.upload_file(str(source))
+            seconds = time.perf_counter() - started
+            return _upload_result("huge_file", params, graph, uploader, seconds, 1)
+    finally:
+        workspace.cleanup()
+
+
+def high_rtt(scale=1.0, latency=0.1):
+    """A medium file against a server that adds ``latency`` seconds to every request."""
+    size = max(MiB, int(128 * MiB * scale))
+    params = {"file_size": size, "latency": latency}
+    workspace = Workspace()
+    try:
+        source = write_file(workspace.path / "medium.bin", size)
+        with GraphEmulator(latency=latency, store_content=False) as graph:
+            uploader = workspace.make_uploader(graph)
+            started = time.perf_counter()
+            uploader.upload_file(str(source))
+            seconds = time.perf_counter() - started
+            return _upload_result("high_rtt", params, graph, uploader, seconds, 1)
+    finally:
+        workspace.cleanup()
+
+
+def throttling(scale=1.0, files=8, throttle_rate=0.2, retry_after=0.2, workers=8):
+    """Several files uploaded in parallel while a share of requests is throttled."""
+    size = max(MiB, int(32 * MiB * scale))
+    params = {"files": files, "file_size": size, "throttle_rate": throttle_rate,
+              "retry_after": retry_after, "workers": workers}
+    workspace = Workspace()
+    try:
+        sources = [write_file(workspace.path / f"part{i}.bin", size) for i in range(files)]
+        faults = FaultInjector(throttle_rate=throttle_rate, retry_after=retry_after, seed=42)
+        with GraphEmulator(faults=faults, store_content=False) as graph:
+            uploader = workspace.make_uploader(graph, concurrency=workers)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda path: uploader.upload_file(str(path)), sources))
+            seconds = time.perf_counter() - started
+            result = _upload_result("throttling", params, graph, uploader, seconds, files)
+            result["throttle"] = uploader.throttle.stats()
+            return result
+    finally:
+        workspace.cleanup()
+
+
+def tiny_files(scale=1.0, file_size=512, fanout=1000):
+    """Many tiny files fetched over SFTP, compressed and uploaded as one archive."""
+    from main import compress_directory
+
+    count = max(10, int(100_000 * scale))
+    params = {"files": count, "file_size": file_size}
+    workspace = Workspace()
+    try:
+        remote_root = workspace.path / "remote"
+        source = remote_root / "tiny"
+        payload = os.urandom(file_size)
+        for i in range(count):
+            directory = source / f"d{i // fanout:04d}"
+            if i % fanout == 0:
+                directory.mkdir(parents=True)
+            (directory / f"f{i:06d}.dat").write_bytes(payload)
+
+        local = workspace.path / "local"
+        local.mkdir()
+        timings = {}
+        with SFTPEmulator(remote_root) as sftp, GraphEmulator(store_content=False) as graph:
+            tracker = HeadlessProgressTracker()
+            fetcher = RemoteFetcher(tracker, sftp.host, sftp.username,
+                                    port=sftp.port, password=sftp.password)
+            started = time.perf_counter()
+            with fetcher:
+                fetcher.fetch_directory("/tiny", local)
+            timings["fetch_seconds"] = time.perf_counter() - started
+
+            stage = time.perf_counter()
+            archive = compress_directory(local / "tiny", local / "tiny.zip")
+            timings["compress_seconds"] = time.perf_counter() - stage
+
+            uploader = workspace.make_uploader(graph)
+            stage = time.perf_counter()
+            uploader.upload_file(str(archive))
+            timings["upload_seconds"] = time.perf_counter() - stage
+            seconds = time.perf_counter() - started
+
+            result = _upload_result("tiny_files", params, graph, uploader, seconds, count)
+            result.update(timings)
+            result["bytes"] = count * file_size
+            result["throughput_bps"] = result["bytes"] / seconds if seconds > 0 else 0.0
+            result["files_per_second"] = count / timings["fetch_seconds"] if timings["fetch_seconds"] else 0.0
+            return result
+    finally:
+        workspace.cleanup()
+
+
+SCENARIOS = {
+    "huge_file": huge_file,
+    "tiny_files": tiny_files,
+    "high_rtt": high_rtt,
+    "throttling": throttling,
+}
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from pathlib import Path
+
+from core import metrics, tracing
+from core.filters import iter_files
+
+MANIFEST_VERSION = 1
+MIN_PIECE_SIZE = 1024 * 1024  # Seal a volume rather than start a piece smaller than this
+VOLUME_OVERHEAD = 4 * 1024  # Room kept free for the end of central directory records
+# Worst-case header bytes per member besides its name: local header (30) with a ZIP64
+# extra field (20), and central directory entry (46) with a ZIP64 extra field (28)
+MEMBER_OVERHEAD = 30 + 20 + 46 + 28
+PIECE_SUFFIX_LENGTH = len(".part0000")
+READ_BLOCK = 1024 * 1024
+
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+_UNSAFE_ARCNAME_CHARS = re.compile(r'[|<>:*?"]')
+
+
+def parse_size(value) -> int:
+    """
+    Parses a size such as ``"512M"`` or ``"2G"`` (powers of 1024) into bytes.
+
+    Raises:
+        ValueError: If the value cannot be parsed or is not positive
+    """
+    if isinstance(value, int):
+        size = value
+    else:
+        match = _SIZE_PATTERN.match(str(value))
+        if not match:
+            raise ValueError(f"Invalid size: {value!r}")
+        size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+    if size <= 0:
+        raise ValueError(f"Size must be positive: {value!r}")
+    return size
+
+
+def sanitize_arcname(arcname) -> str:
+    """Replaces characters that are not allowed in Windows file names."""
+    return _UNSAFE_ARCNAME_CHARS.sub("_", str(arcname))
+
+
+class VolumeWriter:
+    """
+    Writes a directory as a sequence of independent ZIP volumes of bounded size.
+
+    Every volume is a complete ZIP file that can be uploaded and opened on its
+    own. Files that do not fit into the space left in a volume are split into
+    pieces stored as ``<name>.partNNNN`` members in consecutive volumes. As soon
+    as a volume is sealed, ``on_sealed(path, index)`` is called, so uploads can
+    run while later volumes are still being written. ``finish`` writes a JSON
+    manifest listing the volumes and, for every file, the pieces that make it
+    up; ``restore_volumes`` uses it to rebuild the tree.
+    """
+
+    def __init__(self, output_dir, base_name: str, volume_size: int,
+                 compression_level: int = 6, on_sealed=None):
+        """
+        Args:
+            output_dir (str | Path): Directory receiving volumes and the manifest
+            base_name (str): Volumes are named ``<base_name>.volNNNN.zip``
+            volume_size (int): Upper bound for the size of a volume in bytes
+            compression_level (int): Deflate level 0-9
+            on_sealed (callable): ``on_sealed(path, index)``, called for each finished volume
+        """
+        if volume_size < MIN_PIECE_SIZE + VOLUME_OVERHEAD:
+            raise ValueError(f"Volume size must be at least {MIN_PIECE_SIZE + VOLUME_OVERHEAD} bytes")
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.base_name = base_name
+        self.volume_size = volume_size
+        self.compression_level = compression_level
+        self.on_sealed = on_sealed
+
+        self.volumes = []
+        self.files = []
+        self.bytes_in = 0
+        self._index = -1
+        self._raw = None
+        self._zip = None
+        self._members = 0
+
+    def volume_path(self, index: int) -> Path:
+        return self.output_dir / f"{self.base_name}.vol{index:04d}.zip"
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_dir / f"{self.base_name}.manifest.json"
+
+    def add_file(self, file_path, arcname: str):
+        """Adds one file, splitting it across volumes if it does not fit."""
+        file_path = Path(file_path)
+        st = file_path.stat()
+        digest = hashlib.sha256()
+        entry = {"path": arcname, "size": st.st_size, "mtime": st.st_mtime, "pieces": []}
+
+        with open(file_path, "rb") as src, tracing.span("archive.file", file=arcname):
+            offset = 0
+            while True:
+                space = self._space_left(arcname)
+                if space < min(MIN_PIECE_SIZE, st.st_size - offset):
+                    self._seal()
+                    space = self._space_left(arcname)
+                whole = offset == 0 and st.st_size <= space
+                length = st.st_size - offset if whole else min(space, st.st_size - offset)
+                member = arcname if whole else f"{arcname}.part{len(entry['pieces']):04d}"
+                self._write_member(src, member, length, digest)
+                entry["pieces"].append({"volume": self._index, "member": member,
+                                        "offset": offset, "length": length})
+                offset += length
+                if offset >= st.st_size:
+                    break
+
+        entry["sha256"] = digest.hexdigest()
+        self.files.append(entry)
+        self.bytes_in += st.st_size
+
+    def add_directory(self, source_dir, path_filter=None):
+        """Adds every file under ``source_dir`` that ``path_filter`` accepts; unreadable files are skipped."""
+        source_dir = Path(source_dir)
+        for file_path in iter_files(source_dir, path_filter):
+            try:
+                self.add_file(file_path, sanitize_arcname(file_path.relative_to(source_dir).as_posix()))
+            except OSError as e:
+                logging.warning(f"   ⚠️  Skipping problematic file: {file_path.name} - {e}")
+
+    def finish(self) -> Path:
+        """Seals the last volume and writes the manifest; returns the manifest path."""
+        if self._zip is not None or not self.volumes:
+            self._seal(final=True)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "base_name": self.base_name,
+            "volume_size": self.volume_size,
+            "created": time.time(),
+            "volumes": self.volumes,
+            "files": self.files,
+        }
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+        return self.manifest_path
+
+    def _space_left(self, arcname: str) -> int:
+        """Bytes of file data that still fit in the volume as one more member named after ``arcname``."""
+        if self._zip is None:
+            self._open_next()
+        # The central directory is written at the end: keep room for the entries of the
+        # members already written and for the headers of the next one
+        name_length = len(arcname.encode("utf-8")) + PIECE_SUFFIX_LENGTH
+        reserved = VOLUME_OVERHEAD + self._directory_size + MEMBER_OVERHEAD + 2 * name_length
+        # Deflate can expand incompressible data slightly; budget for it
+        return int((self.volume_size - reserved - self._raw.tell()) / 1.001)
+
+    def _open_next(self):
+        self._index += 1
+        self._raw = open(self.volume_path(self._index), "wb")
+        self._zip = zipfile.ZipFile(self._raw, "w", zipfile.ZIP_DEFLATED,
+                                    compresslevel=self.compression_level, allowZip64=True)
+        self._members = 0
+        self._directory_size = 0  # Central directory bytes the members written so far will need
+
+    def _write_member(self, src, member, length, digest):
+        remaining = length
+        with self._zip.open(member, "w", force_zip64=length >= zipfile.ZIP64_LIMIT) as dst:
+            while remaining > 0:
+                block = src.read(min(READ_BLOCK, remaining))
+                if not block:
+                    raise OSError(f"{member} changed size while being archived")
+                digest.update(block)
+                dst.write(block)
+                remaining -= len(block)
+        self._members += 1
+        self._directory_size += 46 + 28 + len(member.encode("utf-8"))
+
+    def _seal(self, final=False):
+        if self._zip is None:
+            if not final:
+                return
+            self._open_next()  # An empty directory still produces one volume
+        self._zip.close()
+        self._raw.close()
+        path = self.volume_path(self._index)
+        size = path.stat().st_size
+        self.volumes.append({"index": self._index, "name": path.name, "size": size,
+                             "members": self._members, "sha256": _file_sha256(path)})
+        metrics.COMPRESSION_BYTES.labels("output").inc(size)
+        logging.info(f"   📦 Sealed volume {path.name} ({size / 1024 / 1024:.1f} MB)")
+        self._zip = None
+        self._raw = None
+        if self.on_sealed:
+            self.on_sealed(path, self._index)
+
+
+@tracing.traced("archive.create_volumes")
+def create_volumes(source_dir, output_dir, volume_size: int, base_name: str = None,
+                   compression_level: int = 6, on_sealed=None, path_filter=None) -> Path:
+    """
+    Archives ``source_dir`` into independent ZIP volumes plus a manifest.
+
+    Args:
+        source_dir (str | Path): Directory to archive
+        output_dir (str | Path): Directory receiving the volumes and manifest
+        volume_size (int): Upper bound for each volume in bytes
+        base_name (str): Name prefix; defaults to the directory name
+        compression_level (int): Deflate level 0-9
+        on_sealed (callable): ``on_sealed(path, index)`` for each finished volume
+        path_filter (PathFilter): Include/exclude rules (optional)
+
+    Returns:
+        Path: The manifest
+    """
+    source_dir = Path(source_dir)
+    stage_started = time.monotonic()
+    writer = VolumeWriter(output_dir, base_name or source_dir.name, volume_size,
+                          compression_level, on_sealed)
+    writer.add_directory(source_dir, path_filter)
+    manifest = writer.finish()
+    metrics.COMPRESSION_BYTES.labels("input").inc(writer.bytes_in)
+    metrics.STAGE_DURATION.labels("compress").observe(time.monotonic() - stage_started)
+    return manifest
+
+
+def restore_volumes(manifest_path, dest_dir, volumes_dir=None) -> int:
+    """
+    Rebuilds the archived tree from a manifest and its volumes.
+
+    Args:
+        manifest_path (str | Path): Manifest written by ``create_volumes``
+        dest_dir (str | Path): Directory to extract into
+        volumes_dir (str | Path): Where the volumes are; defaults to the manifest's directory
+
+    Returns:
+        int: Number of files restored
+
+    Raises:
+        ValueError: If a restored file does not match its checksum, or a path
+            would escape ``dest_dir``
+    """
+    manifest_path = Path(manifest_path)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    volumes_dir = Path(volumes_dir or manifest_path.parent)
+    dest_dir = Path(dest_dir).resolve()
+    names = {v["index"]: v["name"] for v in manifest["volumes"]}
+    open_volumes = {}
+
+    try:
+        for entry in manifest["files"]:
+            target = (dest_dir / entry["path"]).resolve()
+            if dest_dir not in target.parents:
+                raise ValueError(f"Refusing to extract outside {dest_dir}: {entry['path']}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            digest = hashlib.sha256()
+            with open(target, "wb") as out:
+                for piece in entry["pieces"]:
+                    volume = open_volumes.get(piece["volume"])
+                    if volume is None:
+                        volume = zipfile.ZipFile(volumes_dir / names[piece["volume"]])
+                        open_volumes[piece["volume"]] = volume
+                    with volume.open(piece["member"]) as src:
+                        while True:
+                            block = src.read(READ_BLOCK)
+                            if not block:
+                                break
+                            digest.update(block)
+                            out.write(block)
+            if digest.hexdigest() != entry["sha256"]:
+                raise ValueError(f"Checksum mismatch for {entry['path']}")
+            os.utime(target, (entry["mtime"], entry["mtime"]))
+    finally:
+        for volume in open_volumes.values():
+            volume.close()
+    return len(manifest["files"])
+
+
+def _file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,367 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from core.journal import Checkpointer, TransferJournal, file_identity
+from core.throttle import AsyncThrottleController, parse_retry_after
+from core.uploader import (
+    SharePointUploader,
+    UploadStats,
+    load_uploader_config,
+    new_session_state,
+    resumed_session,
+    session_recoverable,
+    session_resumable,
+    upload_session_api_url,
+)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class AsyncSharePointUploader:
+    """
+    asyncio SharePoint uploader built on ``httpx.AsyncClient``.
+
+    Mirrors the ``SharePointUploader`` API with coroutines, so many uploads and
+    session creations can be multiplexed over HTTP/2 on a single thread. Chunks of
+    one file are still sent in order, as upload sessions require; concurrency
+    comes from uploading many files at once with ``upload_files``.
+
+    Session resumption and recovery share their logic with ``SharePointUploader``,
+    and ``upload_stats``, ``stats``, ``progress_tracker`` and ``bandwidth`` work the
+    same way. Streaming uploads (``open_stream``) are not offered. Journal writes
+    and bandwidth waits run in worker threads so they never block the event loop.
+    """
+
+    CHUNK_SIZE = SharePointUploader.CHUNK_SIZE
+    MAX_RETRIES = SharePointUploader.MAX_RETRIES
+    RETRY_DELAY = SharePointUploader.RETRY_DELAY
+    CHECKPOINT_INTERVAL_SECONDS = SharePointUploader.CHECKPOINT_INTERVAL_SECONDS
+    CHECKPOINT_INTERVAL_BYTES = SharePointUploader.CHECKPOINT_INTERVAL_BYTES
+    SESSION_EXPIRY_MARGIN = SharePointUploader.SESSION_EXPIRY_MARGIN
+    MAX_SESSION_RECOVERIES = SharePointUploader.MAX_SESSION_RECOVERIES
+    MAX_THROTTLE_RETRIES = SharePointUploader.MAX_THROTTLE_RETRIES
+
+    def __init__(self, token=None, config_path="config.json", journal=None,
+                 checkpoint_interval=None, checkpoint_bytes=None, throttle=None,
+                 token_provider=None, max_connections=100, client=None,
+                 bandwidth=None, progress_tracker=None):
+        """
+        Initialize the async SharePoint uploader.
+
+        Args:
+            token (str): Bearer token; optional when ``token_provider`` is given
+            config_path (str): Path to the configuration file
+            journal (TransferJournal): Resume-state journal, as for SharePointUploader
+            checkpoint_interval (float): Seconds between resume-state checkpoints
+            checkpoint_bytes (int): Bytes of progress between checkpoints
+            throttle (AsyncThrottleController): Shared rate limiter; defaults to the
+                process-wide async controller for the configured tenant
+            token_provider (TokenProvider): Refreshes the token when it expires or a
+                request is rejected with 401
+            max_connections (int): Connection pool size of the HTTP client
+            client (httpx.AsyncClient): Preconfigured client, mainly for tests
+            bandwidth (BandwidthLimiter | JobBandwidthLimiter): Optional cap applied to
+                chunk uploads
+            progress_tracker (ProgressTracker): Optional tracker that receives per-file
+                upload progress
+        """
+        if token is None and token_provider is None:
+            raise ValueError("Either token or token_provider is required")
+
+        self.token = token
+        self.token_provider = token_provider
+        self.config = load_uploader_config(config_path)
+
+        self.client = client or httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(60.0, connect=15.0),
+        )
+        self.journal = journal or TransferJournal(self.config.get("JOURNAL_PATH"))
+        if checkpoint_interval is None:
+            checkpoint_interval = self.config.get("CHECKPOINT_INTERVAL_SECONDS", self.CHECKPOINT_INTERVAL_SECONDS)
+        if checkpoint_bytes is None:
+            checkpoint_bytes = self.config.get("CHECKPOINT_INTERVAL_BYTES", self.CHECKPOINT_INTERVAL_BYTES)
+        self.checkpoint_interval = float(checkpoint_interval)
+        self.checkpoint_bytes = int(checkpoint_bytes)
+        self.throttle = throttle or AsyncThrottleController.for_tenant(self.config.get("TENANT_ID") or "default")
+        self.bandwidth = bandwidth
+        self.progress_tracker = progress_tracker
+        self.upload_stats = []  # One UploadStats per upload_file call
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Closes the HTTP client and flushes the journal."""
+        await self.client.aclose()
+        await asyncio.to_thread(self.journal.flush)
+
+    async def create_upload_session(self, file_path, folder_path=""):
+        """
+        Create a resumable upload session for a file.
+
+        Returns:
+            str: Upload session URL
+        """
+        return (await self._request_upload_session(file_path, folder_path))["uploadUrl"]
+
+    async def _request_upload_session(self, file_path, folder_path=""):
+        """Create an upload session and return the full session resource."""
+        api_url = upload_session_api_url(self.config, file_path, folder_path)
+        response = await self._throttled_request("POST", api_url)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_upload_session_status(self, upload_url):
+        """
+        Query an upload session for the byte ranges the server still expects.
+
+        Returns:
+            dict or None: Session resource, or None if the session no longer exists
+        """
+        response = await self._throttled_request("GET", upload_url)
+        if response.status_code in (404, 410):
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def upload_file(self, file_path, folder_path=""):
+        """
+        Upload a file using resumable upload with chunking and state persistence.
+
+        Behaves like ``SharePointUploader.upload_file``: journaled sessions are
+        resumed from the server's ``nextExpectedRanges`` and expired or lost
+        sessions are replaced transparently.
+
+        Returns:
+            dict: Upload result containing file metadata
+        """
+        file_size = os.stat(file_path).st_size
+        file_key = file_identity(file_path)
+        name = os.path.basename(file_path)
+
+        upload_url, offset, expires_at = await self._resume_upload_session(
+            file_key, file_path, folder_path
+        )
+
+        stats = UploadStats(name, file_size, offset)
+        self.upload_stats.append(stats)
+        task = None
+        if self.progress_tracker:
+            task = self.progress_tracker.add_task(name, total_size=file_size, completed=offset)
+
+        checkpointer = Checkpointer(
+            self.journal, file_key, self.checkpoint_interval, self.checkpoint_bytes
+        )
+        session_recoveries = 0
+
+        try:
+            with open(file_path, 'rb') as file:
+                file.seek(offset)
+
+                while offset < file_size:
+                    chunk_size = min(self.CHUNK_SIZE, file_size - offset)
+                    read_started = time.perf_counter()
+                    chunk_data = await asyncio.to_thread(file.read, chunk_size)
+                    stats.read_seconds += time.perf_counter() - read_started
+
+                    try:
+                        result = await self._upload_chunk_with_retry(
+                            upload_url, chunk_data, offset, chunk_size, file_size, stats=stats
+                        )
+                    except httpx.HTTPStatusError as e:
+                        if not session_recoverable(e.response.status_code, session_recoveries,
+                                                   self.MAX_SESSION_RECOVERIES):
+                            raise
+                        # The session expired or disagrees with our offset: resynchronise
+                        session_recoveries += 1
+                        stats.session_recoveries += 1
+                        checkpointer.discard()
+                        previous_offset = offset
+                        upload_url, offset, expires_at = await self._resume_upload_session(
+                            file_key, file_path, folder_path,
+                            saved_state={"upload_url": upload_url, "expires_at": expires_at}
+                        )
+                        self._report_progress(task, offset - previous_offset)
+                        file.seek(offset)
+                        continue
+
+                    if result.status_code in (200, 201):
+                        checkpointer.discard()
+                        await asyncio.to_thread(self.journal.clear, file_key)
+                        stats.finish(file_size)
+                        self._report_progress(task, file_size - offset)
+                        if self.progress_tracker:
+                            self.progress_tracker.complete_file(task)
+                        return result.json()
+                    elif result.status_code == 202:
+                        sent_to = offset + chunk_size
+                        next_offset = SharePointUploader._next_expected_offset(result, file_size)
+                        previous_offset = offset
+                        offset = next_offset if next_offset is not None else sent_to
+                        if offset != sent_to:
+                            file.seek(offset)
+                        self._report_progress(task, offset - previous_offset)
+                        # Record progress; written only when a checkpoint is due
+                        await asyncio.to_thread(checkpointer.update, {
+                            "file_path": os.path.abspath(file_path),
+                            "upload_url": upload_url,
+                            "offset": offset,
+                            "expires_at": expires_at
+                        })
+                    else:
+                        raise Exception(f"Unexpected response status: {result.status_code}")
+        finally:
+            stats.finish(offset)
+            await asyncio.to_thread(checkpointer.flush)
+            await asyncio.to_thread(self.journal.flush)
+
+        raise Exception("Upload completed but no final response received")
+
+    async def upload_files(self, file_paths, folder_path="", concurrency=32):
+        """
+        Upload many files concurrently on the current event loop.
+
+        Args:
+            file_paths (list): Paths of the files to upload
+            folder_path (str): Optional folder path in SharePoint
+            concurrency (int): Maximum number of files uploading at once; the shared
+                throttle controller may lower the number of requests in flight further
+
+        Returns:
+            list: Upload result or raised exception for each file, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def upload_one(path):
+            async with semaphore:
+                return await self.upload_file(path, folder_path)
+
+        return await asyncio.gather(*(upload_one(path) for path in file_paths), return_exceptions=True)
+
+    def stats(self):
+        """Returns upload metrics summed over every ``upload_file`` call so far."""
+        return UploadStats.aggregate(list(self.upload_stats))
+
+    def _report_progress(self, task, advance):
+        """Forwards confirmed upload progress to the progress tracker task returned by ``add_task``."""
+        if self.progress_tracker and advance > 0:
+            self.progress_tracker.update(task, advance)
+
+    async def _resume_upload_session(self, file_key, file_path, folder_path, saved_state=None):
+        """
+        Resolve the session and offset to upload from.
+
+        Returns:
+            tuple: (upload_url, offset, expires_at)
+        """
+        if saved_state is None:
+            saved_state = await asyncio.to_thread(self.journal.load, file_key)
+
+        if session_resumable(saved_state, self.SESSION_EXPIRY_MARGIN):
+            resumed = resumed_session(saved_state, await self.get_upload_session_status(saved_state["upload_url"]))
+            if resumed:
+                return resumed
+
+        state = new_session_state(file_path, await self._request_upload_session(file_path, folder_path))
+        await asyncio.to_thread(self.journal.save, file_key, state)
+        return state["upload_url"], 0, state["expires_at"]
+
+    async def _upload_chunk_with_retry(self, upload_url, chunk_data, offset, chunk_size, total_size, stats=None):
+        """
+        Upload a single chunk, retrying network errors and 5xx responses.
+
+        The bandwidth cap is waited for in a worker thread, and ``stats`` (an
+        ``UploadStats``) records retries, waits and accepted chunks.
+
+        Returns:
+            httpx.Response: Response from the upload request
+
+        Raises:
+            httpx.HTTPStatusError: On client errors or when retries are exhausted
+        """
+        headers = {
+            "Content-Range": f"bytes {offset}-{offset + chunk_size - 1}/{total_size}",
+            "Content-Length": str(chunk_size)
+        }
+
+        for attempt in range(self.MAX_RETRIES):
+            if attempt and stats:
+                stats.retries += 1
+            if self.bandwidth:
+                wait_started = time.perf_counter()
+                await asyncio.to_thread(self.bandwidth.consume, chunk_size)
+                if stats:
+                    stats.wait_seconds += time.perf_counter() - wait_started
+            sent_at = time.perf_counter()
+            try:
+                response = await self._throttled_request("PUT", upload_url, content=chunk_data, headers=headers)
+            except httpx.TransportError:
+                if attempt < self.MAX_RETRIES - 1:
+                    await asyncio.sleep(self.RETRY_DELAY * (2 ** attempt))
+                    continue
+                raise
+
+            if response.status_code in (200, 201, 202):
+                if stats:
+                    stats.record_chunk(chunk_size, time.perf_counter() - sent_at)
+                return response
+            if response.status_code >= 500 and attempt < self.MAX_RETRIES - 1:
+                await asyncio.sleep(self.RETRY_DELAY * (2 ** attempt))
+                continue
+            response.raise_for_status()
+
+        raise Exception(f"Failed to upload chunk after {self.MAX_RETRIES} attempts")
+
+    async def _throttled_request(self, method, url, headers=None, **kwargs):
+        """
+        Send a request through the shared throttle controller.
+
+        Throttling responses pause every coroutine sharing the controller. A 401 is
+        answered once with a forced token refresh when a token provider is set.
+        """
+        refreshed = False
+        for attempt in range(self.MAX_THROTTLE_RETRIES):
+            request_headers = {"Authorization": f"Bearer {await self._get_token()}"}
+            if headers:
+                request_headers.update(headers)
+
+            async with self.throttle.slot():
+                response = await self.client.request(method, url, headers=request_headers, **kwargs)
+
+            if response.status_code == 401 and self.token_provider and not refreshed:
+                refreshed = True
+                self.token = await self.token_provider.get_token_async(force_refresh=True)
+                continue
+
+            retry_after = None
+            if response.status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429 and retry_after is None:
+                retry_after = self.RETRY_DELAY * (2 ** attempt)
+
+            if retry_after is None:
+                if response.status_code < 500:
+                    self.throttle.on_success()
+                return response
+            self.throttle.on_throttled(retry_after)
+
+        return response
+
+    async def _get_token(self):
+        """Returns the current token, refreshing it through the provider if needed."""
+        if self.token_provider:
+            self.token = await self.token_provider.get_token_async()
+        return self.token
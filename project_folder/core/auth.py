@@ -1,7 +1,11 @@
+import asyncio
 import msal
 import os
+import threading
+import time
 from pathlib import Path
 from dotenv import load_dotenv
+from core.tracing import traced
 from core.utils import load_config
 
 # Load environment variables from .env file if it exists
@@ -28,6 +32,7 @@ if env_file.exists():
 else:
     config = load_config('config.json')
 
+@traced("auth.acquire_token")
 def get_access_token():
     """
     Acquires an access token from Microsoft Graph using the MSAL library.
@@ -61,4 +66,85 @@ def get_access_token():
         return result["access_token"]
     else:
         error_details = result.get("error_description", "No error description provided.")
-        raise Exception(f"Authentication failed: {result.get('error')} - {error_details}")
\ No newline at end of file
+        raise Exception(f"Authentication failed: {result.get('error')} - {error_details}")
+
+
+class TokenProvider:
+    """
+    Caches a Microsoft Graph access token and refreshes it before it expires.
+
+    Long-running and concurrent uploaders share one provider, so a single MSAL
+    client is created and token refreshes are serialised instead of every worker
+    authenticating on its own.
+    """
+
+    REFRESH_MARGIN = 300  # Refresh tokens this many seconds before they expire
+
+    def __init__(self, auth_config=None):
+        """
+        Args:
+            auth_config (dict): Credentials; defaults to the module-level configuration
+        """
+        self.config = auth_config or config
+        self._app = None
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._async_lock = None
+
+    def get_token(self, force_refresh=False):
+        """
+        Returns a valid access token, acquiring a new one if needed.
+
+        Args:
+            force_refresh (bool): Discard the cached token, e.g. after a 401
+
+        Raises:
+            Exception: If token acquisition fails.
+        """
+        with self._lock:
+            if force_refresh or not self._is_fresh():
+                self._acquire()
+            return self._token
+
+    async def get_token_async(self, force_refresh=False):
+        """
+        Async variant of ``get_token``.
+
+        A fresh cached token is returned without locking or leaving the event
+        loop. Only a refresh takes the lock: the blocking MSAL call runs in a
+        worker thread, and concurrent coroutines wait for a single refresh
+        instead of each starting their own.
+        """
+        if not force_refresh and self._is_fresh():
+            return self._token
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if not force_refresh and self._is_fresh():
+                return self._token  # Refreshed by the coroutine that held the lock
+            return await asyncio.to_thread(self.get_token, force_refresh)
+
+    def _is_fresh(self) -> bool:
+        return bool(self._token) and time.time() < self._expires_at - self.REFRESH_MARGIN
+
+    @traced("auth.acquire_token")
+    def _acquire(self):
+        """Acquires a token with the client credentials flow."""
+        if self._app is None:
+            tenant_id = self.config.get("TENANT_ID")
+            self._app = msal.ConfidentialClientApplication(
+                self.config.get("CLIENT_ID"),
+                authority=f"https://login.microsoftonline.com/{tenant_id}",
+                client_credential=self.config.get("CLIENT_SECRET")
+            )
+
+        scopes = [f"https://{self.config.get('SHAREPOINT_HOST')}/.default"]
+        result = self._app.acquire_token_for_client(scopes=scopes)
+
+        if "access_token" not in result:
+            error_details = result.get("error_description", "No error description provided.")
+            raise Exception(f"Authentication failed: {result.get('error')} - {error_details}")
+
+        self._token = result["access_token"]
+        self._expires_at = time.time() + int(result.get("expires_in", 3600))
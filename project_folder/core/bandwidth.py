@@ -0,0 +1,273 @@
+import logging
+import os
+import re
+import signal
+import threading
+import time
+from datetime import datetime
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+_RATE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$", re.IGNORECASE)
+_WINDOW_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def parse_rate(value):
+    """
+    Parses a bandwidth cap such as ``"10M"``, ``"512K"`` or ``"2.5MB/s"``.
+
+    Args:
+        value (str | int | float | None): Rate in bytes per second with an optional
+            K/M/G suffix (powers of 1024)
+
+    Returns:
+        float or None: Bytes per second, or None for "unlimited", "off", "0" or None
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    text = value.strip()
+    if text.lower() in ("", "0", "none", "off", "unlimited"):
+        return None
+    match = _RATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid bandwidth value: {value!r}")
+    rate = float(match.group(1)) * _UNITS[match.group(2).upper()]
+    return rate if rate > 0 else None
+
+
+def parse_schedule(spec):
+    """
+    Parses a time-of-day schedule such as ``"08:00-18:00=10M,18:00-08:00=unlimited"``.
+
+    Windows may wrap past midnight. A ``*=RATE`` entry sets the rate outside all
+    windows; without one, times outside every window are unlimited.
+
+    Returns:
+        list: ``(start_minute, end_minute, rate)`` tuples; ``start_minute`` is None
+        for the default entry
+    """
+    entries = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "=" not in part:
+            raise ValueError(f"Invalid schedule entry: {part!r}")
+        window, rate = part.split("=", 1)
+        if window.strip() == "*":
+            entries.append((None, None, parse_rate(rate)))
+            continue
+        match = _WINDOW_PATTERN.match(window)
+        if not match:
+            raise ValueError(f"Invalid schedule window: {window!r}")
+        start_h, start_m, end_h, end_m = (int(g) for g in match.groups())
+        entries.append((start_h * 60 + start_m, end_h * 60 + end_m, parse_rate(rate)))
+    return entries
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket measured in bytes.
+
+    Callers reserve bytes before sending them; a reservation larger than the tokens
+    available puts the bucket into debt and the caller sleeps exactly until the debt
+    is repaid. Idle time is credited up to ``burst`` bytes, so the long-run rate
+    converges on the cap without extra stalls between chunks.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        """
+        Args:
+            rate (float): Bytes per second, or None for unlimited
+            burst (float): Maximum credit accumulated while idle; defaults to one
+                second worth of traffic
+        """
+        self._lock = threading.Lock()
+        self._burst_override = burst
+        self.rate = None
+        self.burst = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+        self._tokens = self.burst
+
+    def set_rate(self, rate):
+        """Changes the cap at runtime; None removes it."""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = float(self._burst_override or rate or 0.0)
+            self._tokens = min(self._tokens, self.burst)
+
+    def reserve(self, nbytes):
+        """
+        Reserves ``nbytes`` and returns the seconds the caller must wait before sending.
+        """
+        with self._lock:
+            if self.rate is None:
+                return 0.0
+            self._refill()
+            self._tokens -= nbytes
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def consume(self, nbytes):
+        """Blocks until ``nbytes`` may be sent under the cap."""
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class BandwidthLimiter:
+    """
+    Global bandwidth cap with optional per-job caps and a time-of-day schedule.
+
+    Uploads and SFTP reads call ``consume`` (or a job's ``consume``) with the bytes
+    they are about to transfer. The global cap can be changed at runtime through
+    ``set_rate``, by writing a new rate or schedule to the control file, or by
+    sending SIGHUP to force the control file to be re-read.
+    """
+
+    CONTROL_CHECK_INTERVAL = 2.0  # Seconds between control file / schedule checks
+
+    def __init__(self, rate=None, schedule=None, control_file=None):
+        """
+        Args:
+            rate (str | float): Global cap, e.g. "10M"; ignored while a schedule applies
+            schedule (str): Time-of-day schedule, see ``parse_schedule``
+            control_file (str): File containing a rate or schedule that overrides the
+                command-line settings whenever it changes
+        """
+        self.base_rate = parse_rate(rate)
+        self.schedule = parse_schedule(schedule) if schedule else None
+        self.control_file = control_file
+        self.global_bucket = TokenBucket(self._scheduled_rate())
+
+        self._control_mtime = None
+        self._next_check = 0.0
+        self._reload_requested = False
+        self._check_lock = threading.Lock()
+        self._maybe_reload(force=True)
+
+    @property
+    def rate(self):
+        """The global cap currently in force, in bytes per second."""
+        return self.global_bucket.rate
+
+    def set_rate(self, rate, schedule=None):
+        """Replaces the global cap and schedule at runtime."""
+        self.base_rate = parse_rate(rate)
+        self.schedule = parse_schedule(schedule) if schedule else None
+        self.global_bucket.set_rate(self._scheduled_rate())
+        logging.info(f"Bandwidth limit set to {_format_rate(self.rate)}")
+
+    def job(self, rate=None):
+        """Returns a limiter for one transfer job that also honours the global cap."""
+        return JobBandwidthLimiter(self, parse_rate(rate))
+
+    def consume(self, nbytes):
+        """Blocks until ``nbytes`` may be transferred under the global cap."""
+        self._maybe_reload()
+        self.global_bucket.consume(nbytes)
+
+    def install_signal_handler(self, signum=None):
+        """
+        Re-reads the control file when the process receives ``signum`` (SIGHUP).
+
+        Must be called from the main thread. Does nothing on platforms without SIGHUP.
+        """
+        signum = signum or getattr(signal, "SIGHUP", None)
+        if signum is None:
+            return
+
+        def request_reload(_signum, _frame):
+            self._reload_requested = True
+            self._next_check = 0.0
+
+        signal.signal(signum, request_reload)
+
+    def _maybe_reload(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.CONTROL_CHECK_INTERVAL
+            if self.control_file:
+                self._read_control_file(force or self._reload_requested)
+                self._reload_requested = False
+            scheduled = self._scheduled_rate()
+            if scheduled != self.global_bucket.rate:
+                self.global_bucket.set_rate(scheduled)
+                logging.info(f"Bandwidth limit now {_format_rate(scheduled)}")
+        finally:
+            self._check_lock.release()
+
+    def _read_control_file(self, force):
+        try:
+            mtime = os.stat(self.control_file).st_mtime_ns
+        except OSError:
+            return
+        if not force and mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+        try:
+            with open(self.control_file, "r") as f:
+                content = f.read().strip()
+            if "=" in content:
+                self.schedule = parse_schedule(content)
+            else:
+                self.schedule = None
+                self.base_rate = parse_rate(content)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring bandwidth control file {self.control_file}: {e}")
+
+    def _scheduled_rate(self, now=None):
+        if not self.schedule:
+            return self.base_rate
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        default = None
+        for start, end, rate in self.schedule:
+            if start is None:
+                default = rate
+            elif start <= end and start <= minute < end:
+                return rate
+            elif start > end and (minute >= start or minute < end):
+                return rate
+        return default
+
+
+class JobBandwidthLimiter:
+    """Per-job cap layered on top of a ``BandwidthLimiter``'s global cap."""
+
+    def __init__(self, parent, rate=None):
+        self.parent = parent
+        self.bucket = TokenBucket(rate)
+
+    def set_rate(self, rate):
+        """Changes this job's cap at runtime."""
+        self.bucket.set_rate(parse_rate(rate))
+
+    def consume(self, nbytes):
+        """Blocks until ``nbytes`` fits under both the job and the global cap."""
+        self.parent._maybe_reload()
+        # Reserve from both buckets first so the waits overlap rather than add up
+        delay = max(self.bucket.reserve(nbytes), self.parent.global_bucket.reserve(nbytes))
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _format_rate(rate):
+    if rate is None:
+        return "unlimited"
+    return f"{rate / (1024 * 1024):.2f} MB/s"
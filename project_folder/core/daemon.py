@@ -0,0 +1,685 @@
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from core.journal import TransferJournal
+from core.progress import HeadlessProgressTracker
+from core.ssh_copy import RemoteFetcher
+from core.transport import SharedTransport
+from core.uploader import SharePointUploader, load_uploader_config
+
+DEFAULT_DAEMON_DIR = Path.home() / ".sharepoint_uploader"
+DEFAULT_SOCKET_PATH = DEFAULT_DAEMON_DIR / "daemon.sock"
+DEFAULT_QUEUE_PATH = DEFAULT_DAEMON_DIR / "queue.db"
+
+JOB_KINDS = ("upload", "ssh")
+FINAL_STATES = ("done", "failed", "cancelled")
+SECRET_PARAMS = ("ssh_pass",)  # Never written back to the spool directory
+
+
+class DaemonError(Exception):
+    """Raised when the daemon cannot be reached or rejects a request."""
+    pass
+
+
+class JobQueue:
+    """
+    Persistent priority queue of transfer jobs, backed by SQLite in WAL mode.
+
+    Jobs are claimed highest priority first, then in submission order. Every
+    state change is committed immediately, so a daemon that is stopped or
+    crashes loses no jobs: on the next start, jobs that were running are put
+    back in the queue with ``requeue_interrupted``.
+    """
+
+    _COLUMNS = "id, kind, params, priority, state, attempts, submitted_at, started_at, finished_at, result, error"
+
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str | Path): Location of the SQLite file, or ":memory:"
+        """
+        self.db_path = str(db_path or DEFAULT_QUEUE_PATH)
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind         TEXT NOT NULL,
+                params       TEXT NOT NULL,
+                priority     INTEGER NOT NULL DEFAULT 0,
+                state        TEXT NOT NULL DEFAULT 'queued',
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                submitted_at REAL NOT NULL,
+                started_at   REAL,
+                finished_at  REAL,
+                result       TEXT,
+                error        TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (state, priority DESC, id)")
+        if self.db_path != ":memory:":
+            os.chmod(self.db_path, 0o600)  # Job parameters can carry SSH passwords
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, kind: str, params: dict, priority: int = 0) -> int:
+        """
+        Adds a job and returns its id.
+
+        Raises:
+            ValueError: If ``kind`` is unknown
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, params, priority, submitted_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(params), int(priority), time.time()),
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """Marks the next queued job as running and returns it, or None if the queue is empty."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE state = 'queued' ORDER BY priority DESC, id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (time.time(), row[0]),
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0])
+
+    def finish(self, job_id: int, result: dict = None):
+        self._close_job(job_id, "done", result=json.dumps(result) if result is not None else None)
+
+    def fail(self, job_id: int, error: str):
+        self._close_job(job_id, "failed", error=error)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancels a job that has not started yet; returns False otherwise."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE id = ? AND state = 'queued'",
+                (time.time(), job_id),
+            )
+            return cursor.rowcount == 1
+
+    def requeue_interrupted(self) -> int:
+        """Puts jobs left running by a previous daemon back in the queue; returns their count."""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET state = 'queued', started_at = NULL WHERE state = 'running'")
+            return cursor.rowcount
+
+    def get(self, job_id: int):
+        """Returns a job as a dictionary, or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, state: str = None, limit: int = 100) -> list:
+        """Returns the most recent jobs, optionally only those in ``state``."""
+        query = f"SELECT {self._COLUMNS} FROM jobs"
+        args = []
+        if state:
+            query += " WHERE state = ?"
+            args.append(state)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self) -> dict:
+        """Returns the number of jobs per state."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _close_job(self, job_id, state, result=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                (state, time.time(), result, error, job_id),
+            )
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job_id, kind, params, priority, state, attempts, submitted, started, finished, result, error = row
+        return {
+            "id": job_id,
+            "kind": kind,
+            "params": json.loads(params),
+            "priority": priority,
+            "state": state,
+            "attempts": attempts,
+            "submitted_at": submitted,
+            "started_at": started,
+            "finished_at": finished,
+            "result": json.loads(result) if result else None,
+            "error": error,
+        }
+
+
+class SSHConnectionPool:
+    """
+    Keeps SSH/SFTP connections open between jobs, keyed by host, port and user.
+
+    A connection is used by one job at a time; idle connections are kept up to
+    ``max_idle_per_host`` and closed after ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, max_idle_per_host: int = 2, idle_timeout: float = 300.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self._idle = {}  # key -> [(fetcher, released_at)]
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(params: dict):
+        return params["ssh_host"], int(params.get("ssh_port") or 22), params["ssh_user"]
+
+    def acquire(self, params: dict, progress_tracker, bandwidth=None) -> RemoteFetcher:
+        """Returns a connected fetcher for the job's host, reusing an idle one if possible."""
+        key = self.key(params)
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                fetcher, _ = idle.pop()
+                transport = fetcher.ssh_client.get_transport() if fetcher.ssh_client else None
+                if transport is not None and transport.is_active():
+                    self.reused += 1
+                    fetcher.progress_tracker = progress_tracker
+                    fetcher.bandwidth = bandwidth
+                    return fetcher
+                fetcher.close()
+
+        fetcher = RemoteFetcher(
+            progress_tracker=progress_tracker,
+            hostname=key[0],
+            port=key[1],
+            username=key[2],
+            password=params.get("ssh_pass"),
+            private_key_path=params.get("ssh_key"),
+            bandwidth=bandwidth,
+        )
+        fetcher.connect()
+        with self._lock:
+            self.opened += 1
+        return fetcher
+
+    def release(self, fetcher: RemoteFetcher, healthy: bool = True):
+        """Returns a fetcher to the pool, or closes it if it failed or the pool is full."""
+        key = (fetcher.hostname, fetcher.port, fetcher.username)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if healthy and len(idle) < self.max_idle_per_host:
+                idle.append((fetcher, time.monotonic()))
+                return
+        fetcher.close()
+
+    def prune(self):
+        """Closes connections that have been idle longer than ``idle_timeout``."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                keep = [(f, t) for f, t in idle if now - t < self.idle_timeout]
+                expired.extend(f for f, t in idle if now - t >= self.idle_timeout)
+                self._idle[key] = keep
+        for fetcher in expired:
+            fetcher.close()
+
+    def close(self):
+        with self._lock:
+            fetchers = [f for idle in self._idle.values() for f, _ in idle]
+            self._idle.clear()
+        for fetcher in fetchers:
+            fetcher.close()
+
+
+class TransferDaemon:
+    """
+    Long-running process that executes queued transfer jobs.
+
+    The token provider, HTTP connection pools, transfer journal and SSH
+    connections are created once and shared by every job, so a job pays only
+    for its own transfer instead of interpreter start-up, authentication and
+    handshakes. Jobs arrive over a Unix socket (newline-delimited JSON, see
+    ``DaemonClient``) or as JSON files dropped into a spool directory, wait in
+    a persistent ``JobQueue`` and run at most ``max_jobs`` at a time.
+
+    Job parameters:
+
+    - ``upload``: ``path`` (file, or directory compressed first), ``folder``
+    - ``ssh``: ``remote_path``, ``ssh_host``, ``ssh_user``, ``ssh_port``,
+      ``ssh_pass`` or ``ssh_key``, ``folder``, ``compression_level``
+    """
+
+    SPOOL_POLL_INTERVAL = 1.0
+
+    def __init__(self, config_path: str = "config.json", queue: JobQueue = None,
+                 socket_path=None, spool_dir=None, max_jobs: int = 2,
+                 token_provider=None, compress=None, bandwidth=None):
+        """
+        Args:
+            config_path (str): Uploader configuration used for every job
+            queue (JobQueue): Job store; defaults to the per-user queue database
+            socket_path (str | Path): Unix socket to listen on, or None
+            spool_dir (str | Path): Directory polled for ``*.json`` job files, or None
+            max_jobs (int): Jobs executed concurrently
+            token_provider (TokenProvider): Source of access tokens; defaults to a
+                provider for the configured tenant
+            compress (callable): ``compress(directory, compression_level=...)`` returning
+                the archive path; required for directory and SSH jobs
+            bandwidth (BandwidthLimiter): Optional cap shared by all jobs
+        """
+        self.config_path = config_path
+        self.config = load_uploader_config(config_path)
+        self.queue = queue or JobQueue()
+        self.socket_path = str(socket_path) if socket_path else None
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.max_jobs = max_jobs
+        self.compress = compress
+        self.bandwidth = bandwidth
+
+        if token_provider is None:
+            from core.auth import TokenProvider
+            token_provider = TokenProvider()
+        self.token_provider = token_provider
+        pool_size = int(self.config.get("HTTP_POOL_SIZE", SharedTransport.DEFAULT_POOL_SIZE))
+        self.transport = SharedTransport.shared(pool_maxsize=pool_size)
+        self.journal = TransferJournal(self.config.get("JOURNAL_PATH"))
+        self.ssh_pool = SSHConnectionPool()
+
+        self._cond = threading.Condition()
+        self._running = {}  # job id -> thread
+        self._stopping = threading.Event()
+        self._server = None
+        self._threads = []
+
+    def start(self):
+        """Starts the scheduler, socket listener and spool watcher in background threads."""
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            logging.info(f"🔁 Re-queued {requeued} job(s) interrupted by the last shutdown")
+
+        self._stopping.clear()
+        self._spawn(self._schedule_loop, "daemon-scheduler")
+        if self.socket_path:
+            self._server = self._make_server()
+            self._spawn(self._server.serve_forever, "daemon-socket")
+            logging.info(f"📡 Accepting jobs on {self.socket_path}")
+        if self.spool_dir:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._spawn(self._spool_loop, "daemon-spool")
+            logging.info(f"📂 Accepting jobs from {self.spool_dir}")
+        return self
+
+    def stop(self, wait: bool = True):
+        """Stops accepting and scheduling jobs; running jobs finish unless ``wait`` is False."""
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if wait:
+            for thread in list(self._running.values()):
+                thread.join()
+        self.ssh_pool.close()
+        self.journal.flush()
+
+    def serve_forever(self):
+        """Runs until interrupted or asked to shut down over the socket."""
+        self.start()
+        try:
+            while not self._stopping.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            logging.info("🛑 Shutting down daemon...")
+        finally:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def submit(self, job: dict) -> int:
+        """Validates and queues a job description; returns the job id."""
+        kind = job.get("kind")
+        params = dict(job.get("params") or {})
+        if kind == "upload" and not params.get("path"):
+            raise ValueError("upload jobs need a path")
+        if kind == "ssh":
+            missing = [k for k in ("remote_path", "ssh_host", "ssh_user") if not params.get(k)]
+            if missing:
+                raise ValueError(f"ssh jobs need {', '.join(missing)}")
+        if kind == "upload":
+            params["path"] = os.path.abspath(params["path"])
+        job_id = self.queue.submit(kind, params, job.get("priority", 0))
+        logging.info(f"📥 Queued {kind} job {job_id} (priority {job.get('priority', 0)})")
+        with self._cond:
+            self._cond.notify_all()
+        return job_id
+
+    def wait(self, job_id: int, timeout: float = None):
+        """Blocks until a job reaches a final state; returns the job, or None if unknown."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                job = self.queue.get(job_id)
+                if job is None or job["state"] in FINAL_STATES:
+                    return job
+                remaining = deadline - time.monotonic() if deadline is not None else 1.0
+                if remaining <= 0 or self._stopping.is_set():
+                    return job
+                self._cond.wait(min(remaining, 1.0))
+
+    def status(self) -> dict:
+        """Returns queue counts and connection reuse statistics."""
+        transport = self.transport.stats()
+        return {
+            "jobs": self.queue.counts(),
+            "running": sorted(self._running),
+            "max_jobs": self.max_jobs,
+            "ssh_connections_opened": self.ssh_pool.opened,
+            "ssh_connections_reused": self.ssh_pool.reused,
+            "http_connections_opened": transport["connections_opened"],
+            "http_connections_reused": transport["connections_reused"],
+        }
+
+    # Scheduling ---------------------------------------------------------
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _schedule_loop(self):
+        while not self._stopping.is_set():
+            with self._cond:
+                job = self.queue.claim() if len(self._running) < self.max_jobs else None
+                if job is None:
+                    self._cond.wait(self.SPOOL_POLL_INTERVAL)
+                    continue
+                thread = threading.Thread(target=self._run_job, args=(job,),
+                                          name=f"daemon-job-{job['id']}", daemon=True)
+                self._running[job["id"]] = thread
+            thread.start()
+            self.ssh_pool.prune()
+
+    def _run_job(self, job):
+        logging.info(f"▶️  Starting {job['kind']} job {job['id']}")
+        try:
+            if job["kind"] == "upload":
+                result = self._run_upload(job["params"])
+            else:
+                result = self._run_ssh(job["params"])
+            self.queue.finish(job["id"], result)
+            logging.info(f"✅ Job {job['id']} done")
+        except Exception as e:
+            self.queue.fail(job["id"], str(e))
+            logging.error(f"❌ Job {job['id']} failed: {e}")
+        finally:
+            with self._cond:
+                self._running.pop(job["id"], None)
+                self._cond.notify_all()
+
+    def _uploader(self, progress_tracker):
+        return SharePointUploader(
+            self.token_provider.get_token(), self.config_path,
+            journal=self.journal,
+            transport=self.transport,
+            bandwidth=self.bandwidth,
+            progress_tracker=progress_tracker,
+        )
+
+    def _upload(self, file_path, params, progress_tracker):
+        uploader = self._uploader(progress_tracker)
+        item = uploader.upload_file(str(file_path), params.get("folder", ""))
+        return {"item_id": item.get("id"), "name": item.get("name"), "size": item.get("size"),
+                "stats": uploader.stats()}
+
+    def _compress(self, directory, params):
+        if self.compress is None:
+            raise ValueError("This daemon cannot compress directories")
+        return Path(self.compress(Path(directory), compression_level=params.get("compression_level", 6)))
+
+    def _run_upload(self, params):
+        path = Path(params["path"])
+        if not path.exists():
+            raise FileNotFoundError(f"Path not found: {path}")
+        tracker = HeadlessProgressTracker()
+        if path.is_file():
+            return self._upload(path, params, tracker)
+        archive = self._compress(path, params)
+        try:
+            return self._upload(archive, params, tracker)
+        finally:
+            archive.unlink(missing_ok=True)
+
+    def _run_ssh(self, params):
+        tracker = HeadlessProgressTracker()
+        workdir = Path(tempfile.mkdtemp(prefix="sharepoint_daemon_"))
+        try:
+            fetcher = self.ssh_pool.acquire(params, tracker, self.bandwidth)
+            healthy = False
+            try:
+                fetcher.fetch_directory(params["remote_path"], workdir)
+                healthy = True
+            finally:
+                self.ssh_pool.release(fetcher, healthy)
+
+            downloaded = workdir / Path(params["remote_path"]).name
+            if not downloaded.exists():
+                downloaded = workdir
+            archive = self._compress(downloaded, params)
+            return self._upload(archive, params, tracker)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # Job intake ---------------------------------------------------------
+
+    def _spool_loop(self):
+        while not self._stopping.wait(self.SPOOL_POLL_INTERVAL):
+            self.scan_spool()
+
+    def scan_spool(self):
+        """
+        Queues every ``*.json`` job file in the spool directory.
+
+        Accepted files are replaced by an ``.accepted`` record (with the job id
+        added and credentials removed) and invalid ones renamed to
+        ``.rejected``, so each file is queued once.
+        """
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                job = json.loads(path.read_text())
+                job_id = self.submit(job)
+            except (OSError, ValueError, AttributeError) as e:
+                logging.warning(f"⚠️  Rejected spool job {path.name}: {e}")
+                path.replace(path.with_suffix(".rejected"))
+                continue
+            params = {k: v for k, v in dict(job.get("params") or {}).items() if k not in SECRET_PARAMS}
+            path.with_suffix(".accepted").write_text(json.dumps({**job, "params": params, "id": job_id}))
+            path.unlink()
+
+    def _make_server(self):
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonError("Unix sockets are not available on this platform; use a spool directory")
+        Path(self.socket_path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if _socket_alive(self.socket_path):
+                raise DaemonError(f"A daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        response = {"ok": True, **daemon._handle_request(json.loads(line))}
+                    except (ValueError, KeyError, TypeError) as e:
+                        response = {"ok": False, "error": str(e)}
+                    self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)  # Jobs can carry credentials
+        return server
+
+    def _handle_request(self, request):
+        op = request.get("op")
+        if op == "submit":
+            return {"id": self.submit(request["job"])}
+        if op == "get":
+            return {"job": self.queue.get(int(request["id"]))}
+        if op == "wait":
+            return {"job": self.wait(int(request["id"]), request.get("timeout"))}
+        if op == "list":
+            return {"jobs": self.queue.list(request.get("state"), int(request.get("limit", 100)))}
+        if op == "cancel":
+            return {"cancelled": self.queue.cancel(int(request["id"]))}
+        if op == "status":
+            return self.status()
+        if op == "shutdown":
+            self._stopping.set()
+            return {}
+        raise ValueError(f"Unknown request: {op}")
+
+
+class DaemonClient:
+    """Talks to a running ``TransferDaemon`` over its Unix socket."""
+
+    def __init__(self, socket_path=None, timeout: float = 10.0):
+        self.socket_path = str(socket_path or DEFAULT_SOCKET_PATH)
+        self.timeout = timeout
+
+    def request(self, op: str, **fields) -> dict:
+        """
+        Sends one request and returns the response.
+
+        Raises:
+            DaemonError: If the daemon is not running or rejects the request
+        """
+        return self._send({"op": op, **fields}, self.timeout)
+
+    def submit(self, kind: str, params: dict, priority: int = 0) -> int:
+        return self.request("submit", job={"kind": kind, "params": params, "priority": priority})["id"]
+
+    def get(self, job_id: int):
+        return self.request("get", id=job_id)["job"]
+
+    def wait(self, job_id: int, timeout: float = None):
+        """Waits for a job to finish; ``timeout`` None waits indefinitely."""
+        if timeout is None:
+            return self._send({"op": "wait", "id": job_id}, None)["job"]
+        return self._send({"op": "wait", "id": job_id, "timeout": timeout}, timeout + self.timeout)["job"]
+
+    def list(self, state: str = None):
+        return self.request("list", state=state)["jobs"]
+
+    def cancel(self, job_id: int) -> bool:
+        return self.request("cancel", id=job_id)["cancelled"]
+
+    def status(self) -> dict:
+        return self.request("status")
+
+    def shutdown(self):
+        self.request("shutdown")
+
+    def _send(self, message, timeout):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise DaemonError(f"Cannot reach daemon at {self.socket_path}: {e}") from e
+        if not line:
+            raise DaemonError("Daemon closed the connection without answering")
+        response = json.loads(line)
+        if not response.pop("ok", False):
+            raise DaemonError(response.get("error", "Request failed"))
+        return response
+
+
+def submit_to_spool(spool_dir, kind: str, params: dict, priority: int = 0) -> Path:
+    """
+    Drops a job file into a daemon's spool directory and returns its path.
+
+    The file is written under a temporary name and renamed, so the daemon never
+    reads a partial job.
+    """
+    spool_dir = Path(spool_dir)
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=spool_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"kind": kind, "params": params, "priority": priority}, f)
+    final = spool_dir / f"{time.time_ns()}-{os.getpid()}.json"
+    os.replace(tmp_path, final)
+    return final
+
+
+def _socket_alive(path) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1.0)
+            sock.connect(str(path))
+        return True
+    except OSError:
+        return False
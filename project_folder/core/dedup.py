@@ -0,0 +1,400 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core import metrics, tracing
+from core.archive import sanitize_arcname
+from core.filters import iter_files
+
+DEFAULT_INDEX_DIR = Path.home() / ".sharepoint_uploader" / "dedup"
+MANIFEST_VERSION = 1
+
+MIN_CHUNK = 256 * 1024
+AVG_CHUNK = 1024 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+PACK_SIZE = 64 * 1024 * 1024
+READ_BLOCK = 8 * 1024 * 1024
+
+_MASK64 = (1 << 64) - 1
+# Gear table: 256 fixed pseudo-random 64-bit values. Derived from SHA-256 so that
+# chunk boundaries, and therefore deduplication, never change between versions.
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "little") for i in range(256)]
+GEAR_SHIFTED = [(g << 1) & _MASK64 for g in GEAR]
+
+
+def _high_bits_mask(bits):
+    # The gear hash mixes recent bytes into the low bits only; judge cuts by the high bits
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def find_cut(data, start, end, min_size=MIN_CHUNK, avg_size=AVG_CHUNK, max_size=MAX_CHUNK):
+    """
+    Returns the length of the next chunk in ``data[start:end]`` (FastCDC).
+
+    The gear hash is not computed over the first ``min_size`` bytes. Below
+    ``avg_size`` a stricter mask is used and above it a looser one
+    ("normalized chunking"), which keeps chunk sizes close to the average.
+    Two bytes are rolled per step, as in FastCDC 2020, which halves the
+    interpreter work per byte; both positions are tested, the first against
+    the mask shifted left by one.
+    """
+    length = end - start
+    if length <= min_size:
+        return length
+    length = min(length, max_size)
+    normal = min(avg_size, length)
+    # No cut is looked for in the first min_size bytes, so size the masks for the rest
+    bits = max(1, max(avg_size - min_size, 2).bit_length() - 1)
+    mask_strict = _high_bits_mask(bits + 1)
+    mask_loose = _high_bits_mask(bits - 1)
+
+    gear = GEAR
+    gear_shifted = GEAR_SHIFTED
+    h = 0
+    position = min_size
+    for limit, mask in ((normal, mask_strict), (length, mask_loose)):
+        view = data[start + position:start + limit]
+        pairs = iter(view)
+        mask_shifted = mask << 1
+        for first, second in zip(pairs, pairs):
+            # Left unmasked, the hash after the first byte is exactly the one-byte
+            # hash shifted left once, so that byte is judged by the shifted mask
+            h = (h << 2) + gear_shifted[first]
+            if not h & mask_shifted:
+                return position + 1
+            h = (h + gear[second]) & _MASK64
+            position += 2
+            if not h & mask:
+                return position
+        position = limit
+    return length
+
+
+def iter_chunks(file_obj, min_size=MIN_CHUNK, avg_size=AVG_CHUNK, max_size=MAX_CHUNK):
+    """Yields the content-defined chunks of a file as ``bytes``."""
+    buffer = bytearray()
+    eof = False
+    while True:
+        if not eof and len(buffer) < max_size:
+            block = file_obj.read(max(READ_BLOCK, max_size))
+            eof = not block
+            buffer += block
+            continue
+        if not buffer:
+            return
+        view = memoryview(buffer)
+        start = 0
+        # Cut everything that cannot change when more data arrives
+        while len(buffer) - start >= max_size or (eof and start < len(buffer)):
+            cut = find_cut(view, start, len(buffer), min_size, avg_size, max_size)
+            yield bytes(view[start:start + cut])
+            start += cut
+        view.release()
+        del buffer[:start]
+
+
+class ChunkIndex:
+    """
+    Local record of chunks already stored remotely, backed by SQLite.
+
+    Holds the pack and position of every uploaded chunk, and for each source
+    file the chunk list of the version last seen, so unchanged files are not
+    read or chunked again. An index belongs to one destination folder: a chunk
+    is only skipped if it was uploaded to the same place.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash   TEXT PRIMARY KEY,
+                pack   TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size   INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path     TEXT PRIMARY KEY,
+                size     INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                chunks   TEXT NOT NULL
+            )
+            """
+        )
+
+    def lookup(self, chunk_hash):
+        """Returns ``(pack, offset, length, size)`` for a stored chunk, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT pack, offset, length, size FROM chunks WHERE hash = ?", (chunk_hash,)
+            ).fetchone()
+
+    def add_chunks(self, entries):
+        """Records ``(hash, pack, offset, length, size)`` tuples in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", entries)
+            self._conn.execute("COMMIT")
+
+    def cached_file(self, path, size, mtime_ns):
+        """Returns the chunk hashes of a file version seen before, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks FROM files WHERE path = ? AND size = ? AND mtime_ns = ?", (path, size, mtime_ns)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_files(self, entries):
+        """Records ``(path, size, mtime_ns, chunk hashes)`` for files whose chunks are all stored."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                [(path, size, mtime_ns, json.dumps(chunks)) for path, size, mtime_ns, chunks in entries],
+            )
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SnapshotWriter:
+    """
+    Stores a directory as deduplicated, compressed chunks in pack files.
+
+    Files are split with content-defined chunking; chunks already in the
+    ``ChunkIndex`` are referenced instead of stored again, new ones are
+    zlib-compressed and appended to a pack. Full packs are handed to
+    ``upload_pack(path)`` on a worker pool while chunking continues; their
+    chunks enter the index only once the upload succeeded. ``finish`` writes
+    a manifest listing every file's chunks and where each chunk lives, which is
+    all ``restore_snapshot`` needs besides the packs.
+    """
+
+    def __init__(self, index: ChunkIndex, work_dir, upload_pack, pack_size: int = PACK_SIZE,
+                 compression_level: int = 6, workers: int = 2,
+                 min_size: int = MIN_CHUNK, avg_size: int = AVG_CHUNK, max_size: int = MAX_CHUNK):
+        """
+        Args:
+            index (ChunkIndex): Chunks stored by earlier snapshots
+            work_dir (str | Path): Directory for packs being written
+            upload_pack (callable): ``upload_pack(path)`` stores a sealed pack remotely
+            pack_size (int): Packs are sealed once they reach this size
+            compression_level (int): zlib level for chunk data
+            workers (int): Packs uploaded in parallel
+            min_size, avg_size, max_size (int): Chunk size bounds
+        """
+        self.index = index
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_pack = upload_pack
+        self.pack_size = pack_size
+        self.compression_level = compression_level
+        self.chunk_sizes = (min_size, avg_size, max_size)
+
+        self.files = []
+        self.locations = {}  # chunk hash -> [pack, offset, length, size]
+        self.stats = {"files": 0, "files_unchanged": 0, "bytes_scanned": 0, "chunks": 0,
+                      "chunks_new": 0, "bytes_new": 0, "bytes_stored": 0, "packs": 0}
+
+        self._pack = None
+        self._pack_name = None
+        self._pack_entries = []
+        self._cache_waiting = []  # Files to cache once every pack holding their chunks is uploaded
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pack-upload")
+        self._futures = []
+
+    def add_file(self, file_path, arcname):
+        file_path = Path(file_path)
+        st = file_path.stat()
+        key = str(file_path.resolve())
+        hashes = self.index.cached_file(key, st.st_size, st.st_mtime_ns)
+        if hashes is not None and all(self._locate(h) for h in hashes):
+            self.stats["files_unchanged"] += 1
+        else:
+            hashes = []
+            with open(file_path, "rb") as f, tracing.span("dedup.chunk_file", file=arcname):
+                for chunk in iter_chunks(f, *self.chunk_sizes):
+                    chunk_hash = hashlib.sha256(chunk).hexdigest()
+                    hashes.append(chunk_hash)
+                    if not self._locate(chunk_hash):
+                        self._store(chunk_hash, chunk)
+                    self.stats["bytes_scanned"] += len(chunk)
+            self._cache_waiting.append((key, st.st_size, st.st_mtime_ns, hashes))
+
+        self.stats["files"] += 1
+        self.stats["chunks"] += len(hashes)
+        self.files.append({"path": arcname, "size": st.st_size, "mtime": st.st_mtime, "chunks": hashes})
+
+    def add_directory(self, source_dir, path_filter=None):
+        source_dir = Path(source_dir)
+        for file_path in iter_files(source_dir, path_filter):
+            try:
+                self.add_file(file_path, sanitize_arcname(file_path.relative_to(source_dir).as_posix()))
+            except OSError as e:
+                logging.warning(f"   ⚠️  Skipping problematic file: {file_path.name} - {e}")
+
+    def finish(self, manifest_path) -> Path:
+        """
+        Uploads the last pack, waits for all uploads and writes the manifest.
+
+        Raises:
+            Exception: The first pack upload error; the manifest is not written then
+        """
+        self._seal()
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+        self.index.cache_files(self._cache_waiting)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "created": time.time(),
+            "chunking": dict(zip(("min", "avg", "max"), self.chunk_sizes), algorithm="fastcdc"),
+            "files": self.files,
+            "chunks": {h: self.locations[h] for f in self.files for h in f["chunks"]},
+            "stats": self.stats,
+        }
+        manifest_path = Path(manifest_path)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        return manifest_path
+
+    def _locate(self, chunk_hash):
+        location = self.locations.get(chunk_hash)
+        if location is None:
+            row = self.index.lookup(chunk_hash)
+            if row is None:
+                return None
+            location = self.locations[chunk_hash] = list(row)
+        return location
+
+    def _store(self, chunk_hash, chunk):
+        if self._pack is None:
+            self._pack_name = f"pack-{uuid.uuid4().hex}.pack"
+            self._pack = open(self.work_dir / self._pack_name, "wb")
+        data = zlib.compress(chunk, self.compression_level)
+        offset = self._pack.tell()
+        self._pack.write(data)
+        location = [self._pack_name, offset, len(data), len(chunk)]
+        self.locations[chunk_hash] = location
+        self._pack_entries.append((chunk_hash, *location))
+        self.stats["chunks_new"] += 1
+        self.stats["bytes_new"] += len(chunk)
+        self.stats["bytes_stored"] += len(data)
+        metrics.COMPRESSION_BYTES.labels("input").inc(len(chunk))
+        metrics.COMPRESSION_BYTES.labels("output").inc(len(data))
+        if offset + len(data) >= self.pack_size:
+            self._seal()
+
+    def _seal(self):
+        if self._pack is None:
+            return
+        self._pack.close()
+        path = self.work_dir / self._pack_name
+        entries = self._pack_entries
+        self._pack = None
+        self._pack_entries = []
+        self.stats["packs"] += 1
+        self._futures.append(self._executor.submit(self._upload, path, entries))
+
+    def _upload(self, path, entries):
+        self.upload_pack(path)
+        self.index.add_chunks(entries)
+        path.unlink()
+        logging.info(f"   ☁️  Uploaded {path.name} ({len(entries)} chunks)")
+
+
+def default_index_path(config: dict, folder: str) -> Path:
+    """Returns the per-user chunk index for a destination drive and folder."""
+    target = f"{config.get('SITE_ID')}|{config.get('DRIVE_ID')}|{folder.strip('/')}"
+    return DEFAULT_INDEX_DIR / f"{hashlib.sha1(target.encode('utf-8')).hexdigest()[:16]}.db"
+
+
+@tracing.traced("dedup.snapshot")
+def create_snapshot(source_dir, index: ChunkIndex, work_dir, upload_pack, manifest_name: str = None,
+                    path_filter=None, **kwargs) -> SnapshotWriter:
+    """
+    Chunks ``source_dir``, uploads new chunks in packs and writes the manifest.
+
+    Returns the writer; ``writer.stats`` reports how much was deduplicated and
+    the manifest is at ``work_dir / manifest_name``.
+    """
+    source_dir = Path(source_dir)
+    stage_started = time.monotonic()
+    writer = SnapshotWriter(index, work_dir, upload_pack, **kwargs)
+    writer.add_directory(source_dir, path_filter)
+    writer.manifest_path = writer.finish(Path(work_dir) / (manifest_name or f"{source_dir.name}.manifest.json"))
+    metrics.STAGE_DURATION.labels("compress").observe(time.monotonic() - stage_started)
+    return writer
+
+
+def restore_snapshot(manifest_path, packs_dir, dest_dir) -> int:
+    """
+    Rebuilds a snapshot from its manifest and the pack files.
+
+    Args:
+        manifest_path (str | Path): Manifest written by ``create_snapshot``
+        packs_dir (str | Path): Directory holding the referenced packs
+        dest_dir (str | Path): Directory to restore into
+
+    Returns:
+        int: Number of files restored
+
+    Raises:
+        ValueError: If a chunk fails its checksum or a path would escape ``dest_dir``
+        FileNotFoundError: If a referenced pack is missing
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    packs_dir = Path(packs_dir)
+    dest_dir = Path(dest_dir).resolve()
+    chunks = manifest["chunks"]
+    packs = {}
+
+    try:
+        for entry in manifest["files"]:
+            target = (dest_dir / entry["path"]).resolve()
+            if dest_dir not in target.parents:
+                raise ValueError(f"Refusing to restore outside {dest_dir}: {entry['path']}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as out:
+                for chunk_hash in entry["chunks"]:
+                    pack_name, offset, length, size = chunks[chunk_hash]
+                    pack = packs.get(pack_name)
+                    if pack is None:
+                        pack = packs[pack_name] = open(packs_dir / pack_name, "rb")
+                    try:
+                        data = zlib.decompress(os.pread(pack.fileno(), length, offset))
+                    except zlib.error:
+                        data = None
+                    if data is None or len(data) != size or hashlib.sha256(data).hexdigest() != chunk_hash:
+                        raise ValueError(f"Corrupt chunk {chunk_hash[:12]} in {pack_name}")
+                    out.write(data)
+            os.utime(target, (entry["mtime"], entry["mtime"]))
+    finally:
+        for pack in packs.values():
+            pack.close()
+    return len(manifest["files"])
@@ -0,0 +1,397 @@
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import requests
+
+from core import metrics, tracing
+from core.journal import TransferJournal
+from core.local_writer import preallocate
+from core.quickxor import quickxor_file
+from core.throttle import ThrottleController, parse_retry_after
+from core.transport import SharedTransport
+from core.uploader import GRAPH_BASE_URL, SharePointUploader, load_uploader_config
+
+READ_BLOCK = 1024 * 1024
+
+
+class SharePointDownloader:
+    """
+    Downloads drive items with parallel HTTP Range requests.
+
+    The item is resolved by path, a ``.part`` file of its full size is
+    preallocated, and ``workers`` threads fetch ``range_size`` ranges and write
+    them in place with ``os.pwrite``. Completed ranges are recorded in the
+    transfer journal, so an interrupted download only fetches what is missing,
+    as long as the item's eTag is unchanged. The result is checked against the
+    item's quickXorHash before the ``.part`` file is renamed into place.
+    """
+
+    RANGE_SIZE = 8 * 1024 * 1024
+    MAX_RETRIES = SharePointUploader.MAX_RETRIES
+    RETRY_DELAY = SharePointUploader.RETRY_DELAY
+    MAX_THROTTLE_RETRIES = SharePointUploader.MAX_THROTTLE_RETRIES
+
+    def __init__(self, token, config_path="config.json", journal=None, throttle=None,
+                 transport=None, bandwidth=None, progress_tracker=None, workers=4, range_size=None):
+        """
+        Initialize the SharePoint downloader.
+
+        Args:
+            token (str): Bearer token for Microsoft Graph API authentication
+            config_path (str): Path to the configuration file
+            journal (TransferJournal): Resume-state journal; defaults to JOURNAL_PATH
+                from the configuration
+            throttle (ThrottleController): Rate limiter shared with other workers
+            transport (SharedTransport): Connection pools to send requests through
+            bandwidth (BandwidthLimiter | JobBandwidthLimiter): Optional cap on received bytes
+            progress_tracker (ProgressTracker): Optional tracker for download progress
+            workers (int): Ranges fetched in parallel
+            range_size (int): Bytes per Range request; overrides DOWNLOAD_RANGE_SIZE
+                from the configuration
+        """
+        self.token = token
+        self.config = load_uploader_config(config_path)
+
+        pool_size = int(self.config.get("HTTP_POOL_SIZE", SharedTransport.DEFAULT_POOL_SIZE))
+        self.transport = transport or SharedTransport.shared(pool_maxsize=pool_size)
+        self.session = self.transport.create_session()
+        self.auth_headers = {"Authorization": f"Bearer {token}"}
+        self.journal = journal or TransferJournal(self.config.get("JOURNAL_PATH"))
+        self.throttle = throttle or ThrottleController.for_tenant(self.config.get("TENANT_ID") or "default")
+        self.bandwidth = bandwidth
+        self.progress_tracker = progress_tracker
+        self.workers = max(1, int(workers))
+        self.range_size = int(range_size or self.config.get("DOWNLOAD_RANGE_SIZE", self.RANGE_SIZE))
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def get_item(self, remote_path):
+        """
+        Resolve a drive item by path.
+
+        Args:
+            remote_path (str): Path of the item in the drive (e.g. "Backups/db.zip")
+
+        Returns:
+            dict: Drive item resource
+
+        Raises:
+            FileNotFoundError: If no item exists at that path
+        """
+        with tracing.span("download.resolve", path=remote_path):
+            response = self._throttled_request("get", drive_item_api_url(self.config, remote_path),
+                                               headers=self.auth_headers)
+        if response.status_code == 404:
+            raise FileNotFoundError(f"No item at {remote_path}")
+        response.raise_for_status()
+        return response.json()
+
+    def download_file(self, remote_path, dest_path, extract_to=None):
+        """
+        Download a file, resuming an earlier attempt if possible.
+
+        Args:
+            remote_path (str): Path of the item in the drive
+            dest_path (str | Path): Local file, or an existing directory to download into
+            extract_to (str | Path): If set and the item is a ZIP, extract members into
+                this directory as soon as their bytes have arrived
+
+        Returns:
+            Path: The downloaded file
+
+        Raises:
+            ValueError: If the item is a folder or the quickXorHash does not match
+            Exception: If a range cannot be fetched after all retries
+        """
+        with tracing.span("download.file", file=os.path.basename(remote_path)):
+            return self._download_file(remote_path, dest_path, extract_to)
+
+    def _download_file(self, remote_path, dest_path, extract_to):
+        """Body of ``download_file``, run inside its tracing span."""
+        item = self.get_item(remote_path)
+        if "file" not in item:
+            raise ValueError(f"{remote_path} is not a file")
+        dest_path = Path(dest_path)
+        if dest_path.is_dir():
+            dest_path = dest_path / item["name"]
+        part_path = dest_path.with_name(dest_path.name + ".part")
+        size = int(item.get("size") or 0)
+        etag = item.get("eTag") or item.get("cTag")
+        url = item.get("@microsoft.graph.downloadUrl")
+        headers = {} if url else self.auth_headers  # Download URLs are pre-authenticated
+        url = url or drive_item_api_url(self.config, remote_path, "content")
+        transfer_key = f"graph:{item.get('id') or remote_path}|{dest_path.resolve()}"
+
+        state = self.journal.load_download(transfer_key)
+        done = []
+        if (state and state["etag"] == etag and state["size"] == size
+                and part_path.exists() and part_path.stat().st_size == size):
+            done = [list(r) for r in state["ranges"]]
+            logging.info(f"Resuming download of {item['name']}: {covered_bytes(done)} of {size} bytes present")
+        else:
+            part_path.unlink(missing_ok=True)
+
+        extractor = None
+        if extract_to is not None and item["name"].lower().endswith(".zip"):
+            extractor = StreamingZipExtractor(part_path, extract_to, size)
+
+        name = item["name"]
+        task = None
+        if self.progress_tracker:
+            task = self.progress_tracker.add_task(name, total_size=size, completed=covered_bytes(done))
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            preallocate(fd, size)
+            todo = missing_ranges(done, size, self.range_size)
+            if extractor:
+                # The central directory is at the end; fetching it first lets extraction start early
+                todo = todo[-1:] + todo[:-1]
+
+            def fetch(byte_range):
+                self._fetch_range(url, headers, fd, byte_range[0], byte_range[1], name, task)
+                with self._lock:
+                    done.append(list(byte_range))
+                    merged = merge_ranges(done)
+                    done[:] = merged
+                    self.journal.save_download(transfer_key, {
+                        "dest_path": str(dest_path), "source": remote_path,
+                        "etag": etag, "size": size, "ranges": merged,
+                    })
+                if extractor:
+                    extractor.update(merged)
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="range-download") as executor:
+                futures = [executor.submit(fetch, r) for r in todo]
+                errors = [f.exception() for f in futures if f.exception() is not None]
+            if errors:
+                metrics.FILES_TRANSFERRED.labels("download", "failed").inc()
+                raise errors[0]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        expected = (item["file"].get("hashes") or {}).get("quickXorHash")
+        if expected:
+            with tracing.span("download.verify", file=name):
+                actual = quickxor_file(part_path)
+            if actual != expected:
+                self.journal.clear_download(transfer_key)
+                part_path.unlink(missing_ok=True)
+                metrics.FILES_TRANSFERRED.labels("download", "failed").inc()
+                raise ValueError(f"quickXorHash mismatch for {name}: expected {expected}, got {actual}")
+
+        if extractor:
+            # Before the rename: the extractor reads the archive through the .part path
+            extractor.finish()
+        os.replace(part_path, dest_path)
+        modified = _parse_time(item.get("lastModifiedDateTime"))
+        if modified:
+            os.utime(dest_path, (modified, modified))
+        self.journal.clear_download(transfer_key)
+        metrics.FILES_TRANSFERRED.labels("download", "success").inc()
+        if self.progress_tracker:
+            self.progress_tracker.complete_file(task)
+        return dest_path
+
+    def _fetch_range(self, url, headers, fd, start, end, name, task=None):
+        """Fetches ``[start, end)`` into ``fd``; a retry continues where the last attempt stopped."""
+        position = start
+        last_error = None
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                response = self._throttled_request(
+                    "get", url, stream=True,
+                    headers={**headers, "Range": f"bytes={position}-{end - 1}"},
+                )
+                with response:
+                    if response.status_code == 206 or (response.status_code == 200 and position == 0):
+                        position = self._write_body(response, fd, position, end, name, task)
+                        if position >= end:
+                            return
+                        last_error = Exception(f"Range {start}-{end - 1} of {name} ended early at {position}")
+                    elif response.status_code < 500:
+                        raise Exception(f"Range request for {name} failed with status {response.status_code}")
+                    else:
+                        last_error = Exception(f"Range request failed with status {response.status_code}")
+                        metrics.RETRIES.labels(response.status_code).inc()
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                metrics.RETRIES.labels("network").inc()
+            if attempt < self.MAX_RETRIES - 1:
+                time.sleep(self.RETRY_DELAY * (2 ** attempt))
+        raise Exception(f"Failed to download range {start}-{end - 1} of {name} after "
+                        f"{self.MAX_RETRIES} attempts: {last_error}")
+
+    def _write_body(self, response, fd, position, end, name, task=None):
+        received = metrics.TRANSFER_BYTES.labels("download")
+        for block in response.iter_content(READ_BLOCK):
+            block = block[:end - position]  # A server ignoring Range sends the whole file
+            if not block:
+                break
+            if self.bandwidth:
+                self.bandwidth.consume(len(block))
+            os.pwrite(fd, block, position)
+            position += len(block)
+            received.inc(len(block))
+            with self._lock:
+                self.bytes_received += len(block)
+            if self.progress_tracker:
+                self.progress_tracker.update(task, len(block))
+        return position
+
+    def _throttled_request(self, method, url, **kwargs):
+        """
+        Send a request through the shared throttle controller.
+
+        Behaves like ``SharePointUploader._throttled_request``: 429 and 503 with
+        ``Retry-After`` pause all workers sharing the controller and are retried.
+        """
+        send = getattr(self.session, method)
+        for attempt in range(self.MAX_THROTTLE_RETRIES):
+            with self.throttle.slot():
+                response = send(url, **kwargs)
+
+            retry_after = None
+            if response.status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429 and retry_after is None:
+                retry_after = self.RETRY_DELAY * (2 ** attempt)
+
+            if retry_after is None:
+                if response.status_code < 500:
+                    self.throttle.on_success()
+                return response
+            response.close()
+            metrics.THROTTLE_PAUSES.labels(response.status_code).inc()
+            metrics.THROTTLE_PAUSE_SECONDS.inc(retry_after)
+            tracing.event("download.throttled", status=response.status_code, retry_after=retry_after)
+            self.throttle.on_throttled(retry_after)
+
+        return response
+
+
+class StreamingZipExtractor:
+    """
+    Extracts a ZIP archive while it is still being downloaded out of order.
+
+    Once the central directory at the end of the archive is present, each
+    member is extracted as soon as every byte between its local header and the
+    next member's has arrived. ``finish`` extracts whatever is left.
+    """
+
+    def __init__(self, path, dest_dir, size):
+        self.path = Path(path)
+        self.dest_dir = Path(dest_dir)
+        self.size = size
+        self.extracted = 0
+        self._zip = None
+        self._pending = None  # (start, end, ZipInfo) in archive order
+        self._lock = threading.Lock()
+
+    def update(self, ranges):
+        """Extracts the members fully covered by the completed ``ranges``."""
+        with self._lock:
+            if self._pending is None and not self._open(ranges):
+                return
+            ready = [entry for entry in self._pending if is_covered(ranges, entry[0], entry[1])]
+            for entry in ready:
+                self._extract(entry)
+
+    def finish(self):
+        """Extracts every member not extracted yet; the archive must be complete."""
+        with self._lock:
+            if self._pending is None:
+                self._open([[0, self.size]])
+            for entry in list(self._pending):
+                self._extract(entry)
+            self._zip.close()
+
+    def _open(self, ranges):
+        if not is_covered(ranges, self.size - 1, self.size):
+            return False
+        try:
+            archive = zipfile.ZipFile(self.path)
+        except zipfile.BadZipFile:
+            return False  # Central directory not complete yet
+        if not is_covered(ranges, archive.start_dir, self.size):
+            archive.close()
+            return False
+        members = sorted(archive.infolist(), key=lambda info: info.header_offset)
+        ends = [info.header_offset for info in members[1:]] + [archive.start_dir]
+        self._zip = archive
+        self._pending = [(info.header_offset, end, info) for info, end in zip(members, ends)]
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        return True
+
+    def _extract(self, entry):
+        self._zip.extract(entry[2], self.dest_dir)
+        self._pending.remove(entry)
+        self.extracted += 1
+
+
+def drive_item_api_url(config, remote_path, action=None):
+    """
+    Build the Graph URL of a drive item addressed by path.
+
+    Args:
+        config (dict): Uploader configuration (SITE_ID, DRIVE_ID, GRAPH_BASE_URL)
+        remote_path (str): Path of the item in the drive
+        action (str): Optional action segment such as "content"
+
+    Returns:
+        str: Graph API URL
+    """
+    base_url = (config.get("GRAPH_BASE_URL") or GRAPH_BASE_URL).rstrip("/")
+    site_id = config.get("SITE_ID")
+    drive_id = config.get("DRIVE_ID")
+    drive = f"sites/{site_id}/drives/{drive_id}" if site_id and drive_id else "sites/root/drive"
+    item_path = quote(remote_path.replace("\\", "/").strip("/"))
+    return f"{base_url}/{drive}/root:/{item_path}" + (f":/{action}" if action else "")
+
+
+def merge_ranges(ranges):
+    """Merges overlapping and adjacent ``[start, end)`` ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(done, size, range_size):
+    """Returns the ``[start, end)`` ranges of at most ``range_size`` bytes not in ``done``."""
+    missing = []
+    position = 0
+    for start, end in merge_ranges(done) + [[size, size]]:
+        while position < start:
+            missing.append((position, min(start, position + range_size)))
+            position = missing[-1][1]
+        position = max(position, end)
+    return missing
+
+
+def covered_bytes(ranges):
+    return sum(end - start for start, end in merge_ranges(ranges))
+
+
+def is_covered(ranges, start, end):
+    return any(s <= start and end <= e for s, e in ranges)
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
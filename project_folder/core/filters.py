@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+
+import pathspec
+
+# Directories that are almost never worth transferring; enabled with --exclude-common
+COMMON_EXCLUDES = (
+    ".git/", ".hg/", ".svn/",
+    "node_modules/", "bower_components/",
+    "__pycache__/", "*.pyc", ".pytest_cache/", ".mypy_cache/", ".tox/", ".venv/",
+    ".cache/", ".gradle/", ".m2/", ".npm/", ".yarn/cache/",
+    ".DS_Store", "Thumbs.db",
+)
+
+
+class PathFilter:
+    """
+    Include/exclude rules in gitignore syntax, matched against paths relative to
+    the root being transferred.
+
+    A path is skipped if it matches the exclude rules. A directory that is
+    excluded is not descended into at all, so nothing below it is listed or
+    read; as in git, a ``!`` rule cannot bring back a file inside such a
+    directory. When include rules are given, only files matching one of them
+    are kept; they do not prune directories, since any directory may contain a
+    matching file.
+    """
+
+    def __init__(self, include=(), exclude=()):
+        """
+        Args:
+            include (iterable): Patterns a file must match to be kept (optional)
+            exclude (iterable): Patterns of files and directories to skip
+        """
+        self.include_patterns = [p for p in include if p and p.strip()]
+        self.exclude_patterns = [p for p in exclude if p and p.strip()]
+        self._include = pathspec.GitIgnoreSpec.from_lines(self.include_patterns)
+        self._exclude = pathspec.GitIgnoreSpec.from_lines(self.exclude_patterns)
+
+    @classmethod
+    def from_options(cls, include=None, exclude=None, exclude_from=None, exclude_common=False):
+        """
+        Builds a filter from command line options, or returns None if no rule is set.
+
+        Args:
+            include (list): --include patterns
+            exclude (list): --exclude patterns
+            exclude_from (list): Files with one exclude pattern per line, like .gitignore
+            exclude_common (bool): Add ``COMMON_EXCLUDES``
+        """
+        excludes = list(COMMON_EXCLUDES) if exclude_common else []
+        for path in exclude_from or ():
+            with open(path, "r", encoding="utf-8") as f:
+                excludes.extend(line.rstrip("\n") for line in f)
+        excludes.extend(exclude or ())
+        path_filter = cls(include or (), excludes)
+        return path_filter if path_filter else None
+
+    def __bool__(self):
+        return bool(self.include_patterns or self.exclude_patterns)
+
+    def skip_dir(self, rel_path) -> bool:
+        """True if the directory at ``rel_path`` should not be descended into."""
+        return self._exclude.match_file(_posix(rel_path) + "/")
+
+    def accept_file(self, rel_path) -> bool:
+        """True if the file at ``rel_path`` should be transferred."""
+        rel_path = _posix(rel_path)
+        if self._exclude.match_file(rel_path):
+            return False
+        return not self.include_patterns or self._include.match_file(rel_path)
+
+
+def iter_files(root, path_filter: PathFilter = None):
+    """
+    Yields the files under ``root`` in sorted order, skipping what ``path_filter`` rejects.
+
+    Excluded directories are pruned from the walk rather than filtered afterwards.
+    """
+    root = Path(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        rel_dir = "" if rel_dir == "." else rel_dir
+        if path_filter:
+            dirnames[:] = [d for d in dirnames if not path_filter.skip_dir(os.path.join(rel_dir, d))]
+        dirnames.sort()
+        for name in sorted(filenames):
+            if path_filter and not path_filter.accept_file(os.path.join(rel_dir, name)):
+                continue
+            path = Path(dirpath) / name
+            if path.is_file():
+                yield path
+
+
+def _posix(rel_path) -> str:
+    return str(rel_path).replace(os.sep, "/").strip("/")
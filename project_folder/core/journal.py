@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_JOURNAL_PATH = Path.home() / ".sharepoint_uploader" / "journal.db"
+
+# SQLite caps the number of host parameters per statement; stay well below it.
+_LOOKUP_BATCH = 500
+
+
+def file_identity(file_path) -> str:
+    """
+    Returns the journal key for a local file.
+
+    The key combines the absolute path with the file's size and modification time,
+    so a file that is replaced or edited between runs never resumes a stale session.
+    """
+    file_stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{file_stat.st_size}|{file_stat.st_mtime_ns}"
+
+
+class TransferJournal:
+    """
+    Transactional store for resumable transfer state, backed by SQLite in WAL mode.
+
+    One journal holds the state of every in-flight upload, keyed by file identity,
+    instead of a ``.state.json`` file next to each source file. Writes are buffered
+    in memory and group-committed in a single transaction by the first write that
+    arrives ``commit_interval`` seconds or more after the previous commit, or once
+    ``max_pending`` changes have accumulated, so checkpointing a chunk costs a
+    dictionary update rather than a synchronous disk write. There is no timer:
+    writes buffered after the last one of a burst wait for ``flush`` or ``close``.
+    Downloads keep their completed byte ranges in a separate table.
+    """
+
+    def __init__(self, db_path=None, commit_interval: float = 1.0, max_pending: int = 256):
+        """
+        Open (or create) the journal database.
+
+        Args:
+            db_path (str | Path): Location of the SQLite file, or ":memory:"
+            commit_interval (float): Minimum seconds between commits triggered by writes
+            max_pending (int): Maximum number of buffered writes before a commit is forced
+        """
+        self.db_path = str(db_path or DEFAULT_JOURNAL_PATH)
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.commit_interval = commit_interval
+        self.max_pending = max_pending
+
+        self._lock = threading.RLock()
+        self._pending = {}  # file_key -> state dict, or None for a pending delete
+        self._last_commit = time.monotonic()
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS upload_state (
+                file_key   TEXT PRIMARY KEY,
+                file_path  TEXT NOT NULL,
+                upload_url TEXT NOT NULL,
+                offset     INTEGER NOT NULL DEFAULT 0,
+                ranges     TEXT,
+                hashes     TEXT,
+                expires_at TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS download_state (
+                transfer_key TEXT PRIMARY KEY,
+                dest_path    TEXT NOT NULL,
+                source       TEXT,
+                etag         TEXT,
+                size         INTEGER,
+                ranges       TEXT,
+                updated_at   REAL NOT NULL
+            )
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def load(self, file_key: str):
+        """
+        Returns the saved state for a file, or None if nothing is journaled.
+
+        Buffered writes that have not been committed yet are visible immediately.
+        """
+        return self.load_many([file_key]).get(file_key)
+
+    def load_many(self, file_keys) -> dict:
+        """
+        Returns saved states for many files at once, keyed by file key.
+
+        Used when resuming a large batch so that thousands of lookups cost a handful
+        of indexed queries instead of one round trip per file.
+        """
+        results = {}
+        with self._lock:
+            remaining = []
+            for key in file_keys:
+                if key in self._pending:
+                    if self._pending[key] is not None:
+                        results[key] = dict(self._pending[key])
+                else:
+                    remaining.append(key)
+
+            for start in range(0, len(remaining), _LOOKUP_BATCH):
+                batch = remaining[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    "SELECT file_key, file_path, upload_url, offset, ranges, hashes, expires_at "
+                    f"FROM upload_state WHERE file_key IN ({placeholders})",
+                    batch,
+                )
+                for row in rows:
+                    results[row[0]] = self._row_to_state(row)
+        return results
+
+    def save(self, file_key: str, state: dict):
+        """
+        Buffers the state of an upload for the next group commit.
+
+        Args:
+            file_key (str): Key returned by ``file_identity``
+            state (dict): Must contain ``upload_url`` and ``offset``; may contain
+                ``file_path``, ``ranges``, ``hashes`` and ``expires_at``
+        """
+        with self._lock:
+            self._pending[file_key] = dict(state)
+            self._maybe_commit()
+
+    def clear(self, file_key: str):
+        """Buffers the removal of a file's state for the next group commit."""
+        with self._lock:
+            self._pending[file_key] = None
+            self._maybe_commit()
+
+    def load_download(self, transfer_key: str):
+        """Returns the saved state of a download, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dest_path, source, etag, size, ranges FROM download_state WHERE transfer_key = ?",
+                (transfer_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        dest_path, source, etag, size, ranges = row
+        return {"dest_path": dest_path, "source": source, "etag": etag, "size": size,
+                "ranges": json.loads(ranges) if ranges else []}
+
+    def save_download(self, transfer_key: str, state: dict):
+        """
+        Writes the state of a download.
+
+        Unlike upload state this is committed straight away: downloads checkpoint
+        once per completed range, not once per chunk.
+
+        Args:
+            transfer_key (str): Identifies the source and destination of the download
+            state (dict): Must contain ``dest_path``; may contain ``source``, ``etag``,
+                ``size`` and ``ranges`` (completed ``[start, end)`` byte ranges)
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO download_state "
+                "(transfer_key, dest_path, source, etag, size, ranges, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (transfer_key, state["dest_path"], state.get("source"), state.get("etag"),
+                 state.get("size"), json.dumps(state.get("ranges") or []), time.time()),
+            )
+
+    def clear_download(self, transfer_key: str):
+        """Removes the state of a finished or abandoned download."""
+        with self._lock:
+            self._conn.execute("DELETE FROM download_state WHERE transfer_key = ?", (transfer_key,))
+
+    def flush(self):
+        """Commits all buffered writes in a single transaction."""
+        with self._lock:
+            if not self._pending:
+                self._last_commit = time.monotonic()
+                return
+
+            upserts = []
+            deletes = []
+            now = time.time()
+            for key, state in self._pending.items():
+                if state is None:
+                    deletes.append((key,))
+                else:
+                    upserts.append((
+                        key,
+                        state.get("file_path", ""),
+                        state["upload_url"],
+                        state.get("offset", 0),
+                        json.dumps(state["ranges"]) if state.get("ranges") is not None else None,
+                        json.dumps(state["hashes"]) if state.get("hashes") is not None else None,
+                        state.get("expires_at"),
+                        now,
+                    ))
+
+            try:
+                self._conn.execute("BEGIN")
+                if deletes:
+                    self._conn.executemany("DELETE FROM upload_state WHERE file_key = ?", deletes)
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO upload_state "
+                        "(file_key, file_path, upload_url, offset, ranges, hashes, expires_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        upserts,
+                    )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                logging.error(f"Could not commit transfer journal {self.db_path}: {e}")
+                raise
+
+            self._pending.clear()
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        """Flushes buffered writes and closes the database."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def _maybe_commit(self):
+        """Commits if the buffer is full or ``commit_interval`` has passed since the last commit."""
+        if (len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_commit >= self.commit_interval):
+            self.flush()
+
+    @staticmethod
+    def _row_to_state(row) -> dict:
+        """Converts a database row into a state dictionary."""
+        _, file_path, upload_url, offset, ranges, hashes, expires_at = row
+        return {
+            "file_path": file_path,
+            "upload_url": upload_url,
+            "offset": offset,
+            "ranges": json.loads(ranges) if ranges else None,
+            "hashes": json.loads(hashes) if hashes else None,
+            "expires_at": expires_at,
+        }
+
+
+class Checkpointer:
+    """
+    Debounces resume-state writes for a single upload.
+
+    Progress is written to the journal at most once every ``interval_seconds`` or
+    every ``interval_bytes`` of new progress, whichever comes first. A larger interval
+    means less journal I/O but more data re-sent after a crash; each commit is an
+    SQLite transaction, so a crash never leaves a half-written state behind.
+    """
+
+    def __init__(self, journal: TransferJournal, file_key: str,
+                 interval_seconds: float = 5.0, interval_bytes: int = 64 * 1024 * 1024):
+        self.journal = journal
+        self.file_key = file_key
+        self.interval_seconds = interval_seconds
+        self.interval_bytes = interval_bytes
+        self._latest = None
+        self._written_offset = 0
+        self._written_at = time.monotonic()
+
+    def update(self, state: dict) -> bool:
+        """
+        Records the latest state and writes it if a checkpoint is due.
+
+        Returns:
+            bool: True if the state was written to the journal
+        """
+        self._latest = state
+        offset = state.get("offset", 0)
+        if (offset - self._written_offset >= self.interval_bytes
+                or time.monotonic() - self._written_at >= self.interval_seconds):
+            self._write()
+            return True
+        return False
+
+    def flush(self):
+        """Writes the latest state if it has not been written yet."""
+        if self._latest is not None:
+            self._write()
+
+    def discard(self):
+        """Drops unwritten state, e.g. once the upload has completed."""
+        self._latest = None
+
+    def _write(self):
+        self.journal.save(self.file_key, self._latest)
+        self._written_offset = self._latest.get("offset", 0)
+        self._written_at = time.monotonic()
+        self._latest = None
@@ -0,0 +1,385 @@
+import logging
+import math
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+STAGE_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 21600.0)
+
+
+class _ShardedValues:
+    """
+    Per-thread accumulators that are summed only when metrics are collected.
+
+    Each thread writes to its own list, so updates on the transfer hot path are
+    plain additions without a lock; the lock is taken once per thread to
+    register its shard and again when a scrape reads the totals. Shards of
+    threads that have exited are folded into a base shard on both occasions,
+    so a service that starts threads per job does not accumulate them.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._shards = []  # (weak reference to the owning thread, values)
+        self._base = [0.0] * size  # Values left behind by threads that have exited
+        self._lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                self._compact()
+                self._shards.append((weakref.ref(threading.current_thread()), values))
+            self._local.values = values
+            return values
+
+    def totals(self):
+        with self._lock:
+            self._compact()
+            shards = [self._base] + [values for _, values in self._shards]
+        return [sum(column) for column in zip(*shards)]
+
+    def _compact(self):
+        """Folds the shards of finished threads into the base; called with the lock held."""
+        live = []
+        for thread_ref, values in self._shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                live.append((thread_ref, values))
+            else:
+                # A finished thread no longer writes to its shard
+                for index, value in enumerate(values):
+                    self._base[index] += value
+        self._shards = live
+
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount=1.0):
+        """Adds ``amount`` (must not be negative)."""
+        self._values.shard()[0] += amount
+
+    @property
+    def value(self):
+        return self._values.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._values = _ShardedValues(1)
+        self._base = 0.0
+
+    def inc(self, amount=1.0):
+        self._values.shard()[0] += amount
+
+    def dec(self, amount=1.0):
+        self._values.shard()[0] -= amount
+
+    def set(self, value):
+        """Sets the gauge; increments from other threads after this call still apply."""
+        self._base = value - self._values.totals()[0]
+
+    @property
+    def value(self):
+        return self._base + self._values.totals()[0]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Layout: one slot per bucket, then +Inf, sum
+        self._values = _ShardedValues(len(buckets) + 2)
+
+    def observe(self, value):
+        values = self._values.shard()
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                values[index] += 1
+                break
+        else:
+            values[len(self.buckets)] += 1
+        values[-1] += value
+
+    def snapshot(self):
+        """Returns (cumulative bucket counts including +Inf, count, sum)."""
+        totals = self._values.totals()
+        cumulative = []
+        running = 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class _Metric:
+    """A metric family with optional labels."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        """Returns the child metric for one combination of label values."""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def _label_text(self, values, extra=None):
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. bytes or retries."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def _render_samples(self):
+        for values, child in self._items():
+            yield f"{self.name}{self._label_text(values)} {_format(child.value)}"
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. chunks in flight."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def _render_samples(self):
+        for values, child in self._items():
+            yield f"{self.name}{self._label_text(values)} {_format(child.value)}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets, e.g. latencies."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_samples(self):
+        for values, child in self._items():
+            cumulative, count, total = child.snapshot()
+            bounds = [_format(b) for b in self.buckets] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, cumulative):
+                yield f"{self.name}_bucket{self._label_text(values, ('le', bound))} {_format(bucket_count)}"
+            yield f"{self.name}_count{self._label_text(values)} {_format(count)}"
+            yield f"{self.name}_sum{self._label_text(values)} {_format(total)}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        """Returns the existing metric with this name, or registers a new one."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves a registry at ``/metrics`` from a background thread."""
+
+    def __init__(self, registry=None, port=9464, host="127.0.0.1"):
+        """
+        Args:
+            registry (MetricsRegistry): Metrics to expose; defaults to ``REGISTRY``
+            port (int): Port to listen on; 0 picks a free port
+            host (str): Interface to bind
+        """
+        self.registry = registry or REGISTRY
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug("metrics: " + format, *args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=None):
+    """Starts serving ``registry`` (default: ``REGISTRY``) and returns the server."""
+    server = MetricsServer(registry, port, host).start()
+    logging.info(f"Metrics available at http://{host}:{server.port}/metrics")
+    return server
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Process-wide registry and the metrics the transfer code reports into
+REGISTRY = MetricsRegistry()
+
+TRANSFER_BYTES = REGISTRY.counter(
+    "sharepoint_uploader_transfer_bytes_total",
+    "Bytes transferred, by direction (upload, download)", ("direction",))
+FILES_TRANSFERRED = REGISTRY.counter(
+    "sharepoint_uploader_files_total",
+    "Files transferred, by direction and result", ("direction", "result"))
+CHUNKS_IN_FLIGHT = REGISTRY.gauge(
+    "sharepoint_uploader_chunks_in_flight",
+    "Upload chunk requests currently being sent")
+CHUNK_LATENCY = REGISTRY.histogram(
+    "sharepoint_uploader_chunk_latency_seconds",
+    "Time to get an upload chunk accepted, retries included")
+RETRIES = REGISTRY.counter(
+    "sharepoint_uploader_retries_total",
+    "Retried upload requests, by HTTP status code or 'network'", ("status",))
+THROTTLE_PAUSES = REGISTRY.counter(
+    "sharepoint_uploader_throttle_pauses_total",
+    "Responses that paused uploads (429, or 503 with Retry-After)", ("status",))
+THROTTLE_PAUSE_SECONDS = REGISTRY.counter(
+    "sharepoint_uploader_throttle_pause_seconds_total",
+    "Pause requested by throttling responses")
+SFTP_CHANNELS = REGISTRY.gauge(
+    "sharepoint_uploader_sftp_channels_in_use",
+    "Open SFTP channels")
+SFTP_TRANSFERS_ACTIVE = REGISTRY.gauge(
+    "sharepoint_uploader_sftp_transfers_active",
+    "SFTP file downloads in progress")
+COMPRESSION_BYTES = REGISTRY.counter(
+    "sharepoint_uploader_compression_bytes_total",
+    "Bytes read into and written by compression, by kind (input, output)", ("kind",))
+COMPRESSION_RATIO = REGISTRY.gauge(
+    "sharepoint_uploader_compression_ratio",
+    "Compressed size divided by original size for the last archive")
+STAGE_DURATION = REGISTRY.histogram(
+    "sharepoint_uploader_stage_duration_seconds",
+    "Duration of pipeline stages (fetch, compress, upload)", ("stage",), buckets=STAGE_BUCKETS)
@@ -1,4 +1,10 @@
+import itertools
+import json
+import os
+import sys
+import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
 from rich.progress import (
     BarColumn,
@@ -16,9 +22,20 @@ from rich.table import Table
 from rich.text import Text
 
 class ProgressTracker:
-    """Manages Rich library integration for CLI feedback with ETA calculations."""
+    """
+    Manages Rich library integration for CLI feedback with ETA calculations.
 
-    def __init__(self):
+    Transfer callbacks only bump plain counters; the counters are folded into the
+    Rich progress bars when the live display renders, at most ``refresh_per_second``
+    times a second. Finished files are evicted so only a bounded window of recent
+    tasks is kept, no matter how many files a transfer contains.
+    """
+
+    REFRESH_PER_SECOND = 4
+    MAX_VISIBLE_TASKS = 10  # Active file rows shown at once
+    KEEP_FINISHED_TASKS = 3  # Finished file rows kept visible before eviction
+
+    def __init__(self, refresh_per_second: float = None, max_visible_tasks: int = None):
         # Enhanced file progress with more detailed information
         self.file_progress = Progress(
             TextColumn("[bold blue]{task.fields[filename]}", justify="right"),
@@ -48,11 +65,25 @@ class ProgressTracker:
         self.start_time = None
         self.total_files = 0
         self.completed_files = 0
+        self.max_visible_tasks = max_visible_tasks or self.MAX_VISIBLE_TASKS
 
-        self.live = Live(self._create_layout())
+        # Cheap counters written by transfer callbacks and drained at render time
+        self._lock = threading.Lock()
+        self._pending_advance = {}
+        self._pending_finished = []
+        self._finished = deque()
+        self._task_totals = {}
+        self.completed_bytes = 0
+        self.total_bytes = 0
+
+        self.live = Live(
+            get_renderable=self._create_layout,
+            refresh_per_second=refresh_per_second or self.REFRESH_PER_SECOND,
+        )
 
     def _create_layout(self) -> Panel:
         """Creates the layout for the live display with ETA information."""
+        self._apply_pending()
         layout = Table.grid()
         
         # Add ETA summary at the top
@@ -75,9 +106,8 @@ class ProgressTracker:
             elapsed = time.time() - self.start_time
             
             # Get overall progress
-            overall_task = self.overall_progress.tasks[self.overall_task]
-            if overall_task.total and overall_task.total > 0:
-                progress_ratio = overall_task.completed / overall_task.total
+            if self.total_bytes > 0:
+                progress_ratio = self.completed_bytes / self.total_bytes
                 
                 if progress_ratio > 0:
                     estimated_total_time = elapsed / progress_ratio
@@ -88,7 +118,7 @@ class ProgressTracker:
                     eta_time = datetime.now() + remaining_timedelta
                     
                     # Calculate transfer speed
-                    speed_bps = overall_task.completed / elapsed if elapsed > 0 else 0
+                    speed_bps = self.completed_bytes / elapsed if elapsed > 0 else 0
                     speed_mbps = speed_bps / (1024 * 1024)
                     
                     file_info = f"Files: {self.completed_files}/{self.total_files}" if self.total_files > 0 else ""
@@ -107,73 +137,97 @@ class ProgressTracker:
         self.total_files = total
 
     def add_task(self, name: str, total_size: int, completed: int = 0) -> TaskID:
-        """Adds a new task to the progress bar."""
+        """
+        Adds a new task to the progress bar.
+
+        Returns:
+            TaskID: Key to pass to ``update`` and ``complete_file``; names are not
+            unique, since many files in a tree share one
+        """
         if self.start_time is None:
             self.start_time = time.time()
             
-        task_id = self.file_progress.add_task(
-            name, total=total_size, filename=name, start=completed > 0, completed=completed
-        )
-        self.tasks[name] = task_id
+        with self._lock:
+            visible = len(self.tasks) - len(self._finished) - len(self._pending_finished) < self.max_visible_tasks
+            task_id = self.file_progress.add_task(
+                name, total=total_size, filename=name, start=completed > 0,
+                completed=completed, visible=visible
+            )
+            self.tasks[task_id] = name
+            self._task_totals[task_id] = total_size
+            self.total_bytes += total_size
+            self.completed_bytes += completed
         
-        # Get current overall task total and add the new task's size
-        current_total = self.overall_progress.tasks[self.overall_task].total or 0
-        self.overall_progress.update(self.overall_task, total=current_total + total_size)
+        self.overall_progress.update(self.overall_task, total=self.total_bytes)
         
         return task_id
 
-    def update(self, name: str, advance: int):
-        """Updates the progress of a task."""
-        if name in self.tasks:
-            self.file_progress.update(self.tasks[name], advance=advance)
-            self.overall_progress.update(self.overall_task, advance=advance)
+    def update(self, task_id: TaskID, advance: int):
+        """Records progress of a task; applied to the display on the next refresh."""
+        with self._lock:
+            if task_id in self.tasks:
+                self._pending_advance[task_id] = self._pending_advance.get(task_id, 0) + advance
+                self.completed_bytes += advance
 
-    def complete_file(self, name: str):
+    def complete_file(self, task_id: TaskID):
         """Mark a file as completed for better file count tracking."""
-        if name in self.tasks:
-            self.completed_files += 1
-            # Mark task as finished but don't remove to avoid display issues
-            task_id = self.tasks[name]
-            self.file_progress.update(task_id, completed=self.file_progress.tasks[task_id].total)
-            # Optionally remove the task after a short delay to keep display clean
-            # For now, let's keep it to avoid index errors
+        with self._lock:
+            if task_id in self.tasks:
+                self.completed_files += 1
+                self._pending_finished.append(task_id)
+
+    def _apply_pending(self):
+        """Folds the counters into the Rich tasks and evicts old finished tasks."""
+        with self._lock:
+            advances, self._pending_advance = self._pending_advance, {}
+            finished, self._pending_finished = self._pending_finished, []
+
+        overall_advance = 0
+        for task_id, advance in advances.items():
+            if task_id in self.tasks:
+                self.file_progress.update(task_id, advance=advance)
+                overall_advance += advance
+        if overall_advance:
+            self.overall_progress.update(self.overall_task, advance=overall_advance)
+
+        for task_id in finished:
+            if task_id not in self.tasks:
+                continue
+            self.file_progress.update(task_id, completed=self._task_totals[task_id], visible=True)
+            self._finished.append(task_id)
+
+        with self._lock:
+            while len(self._finished) > self.KEEP_FINISHED_TASKS:
+                task_id = self._finished.popleft()
+                self._task_totals.pop(task_id, None)
+                if self.tasks.pop(task_id, None) is not None:
+                    self.file_progress.remove_task(task_id)
+            finished_ids = {task_id for task_id in self._finished if task_id in self.tasks}
+
+        # Reveal queued tasks as rows become free
+        active_tasks = [task for task in self.file_progress.tasks if task.id not in finished_ids]
+        free_rows = self.max_visible_tasks - sum(1 for task in active_tasks if task.visible)
+        for task in active_tasks:
+            if free_rows <= 0:
+                break
+            if not task.visible:
+                self.file_progress.update(task.id, visible=True)
+                free_rows -= 1
 
     def update_status(self, status: str):
         """Update the overall status description."""
         self.overall_progress.update(self.overall_task, description=status)
 
+    def set_stage(self, stage: str, state: str = "running"):
+        """Reports the pipeline stage (fetch, compress, upload) as the overall status."""
+        self.update_status(f"{stage.capitalize()}: {state}")
+
     def get_eta_info(self) -> dict:
         """Get detailed ETA information as a dictionary."""
-        if not self.start_time:
-            return {}
-        
-        elapsed = time.time() - self.start_time
-        overall_task = self.overall_progress.tasks[self.overall_task]
-        
-        if overall_task.total and overall_task.total > 0:
-            progress_ratio = overall_task.completed / overall_task.total
-            
-            if progress_ratio > 0:
-                estimated_total_time = elapsed / progress_ratio
-                remaining_time = estimated_total_time - elapsed
-                eta_time = datetime.now() + timedelta(seconds=int(remaining_time))
-                
-                speed_bps = overall_task.completed / elapsed if elapsed > 0 else 0
-                
-                return {
-                    'elapsed_seconds': elapsed,
-                    'remaining_seconds': remaining_time,
-                    'eta_datetime': eta_time,
-                    'progress_percentage': progress_ratio * 100,
-                    'speed_bps': speed_bps,
-                    'speed_mbps': speed_bps / (1024 * 1024),
-                    'completed_bytes': overall_task.completed,
-                    'total_bytes': overall_task.total,
-                    'completed_files': self.completed_files,
-                    'total_files': self.total_files
-                }
-        
-        return {}
+        return compute_eta_info(
+            self.start_time, self.completed_bytes, self.total_bytes,
+            self.completed_files, self.total_files
+        )
 
     def start(self):
         """Starts the progress bar display."""
@@ -188,4 +242,225 @@ class ProgressTracker:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.stop()
\ No newline at end of file
+        self.stop()
+
+
+def compute_eta_info(start_time, completed_bytes, total_bytes, completed_files, total_files) -> dict:
+    """Computes ETA information from transfer counters; empty until progress is made."""
+    if not start_time:
+        return {}
+    
+    elapsed = time.time() - start_time
+    
+    if total_bytes > 0:
+        progress_ratio = completed_bytes / total_bytes
+        
+        if progress_ratio > 0:
+            estimated_total_time = elapsed / progress_ratio
+            remaining_time = estimated_total_time - elapsed
+            eta_time = datetime.now() + timedelta(seconds=int(remaining_time))
+            
+            speed_bps = completed_bytes / elapsed if elapsed > 0 else 0
+            
+            return {
+                'elapsed_seconds': elapsed,
+                'remaining_seconds': remaining_time,
+                'eta_datetime': eta_time,
+                'progress_percentage': progress_ratio * 100,
+                'speed_bps': speed_bps,
+                'speed_mbps': speed_bps / (1024 * 1024),
+                'completed_bytes': completed_bytes,
+                'total_bytes': total_bytes,
+                'completed_files': completed_files,
+                'total_files': total_files
+            }
+    
+    return {}
+
+
+class HeadlessProgressTracker:
+    """
+    Machine-readable progress for unattended runs (cron, systemd).
+
+    Offers the same interface as ``ProgressTracker`` but, instead of drawing a live
+    display, a background thread writes one JSON object per line to a file or file
+    descriptor every ``interval`` seconds, plus an event whenever a pipeline stage
+    changes state. Transfer callbacks only bump counters, so the hot path costs a
+    lock and an addition.
+    """
+
+    DEFAULT_INTERVAL = 5.0
+
+    def __init__(self, output=None, interval: float = None):
+        """
+        Args:
+            output: Where to write events: a path, ``"fd:N"`` or an int for an open file
+                descriptor, a file object, or None / ``"-"`` for stdout
+            interval (float): Seconds between periodic progress events
+        """
+        self.output = output
+        self.interval = interval or self.DEFAULT_INTERVAL
+
+        self.tasks = {}
+        self._task_ids = itertools.count()
+        self.start_time = None
+        self.total_files = 0
+        self.completed_files = 0
+        self.completed_bytes = 0
+        self.total_bytes = 0
+        self.status = ""
+        self.stages = {}
+        self.current_stage = None
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stream = None
+        self._owns_stream = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_sample = None
+
+    def set_total_files(self, total: int):
+        """Set the total number of files for better ETA calculation."""
+        self.total_files = total
+
+    def add_task(self, name: str, total_size: int, completed: int = 0) -> int:
+        """Registers a file transfer and returns the key for ``update`` and ``complete_file``."""
+        with self._lock:
+            if self.start_time is None:
+                self.start_time = time.time()
+            task_id = next(self._task_ids)
+            self.tasks[task_id] = total_size
+            self.total_bytes += total_size
+            self.completed_bytes += completed
+        return task_id
+
+    def update(self, task_id: int, advance: int):
+        """Records progress of a file transfer."""
+        with self._lock:
+            self.completed_bytes += advance
+
+    def complete_file(self, task_id: int):
+        """Marks a file transfer as finished."""
+        with self._lock:
+            if self.tasks.pop(task_id, None) is not None:
+                self.completed_files += 1
+
+    def update_status(self, status: str):
+        """Update the overall status description."""
+        self.status = status
+
+    def set_stage(self, stage: str, state: str = "running"):
+        """
+        Records the state of a pipeline stage and emits a stage event.
+
+        Args:
+            stage (str): Stage name, e.g. "fetch", "compress" or "upload"
+            state (str): "running", "done", "failed" or "skipped"
+        """
+        now = time.time()
+        with self._lock:
+            info = self.stages.setdefault(stage, {"state": state, "started_at": None, "finished_at": None})
+            info["state"] = state
+            if state == "running":
+                info["started_at"] = now
+                self.current_stage = stage
+            elif info["started_at"] is not None:
+                info["finished_at"] = now
+        self._emit("stage", stage=stage, state=state)
+
+    def get_eta_info(self) -> dict:
+        """Get detailed ETA information as a dictionary."""
+        return compute_eta_info(
+            self.start_time, self.completed_bytes, self.total_bytes,
+            self.completed_files, self.total_files
+        )
+
+    def snapshot(self) -> dict:
+        """Returns the current progress as a JSON-serialisable dictionary."""
+        now = time.monotonic()
+        with self._lock:
+            completed = self.completed_bytes
+            snapshot = {
+                "status": self.status,
+                "stage": self.current_stage,
+                "stages": {name: dict(info) for name, info in self.stages.items()},
+                "bytes_done": completed,
+                "bytes_total": self.total_bytes,
+                "files_done": self.completed_files,
+                "files_total": self.total_files,
+                "files_active": len(self.tasks),
+            }
+
+        # Rate over the last interval, so stalls show up immediately
+        rate = 0.0
+        if self._last_sample is not None:
+            sample_time, sample_bytes = self._last_sample
+            if now > sample_time:
+                rate = (completed - sample_bytes) / (now - sample_time)
+        self._last_sample = (now, completed)
+        snapshot["rate_bps"] = rate
+
+        eta = self.get_eta_info()
+        snapshot["avg_rate_bps"] = eta.get("speed_bps", 0.0)
+        snapshot["eta_seconds"] = eta.get("remaining_seconds")
+        snapshot["elapsed_seconds"] = time.time() - self.start_time if self.start_time else 0.0
+        return snapshot
+
+    def start(self):
+        """Opens the output and starts emitting periodic progress events."""
+        self._stream, self._owns_stream = self._open_output(self.output)
+        self._last_sample = (time.monotonic(), self.completed_bytes)
+        self._emit("start")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="progress-ndjson", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Emits a final event and closes the output."""
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self._emit("finish", **self.snapshot())
+        if self._owns_stream and self._stream:
+            self._stream.close()
+        self._stream = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._emit("progress", **self.snapshot())
+
+    def _emit(self, event: str, **fields):
+        if self._stream is None:
+            return
+        record = {"ts": datetime.now().astimezone().isoformat(timespec="milliseconds"), "event": event}
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        with self._write_lock:
+            try:
+                self._stream.write(line + "\n")
+                self._stream.flush()
+            except (OSError, ValueError):
+                # Monitoring must never break a transfer
+                pass
+
+    @staticmethod
+    def _open_output(output):
+        """Returns (stream, owned) for the configured output."""
+        if output is None or output == "-":
+            return sys.stdout, False
+        if hasattr(output, "write"):
+            return output, False
+        if isinstance(output, int):
+            return os.fdopen(output, "w", buffering=1, closefd=False), True
+        if isinstance(output, str) and output.startswith("fd:"):
+            return os.fdopen(int(output[3:]), "w", buffering=1, closefd=False), True
+        return open(output, "a", buffering=1), True
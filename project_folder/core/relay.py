@@ -0,0 +1,258 @@
+import logging
+import os
+import threading
+
+import paramiko
+import requests
+
+from core import metrics, tracing
+from core.journal import Checkpointer
+from core.uploader import SharePointUploader, UploadStats, session_recoverable
+
+DEFAULT_SLOTS = 4
+DEFAULT_READERS = 2
+
+
+class RelayAborted(Exception):
+    """Raised in relay threads once the ring buffer has been closed."""
+
+
+class RingBuffer:
+    """
+    Fixed set of preallocated chunk buffers shared by SFTP readers and the uploader.
+
+    Chunk ``seq`` lives in slot ``seq % slots``. Readers may fill chunks out of
+    order but never more than ``slots`` ahead of the oldest chunk not yet
+    released, so memory stays at ``slots * slot_size`` however large the file.
+    """
+
+    def __init__(self, slots: int, slot_size: int):
+        self.slots = [bytearray(slot_size) for _ in range(slots)]
+        self._lengths = {}  # seq -> bytes filled, for chunks ready to upload
+        self._released = 0  # Every chunk below this has been uploaded
+        self._error = None
+        self._cond = threading.Condition()
+
+    def reserve(self, seq: int) -> memoryview:
+        """Waits until the slot for chunk ``seq`` is free and returns it for filling."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._error is not None or seq < self._released + len(self.slots))
+            self._check()
+            return memoryview(self.slots[seq % len(self.slots)])
+
+    def commit(self, seq: int, length: int):
+        """Marks chunk ``seq`` as filled with ``length`` bytes."""
+        with self._cond:
+            self._lengths[seq] = length
+            self._cond.notify_all()
+
+    def take(self, seq: int) -> memoryview:
+        """Waits until chunk ``seq`` is filled and returns its bytes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._error is not None or seq in self._lengths)
+            self._check()
+            return memoryview(self.slots[seq % len(self.slots)])[:self._lengths[seq]]
+
+    def release(self, seq: int):
+        """Frees the slot of chunk ``seq`` once it has been uploaded."""
+        with self._cond:
+            self._lengths.pop(seq, None)
+            self._released = seq + 1
+            self._cond.notify_all()
+
+    def close(self, error: Exception = None):
+        """Wakes every waiting thread; they raise ``error`` (or RelayAborted)."""
+        with self._cond:
+            if self._error is None:
+                self._error = error or RelayAborted()
+            self._cond.notify_all()
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+
+class SFTPRelay:
+    """
+    Copies a remote file into SharePoint without storing it locally.
+
+    ``readers`` threads, each on its own SFTP channel, read consecutive chunks
+    of the remote file into a ``RingBuffer``, every read split into pipelined
+    SFTP requests; the calling thread uploads the chunks in order into one
+    upload session, as Graph requires. Reads of later chunks therefore overlap
+    the upload of earlier ones, and memory use is ``slots`` chunks.
+
+    Because every byte is relayed unchanged, the Graph session offset is also
+    the SFTP offset: the journaled session (keyed by the remote file's identity)
+    is enough to resume both sides after an interruption.
+    """
+
+    MAX_SESSION_RECOVERIES = SharePointUploader.MAX_SESSION_RECOVERIES
+
+    def __init__(self, sftp_client, uploader: SharePointUploader, chunk_size: int = None,
+                 slots: int = DEFAULT_SLOTS, readers: int = DEFAULT_READERS):
+        """
+        Args:
+            sftp_client (paramiko.SFTPClient): Connected SFTP client
+            uploader (SharePointUploader): Uploader providing the session, journal and retries
+            chunk_size (int): Bytes per chunk, rounded down to a multiple of 320 KiB;
+                defaults to the uploader's chunk size
+            slots (int): Chunks buffered in memory
+            readers (int): Threads reading chunks from the remote file
+        """
+        self.sftp = sftp_client
+        self.uploader = uploader
+        self.chunk_size = uploader.aligned_chunk_size(chunk_size)
+        self.slots = max(2, slots)
+        self.readers = max(1, min(readers, self.slots))
+
+    def relay(self, remote_path: str, folder_path: str = "", source_id: str = None) -> dict:
+        """
+        Relay one remote file into ``folder_path``.
+
+        Args:
+            remote_path (str): Path of the file on the SSH host
+            folder_path (str): Optional folder path in SharePoint
+            source_id (str): Identifies the host, e.g. "user@host:22"; part of the resume key
+
+        Returns:
+            dict: The uploaded item
+
+        Raises:
+            Exception: If a chunk cannot be read or uploaded after all retries
+        """
+        with tracing.span("relay.file", file=os.path.basename(remote_path)):
+            return self._relay(remote_path, folder_path, source_id)
+
+    def _relay(self, remote_path, folder_path, source_id):
+        """Body of ``relay``, run inside its tracing span."""
+        uploader = self.uploader
+        attrs = self.sftp.stat(remote_path)
+        size = attrs.st_size
+        if not size:
+            raise ValueError(f"{remote_path} is empty; upload sessions cannot create empty files")
+        name = os.path.basename(remote_path)
+        file_key = f"sftp://{source_id or 'remote'}{remote_path}|{size}|{int(attrs.st_mtime or 0)}"
+
+        upload_url, offset, expires_at = uploader._resume_upload_session(file_key, remote_path, folder_path)
+        if offset:
+            logging.info(f"Resuming relay of {name} at {offset} of {size} bytes")
+        uploader.transport.warm_up(uploader.session, upload_url)
+        stats = UploadStats(name, size, offset)
+        uploader.upload_stats.append(stats)
+        task = None
+        if uploader.progress_tracker:
+            task = uploader.progress_tracker.add_task(name, total_size=size, completed=offset)
+        checkpointer = Checkpointer(uploader.journal, file_key,
+                                    uploader.checkpoint_interval, uploader.checkpoint_bytes)
+        recoveries = 0
+        metrics.SFTP_TRANSFERS_ACTIVE.inc()
+
+        try:
+            while True:
+                try:
+                    result = self._pump(remote_path, upload_url, offset, size, stats, checkpointer, expires_at, task)
+                except requests.exceptions.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if not session_recoverable(status, recoveries, self.MAX_SESSION_RECOVERIES):
+                        raise
+                    # Session lost or out of step: ask the server where to continue, reading from there
+                    recoveries += 1
+                    stats.session_recoveries += 1
+                    checkpointer.discard()
+                    upload_url, offset, expires_at = uploader._resume_upload_session(
+                        file_key, remote_path, folder_path,
+                        saved_state={"upload_url": upload_url, "expires_at": expires_at}
+                    )
+                    continue
+                checkpointer.discard()
+                uploader.journal.clear(file_key)
+                stats.finish(size)
+                metrics.FILES_TRANSFERRED.labels("upload", "success").inc()
+                if uploader.progress_tracker:
+                    uploader.progress_tracker.complete_file(task)
+                return result
+        finally:
+            metrics.SFTP_TRANSFERS_ACTIVE.dec()
+            if stats.finished is None:
+                metrics.FILES_TRANSFERRED.labels("upload", "failed").inc()
+                stats.finish(stats.offset)
+            checkpointer.flush()
+            uploader.journal.flush()
+
+    def _pump(self, remote_path, upload_url, start, size, stats, checkpointer, expires_at, task=None):
+        """Relays ``[start, size)``; returns the final item or raises on the first failure."""
+        ring = RingBuffer(self.slots, self.chunk_size)
+        chunks = (size - start + self.chunk_size - 1) // self.chunk_size
+        next_seq = [0]
+        seq_lock = threading.Lock()
+
+        def read_chunks(sftp):
+            try:
+                with sftp.open(remote_path, "rb") as remote:
+                    while True:
+                        with seq_lock:
+                            seq = next_seq[0]
+                            next_seq[0] += 1
+                        if seq >= chunks:
+                            return
+                        offset = start + seq * self.chunk_size
+                        length = min(self.chunk_size, size - offset)
+                        slot = ring.reserve(seq)
+                        with tracing.span("relay.sftp_read", offset=offset, size=length):
+                            data = next(remote.readv([(offset, length)]))
+                        if len(data) != length:
+                            raise IOError(f"{remote_path} changed size while being relayed")
+                        slot[:length] = data
+                        metrics.TRANSFER_BYTES.labels("download").inc(length)
+                        ring.commit(seq, length)
+            except RelayAborted:
+                pass
+            except Exception as e:
+                ring.close(e)
+            finally:
+                if sftp is not self.sftp:
+                    sftp.close()
+
+        # SFTP clients are not safe to share between threads: each extra reader gets its own channel
+        transport = self.sftp.get_channel().get_transport()
+        clients = [self.sftp] + [paramiko.SFTPClient.from_transport(transport) for _ in range(self.readers - 1)]
+        threads = [threading.Thread(target=read_chunks, args=(client,), name=f"relay-read-{i}", daemon=True)
+                   for i, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+
+        offset = start
+        try:
+            for seq in range(chunks):
+                chunk = ring.take(seq)
+                response = self.uploader._upload_chunk_with_retry(
+                    upload_url, bytes(chunk), offset, len(chunk), size, stats=stats
+                )
+                previous = offset
+                offset += len(chunk)
+                ring.release(seq)
+                self.uploader._report_progress(task, offset - previous)
+                stats.offset = offset
+                if response.status_code in (200, 201):
+                    return response.json()
+                checkpointer.update({"file_path": remote_path, "upload_url": upload_url,
+                                     "offset": offset, "expires_at": expires_at})
+            raise Exception("Relay completed but no final response received")
+        finally:
+            ring.close()
+            for thread in threads:
+                thread.join()
+
+
+def relay_remote_file(fetcher, uploader: SharePointUploader, remote_path: str, folder_path: str = "",
+                      slots: int = DEFAULT_SLOTS, readers: int = DEFAULT_READERS) -> dict:
+    """
+    Relay a file from a connected ``RemoteFetcher`` into SharePoint.
+
+    Returns:
+        dict: The uploaded item
+    """
+    relay = SFTPRelay(fetcher.sftp_client, uploader, slots=slots, readers=readers)
+    source_id = f"{fetcher.username}@{fetcher.hostname}:{fetcher.port}"
+    return relay.relay(remote_path, folder_path, source_id=source_id)
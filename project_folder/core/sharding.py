@@ -0,0 +1,278 @@
+import hashlib
+import heapq
+import json
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+MANIFEST_VERSION = 1
+SHARD_MODES = ("hash", "balanced")
+
+_SHARD_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+_AGE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*$", re.IGNORECASE)
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+class RemoteEntry(NamedTuple):
+    """A file found while listing the remote tree."""
+    path: str  # Relative to the fetched root, with "/" separators
+    size: int
+    mtime: float
+
+
+def parse_shard(value) -> tuple:
+    """
+    Parses ``"K/N"`` (shard K of N, counted from 1) into ``(K, N)``.
+
+    Raises:
+        ValueError: If the value cannot be parsed or K is not in 1..N
+    """
+    match = _SHARD_PATTERN.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid shard: {value!r} (expected K/N, e.g. 2/8)")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}: {value!r}")
+    return index, count
+
+
+def parse_age(value, now: float = None) -> float:
+    """
+    Parses an age such as ``"36h"`` or ``"7d"``, or a date such as
+    ``"2026-01-31"``, into the epoch time files must be newer than.
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    match = _AGE_PATTERN.match(str(value))
+    if match:
+        now = time.time() if now is None else now
+        return now - float(match.group(1)) * _AGE_UNITS[match.group(2).lower()]
+    try:
+        return datetime.fromisoformat(str(value).strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid age: {value!r} (expected e.g. 12h, 7d or 2026-01-31)") from None
+
+
+def shard_of(path: str, count: int) -> int:
+    """Returns the shard (1..count) a path belongs to; stable across processes and machines."""
+    digest = hashlib.sha1(path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def balance(entries, count: int) -> dict:
+    """
+    Assigns entries to ``count`` shards with similar byte totals.
+
+    Largest files are placed first, each into the shard with the fewest bytes
+    so far. Ties are broken by path and shard number, so every worker that
+    lists the same tree computes the same plan.
+
+    Returns:
+        dict: Shard number -> list of entries
+    """
+    plan = {index: [] for index in range(1, count + 1)}
+    loads = [(0, index) for index in range(1, count + 1)]
+    for entry in sorted(entries, key=lambda e: (-e.size, e.path)):
+        total, index = heapq.heappop(loads)
+        plan[index].append(entry)
+        heapq.heappush(loads, (total + entry.size, index))
+    return plan
+
+
+class FileSelector:
+    """
+    Chooses which remote files a fetch transfers, from the metadata returned
+    by ``listdir_attr``.
+
+    Files older than ``newer_than`` or not larger than ``larger_than`` are
+    dropped first. The remaining files are split into ``count`` disjoint
+    shards, either by a hash of their path (each file's shard is independent
+    of the rest of the tree) or by balanced byte totals (needs the full
+    listing, and every worker must see the same tree).
+    """
+
+    def __init__(self, shard: int = 1, count: int = 1, mode: str = "hash",
+                 newer_than=None, larger_than: int = None):
+        """
+        Args:
+            shard (int): Shard handled by this worker, from 1
+            count (int): Number of shards
+            mode (str): "hash" or "balanced"
+            newer_than (str or float): Age or date as accepted by ``parse_age``, or an
+                epoch time, files must be modified after (optional)
+            larger_than (int): Size in bytes files must exceed (optional)
+        """
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode: {mode!r}")
+        if not 1 <= shard <= count:
+            raise ValueError(f"Shard index must be between 1 and {count}")
+        self.shard = shard
+        self.count = count
+        self.mode = mode
+        # Relative ages are kept as given: the cutoff differs slightly between
+        # workers and reruns, but the setting they must agree on does not
+        self.newer_than_spec = newer_than
+        self.newer_than = parse_age(newer_than) if isinstance(newer_than, str) else newer_than
+        self.larger_than = larger_than
+
+    @property
+    def sharded(self) -> bool:
+        return self.count > 1
+
+    def matches(self, size: int, mtime: float) -> bool:
+        """True if a file passes the size and age filters."""
+        if self.larger_than is not None and (size or 0) <= self.larger_than:
+            return False
+        if self.newer_than is not None and (mtime or 0) <= self.newer_than:
+            return False
+        return True
+
+    def select(self, entries) -> list:
+        """Returns the entries this worker should transfer, sorted by path."""
+        entries = [e for e in entries if self.matches(e.size, e.mtime)]
+        if not self.sharded:
+            selected = entries
+        elif self.mode == "balanced":
+            selected = balance(entries, self.count)[self.shard]
+        else:
+            selected = [e for e in entries if shard_of(e.path, self.count) == self.shard]
+        return sorted(selected, key=lambda e: e.path)
+
+    def directory_name(self, name: str) -> str:
+        """Local directory for this shard, so shards archive and upload under distinct names."""
+        return f"{name}.shard-{self.shard}-of-{self.count}" if self.sharded else name
+
+    @property
+    def manifest_name(self) -> str:
+        return f".shard-{self.shard}-of-{self.count}.json"
+
+    def describe(self) -> dict:
+        """Settings that must agree between the shards of one job."""
+        return {"shards": self.count, "mode": self.mode,
+                "newer_than": self.newer_than_spec, "larger_than": self.larger_than}
+
+
+class ShardManifest:
+    """
+    State of one shard: the files it was assigned and whether all arrived.
+
+    The manifest is written into the shard's directory before any file is
+    fetched, so a rerun of the same shard reuses its plan instead of listing
+    the remote tree again (which could have changed), and it travels inside
+    the shard's archive so the shards of a job can be checked and merged.
+    """
+
+    def __init__(self, path: Path, data: dict):
+        self.path = Path(path)
+        self.data = data
+
+    @classmethod
+    def create(cls, path, remote_root: str, selector: FileSelector, entries) -> "ShardManifest":
+        files = [{"path": e.path, "size": e.size, "mtime": e.mtime} for e in entries]
+        data = {
+            "version": MANIFEST_VERSION,
+            "remote_root": remote_root,
+            "shard": selector.shard,
+            **selector.describe(),
+            "created": time.time(),
+            "complete": False,
+            "total_bytes": sum(f["size"] for f in files),
+            "files": files,
+        }
+        manifest = cls(path, data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, path, remote_root: str = None, selector: FileSelector = None):
+        """
+        Loads a manifest, or returns None if it is missing, unreadable or was
+        written for a different root or shard settings.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        if remote_root is not None and data.get("remote_root") != remote_root:
+            return None
+        if selector is not None and (data.get("shard") != selector.shard or
+                                     any(data.get(k) != v for k, v in selector.describe().items())):
+            return None
+        return cls(path, data)
+
+    @property
+    def entries(self) -> list:
+        return [RemoteEntry(f["path"], f["size"], f["mtime"]) for f in self.data["files"]]
+
+    def mark_complete(self):
+        self.data["complete"] = True
+        self.data["completed"] = time.time()
+        self.save()
+
+    def save(self):
+        """Writes the manifest atomically."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        tmp_path.replace(self.path)
+
+
+def merge_manifests(paths) -> dict:
+    """
+    Checks that the manifests of a sharded job fit together and combines them.
+
+    Raises:
+        ValueError: If the manifests disagree on the job settings, a shard is
+            missing, duplicated or incomplete, or a file appears in two shards
+
+    Returns:
+        dict: Job settings plus the combined, sorted file list and totals
+    """
+    manifests = []
+    for path in paths:
+        manifest = ShardManifest.load(path)
+        if manifest is None:
+            raise ValueError(f"Not a shard manifest: {path}")
+        manifests.append(manifest.data)
+    if not manifests:
+        raise ValueError("No manifests given")
+
+    settings = ("remote_root", "shards", "mode", "newer_than", "larger_than")
+    first = manifests[0]
+    for data in manifests[1:]:
+        for key in settings:
+            if data.get(key) != first.get(key):
+                raise ValueError(f"Manifests disagree on {key}: {first.get(key)!r} != {data.get(key)!r}")
+
+    shards = [data["shard"] for data in manifests]
+    duplicated = sorted({s for s in shards if shards.count(s) > 1})
+    missing = sorted(set(range(1, first["shards"] + 1)) - set(shards))
+    incomplete = sorted(data["shard"] for data in manifests if not data.get("complete"))
+    if duplicated:
+        raise ValueError(f"Shards given more than once: {duplicated}")
+    if missing:
+        raise ValueError(f"Missing shards: {missing}")
+    if incomplete:
+        raise ValueError(f"Shards not completed: {incomplete}")
+
+    owners = {}
+    for data in manifests:
+        for f in data["files"]:
+            if f["path"] in owners:
+                raise ValueError(f"{f['path']} is in shards {owners[f['path']]} and {data['shard']}")
+            owners[f["path"]] = data["shard"]
+
+    files = sorted((dict(f, shard=data["shard"]) for data in manifests for f in data["files"]),
+                   key=lambda f: f["path"])
+    return {
+        **{key: first.get(key) for key in settings},
+        "files": files,
+        "total_files": len(files),
+        "total_bytes": sum(f["size"] for f in files),
+    }
@@ -5,7 +5,20 @@ from pathlib import Path
 
 import paramiko
 
+from . import metrics, tracing
+from .local_writer import LocalFileWriter
 from .progress import ProgressTracker
+from .sharding import RemoteEntry, ShardManifest
+
+
+# Characters not allowed in Windows file names, replaced when files are written locally
+_UNSAFE_NAME_CHARS = str.maketrans({c: "_" for c in '|<>:*?"'})
+
+
+def _mtime(attr):
+    """The remote modification time as an int, or None if the server did not report one."""
+    mtime = attr.st_mtime
+    return int(mtime) if isinstance(mtime, (int, float)) else None
 
 
 class SSHConnectionError(Exception):
@@ -18,6 +31,11 @@ class RemoteFetcher:
     Handles connecting to a remote server via SSH and fetching directories.
     """
 
+    BANDWIDTH_PREFETCH_REQUESTS = 16  # Outstanding SFTP reads per file when a bandwidth cap is set
+    READ_BLOCK = 1024 * 1024  # Bytes taken from the prefetched SFTP stream at a time
+    CHECKPOINT_BYTES = 64 * 1024 * 1024  # Bytes between journaled offsets of a partial file
+    BANDWIDTH_READ_BLOCK = 32 * 1024
+
     def __init__(
         self,
         progress_tracker: ProgressTracker,
@@ -27,6 +45,11 @@ class RemoteFetcher:
         password: str = None,
         private_key_path: str = None,
         timeout: int = 15,
+        bandwidth=None,
+        path_filter=None,
+        selector=None,
+        direct_io: bool = False,
+        journal=None,
     ):
         self.progress_tracker = progress_tracker
         self.hostname = hostname
@@ -35,6 +58,15 @@ class RemoteFetcher:
         self.password = password
         self.private_key_path = private_key_path
         self.timeout = timeout
+        self.bandwidth = bandwidth
+        self.path_filter = path_filter  # core.filters.PathFilter applied during the remote walk
+        self.selector = selector  # core.sharding.FileSelector: size/age filters and sharding
+        self.direct_io = direct_io  # Write huge files with O_DIRECT, see core.local_writer
+        self.journal = journal  # core.journal.TransferJournal holding partial downloads, if resumable
+        self.skipped_complete = 0
+        self.resumed_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
         self.ssh_client = None
         self.sftp_client = None
 
@@ -45,6 +77,7 @@ class RemoteFetcher:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
+    @tracing.traced("sftp.connect")
     def connect(self):
         """Establishes the SSH connection."""
         if self.ssh_client:
@@ -67,6 +100,7 @@ class RemoteFetcher:
                 timeout=self.timeout,
             )
             self.sftp_client = self.ssh_client.open_sftp()
+            metrics.SFTP_CHANNELS.inc()
 
         except paramiko.AuthenticationException as e:
             raise SSHConnectionError(f"Authentication failed: {e}") from e
@@ -84,13 +118,17 @@ class RemoteFetcher:
         if self.sftp_client:
             self.sftp_client.close()
             self.sftp_client = None
+            metrics.SFTP_CHANNELS.dec()
         if self.ssh_client:
             self.ssh_client.close()
             self.ssh_client = None
 
-    def fetch_directory(self, remote_path: str, local_path: Path):
+    def fetch_directory(self, remote_path: str, local_path: Path) -> Path:
         """
         Recursively fetches a directory from the remote server to a local path.
+
+        Returns:
+            Path: The local directory holding the fetched files
         """
         if not self.sftp_client:
             raise SSHConnectionError("SFTP client is not connected.")
@@ -103,6 +141,9 @@ class RemoteFetcher:
         except FileNotFoundError as e:
             raise FileNotFoundError(f"Remote path '{remote_path}' not found.") from e
 
+        if self.selector:
+            return self._fetch_selected(remote_path, local_path)
+
         # Create a subdirectory in the local path to house the fetched contents
         local_dest_path = local_path / Path(remote_path).name
         local_dest_path.mkdir(exist_ok=True)
@@ -116,62 +157,237 @@ class RemoteFetcher:
         print(f"📁 Found {total_files} files to download")
 
         self._recursive_fetch(remote_path, local_dest_path)
+        self._report_resume()
+        if self.skipped_files:
+            print(f"🚫 Skipped {self.skipped_files} filtered files "
+                  f"({self.skipped_bytes / 1024 / 1024:.1f} MB) plus excluded directories")
+        return local_dest_path
+
+    def _fetch_selected(self, remote_path: str, local_path: Path) -> Path:
+        """
+        Fetches the files chosen by ``self.selector`` from one listing of the tree.
+
+        A sharded fetch goes into its own directory with a manifest of the
+        shard's files. Rerunning the same shard reuses that plan and skips
+        files that were already fetched in full.
+        """
+        selector = self.selector
+        local_dest_path = local_path / selector.directory_name(Path(remote_path).name)
+        local_dest_path.mkdir(exist_ok=True)
+
+        manifest = None
+        if selector.sharded:
+            manifest_path = local_dest_path / selector.manifest_name
+            manifest = ShardManifest.load(manifest_path, remote_path, selector)
+        if manifest is not None:
+            print(f"📋 Resuming shard {selector.shard}/{selector.count} from {manifest_path.name}")
+            selected = manifest.entries
+        else:
+            print("📊 Listing remote directory...")
+            entries = list(self._list_remote_files(remote_path))
+            selected = selector.select(entries)
+            if selector.sharded:
+                manifest = ShardManifest.create(manifest_path, remote_path, selector, selected)
+            print(f"🔎 Selected {len(selected)} of {len(entries)} files "
+                  f"({sum(e.size for e in selected) / 1024 / 1024:.1f} MB)")
+
+        pending = []
+        directories = {local_dest_path}
+        for entry in selected:
+            local_file = local_dest_path.joinpath(*entry.path.split("/"))
+            if self._is_fetched(local_file, entry.size, entry.mtime):
+                self.skipped_complete += 1
+                continue
+            pending.append((entry, local_file))
+        self.progress_tracker.set_total_files(len(pending))
+        self.progress_tracker.update_status(f"Downloading {len(pending)} files...")
+        print(f"📁 {len(pending)} files to download")
+
+        for entry, local_file in pending:
+            if local_file.parent not in directories:
+                local_file.parent.mkdir(parents=True, exist_ok=True)
+                directories.add(local_file.parent)
+            self._download_file(f"{remote_path}/{entry.path}", local_file, entry.size, entry.mtime)
+        self._report_resume()
+        if manifest is not None:
+            manifest.mark_complete()
+        return local_dest_path
 
-    def _count_remote_files(self, remote_dir: str) -> int:
+    def _list_remote_files(self, remote_dir: str, rel_dir: str = ""):
+        """Yields a ``RemoteEntry`` for every regular file the path filter accepts."""
+        with tracing.span("sftp.listdir", path=remote_dir):
+            entries = self.sftp_client.listdir_attr(remote_dir)
+        for item_attr in entries:
+            rel_path = f"{rel_dir}/{item_attr.filename}" if rel_dir else item_attr.filename
+            if stat.S_ISDIR(item_attr.st_mode):
+                if not (self.path_filter and self.path_filter.skip_dir(rel_path)):
+                    yield from self._list_remote_files(f"{remote_dir}/{item_attr.filename}", rel_path)
+            elif stat.S_ISREG(item_attr.st_mode):
+                if self.path_filter and not self.path_filter.accept_file(rel_path):
+                    self.skipped_files += 1
+                    self.skipped_bytes += item_attr.st_size or 0
+                    continue
+                yield RemoteEntry(rel_path, item_attr.st_size or 0, _mtime(item_attr) or 0)
+
+    def _count_remote_files(self, remote_dir: str, rel_dir: str = "") -> int:
         """Count total number of files in remote directory for ETA calculation."""
         total_files = 0
         try:
-            for item_attr in self.sftp_client.listdir_attr(remote_dir):
+            with tracing.span("sftp.listdir", path=remote_dir):
+                entries = self.sftp_client.listdir_attr(remote_dir)
+            for item_attr in entries:
                 remote_item_path = f"{remote_dir}/{item_attr.filename}"
+                rel_path = f"{rel_dir}/{item_attr.filename}" if rel_dir else item_attr.filename
                 
                 if stat.S_ISDIR(item_attr.st_mode):
-                    # Recursively count files in subdirectory
-                    total_files += self._count_remote_files(remote_item_path)
+                    # Recursively count files in subdirectory, unless it is excluded
+                    if not (self.path_filter and self.path_filter.skip_dir(rel_path)):
+                        total_files += self._count_remote_files(remote_item_path, rel_path)
                 elif stat.S_ISREG(item_attr.st_mode):
                     # Count regular files
-                    total_files += 1
+                    if not self.path_filter or self.path_filter.accept_file(rel_path):
+                        total_files += 1
         except Exception as e:
             # If we can't count files, just continue without ETA
             print(f"⚠️  Warning: Could not count files in {remote_dir}: {e}")
             
         return total_files
 
-    def _recursive_fetch(self, remote_dir: str, local_dir: Path):
+    def _recursive_fetch(self, remote_dir: str, local_dir: Path, rel_dir: str = ""):
         """Helper for recursively fetching directory contents."""
-        for item_attr in self.sftp_client.listdir_attr(remote_dir):
+        with tracing.span("sftp.listdir", path=remote_dir):
+            entries = self.sftp_client.listdir_attr(remote_dir)
+        for item_attr in entries:
             remote_item_path = f"{remote_dir}/{item_attr.filename}"
             local_item_path = local_dir / item_attr.filename
+            rel_path = f"{rel_dir}/{item_attr.filename}" if rel_dir else item_attr.filename
 
             if stat.S_ISDIR(item_attr.st_mode):
+                if self.path_filter and self.path_filter.skip_dir(rel_path):
+                    continue  # Never listed, so nothing below it costs a round trip
                 local_item_path.mkdir(exist_ok=True)
-                self._recursive_fetch(remote_item_path, local_item_path)
+                self._recursive_fetch(remote_item_path, local_item_path, rel_path)
             elif stat.S_ISREG(item_attr.st_mode):
-                self._download_file(remote_item_path, local_item_path, item_attr.st_size)
+                if self.path_filter and not self.path_filter.accept_file(rel_path):
+                    self.skipped_files += 1
+                    self.skipped_bytes += item_attr.st_size or 0
+                    continue
+                mtime = _mtime(item_attr)
+                if self._is_fetched(local_item_path, item_attr.st_size, mtime):
+                    self.skipped_complete += 1
+                    continue
+                self._download_file(remote_item_path, local_item_path, item_attr.st_size, mtime)
 
-    def _download_file(self, remote_file: str, local_file: Path, file_size: int):
-        """Downloads a single file with progress tracking."""
-        # Sanitize local filename for Windows compatibility
-        sanitized_name = local_file.name.replace('|', '_').replace('<', '_').replace('>', '_').replace(':', '_').replace('*', '_').replace('?', '_').replace('"', '_')
-        sanitized_local_file = local_file.parent / sanitized_name
+    def _download_file(self, remote_file: str, local_file: Path, file_size: int, mtime: int = None):
+        """
+        Downloads a single file with progress tracking.
+
+        Data goes to ``<name>.part``, renamed into place once complete and
+        stamped with the remote mtime. With a journal, the offset reached is
+        recorded every ``CHECKPOINT_BYTES`` and when the transfer fails, and a
+        later call for the same remote file (same size and mtime) continues
+        from there instead of starting over.
+        """
+        sanitized_local_file = self._local_target(local_file)
+        sanitized_name = sanitized_local_file.name
+        part_file = sanitized_local_file.with_name(sanitized_name + ".part")
+        source_id = f"{self.username}@{self.hostname}:{self.port}"
+        transfer_key = f"sftp://{source_id}{remote_file}|{sanitized_local_file.resolve()}"
+        version = f"{file_size}:{mtime}"
+        offset = self._resume_offset(transfer_key, version, file_size, part_file)
         
-        task_id = self.progress_tracker.add_task(
-            sanitized_name, total_size=file_size
-        )
-
-        # Simple callback to update progress
-        def progress_callback(bytes_transferred, total_bytes):
-            # This callback gives total bytes, not delta. We need to calculate the advance.
-            current_completed = self.progress_tracker.file_progress.tasks[task_id].completed
-            advance = bytes_transferred - current_completed
-            if advance > 0:
-                self.progress_tracker.update(sanitized_name, advance)
+        if offset:
+            task = self.progress_tracker.add_task(sanitized_name, total_size=file_size, completed=offset)
+        else:
+            task = self.progress_tracker.add_task(sanitized_name, total_size=file_size)
+        download_bytes = metrics.TRANSFER_BYTES.labels("download")
+        # Small reads keep a bandwidth cap smooth; otherwise read in large blocks
+        block_size = self.BANDWIDTH_READ_BLOCK if self.bandwidth else self.READ_BLOCK
+
+        def checkpoint(position):
+            self.journal.save_download(transfer_key, {
+                "dest_path": str(sanitized_local_file), "source": remote_file,
+                "etag": version, "size": file_size, "ranges": [[0, position]] if position else [],
+            })
 
+        writer = None
+        metrics.SFTP_TRANSFERS_ACTIVE.inc()
         try:
-            self.sftp_client.get(remote_file, str(sanitized_local_file), callback=progress_callback)
+            with tracing.span("sftp.read", path=remote_file, size=file_size, offset=offset), \
+                    self.sftp_client.open(remote_file, "rb") as remote, \
+                    LocalFileWriter(part_file, file_size, offset=offset, direct=self.direct_io) as writer:
+                if offset:
+                    remote.seek(offset)
+                # Pipeline the SFTP reads; bound read-ahead when a cap is set so it limits the network
+                remote.prefetch(file_size, self.BANDWIDTH_PREFETCH_REQUESTS if self.bandwidth else None)
+                next_checkpoint = offset + self.CHECKPOINT_BYTES
+                while True:
+                    block = remote.read(block_size)
+                    if not block:
+                        break
+                    writer.write(block)
+                    self.progress_tracker.update(task, len(block))
+                    download_bytes.inc(len(block))
+                    if self.bandwidth:
+                        self.bandwidth.consume(len(block))
+                    if self.journal and writer.written >= next_checkpoint:
+                        checkpoint(writer.sync())
+                        next_checkpoint = writer.written + self.CHECKPOINT_BYTES
+            if writer.position != file_size:
+                raise IOError(f"Size mismatch for {remote_file}: expected {file_size} bytes, "
+                              f"received {writer.position}")
+            os.replace(part_file, sanitized_local_file)
+            if mtime is not None:
+                os.utime(sanitized_local_file, (mtime, mtime))
+            if self.journal:
+                self.journal.clear_download(transfer_key)
             # Mark file as completed for ETA tracking
-            self.progress_tracker.complete_file(sanitized_name)
-        except Exception as e:
-            # Clean up partially downloaded file on error
-            if sanitized_local_file.exists():
-                sanitized_local_file.unlink()
-            raise e
\ No newline at end of file
+            self.progress_tracker.complete_file(task)
+            metrics.FILES_TRANSFERRED.labels("download", "success").inc()
+        except BaseException:  # Including Ctrl-C, so an interrupted fetch can resume
+            metrics.FILES_TRANSFERRED.labels("download", "failed").inc()
+            if self.journal and writer is not None and 0 < writer.position < file_size:
+                # Keep what arrived; the writer flushed its buffer when it was closed
+                checkpoint(writer.position)
+            elif part_file.exists():
+                part_file.unlink()
+            raise
+        finally:
+            metrics.SFTP_TRANSFERS_ACTIVE.dec()
+
+    def _resume_offset(self, transfer_key: str, version: str, file_size: int, part_file: Path) -> int:
+        """Returns where an earlier, interrupted download of this file stopped, or 0."""
+        if not self.journal:
+            return 0
+        state = self.journal.load_download(transfer_key)
+        offset = state["ranges"][0][1] if state and state["ranges"] else 0
+        if (offset and state["etag"] == version and state["size"] == file_size
+                and part_file.exists() and part_file.stat().st_size >= offset):
+            self.resumed_bytes += offset
+            return offset
+        # Nothing usable: the remote file changed or the partial file is gone
+        if state:
+            self.journal.clear_download(transfer_key)
+        if part_file.exists():
+            part_file.unlink()
+        return 0
+
+    def _is_fetched(self, local_file: Path, size: int, mtime) -> bool:
+        """True if an earlier run already fetched this exact version of the file."""
+        if mtime is None:
+            return False
+        try:
+            local_stat = self._local_target(local_file).stat()
+        except OSError:
+            return False
+        return local_stat.st_size == size and int(local_stat.st_mtime) == mtime
+
+    def _report_resume(self):
+        if self.skipped_complete or self.resumed_bytes:
+            print(f"♻️  Skipped {self.skipped_complete} files fetched by an earlier run; resumed "
+                  f"{self.resumed_bytes / 1024 / 1024:.1f} MB of partial files")
+
+    @staticmethod
+    def _local_target(local_file: Path) -> Path:
+        # Sanitize local filename for Windows compatibility
+        return local_file.parent / local_file.name.translate(_UNSAFE_NAME_CHARS)
\ No newline at end of file
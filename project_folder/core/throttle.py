@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """
+    Parses a ``Retry-After`` header value.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date
+
+    Returns:
+        float or None: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class ThrottleController:
+    """
+    Process-wide concurrency controller for requests against one tenant.
+
+    Every worker takes a slot before sending a request. When SharePoint throttles
+    (429, or 503 with ``Retry-After``), all workers for the tenant pause until the
+    server's deadline and the concurrency limit is halved. Each successful request
+    then grows the limit by roughly one slot per window of successes (AIMD), so
+    throughput climbs back to the highest level the tenant tolerates.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, max_concurrency: int = 16, min_concurrency: int = 1,
+                 decrease_factor: float = 0.5):
+        """
+        Args:
+            max_concurrency (int): Upper bound on simultaneous requests
+            min_concurrency (int): Lower bound the limit never drops below
+            decrease_factor (float): Multiplier applied to the limit when throttled
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_factor = decrease_factor
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttle_events = 0
+
+        self._cond = threading.Condition()
+
+    @classmethod
+    def for_tenant(cls, tenant_key: str, **kwargs) -> "ThrottleController":
+        """Returns the shared controller for a tenant, creating it on first use."""
+        with cls._registry_lock:
+            controller = cls._registry.get(tenant_key)
+            if controller is None:
+                controller = cls(**kwargs)
+                cls._registry[tenant_key] = controller
+            return controller
+
+    def acquire(self):
+        """Blocks until the tenant is not paused and a concurrency slot is free."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                    continue
+                if self.in_flight < max(self.min_concurrency, int(self.limit)):
+                    self.in_flight += 1
+                    return
+                self._cond.wait()
+
+    def release(self):
+        """Returns a slot taken by ``acquire``."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """Context manager wrapping ``acquire`` and ``release``."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        """Additive increase: grows the limit by one slot per window of successes."""
+        with self._cond:
+            if self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                self._cond.notify()
+
+    def on_throttled(self, retry_after: float):
+        """
+        Multiplicative decrease: pauses all workers and shrinks the limit.
+
+        Workers that are throttled by the same burst only extend the pause; the
+        limit is cut once per throttling episode.
+        """
+        with self._cond:
+            now = time.monotonic()
+            resume_at = now + retry_after
+            if now >= self.paused_until:
+                self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+                self.throttle_events += 1
+            self.paused_until = max(self.paused_until, resume_at)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the controller state."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "paused_for": max(0.0, self.paused_until - time.monotonic()),
+                "throttle_events": self.throttle_events,
+            }
+
+
+class AsyncThrottleController(ThrottleController):
+    """
+    asyncio flavour of ``ThrottleController`` for coroutines on one event loop.
+
+    The AIMD bookkeeping is shared with the threaded controller; only waiting for
+    a slot or for the end of a pause is done with asyncio primitives.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wakeup = None
+        self._wakeup_loop = None
+
+    async def acquire(self):
+        """Waits until the tenant is not paused and a concurrency slot is free."""
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.in_flight < max(self.min_concurrency, int(self.limit)):
+                self.in_flight += 1
+                return
+            wakeup = self._get_wakeup()
+            wakeup.clear()
+            await wakeup.wait()
+
+    def release(self):
+        """Returns a slot taken by ``acquire``."""
+        self.in_flight -= 1
+        self._get_wakeup().set()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Async context manager wrapping ``acquire`` and ``release``."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        super().on_success()
+        self._get_wakeup().set()
+
+    def _get_wakeup(self):
+        """Creates the wake-up event lazily so it binds to the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._wakeup is None or self._wakeup_loop is not loop:
+            self._wakeup = asyncio.Event()
+            self._wakeup_loop = loop
+        return self._wakeup
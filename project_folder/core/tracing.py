@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+_tracer = None
+
+
+class _NoopSpan:
+    """Shared span returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """A timed section of work; use as a context manager."""
+
+    __slots__ = ("tracer", "name", "attrs", "start_ns", "path")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = 0
+        self.path = None
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.path = f"{stack[-1].path};{self.name}" if stack else self.name
+        stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end_ns = time.perf_counter_ns()
+        stack = self.tracer._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._record(("span", self.name, self.path, self.start_ns, end_ns - self.start_ns,
+                             threading.get_ident(), self.attrs))
+        return False
+
+    def set(self, **attrs):
+        """Adds attributes, e.g. a status code known only at the end of the span."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    In-memory collector of spans and events for one run.
+
+    Records are appended to a list without locking; nesting is tracked per
+    thread so the flame summary can attribute time to call paths. Once
+    ``max_records`` is reached further records are counted but dropped.
+    """
+
+    MAX_RECORDS = 1_000_000
+
+    def __init__(self, max_records: int = MAX_RECORDS):
+        self.max_records = max_records
+        self.records = []
+        self.dropped = 0
+        self.origin_ns = time.perf_counter_ns()
+        self._local = threading.local()
+        self._thread_names = {}
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def event(self, name, **attrs):
+        stack = self._stack()
+        path = f"{stack[-1].path};{name}" if stack else name
+        self._record(("event", name, path, time.perf_counter_ns(), 0, threading.get_ident(), attrs))
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            self._thread_names[threading.get_ident()] = threading.current_thread().name
+            return self._local.stack
+
+    def _record(self, record):
+        if len(self.records) < self.max_records:
+            self.records.append(record)
+        else:
+            self.dropped += 1
+
+    def flame_summary(self, limit: int = 30) -> str:
+        """
+        Returns a text table of time per call path, heaviest first.
+
+        ``self`` time excludes time spent in nested spans on the same thread, so
+        the column shows where a run's time actually goes.
+        """
+        totals = {}
+        child_time = {}
+        for kind, _, path, _, duration, _, _ in list(self.records):
+            if kind != "span":
+                continue
+            count, total = totals.get(path, (0, 0))
+            totals[path] = (count + 1, total + duration)
+            parent = path.rpartition(";")[0]
+            if parent:
+                child_time[parent] = child_time.get(parent, 0) + duration
+
+        rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        lines = [f"{'total s':>10} {'self s':>10} {'count':>8}  path"]
+        for path, (count, total) in rows:
+            self_time = max(0, total - child_time.get(path, 0))
+            lines.append(f"{total / 1e9:>10.3f} {self_time / 1e9:>10.3f} {count:>8}  {path}")
+        if self.dropped:
+            lines.append(f"({self.dropped} records dropped after reaching {self.max_records})")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        """Returns the trace in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = []
+        for tid, name in list(self._thread_names.items()):
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}})
+        for kind, name, _, start_ns, duration, tid, attrs in list(self.records):
+            event = {
+                "name": name,
+                "cat": name.split(".")[0],
+                "pid": pid,
+                "tid": tid,
+                "ts": (start_ns - self.origin_ns) / 1000,
+                "args": attrs,
+            }
+            if kind == "span":
+                event.update(ph="X", dur=duration / 1000)
+            else:
+                event.update(ph="i", s="t")
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """Writes ``chrome_trace()`` as JSON to ``path``."""
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+
+def enable(tracer: Tracer = None) -> Tracer:
+    """Starts collecting spans and events process-wide and returns the tracer."""
+    global _tracer
+    _tracer = tracer or Tracer()
+    return _tracer
+
+
+def disable():
+    """Stops collecting; returns the tracer that was active, if any."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer():
+    """Returns the active tracer, or None while tracing is disabled."""
+    return _tracer
+
+
+def span(name, **attrs):
+    """
+    Context manager timing a section of work.
+
+    While tracing is disabled this returns a shared no-op object, so
+    instrumented code pays one global lookup and a function call.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.span(name, **attrs)
+
+
+def event(name, **attrs):
+    """Records an instantaneous event such as a retry or a throttling pause."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.event(name, **attrs)
+
+
+def traced(name):
+    """Decorator wrapping every call of a function in a span."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SharedTransport:
+    """
+    Process-wide HTTP connection pools for Graph and SharePoint requests.
+
+    Every uploader mounts the same ``HTTPAdapter`` on its session, so connections to
+    ``graph.microsoft.com`` and to the tenant's upload host stay alive across files,
+    uploaders and batches instead of being re-established for each one. The pool is
+    sized to the upload concurrency, connection failures are retried by urllib3, and
+    the first use of a host can pre-open connections before the first chunk.
+    """
+
+    DEFAULT_POOL_SIZE = 16
+    WARM_UP_TIMEOUT = 5  # Seconds allowed for a warm-up request
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_SIZE, pool_connections: int = 16,
+                 connect_retries: int = 3, warm_up: bool = True):
+        """
+        Args:
+            pool_maxsize (int): Keep-alive connections kept per host; match this to the
+                number of concurrent requests
+            pool_connections (int): Number of hosts whose pools are kept
+            connect_retries (int): Retries for failures while establishing a connection;
+                requests that reached the server are never retried here
+            warm_up (bool): Pre-open connections the first time a host is used
+        """
+        self.pool_maxsize = pool_maxsize
+        self.warm_up_enabled = warm_up
+        retries = Retry(
+            total=connect_retries,
+            connect=connect_retries,
+            read=0,
+            status=0,
+            other=0,
+            redirect=False,
+            backoff_factor=0.5,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+        )
+        self._warmed_hosts = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, pool_maxsize: int = DEFAULT_POOL_SIZE) -> "SharedTransport":
+        """Returns the process-wide transport, creating it on first use."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(pool_maxsize=pool_maxsize)
+            return cls._shared
+
+    def create_session(self) -> requests.Session:
+        """Returns a new session that sends its requests through the shared pools."""
+        session = requests.Session()
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    def warm_up(self, session: requests.Session, url: str, connections: int = None):
+        """
+        Opens keep-alive connections to the host of ``url`` the first time it is seen.
+
+        The upload session URLs point at the tenant's SharePoint host rather than
+        the Graph endpoint, so TCP and TLS handshakes for it would otherwise be paid
+        on the first chunk of every worker. Failures are ignored: warm-up is only an
+        optimisation.
+
+        Args:
+            session (requests.Session): Session mounted on this transport
+            url (str): Any URL on the host to warm up
+            connections (int): Number of connections to open; defaults to a quarter of
+                the pool size, at least one
+        """
+        if not self.warm_up_enabled:
+            return
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if origin in self._warmed_hosts:
+                return
+            self._warmed_hosts.add(origin)
+
+        connections = connections or max(1, self.pool_maxsize // 4)
+
+        def probe(_):
+            try:
+                # Upload URLs are pre-authenticated; never send the bearer token here
+                session.head(f"{origin}/", headers={"Authorization": None},
+                             timeout=self.WARM_UP_TIMEOUT, allow_redirects=False)
+            except requests.exceptions.RequestException as e:
+                logging.debug(f"Connection warm-up for {origin} failed: {e}")
+
+        if connections == 1:
+            probe(0)
+        else:
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(probe, range(connections)))
+
+    def stats(self) -> dict:
+        """
+        Returns connection reuse metrics aggregated over all live host pools.
+
+        ``connections_opened`` counts new TCP/TLS connections; the difference to
+        ``requests`` is the number of requests served by a kept-alive connection.
+        urllib3 has no public way to list its pools; if the private container is
+        missing (a newer urllib3), every count is reported as None (unknown).
+        """
+        pools = self.adapter.poolmanager.pools
+        requests_sent = 0
+        connections_opened = 0
+        try:
+            with pools.lock:
+                pool_list = list(pools._container.values())
+            for pool in pool_list:
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+        except AttributeError:
+            return dict.fromkeys(("hosts", "requests", "connections_opened",
+                                  "connections_reused", "reuse_ratio"))
+        reused = max(0, requests_sent - connections_opened)
+        return {
+            "hosts": len(pool_list),
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": reused / requests_sent if requests_sent else 0.0,
+        }
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.adapter.close()
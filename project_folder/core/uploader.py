@@ -1,9 +1,18 @@
 import os
+import queue
+import threading
 import time
 import requests
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from dotenv import load_dotenv
-from core.utils import StatePersister, load_config
+from core import metrics, tracing
+from core.journal import Checkpointer, TransferJournal, file_identity
+from core.throttle import ThrottleController, parse_retry_after
+from core.transport import SharedTransport
+from core.utils import load_config
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
 
 class SharePointUploader:
     """
@@ -17,44 +26,60 @@ class SharePointUploader:
     CHUNK_SIZE = 4 * 1024 * 1024  # 4MB chunks
     MAX_RETRIES = 3
     RETRY_DELAY = 1  # Base delay in seconds for exponential backoff
+    CHECKPOINT_INTERVAL_SECONDS = 5.0  # Resume state is written at most this often...
+    CHECKPOINT_INTERVAL_BYTES = 64 * 1024 * 1024  # ...or after this much new progress
+    SESSION_EXPIRY_MARGIN = 60  # Treat sessions this close to expiry (seconds) as expired
+    MAX_SESSION_RECOVERIES = 3  # Session re-creations allowed within a single upload
+    MAX_THROTTLE_RETRIES = 10  # Throttled (429 / 503 + Retry-After) attempts per request
+    CHUNK_ALIGNMENT = 320 * 1024  # Graph requires chunks other than the last to be multiples of this
+    STREAM_QUEUE_DEPTH = 2  # Filled stream chunks waiting for the upload thread
     
-    def __init__(self, token, config_path="config.json"):
+    def __init__(self, token, config_path="config.json", journal=None,
+                 checkpoint_interval=None, checkpoint_bytes=None, throttle=None,
+                 transport=None, bandwidth=None, progress_tracker=None):
         """
         Initialize the SharePoint uploader.
         
         Args:
             token (str): Bearer token for Microsoft Graph API authentication
             config_path (str): Path to the configuration file
+            journal (TransferJournal): Resume-state journal; defaults to JOURNAL_PATH from
+                the configuration, or the per-user journal if that is not set
+            checkpoint_interval (float): Seconds between resume-state checkpoints; overrides
+                CHECKPOINT_INTERVAL_SECONDS from the configuration
+            checkpoint_bytes (int): Bytes of progress between checkpoints; overrides
+                CHECKPOINT_INTERVAL_BYTES from the configuration
+            throttle (ThrottleController): Rate limiter to share with other workers;
+                defaults to the process-wide controller for the configured tenant
+            transport (SharedTransport): Connection pools to send requests through;
+                defaults to the process-wide transport sized by HTTP_POOL_SIZE
+            bandwidth (BandwidthLimiter | JobBandwidthLimiter): Optional cap applied to
+                chunk uploads
+            progress_tracker (ProgressTracker): Optional tracker that receives per-file
+                upload progress
         """
         self.token = token
         
-        # Load configuration using the same logic as auth.py
-        env_file = Path('.env')
-        if env_file.exists():
-            load_dotenv(env_file)
-            # Use environment variables if available
-            self.config = {
-                'TENANT_ID': os.getenv('TENANT_ID'),
-                'CLIENT_ID': os.getenv('CLIENT_ID'), 
-                'CLIENT_SECRET': os.getenv('CLIENT_SECRET'),
-                'SITE_ID': os.getenv('SITE_ID'),
-                'DRIVE_ID': os.getenv('DRIVE_ID'),
-                'SHAREPOINT_HOST': os.getenv('SHAREPOINT_HOST', 'graph.microsoft.com'),
-                'SCOPES': os.getenv('SCOPES', 'https://graph.microsoft.com/.default')
-            }
-            # Check if all required env vars are present
-            required_vars = ['TENANT_ID', 'CLIENT_ID', 'CLIENT_SECRET', 'SITE_ID', 'DRIVE_ID']
-            if not all(self.config.get(var) for var in required_vars):
-                self.config = load_config(config_path)
-        else:
-            self.config = load_config(config_path)
+        self.config = load_uploader_config(config_path)
             
-        self.session = requests.Session()
+        pool_size = int(self.config.get("HTTP_POOL_SIZE", SharedTransport.DEFAULT_POOL_SIZE))
+        self.transport = transport or SharedTransport.shared(pool_maxsize=pool_size)
+        self.session = self.transport.create_session()
         self.session.headers.update({
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
         })
-        self.state_persister = StatePersister()
+        self.journal = journal or TransferJournal(self.config.get("JOURNAL_PATH"))
+        if checkpoint_interval is None:
+            checkpoint_interval = self.config.get("CHECKPOINT_INTERVAL_SECONDS", self.CHECKPOINT_INTERVAL_SECONDS)
+        if checkpoint_bytes is None:
+            checkpoint_bytes = self.config.get("CHECKPOINT_INTERVAL_BYTES", self.CHECKPOINT_INTERVAL_BYTES)
+        self.checkpoint_interval = float(checkpoint_interval)
+        self.checkpoint_bytes = int(checkpoint_bytes)
+        self.throttle = throttle or ThrottleController.for_tenant(self.config.get("TENANT_ID") or "default")
+        self.bandwidth = bandwidth
+        self.progress_tracker = progress_tracker
+        self.upload_stats = []  # One UploadStats per upload_file call
 
     def create_upload_session(self, file_path, folder_path=""):
         """
@@ -70,39 +95,56 @@ class SharePointUploader:
         Raises:
             Exception: If session creation fails
         """
-        filename = os.path.basename(file_path)
+        return self._request_upload_session(file_path, folder_path)["uploadUrl"]
+
+    def _request_upload_session(self, file_path, folder_path=""):
+        """
+        Create a resumable upload session and return the full session resource.
         
-        # Construct the API URL using specific site and drive IDs
-        site_id = self.config.get("SITE_ID")
-        drive_id = self.config.get("DRIVE_ID")
+        Args:
+            file_path (str): Path to the file to upload
+            folder_path (str): Optional folder path in SharePoint
+            
+        Returns:
+            dict: Session resource with ``uploadUrl`` and ``expirationDateTime``
+        """
+        api_url = upload_session_api_url(self.config, file_path, folder_path)
+        with tracing.span("upload.create_session", file=os.path.basename(file_path)):
+            response = self._throttled_request("post", api_url, headers=self.session.headers)
+        response.raise_for_status()
         
-        if site_id and drive_id:
-            # Use specific site and drive IDs for better targeting
-            if folder_path:
-                # Upload to specific folder
-                item_path = f"{folder_path}/{filename}".replace("\\", "/")
-                api_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root:/{item_path}:/createUploadSession"
-            else:
-                # Upload to root of the drive
-                api_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root:/{filename}:/createUploadSession"
-        else:
-            # Fallback to default site/drive
-            if folder_path:
-                item_path = f"{folder_path}/{filename}".replace("\\", "/")
-                api_url = f"https://graph.microsoft.com/v1.0/sites/root/drive/root:/{item_path}:/createUploadSession"
-            else:
-                api_url = f"https://graph.microsoft.com/v1.0/sites/root/drive/root:/{filename}:/createUploadSession"
+        return response.json()
+
+    def get_upload_session_status(self, upload_url):
+        """
+        Query an upload session for the byte ranges the server still expects.
         
-        response = self.session.post(api_url, headers=self.session.headers)
+        Args:
+            upload_url (str): Upload session URL
+            
+        Returns:
+            dict or None: Session resource with ``nextExpectedRanges`` and
+            ``expirationDateTime``, or None if the session no longer exists
+        """
+        with tracing.span("upload.session_status"):
+            response = self._throttled_request("get", upload_url)
+        if response.status_code in (404, 410):
+            return None
         response.raise_for_status()
-        
-        result = response.json()
-        return result["uploadUrl"]
+        return response.json()
 
     def upload_file(self, file_path, folder_path=""):
         """
         Upload a file using resumable upload with chunking and state persistence.
         
+        A journaled session is only reused if it has not expired; its position is
+        taken from the server's ``nextExpectedRanges`` rather than the local checkpoint,
+        so bytes the server already holds are never sent again. If the session expires
+        or disappears mid-upload, a new one is created transparently.
+        
+        Progress and timing are recorded in an ``UploadStats`` appended to
+        ``upload_stats``; see ``stats`` for the totals across uploads.
+        
         Args:
             file_path (str): Path to the file to upload
             folder_path (str): Optional folder path in SharePoint
@@ -113,54 +155,198 @@ class SharePointUploader:
         Raises:
             Exception: If upload fails after all retries
         """
+        with tracing.span("upload.file", file=os.path.basename(file_path)):
+            return self._upload_file(file_path, folder_path)
+
+    def _upload_file(self, file_path, folder_path):
+        """Body of ``upload_file``, run inside its tracing span."""
         file_size = os.stat(file_path).st_size
-        state_file = f"{file_path}.state.json"
-        
-        # Check if we can resume from a previous upload
-        if os.path.exists(state_file):
-            saved_state = load_upload_state(state_file)
-            if saved_state:
-                upload_url = saved_state["upload_url"]
-                offset = saved_state["offset"]
-            else:
-                upload_url = self.create_upload_session(file_path, folder_path)
-                offset = 0
-        else:
-            upload_url = self.create_upload_session(file_path, folder_path)
-            offset = 0
+        file_key = file_identity(file_path)
+        name = os.path.basename(file_path)
         
-        with open(file_path, 'rb') as file:
-            file.seek(offset)
-            
-            while offset < file_size:
-                chunk_size = min(self.CHUNK_SIZE, file_size - offset)
-                chunk_data = file.read(chunk_size)
-                
-                # Upload chunk with retry logic
-                result = self._upload_chunk_with_retry(
-                    upload_url, chunk_data, offset, chunk_size, file_size
-                )
+        upload_url, offset, expires_at = self._resume_upload_session(
+            file_key, file_path, folder_path
+        )
+        # Open connections to the tenant's upload host before the first chunk
+        self.transport.warm_up(self.session, upload_url)
+        
+        stats = UploadStats(name, file_size, offset)
+        self.upload_stats.append(stats)
+        task = None
+        if self.progress_tracker:
+            task = self.progress_tracker.add_task(name, total_size=file_size, completed=offset)
+        
+        checkpointer = Checkpointer(
+            self.journal, file_key, self.checkpoint_interval, self.checkpoint_bytes
+        )
+        session_recoveries = 0
+        
+        try:
+            with open(file_path, 'rb') as file:
+                file.seek(offset)
                 
-                if result.status_code == 201:
-                    # Upload complete
-                    if os.path.exists(state_file):
-                        os.remove(state_file)
-                    return result.json()
-                elif result.status_code == 202:
-                    # Chunk uploaded successfully, continue
-                    offset += chunk_size
-                    # Save progress state
-                    save_upload_state(state_file, {
-                        "upload_url": upload_url,
-                        "offset": offset
-                    })
-                else:
-                    raise Exception(f"Unexpected response status: {result.status_code}")
+                while offset < file_size:
+                    chunk_size = min(self.CHUNK_SIZE, file_size - offset)
+                    read_started = time.perf_counter()
+                    chunk_data = file.read(chunk_size)
+                    stats.read_seconds += time.perf_counter() - read_started
+                    
+                    # Upload chunk with retry logic
+                    try:
+                        result = self._upload_chunk_with_retry(
+                            upload_url, chunk_data, offset, chunk_size, file_size, stats=stats
+                        )
+                    except requests.exceptions.HTTPError as e:
+                        status = e.response.status_code if e.response is not None else None
+                        if not session_recoverable(status, session_recoveries, self.MAX_SESSION_RECOVERIES):
+                            raise
+                        # The session expired or disagrees with our offset: resynchronise
+                        session_recoveries += 1
+                        stats.session_recoveries += 1
+                        checkpointer.discard()
+                        previous_offset = offset
+                        upload_url, offset, expires_at = self._resume_upload_session(
+                            file_key, file_path, folder_path,
+                            saved_state={"upload_url": upload_url, "expires_at": expires_at}
+                        )
+                        self._report_progress(task, offset - previous_offset)
+                        file.seek(offset)
+                        continue
+                    
+                    if result.status_code in (200, 201):
+                        # Upload complete
+                        checkpointer.discard()
+                        self.journal.clear(file_key)
+                        stats.finish(file_size)
+                        metrics.FILES_TRANSFERRED.labels("upload", "success").inc()
+                        self._report_progress(task, file_size - offset)
+                        if self.progress_tracker:
+                            self.progress_tracker.complete_file(task)
+                        return result.json()
+                    elif result.status_code == 202:
+                        # Chunk uploaded successfully, continue from where the server expects
+                        sent_to = offset + chunk_size
+                        next_offset = self._next_expected_offset(result, file_size)
+                        previous_offset = offset
+                        offset = next_offset if next_offset is not None else sent_to
+                        if offset != sent_to:
+                            file.seek(offset)
+                        self._report_progress(task, offset - previous_offset)
+                        # Record progress; written only when a checkpoint is due
+                        checkpointer.update({
+                            "file_path": os.path.abspath(file_path),
+                            "upload_url": upload_url,
+                            "offset": offset,
+                            "expires_at": expires_at
+                        })
+                    else:
+                        raise Exception(f"Unexpected response status: {result.status_code}")
+        finally:
+            if stats.finished is None:
+                metrics.FILES_TRANSFERRED.labels("upload", "failed").inc()
+            stats.finish(offset)
+            checkpointer.flush()
+            self.journal.flush()
         
         # Should not reach here in normal flow
         raise Exception("Upload completed but no final response received")
 
-    def _upload_chunk_with_retry(self, upload_url, chunk_data, offset, chunk_size, total_size):
+    def open_stream(self, name, folder_path=""):
+        """
+        Start an upload whose length is not known in advance.
+        
+        Returns a writable sink; bytes written to it are uploaded in chunks while
+        the producer keeps writing. Use it as a context manager: leaving the block
+        normally completes the upload, an exception cancels the session.
+        
+        Args:
+            name (str): File name in SharePoint
+            folder_path (str): Optional folder path in SharePoint
+            
+        Returns:
+            StreamingUpload: The sink; its ``result`` holds the item once closed
+        """
+        session = self._request_upload_session(name, folder_path)
+        self.transport.warm_up(self.session, session["uploadUrl"])
+        stats = UploadStats(name, 0)
+        self.upload_stats.append(stats)
+        task = None
+        if self.progress_tracker:
+            task = self.progress_tracker.add_task(name, total_size=0)
+        return StreamingUpload(self, session["uploadUrl"], name, self.aligned_chunk_size(), stats, task)
+
+    def aligned_chunk_size(self, size=None):
+        """Returns ``size`` (default CHUNK_SIZE) rounded down to a multiple of CHUNK_ALIGNMENT."""
+        size = size or self.CHUNK_SIZE
+        return max(self.CHUNK_ALIGNMENT, size - size % self.CHUNK_ALIGNMENT)
+
+    def stats(self):
+        """
+        Returns upload metrics summed over every ``upload_file`` call so far.
+        
+        Returns:
+            dict: Bytes sent, chunk, retry and throttle counts, time spent reading,
+            waiting for the bandwidth cap and on the network, chunk latency
+            percentiles and overall throughput
+        """
+        return UploadStats.aggregate(list(self.upload_stats))
+
+    def _report_progress(self, task, advance):
+        """Forwards confirmed upload progress to the progress tracker task returned by ``add_task``."""
+        if self.progress_tracker and advance > 0:
+            self.progress_tracker.update(task, advance)
+
+    def _resume_upload_session(self, file_key, file_path, folder_path, saved_state=None):
+        """
+        Resolve the session and offset to upload from.
+        
+        Reuses the journaled session if it is still valid, asking the server which
+        ranges it already holds. Otherwise a new session is created and journaled.
+        
+        Args:
+            file_key (str): Journal key of the file
+            file_path (str): Path to the file to upload
+            folder_path (str): Optional folder path in SharePoint
+            saved_state (dict): Session to check instead of the journaled one
+            
+        Returns:
+            tuple: (upload_url, offset, expires_at)
+        """
+        if saved_state is None:
+            saved_state = self.journal.load(file_key)
+        
+        if session_resumable(saved_state, self.SESSION_EXPIRY_MARGIN):
+            resumed = resumed_session(saved_state, self.get_upload_session_status(saved_state["upload_url"]))
+            if resumed:
+                return resumed
+        
+        state = new_session_state(file_path, self._request_upload_session(file_path, folder_path))
+        # Journal the new session straight away so an early crash can still resume
+        self.journal.save(file_key, state)
+        return state["upload_url"], 0, state["expires_at"]
+
+    @staticmethod
+    def _next_expected_offset(response, file_size):
+        """
+        Return the next offset the server expects, from a 202 response body.
+        
+        Returns:
+            int or None: Start of the first expected range, or None if the body
+            does not say
+        """
+        try:
+            ranges = response.json().get("nextExpectedRanges")
+        except (ValueError, AttributeError):
+            return None
+        if not isinstance(ranges, list) or not ranges:
+            return None
+        try:
+            offset = int(str(ranges[0]).split("-")[0])
+        except ValueError:
+            return None
+        return offset if 0 <= offset < file_size else None
+
+    def _upload_chunk_with_retry(self, upload_url, chunk_data, offset, chunk_size, total_size, stats=None):
         """
         Upload a single chunk with retry logic for transient failures.
         
@@ -170,6 +356,7 @@ class SharePointUploader:
             offset (int): Byte offset in the file
             chunk_size (int): Size of the chunk
             total_size (int): Total file size
+            stats (UploadStats): Optional per-upload metrics to record into
             
         Returns:
             requests.Response: Response from the upload request
@@ -183,60 +370,475 @@ class SharePointUploader:
         }
         
         for attempt in range(self.MAX_RETRIES):
+            if attempt and stats:
+                stats.retries += 1
+            if self.bandwidth:
+                wait_started = time.perf_counter()
+                self.bandwidth.consume(chunk_size)
+                if stats:
+                    stats.wait_seconds += time.perf_counter() - wait_started
+            sent_at = time.perf_counter()
+            metrics.CHUNKS_IN_FLIGHT.inc()
             try:
-                response = self.session.put(upload_url, data=chunk_data, headers=headers)
-                
-                if response.status_code in [200, 201, 202]:
-                    return response
-                elif response.status_code >= 500:
-                    # Server error, retry
-                    if attempt < self.MAX_RETRIES - 1:
-                        delay = self.RETRY_DELAY * (2 ** attempt)  # Exponential backoff
-                        time.sleep(delay)
-                        continue
-                    else:
-                        response.raise_for_status()
-                else:
-                    # Client error, don't retry
-                    response.raise_for_status()
-                    
+                with tracing.span("upload.chunk_put", offset=offset, size=chunk_size, attempt=attempt) as span:
+                    response = self._throttled_request("put", upload_url, data=chunk_data, headers=headers, stats=stats)
+                    span.set(status=response.status_code)
             except requests.exceptions.RequestException as e:
                 if attempt < self.MAX_RETRIES - 1:
+                    metrics.RETRIES.labels("network").inc()
+                    tracing.event("upload.retry", reason=type(e).__name__, offset=offset)
                     delay = self.RETRY_DELAY * (2 ** attempt)  # Exponential backoff
                     time.sleep(delay)
                     continue
                 else:
                     raise e
+            finally:
+                metrics.CHUNKS_IN_FLIGHT.dec()
+            
+            if response.status_code in [200, 201, 202]:
+                latency = time.perf_counter() - sent_at
+                metrics.TRANSFER_BYTES.labels("upload").inc(chunk_size)
+                metrics.CHUNK_LATENCY.observe(latency)
+                if stats:
+                    stats.record_chunk(chunk_size, latency)
+                return response
+            elif response.status_code >= 500:
+                # Server error, retry
+                if attempt < self.MAX_RETRIES - 1:
+                    metrics.RETRIES.labels(response.status_code).inc()
+                    tracing.event("upload.retry", status=response.status_code, offset=offset)
+                    delay = self.RETRY_DELAY * (2 ** attempt)  # Exponential backoff
+                    time.sleep(delay)
+                    continue
+                else:
+                    response.raise_for_status()
+            else:
+                # Client error, don't retry; the caller decides how to recover
+                response.raise_for_status()
         
         raise Exception(f"Failed to upload chunk after {self.MAX_RETRIES} attempts")
 
+    def _throttled_request(self, method, url, stats=None, **kwargs):
+        """
+        Send a request through the shared throttle controller.
+        
+        Throttling responses (429, or 503 carrying ``Retry-After``) pause every worker
+        sharing the controller for the time the server asks for, then the request is
+        sent again. Any other response is returned to the caller unchanged.
+        
+        Args:
+            method (str): Session method name ("get", "post", "put")
+            url (str): Request URL
+            stats (UploadStats): Optional per-upload metrics counting throttled attempts
+            **kwargs: Passed through to the session method
+            
+        Returns:
+            requests.Response: First response that is not a throttling response
+        """
+        send = getattr(self.session, method)
+        for attempt in range(self.MAX_THROTTLE_RETRIES):
+            with self.throttle.slot():
+                response = send(url, **kwargs)
+            
+            retry_after = None
+            if response.status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429 and retry_after is None:
+                retry_after = self.RETRY_DELAY * (2 ** attempt)
+            
+            if retry_after is None:
+                if response.status_code < 500:
+                    self.throttle.on_success()
+                return response
+            if stats:
+                stats.throttled += 1
+            metrics.THROTTLE_PAUSES.labels(response.status_code).inc()
+            metrics.THROTTLE_PAUSE_SECONDS.inc(retry_after)
+            tracing.event("upload.throttled", status=response.status_code, retry_after=retry_after)
+            self.throttle.on_throttled(retry_after)
+        
+        return response
+
 
-def save_upload_state(state_file, state_data):
+class StreamingUpload:
     """
-    Save upload state to a JSON file.
+    Writable sink that uploads what is written to it through an upload session.
     
-    Args:
-        state_file (str): Path to the state file
-        state_data (dict): State data to save
+    Only the current chunk is buffered. Full chunks go to a background thread
+    through a queue of ``STREAM_QUEUE_DEPTH`` entries, so the producer keeps
+    working while a chunk is in flight and is held back only when the network
+    is slower than it is. Chunks are sent as ``bytes a-b/*`` because the total
+    is unknown; the last one, sent by ``close``, carries the real size. At least
+    one byte is always held back so the final request is never empty.
+    
+    The sink cannot be rewound: if a chunk fails after all retries, or the
+    session disappears, the upload fails and has to be started again.
     """
-    import json
-    with open(state_file, 'w') as f:
-        json.dump(state_data, f)
+    
+    def __init__(self, uploader, upload_url, name, chunk_size, stats, task=None):
+        self.uploader = uploader
+        self.upload_url = upload_url
+        self.name = name
+        self.chunk_size = chunk_size
+        self.stats = stats
+        self.task = task  # Progress tracker task, if any
+        self.result = None
+        self._buffer = bytearray()
+        self._position = 0  # Bytes accepted by write()
+        self._sent = 0  # Offset of the next chunk handed to the upload thread
+        self._error = None
+        self._closed = False
+        self._queue = queue.Queue(maxsize=uploader.STREAM_QUEUE_DEPTH)
+        self._thread = threading.Thread(target=self._run, name=f"stream-upload-{name}", daemon=True)
+        self._thread.start()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+    
+    def writable(self):
+        return True
+    
+    def seekable(self):
+        return False
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def write(self, data):
+        """Buffers ``data`` and queues every chunk that is full; returns the byte count."""
+        if self._closed:
+            raise ValueError("write to closed stream")
+        self._raise_error()
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) > self.chunk_size:
+            chunk = bytes(self._buffer[:self.chunk_size])
+            del self._buffer[:self.chunk_size]
+            self._enqueue(chunk, "*")
+        return len(data)
+    
+    def close(self):
+        """
+        Sends the last chunk with the total size and waits for the upload to finish.
+        
+        Returns:
+            dict: The uploaded item
+        
+        Raises:
+            ValueError: If nothing was written; upload sessions cannot create empty files
+        """
+        if self._closed:
+            return self.result
+        if not self._position:
+            self.abort()
+            raise ValueError(f"Nothing was written to {self.name}")
+        self._closed = True
+        try:
+            self._enqueue(bytes(self._buffer), self._position)
+            self._buffer = bytearray()
+            self._queue.put(None)
+            self._thread.join()
+            self._raise_error()
+        except BaseException:
+            self.abort()
+            raise
+        self.stats.file_size = self._position
+        self.stats.finish(self._position)
+        metrics.FILES_TRANSFERRED.labels("upload", "success").inc()
+        if self.uploader.progress_tracker:
+            self.uploader.progress_tracker.complete_file(self.task)
+        return self.result
+    
+    def abort(self):
+        """Stops the upload and cancels the session."""
+        if self._thread.is_alive():
+            if self._error is None:
+                self._error = Exception("Upload aborted")
+            self._drain()
+            self._queue.put(None)
+            self._thread.join()
+        self._closed = True
+        if self.stats.finished is None:
+            self.stats.finish(self._sent)
+            metrics.FILES_TRANSFERRED.labels("upload", "failed").inc()
+        try:
+            self.uploader._throttled_request("delete", self.upload_url)
+        except requests.exceptions.RequestException:
+            pass  # The session expires on its own
+    
+    def _enqueue(self, chunk, total):
+        while True:
+            self._raise_error()
+            try:
+                self._queue.put((self._sent, chunk, total), timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._sent += len(chunk)
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            offset, chunk, total = item
+            try:
+                response = self.uploader._upload_chunk_with_retry(
+                    self.upload_url, chunk, offset, len(chunk), total, stats=self.stats
+                )
+                if total != "*":
+                    if response.status_code not in (200, 201):
+                        raise Exception(f"Unexpected response status: {response.status_code}")
+                    self.result = response.json()
+                self.uploader._report_progress(self.task, len(chunk))
+            except Exception as e:
+                self._error = e
+    
+    def _drain(self):
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
 
+class UploadStats:
+    """
+    Progress and timing of a single ``upload_file`` call.
 
-def load_upload_state(state_file):
+    Each upload owns its instance and updates it from one thread only, so
+    recording a chunk is a few attribute updates with no locking. Totals across
+    files are computed on demand by ``aggregate``.
     """
-    Load upload state from a JSON file.
+
+    def __init__(self, name, file_size, start_offset=0):
+        self.name = name
+        self.file_size = file_size
+        self.start_offset = start_offset
+        self.offset = start_offset
+        self.bytes_sent = 0
+        self.chunks = 0
+        self.retries = 0
+        self.throttled = 0
+        self.session_recoveries = 0
+        self.read_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.chunk_latencies = []
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record_chunk(self, nbytes, latency):
+        """Records an accepted chunk and the time its request took, retries included."""
+        self.bytes_sent += nbytes
+        self.chunks += 1
+        self.chunk_latencies.append(latency)
+
+    def finish(self, offset):
+        """Marks the upload as ended at ``offset``; later calls keep the first end time."""
+        if self.finished is None:
+            self.finished = time.monotonic()
+            self.offset = offset
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def as_dict(self):
+        """Returns the metrics of this upload."""
+        summary = UploadStats.aggregate([self])
+        summary.update(name=self.name, file_size=self.file_size,
+                       start_offset=self.start_offset, offset=self.offset)
+        return summary
+
+    @staticmethod
+    def aggregate(uploads):
+        """
+        Sums the metrics of several uploads.
+
+        Throughput is computed over the wall-clock span covered by the uploads,
+        so files uploaded concurrently are not double counted.
+        """
+        latencies = sorted(l for u in uploads for l in u.chunk_latencies)
+        bytes_sent = sum(u.bytes_sent for u in uploads)
+        if uploads:
+            now = time.monotonic()
+            elapsed = max(u.finished or now for u in uploads) - min(u.started for u in uploads)
+        else:
+            elapsed = 0.0
+        network_seconds = sum(latencies)
+        return {
+            "files": len(uploads),
+            "bytes_sent": bytes_sent,
+            "chunks": sum(u.chunks for u in uploads),
+            "retries": sum(u.retries for u in uploads),
+            "throttled": sum(u.throttled for u in uploads),
+            "session_recoveries": sum(u.session_recoveries for u in uploads),
+            "elapsed_seconds": elapsed,
+            "read_seconds": sum(u.read_seconds for u in uploads),
+            "wait_seconds": sum(u.wait_seconds for u in uploads),
+            "network_seconds": network_seconds,
+            "chunk_latency_avg": network_seconds / len(latencies) if latencies else 0.0,
+            "chunk_latency_p50": _percentile(latencies, 0.50),
+            "chunk_latency_p95": _percentile(latencies, 0.95),
+            "chunk_latency_max": latencies[-1] if latencies else 0.0,
+            "throughput_bps": bytes_sent / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _session_expired(expires_at, margin_seconds=0):
+    """
+    Check whether an upload session's ``expirationDateTime`` has passed.
     
     Args:
-        state_file (str): Path to the state file
+        expires_at (str): ISO 8601 UTC timestamp as returned by Graph, or None if unknown
+        margin_seconds (int): Treat sessions expiring within this window as expired
         
     Returns:
-        dict or None: Loaded state data or None if file doesn't exist/is invalid
+        bool: True if the session is known to be expired
     """
-    import json
+    if not expires_at:
+        return False
     try:
-        with open(state_file, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None
\ No newline at end of file
+        expiry = datetime.strptime(expires_at[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return False
+    return datetime.now(timezone.utc) + timedelta(seconds=margin_seconds) >= expiry
+
+
+def session_resumable(saved_state, margin_seconds=0):
+    """True if a journaled state names an upload session that has not expired yet."""
+    return bool(saved_state) and not _session_expired(saved_state.get("expires_at"), margin_seconds)
+
+
+def resumed_session(saved_state, status):
+    """
+    Where to continue a journaled session, given the server's view of it.
+    
+    Args:
+        saved_state (dict): Journaled session state
+        status (dict): Session resource from ``get_upload_session_status``, or None
+            if the session no longer exists
+        
+    Returns:
+        tuple or None: (upload_url, offset, expires_at), or None if the session
+        cannot be continued and a new one is needed
+    """
+    ranges = (status or {}).get("nextExpectedRanges") or []
+    if not ranges:
+        return None
+    offset = int(str(ranges[0]).split("-")[0])
+    expires_at = status.get("expirationDateTime", saved_state.get("expires_at"))
+    return saved_state["upload_url"], offset, expires_at
+
+
+def new_session_state(file_path, session):
+    """Journal state for a newly created upload session, starting at offset 0."""
+    return {
+        "file_path": os.path.abspath(file_path),
+        "upload_url": session["uploadUrl"],
+        "offset": 0,
+        "expires_at": session.get("expirationDateTime"),
+    }
+
+
+def session_recoverable(status_code, recoveries, max_recoveries):
+    """
+    True if a failed chunk should be followed by resynchronising the session.
+    
+    404 and 410 mean the session expired or disappeared, 416 that the server
+    expects a different offset; each is recovered at most ``max_recoveries`` times.
+    """
+    return status_code in (404, 410, 416) and recoveries < max_recoveries
+
+
+def load_uploader_config(config_path="config.json"):
+    """
+    Load uploader configuration using the same logic as auth.py.
+    
+    Credentials come from ``.env`` when it defines all required variables,
+    otherwise from the JSON configuration file.
+    
+    Args:
+        config_path (str): Path to the configuration file
+        
+    Returns:
+        dict: Configuration values
+    """
+    env_file = Path('.env')
+    if env_file.exists():
+        load_dotenv(env_file)
+        # Use environment variables if available
+        config = {
+            'TENANT_ID': os.getenv('TENANT_ID'),
+            'CLIENT_ID': os.getenv('CLIENT_ID'), 
+            'CLIENT_SECRET': os.getenv('CLIENT_SECRET'),
+            'SITE_ID': os.getenv('SITE_ID'),
+            'DRIVE_ID': os.getenv('DRIVE_ID'),
+            'SHAREPOINT_HOST': os.getenv('SHAREPOINT_HOST', 'graph.microsoft.com'),
+            'SCOPES': os.getenv('SCOPES', 'https://graph.microsoft.com/.default'),
+            'GRAPH_BASE_URL': os.getenv('GRAPH_BASE_URL')
+        }
+        # Check if all required env vars are present
+        required_vars = ['TENANT_ID', 'CLIENT_ID', 'CLIENT_SECRET', 'SITE_ID', 'DRIVE_ID']
+        if all(config.get(var) for var in required_vars):
+            return config
+    return load_config(config_path)
+
+
+def upload_session_api_url(config, file_path, folder_path=""):
+    """
+    Build the createUploadSession URL for a file.
+    
+    Args:
+        config (dict): Uploader configuration (SITE_ID, DRIVE_ID, and optionally
+            GRAPH_BASE_URL to target a Graph emulator or national cloud)
+        file_path (str): Path to the file to upload
+        folder_path (str): Optional folder path in SharePoint
+        
+    Returns:
+        str: Graph API URL
+    """
+    filename = os.path.basename(file_path)
+    base_url = (config.get("GRAPH_BASE_URL") or GRAPH_BASE_URL).rstrip("/")
+    
+    # Construct the API URL using specific site and drive IDs
+    site_id = config.get("SITE_ID")
+    drive_id = config.get("DRIVE_ID")
+    
+    if site_id and drive_id:
+        # Use specific site and drive IDs for better targeting
+        if folder_path:
+            # Upload to specific folder
+            item_path = f"{folder_path}/{filename}".replace("\\", "/")
+            return f"{base_url}/sites/{site_id}/drives/{drive_id}/root:/{item_path}:/createUploadSession"
+        # Upload to root of the drive
+        return f"{base_url}/sites/{site_id}/drives/{drive_id}/root:/{filename}:/createUploadSession"
+    
+    # Fallback to default site/drive
+    if folder_path:
+        item_path = f"{folder_path}/{filename}".replace("\\", "/")
+        return f"{base_url}/sites/root/drive/root:/{item_path}:/createUploadSession"
+    return f"{base_url}/sites/root/drive/root:/{filename}:/createUploadSession"
@@ -4,41 +4,6 @@ import tempfile
 from pathlib import Path
 from rich.logging import RichHandler
 
-class StatePersister:
-    """Handles reading and writing the state of resumable uploads to a JSON file."""
-
-    def get_state_filepath(self, original_path: Path) -> Path:
-        """Returns the standardized path for a state file."""
-        return Path(f"{original_path}.state.json")
-
-    def load_state(self, file_path: Path) -> dict:
-        """Reads and deserializes the JSON state file."""
-        if not file_path.exists():
-            return {}
-        try:
-            with open(file_path, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logging.warning(f"Could not read state file {file_path}: {e}. Starting fresh.")
-            return {}
-
-    def save_state(self, file_path: Path, state: dict):
-        """Serializes and writes the current state to the file."""
-        try:
-            with open(file_path, "w") as f:
-                json.dump(state, f, indent=4)
-        except IOError as e:
-            logging.error(f"Could not write to state file {file_path}: {e}")
-
-    def clear_state(self, file_path: Path):
-        """Deletes the state file."""
-        try:
-            if file_path.exists():
-                file_path.unlink()
-        except IOError as e:
-            logging.error(f"Could not delete state file {file_path}: {e}")
-
-
 class PathManager:
     """Manages filesystem paths."""
 
@@ -0,0 +1,384 @@
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import hashlib
+import logging
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+DEFAULT_IGNORE = (".*", "*.tmp", "*.part", "*.swp", "*~")
+DEFAULT_CURSOR_DIR = Path.home() / ".sharepoint_uploader" / "watch"
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+def is_ignored(name, patterns) -> bool:
+    """True if a file or directory name matches one of the glob ``patterns``."""
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def default_cursor_path(root) -> Path:
+    """Returns the per-user cursor database for a watched directory."""
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return DEFAULT_CURSOR_DIR / f"{Path(root).name or 'root'}-{digest}.db"
+
+
+class InotifyWatcher:
+    """
+    Recursive change notification for a directory tree through Linux inotify.
+
+    The kernel queues events and ``wait`` blocks in ``select``, so an idle
+    watcher uses no CPU. Watches are added for new subdirectories as they
+    appear; files created in a directory before its watch existed are reported
+    by listing it. Directories whose name matches ``ignore`` are never watched.
+    If the kernel queue overflows, ``wait`` asks for a rescan.
+    """
+
+    def __init__(self, root, ignore=()):
+        """
+        Raises:
+            OSError: If inotify is not available
+        """
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self.root = str(root)
+        self.ignore = tuple(ignore)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._dirs = {}  # watch descriptor -> directory
+        self._add_tree(self.root)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def wait(self, timeout=None):
+        """
+        Waits up to ``timeout`` seconds for changes.
+
+        Returns:
+            tuple: (set of changed file paths, True if a full rescan is needed)
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set(), False
+
+        changed = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b"\0").decode("utf-8", "surrogateescape")
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                directory = self._dirs.get(wd)
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not is_ignored(name, self.ignore):
+                        changed.update(self._add_tree(path))
+                else:
+                    changed.add(path)
+            if len(data) < _READ_SIZE:
+                break
+        return changed, rescan
+
+    def _add_tree(self, top):
+        """Watches ``top`` and its subdirectories; returns the files already inside them."""
+        files = set()
+        for directory, subdirs, names in os.walk(top):
+            subdirs[:] = [d for d in subdirs if not is_ignored(d, self.ignore)]
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    logging.warning("⚠️  inotify watch limit reached (fs.inotify.max_user_watches); "
+                                    f"changes under {directory} are only found by rescans")
+                continue
+            self._dirs[wd] = directory
+            files.update(os.path.join(directory, name) for name in names)
+        return files
+
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: asks for a rescan every ``interval`` seconds."""
+
+    def __init__(self, root, interval=5.0):
+        self.root = str(root)
+        self.interval = interval
+        self._next_scan = time.monotonic() + interval
+
+    def close(self):
+        pass
+
+    def wait(self, timeout=None):
+        now = time.monotonic()
+        remaining = self._next_scan - now
+        if timeout is not None and timeout < remaining:
+            time.sleep(max(0.0, timeout))
+            return set(), False
+        time.sleep(max(0.0, remaining))
+        self._next_scan = time.monotonic() + self.interval
+        return set(), True
+
+
+class WatchCursor:
+    """
+    Persistent record of the files a watcher has uploaded, backed by SQLite.
+
+    Each entry holds the size and modification time that was uploaded, so a
+    restarted watcher only queues files that are new or changed since.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS watch_cursor (
+                path        TEXT PRIMARY KEY,
+                size        INTEGER NOT NULL,
+                mtime_ns    INTEGER NOT NULL,
+                uploaded_at REAL NOT NULL
+            )
+            """
+        )
+
+    def load(self) -> dict:
+        """Returns ``{path: (size, mtime_ns)}`` for every uploaded file."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns FROM watch_cursor").fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def record(self, path: str, size: int, mtime_ns: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watch_cursor (path, size, mtime_ns, uploaded_at) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class FolderWatcher:
+    """
+    Uploads new and modified files under a directory as they appear.
+
+    Changes come from inotify where available and from periodic rescans
+    otherwise. A changed file is held back until its size and modification
+    time have not changed for ``stable_seconds``, so files still being written
+    are not uploaded half-finished. Uploaded versions are recorded in a
+    ``WatchCursor``; on start only files that differ from it are queued.
+    """
+
+    IDLE_WAKEUP = 1.0  # Longest blocking wait, so stop() is noticed promptly
+    RETRY_DELAY = 30.0  # Seconds before a failed upload is tried again
+
+    def __init__(self, root, upload, cursor: WatchCursor, folder: str = "",
+                 stable_seconds: float = 2.0, poll_interval: float = 5.0,
+                 use_inotify: bool = None, workers: int = 4, ignore=DEFAULT_IGNORE):
+        """
+        Args:
+            root (str | Path): Directory to watch
+            upload (callable): ``upload(path, folder)`` uploads one file; ``folder`` is the
+                remote folder mirroring the file's parent directory
+            cursor (WatchCursor): Record of uploaded file versions
+            folder (str): Remote folder corresponding to ``root``
+            stable_seconds (float): Quiet period before a changed file is uploaded
+            poll_interval (float): Seconds between rescans without inotify
+            use_inotify (bool): Force (True) or disable (False) inotify; by default it
+                is used when available
+            workers (int): Concurrent uploads
+            ignore (tuple): Glob patterns for file names that are never uploaded
+        """
+        self.root = os.path.abspath(root)
+        self.upload = upload
+        self.cursor = cursor
+        self.folder = folder.strip("/")
+        self.stable_seconds = stable_seconds
+        self.ignore = tuple(ignore)
+        self.uploaded = 0
+        self.failed = 0
+
+        self.source = None
+        if use_inotify is not False:
+            try:
+                self.source = InotifyWatcher(self.root, self.ignore)
+            except OSError as e:
+                if use_inotify:
+                    raise
+                logging.info(f"ℹ️  inotify unavailable ({e}); polling every {poll_interval}s")
+        if self.source is None:
+            self.source = PollingWatcher(self.root, poll_interval)
+
+        self._uploaded = cursor.load()
+        self._pending = {}  # path -> (size, mtime_ns, monotonic time the version was first seen)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch-upload")
+        self._stopping = threading.Event()
+        self._finished = threading.Event()
+        self._finished.set()  # Not running yet
+
+    def run(self):
+        """Watches until ``stop`` is called, then waits for running uploads."""
+        logging.info(f"👀 Watching {self.root} ({type(self.source).__name__})")
+        self._finished.clear()
+        try:
+            self.scan()
+            while not self._stopping.is_set():
+                changed, rescan = self.source.wait(self._wait_timeout())
+                if rescan:
+                    self.scan()
+                for path in changed:
+                    self._observe(path)
+                self._submit_stable()
+        finally:
+            self._executor.shutdown(wait=True)
+            self.source.close()
+            self._finished.set()
+
+    def stop(self, wait: bool = True):
+        """Asks ``run`` to return; with ``wait``, blocks until it has."""
+        self._stopping.set()
+        if wait:
+            self._finished.wait()
+
+    def scan(self):
+        """Compares the whole tree with the cursor and queues every difference."""
+        for directory, subdirs, names in os.walk(self.root):
+            subdirs[:] = [d for d in subdirs if not is_ignored(d, self.ignore)]
+            for name in names:
+                self._observe(os.path.join(directory, name))
+
+    def _ignored(self, path):
+        """True if the file or any directory between it and the root matches an ignore pattern."""
+        relative = os.path.relpath(path, self.root)
+        return any(is_ignored(part, self.ignore) for part in Path(relative).parts)
+
+    def _observe(self, path):
+        """Records the current version of a file reported as changed."""
+        if self._ignored(path):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._pending.pop(path, None)
+            return
+        if not os.path.isfile(path):
+            return
+        version = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if self._uploaded.get(path) == version:
+                self._pending.pop(path, None)
+                return
+            current = self._pending.get(path)
+            if current is None or current[:2] != version:
+                self._pending[path] = (*version, time.monotonic())
+
+    def _wait_timeout(self):
+        with self._lock:
+            if not self._pending:
+                return self.IDLE_WAKEUP
+            due = min(seen for _, _, seen in self._pending.values()) + self.stable_seconds
+        return min(self.IDLE_WAKEUP, max(0.0, due - time.monotonic()))
+
+    def _submit_stable(self):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [p for p, (_, _, seen) in self._pending.items()
+                          if now - seen >= self.stable_seconds and p not in self._in_flight]
+        for path in candidates:
+            # A file that changed without an event (e.g. while polling) restarts its quiet period
+            self._observe(path)
+            with self._lock:
+                entry = self._pending.get(path)
+                if entry is None or now - entry[2] < self.stable_seconds:
+                    continue
+                del self._pending[path]
+                self._in_flight.add(path)
+            self._executor.submit(self._upload_one, path, entry[0], entry[1])
+
+    def _remote_folder(self, path):
+        relative = PurePosixPath(Path(os.path.relpath(os.path.dirname(path), self.root)).as_posix())
+        parts = [self.folder] if self.folder else []
+        if str(relative) != ".":
+            parts.append(str(relative))
+        return "/".join(parts)
+
+    def _upload_one(self, path, size, mtime_ns):
+        try:
+            self.upload(Path(path), self._remote_folder(path))
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"❌ Upload of {path} failed: {e}; retrying in {self.RETRY_DELAY:.0f}s")
+            with self._lock:
+                self._in_flight.discard(path)
+                seen = time.monotonic() + self.RETRY_DELAY - self.stable_seconds
+                self._pending.setdefault(path, (size, mtime_ns, seen))
+            return
+
+        self.cursor.record(path, size, mtime_ns)
+        self.uploaded += 1
+        logging.info(f"✅ Uploaded {os.path.relpath(path, self.root)}")
+        with self._lock:
+            self._uploaded[path] = (size, mtime_ns)
+            self._in_flight.discard(path)
+        # Changes made during the upload produce a new version and another upload
+        self._observe(path)
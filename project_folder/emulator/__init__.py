@@ -0,0 +1,9 @@
+"""
+Local stand-ins for Microsoft Graph and an SFTP host, used by the benchmarks
+and end-to-end tests.
+"""
+
+from emulator.graph import DriveStore, FaultInjector, GraphEmulator
+from emulator.sftp import SFTPEmulator
+
+__all__ = ["DriveStore", "FaultInjector", "GraphEmulator", "SFTPEmulator"]
@@ -0,0 +1,686 @@
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from core.quickxor import QuickXorHash
+
+_DRIVE_PREFIX = re.compile(
+    r"^/v1\.0/(?:sites/[^/]+/drives/[^/]+|sites/[^/]+/drive|drives/[^/]+|me/drive)(?P<rest>/.*)$"
+)
+_ITEM_ACTION = re.compile(r"^/root:/(?P<path>.+?):/(?P<action>createUploadSession|content|children)$")
+_ITEM = re.compile(r"^/root:/(?P<path>.+?):?$")
+_UPLOAD = re.compile(r"^/upload/(?P<session_id>[0-9a-f]+)$")
+_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+READ_BLOCK = 64 * 1024
+SIMPLE_UPLOAD_LIMIT = 250 * 1024 * 1024  # Graph rejects larger /content uploads
+MAX_BATCH_REQUESTS = 20
+
+
+class FaultInjector:
+    """
+    Decides which requests the emulator answers with an injected fault.
+
+    Faults are either drawn at random, from a seeded generator so a scenario
+    injects the same faults on every run, or scheduled explicitly with
+    ``schedule`` for deterministic tests. Kinds:
+
+    - ``throttle``: 429 with ``Retry-After``
+    - ``error``: a 5xx (``error_status``)
+    - ``drop``: the connection is closed without a response
+    - ``expire``: the upload session addressed by the request expires first
+    """
+
+    def __init__(self, throttle_rate=0.0, retry_after=1.0, error_rate=0.0, error_status=503,
+                 drop_rate=0.0, expire_rate=0.0, seed=0):
+        """
+        Args:
+            throttle_rate (float): Fraction of requests answered with 429 and Retry-After
+            retry_after (float): Seconds sent in the Retry-After header
+            error_rate (float): Fraction of requests answered with ``error_status``
+            error_status (int): Status code for injected errors
+            drop_rate (float): Fraction of requests whose connection is dropped
+            expire_rate (float): Fraction of upload-session requests whose session expires
+            seed (int): Seed for the random generator
+        """
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.expire_rate = expire_rate
+        self._random = random.Random(seed)
+        self._scheduled = deque()
+        self._lock = threading.Lock()
+
+    def schedule(self, kind, count=1, method=None, status=None):
+        """
+        Injects ``kind`` into the next ``count`` matching requests.
+
+        Args:
+            kind (str): "throttle", "error", "drop" or "expire"
+            count (int): Number of requests to affect
+            method (str): Only affect requests with this HTTP method
+            status (int): Status code for "error" faults
+        """
+        with self._lock:
+            for _ in range(count):
+                self._scheduled.append((kind, method, status))
+
+    def decide(self, method, path):
+        """Returns ``(kind, status)`` for a request, or None to serve it normally."""
+        with self._lock:
+            for index, (kind, only_method, status) in enumerate(self._scheduled):
+                if only_method is None or only_method == method:
+                    del self._scheduled[index]
+                    return kind, status or self.error_status
+            roll = self._random.random()
+
+        for kind, rate in (("throttle", self.throttle_rate), ("error", self.error_rate),
+                           ("drop", self.drop_rate)):
+            if roll < rate:
+                return kind, self.error_status
+            roll -= rate
+        if path.startswith("/upload/") and roll < self.expire_rate:
+            return "expire", None
+        return None
+
+
+class DriveStore:
+    """
+    Items of the emulated drive, kept in memory or under a directory on disk.
+
+    With ``root`` set, file contents live in ``root/content`` and in-progress
+    upload sessions in ``root/sessions``, and the metadata index is saved to
+    ``root/index.json`` after every change, so a restarted emulator serves the
+    same drive. Without ``root`` contents stay in memory, or are discarded when
+    ``keep_content`` is false (only sizes and hashes are kept).
+    """
+
+    def __init__(self, root=None, keep_content=True):
+        self.root = root
+        self.keep_content = keep_content or root is not None
+        self.items = {"": _folder_item("", "root")}
+        self.changes = []  # Paths in modification order; the delta token is an index
+        self._contents = {}
+        self._lock = threading.RLock()
+
+        if root:
+            os.makedirs(os.path.join(root, "content"), exist_ok=True)
+            os.makedirs(os.path.join(root, "sessions"), exist_ok=True)
+            index = os.path.join(root, "index.json")
+            if os.path.exists(index):
+                with open(index, "r") as f:
+                    saved = json.load(f)
+                self.items = saved["items"]
+                self.changes = saved["changes"]
+
+    def open_session(self, session_id):
+        """Returns a writable buffer for an upload session, or None if content is discarded."""
+        if self.root:
+            return open(os.path.join(self.root, "sessions", session_id), "wb")
+        return io.BytesIO() if self.keep_content else None
+
+    def commit(self, path, buffer, size, hashes):
+        """Turns a finished upload session buffer into a drive item."""
+        with self._lock:
+            if self.root:
+                buffer.close()
+                dest = self._content_path(path)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(buffer.name, dest)
+            elif buffer is not None:
+                self._contents[path] = buffer.getvalue()
+            return self._add_file(path, size, hashes)
+
+    def discard(self, buffer):
+        """Drops the buffer of a cancelled or expired session."""
+        if buffer is not None and self.root:
+            buffer.close()
+            try:
+                os.remove(buffer.name)
+            except OSError:
+                pass
+
+    def write(self, path, data):
+        """Stores ``data`` at ``path`` in one go, as a simple upload does."""
+        with self._lock:
+            if self.root:
+                dest = self._content_path(path)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with open(dest, "wb") as f:
+                    f.write(data)
+            elif self.keep_content:
+                self._contents[path] = bytes(data)
+            return self._add_file(path, len(data), _hashes(hashlib.sha256(data), QuickXorHash(data)))
+
+    def read(self, path):
+        """Returns the content stored at ``path``, or None."""
+        with self._lock:
+            if path not in self.items or "file" not in self.items[path]:
+                return None
+            if self.root:
+                with open(self._content_path(path), "rb") as f:
+                    return f.read()
+            return self._contents.get(path)
+
+    def item(self, path):
+        return self.items.get(path.strip("/"))
+
+    def children(self, path):
+        """Returns the items directly inside the folder at ``path``, or None."""
+        path = path.strip("/")
+        folder = self.items.get(path)
+        if folder is None or "folder" not in folder:
+            return None
+        with self._lock:
+            return [item for p, item in sorted(self.items.items())
+                    if p and p.rpartition("/")[0] == path]
+
+    def delta(self, token, page_size):
+        """
+        Returns ``(items, next_token, more)`` for changes after ``token``.
+
+        Each changed item is reported once, with its latest state.
+        """
+        with self._lock:
+            start = min(max(0, token), len(self.changes))
+            end = min(len(self.changes), start + page_size)
+            seen = []
+            for path in self.changes[start:end]:
+                if path not in seen:
+                    seen.append(path)
+            return [self.items[p] for p in seen if p in self.items], end, end < len(self.changes)
+
+    def _add_file(self, path, size, hashes):
+        with self._lock:
+            self._ensure_folders(path)
+            existing = self.items.get(path)
+            item = {
+                "id": existing["id"] if existing else uuid.uuid4().hex,
+                "name": path.rsplit("/", 1)[-1],
+                "eTag": f'"{{{uuid.uuid4()}}},1"',
+                "size": size,
+                "lastModifiedDateTime": _format_time(datetime.now(timezone.utc)),
+                "parentReference": {"path": "/drive/root:/" + path.rpartition("/")[0]},
+                "file": {"hashes": hashes},
+            }
+            self.items[path] = item
+            self.changes.append(path)
+            self._save()
+            return item, existing is None
+
+    def _ensure_folders(self, path):
+        parts = path.split("/")[:-1]
+        for depth in range(1, len(parts) + 1):
+            folder = "/".join(parts[:depth])
+            if folder not in self.items:
+                self.items[folder] = _folder_item(folder, parts[depth - 1])
+                self.changes.append(folder)
+
+    def _content_path(self, path):
+        dest = os.path.realpath(os.path.join(self.root, "content", path))
+        if not dest.startswith(os.path.realpath(os.path.join(self.root, "content")) + os.sep):
+            raise ValueError(f"Invalid item path: {path}")
+        return dest
+
+    def _save(self):
+        if not self.root:
+            return
+        index = os.path.join(self.root, "index.json")
+        with open(index + ".tmp", "w") as f:
+            json.dump({"items": self.items, "changes": self.changes}, f)
+        os.replace(index + ".tmp", index)
+
+
+class UploadSession:
+    """Server-side state of one resumable upload session."""
+
+    def __init__(self, session_id, path, expires_at, buffer):
+        self.id = session_id
+        self.path = path
+        self.expires_at = expires_at
+        self.received = 0
+        self.total = None
+        self.buffer = buffer
+        self.sha256 = hashlib.sha256()
+        self.quickxor = QuickXorHash()
+        self.lock = threading.Lock()
+
+
+class GraphEmulator:
+    """
+    Local stand-in for the Graph drive endpoints the tool uses.
+
+    Speaks ``createUploadSession`` with ranged chunk PUTs, 202/201 responses,
+    ``nextExpectedRanges`` and session expiry; simple ``/content`` uploads and
+    downloads; item metadata, folder ``children``, ``delta`` and JSON ``$batch``.
+    Latency per request, a bandwidth cap per connection and fault injection make
+    it usable for throughput benchmarks as well as end-to-end tests. Point an
+    uploader at it by setting ``GRAPH_BASE_URL`` to ``base_url``.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, bandwidth=None,
+                 faults=None, store_content=True, session_lifetime=3600,
+                 store_dir=None, delta_page_size=200):
+        """
+        Args:
+            host (str): Interface to bind
+            port (int): Port to listen on; 0 picks a free port
+            latency (float): Seconds added before every response, emulating RTT
+            bandwidth (float): Bytes per second each connection may upload, or None
+            faults (FaultInjector): Fault injection, or None
+            store_content (bool): Keep uploaded bytes so tests can check them;
+                benchmarks with huge files only keep sizes and hashes
+            session_lifetime (float): Seconds until an upload session expires
+            store_dir (str): Keep the drive on disk in this directory
+            delta_page_size (int): Changes returned per delta page
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.faults = faults
+        self.session_lifetime = session_lifetime
+        self.delta_page_size = delta_page_size
+        self.store = DriveStore(store_dir, keep_content=store_content)
+
+        self.sessions = {}
+        self.stats = {"requests": 0, "bytes_received": 0, "throttled": 0, "errors": 0,
+                      "dropped": 0, "expired": 0, "sessions": 0}
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """Value for the ``GRAPH_BASE_URL`` configuration key."""
+        return f"{self.origin}/v1.0"
+
+    @property
+    def origin(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="graph-emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def expire_session(self, session_id):
+        """Makes an upload session expire immediately."""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+            self._count("expired")
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # Request handling ---------------------------------------------------
+
+    def dispatch(self, method, target, headers, read_body):
+        """
+        Routes one request.
+
+        Args:
+            method (str): HTTP method
+            target (str): Request path and query
+            headers: Mapping with the request headers
+            read_body: ``read_body(n)`` returns the body; ``read_body(None)`` discards it
+
+        Returns:
+            tuple: (status, body, headers); a ``bytes`` body is sent as-is, anything
+            else as JSON
+        """
+        parts = urlsplit(target)
+        path = parts.path
+        query = parse_qs(parts.query)
+
+        match = _UPLOAD.match(path)
+        if match:
+            return self._upload_session_request(method, match.group("session_id"), headers, read_body)
+
+        if path == "/v1.0/$batch" and method == "POST":
+            return self._batch(read_body(_content_length(headers)))
+
+        match = _DRIVE_PREFIX.match(path)
+        if not match:
+            read_body(None)
+            return 404, _error("itemNotFound", f"No route for {method} {path}"), None
+        rest = match.group("rest")
+
+        action = _ITEM_ACTION.match(rest)
+        if action:
+            item_path = unquote(action.group("path")).strip("/")
+            kind = action.group("action")
+            if kind == "createUploadSession" and method == "POST":
+                read_body(None)
+                return self._create_session(item_path)
+            if kind == "content" and method == "PUT":
+                return self._simple_upload(item_path, headers, read_body)
+            if kind == "content" and method == "GET":
+                read_body(None)
+                return self._download(item_path, headers)
+            if kind == "children" and method == "GET":
+                read_body(None)
+                return self._children(item_path)
+        elif rest in ("/root/children", "/root/children/") and method == "GET":
+            read_body(None)
+            return self._children("")
+        elif rest == "/root/delta" and method == "GET":
+            read_body(None)
+            return self._delta(query, parts)
+        elif rest in ("/root", "/root/") and method == "GET":
+            read_body(None)
+            return 200, self.store.item(""), None
+        else:
+            item = _ITEM.match(rest)
+            if item and method == "GET":
+                read_body(None)
+                found = self.store.item(unquote(item.group("path")))
+                if found is None:
+                    return 404, _error("itemNotFound", "Item not found"), None
+                return 200, found, None
+
+        read_body(None)
+        return 405, _error("invalidRequest", f"Unsupported request {method} {path}"), None
+
+    def _create_session(self, path):
+        session_id = uuid.uuid4().hex
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.session_lifetime)
+        session = UploadSession(session_id, path, expires_at, self.store.open_session(session_id))
+        with self._lock:
+            self.sessions[session_id] = session
+            self.stats["sessions"] += 1
+        return 200, {
+            "uploadUrl": f"{self.origin}/upload/{session_id}",
+            "expirationDateTime": _format_time(expires_at),
+            "nextExpectedRanges": ["0-"],
+        }, None
+
+    def _live_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires_at <= datetime.now(timezone.utc):
+            with self._lock:
+                self.sessions.pop(session_id, None)
+            self.store.discard(session.buffer)
+            return None
+        return session
+
+    def _session_status(self, session):
+        return {
+            "expirationDateTime": _format_time(session.expires_at),
+            "nextExpectedRanges": [f"{session.received}-"],
+        }
+
+    def _upload_session_request(self, method, session_id, headers, read_body):
+        session = self._live_session(session_id)
+        if session is None:
+            read_body(None)
+            return 404, _error("itemNotFound", "Upload session not found or expired"), None
+        if method == "PUT":
+            return self._put_chunk(session, headers.get("Content-Range"), read_body)
+        read_body(None)
+        if method == "GET":
+            return 200, self._session_status(session), None
+        if method == "DELETE":
+            with self._lock:
+                self.sessions.pop(session.id, None)
+            self.store.discard(session.buffer)
+            return 204, None, None
+        return 405, _error("invalidRequest", "Method not allowed"), None
+
+    def _put_chunk(self, session, content_range, read_body):
+        match = _CONTENT_RANGE.match(content_range or "")
+        if not match:
+            read_body(None)
+            return 400, _error("invalidRequest", "Missing or invalid Content-Range"), None
+        start, end = int(match.group(1)), int(match.group(2))
+        total = None if match.group(3) == "*" else int(match.group(3))  # "*": length not known yet
+
+        with session.lock:
+            if start != session.received or end < start or (total is not None and end >= total):
+                read_body(None)
+                return 416, _error("invalidRange", f"Expected range starting at {session.received}"), None
+            data = read_body(end - start + 1)
+            if data is None or len(data) != end - start + 1:
+                return 400, _error("invalidRequest", "Body length does not match Content-Range"), None
+            session.total = total
+            session.sha256.update(data)
+            session.quickxor.update(data)
+            if session.buffer is not None:
+                session.buffer.write(data)
+            session.received = end + 1
+            self._count("bytes_received", len(data))
+
+            if total is None or session.received < total:
+                return 202, self._session_status(session), None
+
+            with self._lock:
+                self.sessions.pop(session.id, None)
+            item, created = self.store.commit(session.path, session.buffer, session.received,
+                                              _hashes(session.sha256, session.quickxor))
+        return (201 if created else 200), item, None
+
+    def _simple_upload(self, path, headers, read_body):
+        length = _content_length(headers)
+        if length > SIMPLE_UPLOAD_LIMIT:
+            read_body(None)
+            return 413, _error("requestTooLarge", "Use an upload session for files over 250 MB"), None
+        data = read_body(length) or b""
+        self._count("bytes_received", len(data))
+        item, created = self.store.write(path, data)
+        return (201 if created else 200), item, None
+
+    def _download(self, path, headers):
+        content = self.store.read(path)
+        if content is None:
+            return 404, _error("itemNotFound", "Item not found"), None
+        byte_range = re.match(r"^bytes=(\d+)-(\d*)$", headers.get("Range") or "")
+        if not byte_range:
+            return 200, content, {"Content-Type": "application/octet-stream"}
+        start = int(byte_range.group(1))
+        end = int(byte_range.group(2)) if byte_range.group(2) else len(content) - 1
+        if start >= len(content):
+            return 416, _error("invalidRange", "Range not satisfiable"), {"Content-Range": f"bytes */{len(content)}"}
+        end = min(end, len(content) - 1)
+        return 206, content[start:end + 1], {
+            "Content-Type": "application/octet-stream",
+            "Content-Range": f"bytes {start}-{end}/{len(content)}",
+        }
+
+    def _children(self, path):
+        children = self.store.children(path)
+        if children is None:
+            return 404, _error("itemNotFound", "Folder not found"), None
+        return 200, {"value": children}, None
+
+    def _delta(self, query, parts):
+        try:
+            token = int(query.get("token", ["0"])[0])
+        except ValueError:
+            return 400, _error("invalidRequest", "Invalid delta token"), None
+        items, next_token, more = self.store.delta(token, self.delta_page_size)
+        link = f"{self.origin}{parts.path}?token={next_token}"
+        body = {"value": items}
+        body["@odata.nextLink" if more else "@odata.deltaLink"] = link
+        return 200, body, None
+
+    def _batch(self, raw):
+        try:
+            requests = json.loads(raw or b"{}").get("requests", [])
+        except ValueError:
+            return 400, _error("invalidRequest", "Batch body is not JSON"), None
+        if len(requests) > MAX_BATCH_REQUESTS:
+            return 400, _error("invalidRequest", f"At most {MAX_BATCH_REQUESTS} requests per batch"), None
+
+        responses = []
+        for request in requests:
+            body = request.get("body")
+            payload = json.dumps(body).encode("utf-8") if body is not None else b""
+            url = request.get("url", "")
+            target = url if url.startswith("/v1.0") else "/v1.0" + ("" if url.startswith("/") else "/") + url
+            status, response_body, response_headers = self.dispatch(
+                request.get("method", "GET").upper(), target,
+                {**(request.get("headers") or {}), "Content-Length": str(len(payload))},
+                lambda n, payload=payload: payload if n is not None else None,
+            )
+            if isinstance(response_body, bytes):
+                response_body = response_body.decode("utf-8", "replace")
+            responses.append({"id": request.get("id"), "status": status,
+                              "headers": response_headers or {}, "body": response_body})
+        return 200, {"responses": responses}, None
+
+    def _make_handler(self):
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(200, None)
+
+            def do_POST(self):
+                self._handle()
+
+            def do_PUT(self):
+                self._handle()
+
+            def do_GET(self):
+                self._handle()
+
+            def do_DELETE(self):
+                self._handle()
+
+            def _handle(self):
+                emulator._count("requests")
+                if emulator.latency:
+                    time.sleep(emulator.latency)
+
+                self._body_read = False
+                fault = emulator.faults.decide(self.command, self.path) if emulator.faults else None
+                if fault and self._inject(*fault):
+                    return
+
+                status, body, headers = emulator.dispatch(self.command, self.path, self.headers, self._read_body)
+                self._read_body(None)
+                self._respond(status, body, headers)
+
+            def _inject(self, kind, status):
+                """Applies a fault; returns False if the request should still be served."""
+                if kind == "expire":
+                    match = _UPLOAD.match(urlsplit(self.path).path)
+                    if match:
+                        emulator.expire_session(match.group("session_id"))
+                    return False
+                self._read_body(None)
+                if kind == "throttle":
+                    emulator._count("throttled")
+                    self._respond(429, _error("activityLimitReached", "Throttled"),
+                                  {"Retry-After": f"{emulator.faults.retry_after:g}"})
+                elif kind == "drop":
+                    emulator._count("dropped")
+                    self.close_connection = True
+                else:
+                    emulator._count("errors")
+                    self._respond(status, _error("serviceNotAvailable", "Injected error"))
+                return True
+
+            def _read_body(self, expected):
+                """Reads the request body once, pacing it to the bandwidth cap; None discards it."""
+                if self._body_read:
+                    return None
+                self._body_read = True
+                length = _content_length(self.headers)
+                chunks = []
+                remaining = length
+                started = time.monotonic()
+                received = 0
+                while remaining > 0:
+                    block = self.rfile.read(min(READ_BLOCK, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    received += len(block)
+                    if expected is not None:
+                        chunks.append(block)
+                    if emulator.bandwidth:
+                        ahead = received / emulator.bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                return b"".join(chunks) if expected is not None else None
+
+            def _respond(self, status, body, headers=None):
+                if isinstance(body, bytes):
+                    payload = body
+                else:
+                    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status)
+                if body is not None and not isinstance(body, bytes):
+                    self.send_header("Content-Type", "application/json")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if payload and self.command != "HEAD":
+                    self.wfile.write(payload)
+
+        return Handler
+
+
+def _content_length(headers):
+    try:
+        return int(headers.get("Content-Length") or 0)
+    except ValueError:
+        return 0
+
+
+def _folder_item(path, name):
+    return {
+        "id": uuid.uuid4().hex,
+        "name": name,
+        "folder": {},
+        "parentReference": {"path": "/drive/root:/" + path.rpartition("/")[0]} if path else {},
+    }
+
+
+def _format_time(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+
+def _error(code, message):
+    return {"error": {"code": code, "message": message}}
+
+
+def _hashes(sha256, quickxor):
+    return {"sha256Hash": sha256.hexdigest().upper(), "quickXorHash": quickxor.b64digest()}
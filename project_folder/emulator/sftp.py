@@ -0,0 +1,237 @@
+import os
+import socket
+import threading
+import time
+
+import paramiko
+
+
+class _Authenticator(paramiko.ServerInterface):
+    """Accepts a single username/password and SFTP session channels."""
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if username == self.username and password == self.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class _Handle(paramiko.SFTPHandle):
+    def __init__(self, flags, latency):
+        super().__init__(flags)
+        self.latency = latency
+
+    def read(self, offset, length):
+        if self.latency:
+            time.sleep(self.latency)
+        return super().read(offset, length)
+
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _LocalFolder(paramiko.SFTPServerInterface):
+    """Serves a local directory; remote paths are resolved below ``root``."""
+
+    def __init__(self, server, root, latency=0.0, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = os.path.realpath(root)
+        self.latency = latency
+
+    def _local(self, path):
+        local = os.path.realpath(os.path.join(self.root, self.canonicalize(path).lstrip("/")))
+        if local != self.root and not local.startswith(self.root + os.sep):
+            raise PermissionError(path)
+        return local
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def canonicalize(self, path):
+        return os.path.normpath("/" + path).replace(os.sep, "/")
+
+    def list_folder(self, path):
+        self._delay()
+        try:
+            local = self._local(path)
+            entries = []
+            for name in os.listdir(local):
+                attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local, name)))
+                attr.filename = name
+                entries.append(attr)
+            return entries
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        self._delay()
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        self._delay()
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        self._delay()
+        try:
+            local = self._local(path)
+            fd = os.open(local, flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        try:
+            f = os.fdopen(fd, mode)
+        except OSError as e:
+            os.close(fd)
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+        handle = _Handle(flags, self.latency)
+        handle.filename = local
+        handle.readfile = f
+        handle.writefile = f
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.rename(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class SFTPEmulator:
+    """
+    Local SFTP server built on paramiko's server mode.
+
+    Serves ``root`` to clients that log in with the configured username and
+    password, so ``RemoteFetcher`` can be exercised end to end without a real
+    SSH host. ``latency`` adds a delay to every listing, stat, open and read,
+    emulating a distant server.
+    """
+
+    def __init__(self, root, host="127.0.0.1", port=0, username="emulator",
+                 password="emulator", latency=0.0, host_key=None):
+        """
+        Args:
+            root (str): Local directory served as "/"
+            host (str): Interface to bind
+            port (int): Port to listen on; 0 picks a free port
+            username (str): Accepted username
+            password (str): Accepted password
+            latency (float): Seconds added to every SFTP request
+            host_key (paramiko.PKey): Server key; a new RSA key is generated if omitted
+        """
+        self.root = str(root)
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(16)
+        self._sock.settimeout(0.5)  # Lets the accept loop notice stop()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._transports = []
+
+    @property
+    def host(self):
+        return self._sock.getsockname()[0]
+
+    @property
+    def port(self):
+        return self._sock.getsockname()[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept_loop, name="sftp-emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        for transport in list(self._transports):
+            transport.close()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            client.settimeout(None)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        transport = paramiko.Transport(client)
+        self._transports.append(transport)
+        try:
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _LocalFolder, self.root, self.latency)
+            transport.start_server(server=_Authenticator(self.username, self.password))
+            # Keep a reference: a collected channel is closed
+            channel = transport.accept(30)
+            while channel is not None and transport.is_active() and not self._stopping.is_set():
+                time.sleep(0.1)
+        except (paramiko.SSHException, EOFError, OSError):
+            pass
+        finally:
+            transport.close()
+            self._transports.remove(transport)
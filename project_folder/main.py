@@ -1,17 +1,35 @@
 import argparse
+import atexit
+import json
+import shutil
 import zipfile
 import tempfile
 from pathlib import Path
 import sys
 import os
 import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from core.ssh_copy import RemoteFetcher, SSHConnectionError
-from core.progress import ProgressTracker
-from core.uploader import SharePointUploader
-from core.auth import get_access_token
+from core.progress import HeadlessProgressTracker, ProgressTracker
+from core.uploader import SharePointUploader, load_uploader_config
+from core.auth import TokenProvider, get_access_token
 from core.utils import load_config
+from core.journal import TransferJournal
+from core.watch import FolderWatcher, WatchCursor, default_cursor_path
+from core.bandwidth import BandwidthLimiter
+from core.archive import create_volumes, parse_size, sanitize_arcname
+from core.filters import PathFilter, iter_files
+from core.sharding import SHARD_MODES, FileSelector, merge_manifests, parse_shard
+from core.downloader import SharePointDownloader
+from core.relay import relay_remote_file
+from core.dedup import ChunkIndex, create_snapshot, default_index_path, restore_snapshot
+from core.daemon import (DEFAULT_QUEUE_PATH, DEFAULT_SOCKET_PATH, DaemonClient, DaemonError,
+                         JobQueue, TransferDaemon, submit_to_spool)
+from core import metrics, tracing
 
 # Initialize logger at module level
 if not os.path.exists('logs'):
@@ -29,7 +47,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def compress_directory(source_dir: Path, output_path: Path = None, compression_level: int = 6) -> Path:
+@tracing.traced("compress.directory")
+def compress_directory(source_dir: Path, output_path: Path = None, compression_level: int = 6,
+                       sink=None, path_filter: PathFilter = None) -> Path:
     """
     Compress a directory into a ZIP file.
     
@@ -37,35 +57,43 @@ def compress_directory(source_dir: Path, output_path: Path = None, compression_l
         source_dir: Directory to compress
         output_path: Output ZIP file path (optional)
         compression_level: Compression level 0-9 (0=no compression, 9=maximum)
+        sink: Writable, non-seekable stream to write the archive to instead of a
+            file, e.g. ``SharePointUploader.open_stream`` (optional)
+        path_filter: Include/exclude rules; excluded directories are not walked (optional)
     
     Returns:
-        Path to the created ZIP file
+        Path to the created ZIP file, or None when writing to ``sink``
     """
-    if output_path is None:
+    if sink is not None:
+        output_path = None
+    elif output_path is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = source_dir.parent / f"{source_dir.name}_{timestamp}.zip"
     
-    logger.info(f"🗜️  Compressing {source_dir} to {output_path}...")
+    logger.info(f"🗜️  Compressing {source_dir} to {output_path or 'upload stream'}...")
     
     # Count total files first for ETA
-    total_files = sum(1 for _ in source_dir.rglob('*') if _.is_file())
+    files = list(iter_files(source_dir, path_filter))
+    total_files = len(files)
     logger.info(f"📁 Found {total_files} files to compress")
     
     start_time = datetime.now()
+    stage_started = time.monotonic()
     
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compression_level) as zipf:
+    with zipfile.ZipFile(sink or output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compression_level) as zipf:
         processed_files = 0
         
-        for file_path in source_dir.rglob('*'):
+        for file_path in files:
             if file_path.is_file():
                 try:
                     # Calculate relative path for the archive
                     arcname = file_path.relative_to(source_dir)
                     
                     # Sanitize archive name for Windows compatibility
-                    sanitized_arcname = str(arcname).replace('|', '_').replace('<', '_').replace('>', '_').replace(':', '_').replace('*', '_').replace('?', '_').replace('"', '_')
+                    sanitized_arcname = sanitize_arcname(arcname)
                     
-                    zipf.write(file_path, sanitized_arcname)
+                    with tracing.span("compress.file", file=sanitized_arcname):
+                        zipf.write(file_path, sanitized_arcname)
                     processed_files += 1
                     
                     # Show progress with ETA
@@ -91,10 +119,16 @@ def compress_directory(source_dir: Path, output_path: Path = None, compression_l
                     continue
     
     # Get compression statistics
-    original_size = sum(f.stat().st_size for f in source_dir.rglob('*') if f.is_file())
-    compressed_size = output_path.stat().st_size
+    original_size = sum(f.stat().st_size for f in files if f.is_file())
+    compressed_size = sink.tell() if sink is not None else output_path.stat().st_size
     compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
     
+    metrics.STAGE_DURATION.labels("compress").observe(time.monotonic() - stage_started)
+    metrics.COMPRESSION_BYTES.labels("input").inc(original_size)
+    metrics.COMPRESSION_BYTES.labels("output").inc(compressed_size)
+    if original_size > 0:
+        metrics.COMPRESSION_RATIO.set(compressed_size / original_size)
+    
     logger.info(f"✅ Compression complete!")
     logger.info(f"   📁 Original size: {original_size:,} bytes ({original_size/1024/1024:.2f} MB)")
     logger.info(f"   📦 Compressed size: {compressed_size:,} bytes ({compressed_size/1024/1024:.2f} MB)")
@@ -103,7 +137,9 @@ def compress_directory(source_dir: Path, output_path: Path = None, compression_l
     return output_path
 
 
-def upload_to_sharepoint(file_path: Path, folder_path: str = "", config_path: str = "config.json") -> bool:
+def upload_to_sharepoint(file_path: Path, folder_path: str = "", config_path: str = "config.json",
+                         checkpoint_interval: float = None, checkpoint_bytes: int = None,
+                         bandwidth: BandwidthLimiter = None, progress_tracker=None) -> bool:
     """
     Upload a file to SharePoint using the new authentication and upload system.
     
@@ -111,10 +147,18 @@ def upload_to_sharepoint(file_path: Path, folder_path: str = "", config_path: st
         file_path: Path to file to upload
         folder_path: Optional folder path in SharePoint
         config_path: Path to configuration file
+        checkpoint_interval: Seconds between resume-state checkpoints (optional)
+        checkpoint_bytes: Bytes of progress between resume-state checkpoints (optional)
+        bandwidth: Bandwidth limiter applied to chunk uploads (optional)
+        progress_tracker: Tracker that receives the upload stage and file progress (optional)
     
     Returns:
         True if upload successful, False otherwise
     """
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "running")
+    stage_started = time.monotonic()
+    
     try:
         logger.info(f"🚀 Starting SharePoint upload for {file_path.name}...")
         
@@ -125,7 +169,13 @@ def upload_to_sharepoint(file_path: Path, folder_path: str = "", config_path: st
         
         # Initialize uploader with new system
         logger.info("📤 Initializing SharePoint uploader...")
-        uploader = SharePointUploader(access_token, config_path)
+        uploader = SharePointUploader(
+            access_token, config_path,
+            checkpoint_interval=checkpoint_interval,
+            checkpoint_bytes=checkpoint_bytes,
+            bandwidth=bandwidth,
+            progress_tracker=progress_tracker
+        )
         logger.info("✅ Uploader initialized!")
         
         # Upload the file
@@ -134,17 +184,557 @@ def upload_to_sharepoint(file_path: Path, folder_path: str = "", config_path: st
         
         result = uploader.upload_file(str(file_path), folder_path)
         
+        metrics.STAGE_DURATION.labels("upload").observe(time.monotonic() - stage_started)
+        if progress_tracker:
+            progress_tracker.set_stage("upload", "done")
+        
         logger.info("🎉 Upload completed successfully!")
         logger.info(f"📋 File details:")
         logger.info(f"   - Name: {result.get('name', 'Unknown')}")
         logger.info(f"   - ID: {result.get('id', 'Unknown')}")
         logger.info(f"   - Size: {result.get('size', 'Unknown')} bytes")
         
+        upload_stats = uploader.stats()
+        logger.info(f"   - Throughput: {upload_stats['throughput_bps']/1024/1024:.2f} MB/s over "
+                    f"{upload_stats['chunks']} chunks (p50 {upload_stats['chunk_latency_p50']:.2f}s, "
+                    f"p95 {upload_stats['chunk_latency_p95']:.2f}s)")
+        logger.info(f"   - Time: {upload_stats['network_seconds']:.1f}s network, "
+                    f"{upload_stats['read_seconds']:.1f}s reading, "
+                    f"{upload_stats['wait_seconds']:.1f}s bandwidth cap; "
+                    f"{upload_stats['retries']} retries, {upload_stats['throttled']} throttled")
+        
+        transport_stats = uploader.transport.stats()
+        if transport_stats["requests"] is not None:
+            logger.info(f"   - Connections: {transport_stats['connections_opened']} opened, "
+                        f"{transport_stats['connections_reused']} reused")
+        
         return True
             
     except Exception as e:
         logger.error(f"❌ SharePoint upload error: {e}")
+        if progress_tracker:
+            progress_tracker.set_stage("upload", "failed")
+        return False
+
+
+def stream_to_sharepoint(source_dir: Path, folder_path: str = "", config_path: str = "config.json",
+                         compression_level: int = 6, bandwidth: BandwidthLimiter = None,
+                         progress_tracker=None, path_filter: PathFilter = None) -> bool:
+    """
+    Compress a directory straight into an upload session, without a local ZIP file.
+    
+    Compression and upload run concurrently and only a few chunks are held in
+    memory. The stream cannot be resumed: an interrupted upload starts over.
+    
+    Args:
+        source_dir: Directory to compress and upload
+        folder_path: Optional folder path in SharePoint
+        config_path: Path to configuration file
+        compression_level: Compression level 0-9
+        bandwidth: Bandwidth limiter applied to chunk uploads (optional)
+        progress_tracker: Tracker that receives stages and upload progress (optional)
+        path_filter: Include/exclude rules for the archived files (optional)
+    
+    Returns:
+        True if the upload completed, False otherwise
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = f"{source_dir.name}_{timestamp}.zip"
+    if progress_tracker:
+        progress_tracker.set_stage("compress", "running")
+        progress_tracker.set_stage("upload", "running")
+    stage_started = time.monotonic()
+    
+    try:
+        uploader = SharePointUploader(
+            get_access_token(), config_path,
+            bandwidth=bandwidth,
+            progress_tracker=progress_tracker
+        )
+        with uploader.open_stream(name, folder_path) as sink:
+            compress_directory(source_dir, compression_level=compression_level, sink=sink,
+                               path_filter=path_filter)
+            if progress_tracker:
+                progress_tracker.set_stage("compress", "done")
+    except Exception as e:
+        logger.error(f"❌ SharePoint upload error: {e}")
+        if progress_tracker:
+            progress_tracker.set_stage("upload", "failed")
         return False
+    
+    metrics.STAGE_DURATION.labels("upload").observe(time.monotonic() - stage_started)
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "done")
+    upload_stats = uploader.stats()
+    logger.info(f"🎉 Streamed {name} to SharePoint ({upload_stats['bytes_sent'] / 1024 / 1024:.1f} MB, "
+                f"{upload_stats['throughput_bps'] / 1024 / 1024:.2f} MB/s)")
+    return True
+
+
+def relay_to_sharepoint(fetcher: RemoteFetcher, remote_path: str, folder_path: str = "",
+                        config_path: str = "config.json", checkpoint_interval: float = None,
+                        checkpoint_bytes: int = None, bandwidth: BandwidthLimiter = None,
+                        progress_tracker=None, buffers: int = 4) -> bool:
+    """
+    Relay a single remote file into SharePoint without a local copy.
+    
+    SFTP reads of later chunks overlap the upload of earlier ones through a
+    small in-memory ring buffer. Progress is journaled, so running the same
+    command again resumes both the SFTP read and the upload session.
+    
+    Args:
+        fetcher: Connected RemoteFetcher
+        remote_path: Path of the file on the SSH host
+        folder_path: Optional folder path in SharePoint
+        config_path: Path to configuration file
+        checkpoint_interval: Seconds between resume-state checkpoints (optional)
+        checkpoint_bytes: Bytes of progress between resume-state checkpoints (optional)
+        bandwidth: Bandwidth limiter applied to chunk uploads (optional)
+        progress_tracker: Tracker that receives stages and upload progress (optional)
+        buffers: Chunks held in memory
+    
+    Returns:
+        True if the upload completed, False otherwise
+    """
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "running")
+    stage_started = time.monotonic()
+    try:
+        uploader = SharePointUploader(
+            get_access_token(), config_path,
+            checkpoint_interval=checkpoint_interval,
+            checkpoint_bytes=checkpoint_bytes,
+            bandwidth=bandwidth,
+            progress_tracker=progress_tracker
+        )
+        logger.info(f"🔀 Relaying {remote_path} to SharePoint...")
+        relay_remote_file(fetcher, uploader, remote_path, folder_path, slots=buffers)
+    except Exception as e:
+        logger.error(f"❌ Relay error: {e}")
+        if progress_tracker:
+            progress_tracker.set_stage("upload", "failed")
+        return False
+    
+    metrics.STAGE_DURATION.labels("upload").observe(time.monotonic() - stage_started)
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "done")
+    upload_stats = uploader.stats()
+    logger.info(f"🎉 Relayed {os.path.basename(remote_path)} "
+                f"({upload_stats['bytes_sent'] / 1024 / 1024:.1f} MB, "
+                f"{upload_stats['throughput_bps'] / 1024 / 1024:.2f} MB/s)")
+    return True
+
+
+def upload_volumes(source_dir: Path, folder_path: str = "", config_path: str = "config.json",
+                   volume_size: int = None, compression_level: int = 6,
+                   checkpoint_interval: float = None, checkpoint_bytes: int = None,
+                   bandwidth: BandwidthLimiter = None, progress_tracker=None, workers: int = 4,
+                   path_filter: PathFilter = None) -> bool:
+    """
+    Archive a directory into fixed-size volumes and upload each one as soon as it is sealed.
+    
+    Compression of later volumes overlaps with the upload of earlier ones, and up
+    to ``workers`` volumes upload in parallel sessions. The manifest describing how
+    to reassemble the files is uploaded last. Volumes are deleted once uploaded.
+    
+    Args:
+        source_dir: Directory to archive
+        folder_path: Optional folder path in SharePoint
+        config_path: Path to configuration file
+        volume_size: Upper bound for each volume in bytes
+        compression_level: Compression level 0-9
+        checkpoint_interval: Seconds between resume-state checkpoints (optional)
+        checkpoint_bytes: Bytes of progress between resume-state checkpoints (optional)
+        bandwidth: Bandwidth limiter applied to chunk uploads (optional)
+        progress_tracker: Tracker that receives stages and per-volume progress (optional)
+        workers: Volumes uploaded at the same time
+        path_filter: Include/exclude rules for the archived files (optional)
+    
+    Returns:
+        True if every volume and the manifest were uploaded, False otherwise
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_name = f"{source_dir.name}_{timestamp}"
+    volume_dir = Path(tempfile.mkdtemp(prefix="sharepoint_volumes_", dir=source_dir.parent))
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "running")
+    stage_started = time.monotonic()
+    
+    try:
+        uploader = SharePointUploader(
+            get_access_token(), config_path,
+            checkpoint_interval=checkpoint_interval,
+            checkpoint_bytes=checkpoint_bytes,
+            bandwidth=bandwidth,
+            progress_tracker=progress_tracker
+        )
+    except Exception as e:
+        logger.error(f"❌ SharePoint upload error: {e}")
+        shutil.rmtree(volume_dir, ignore_errors=True)
+        return False
+    
+    # Sealed volumes waiting for or in upload; archiving pauses when all slots are taken,
+    # so at most ``workers`` sealed volumes plus the one being written are on disk
+    pending_volumes = threading.BoundedSemaphore(workers)
+    
+    def upload_volume(path):
+        try:
+            uploader.upload_file(str(path), folder_path)
+            path.unlink()
+            logger.info(f"   ☁️  Uploaded {path.name}")
+        finally:
+            pending_volumes.release()
+    
+    def on_sealed(path, index):
+        pending_volumes.acquire()
+        futures.append(executor.submit(upload_volume, path))
+    
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="volume-upload") as executor:
+        try:
+            logger.info(f"🗜️  Archiving {source_dir} into {volume_size / 1024 / 1024:.0f} MB volumes...")
+            if progress_tracker:
+                progress_tracker.set_stage("compress", "running")
+            manifest = create_volumes(
+                source_dir, volume_dir, volume_size, base_name, compression_level,
+                on_sealed=on_sealed,
+                path_filter=path_filter
+            )
+            if progress_tracker:
+                progress_tracker.set_stage("compress", "done")
+        except Exception as e:
+            logger.error(f"❌ Archiving failed: {e}")
+            if progress_tracker:
+                progress_tracker.set_stage("compress", "failed")
+            manifest = None
+    
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    try:
+        if manifest is None or errors:
+            for error in errors:
+                logger.error(f"❌ Volume upload error: {error}")
+            raise RuntimeError("Not all volumes were uploaded")
+        uploader.upload_file(str(manifest), folder_path)
+    except Exception as e:
+        logger.error(f"❌ SharePoint upload error: {e}")
+        if progress_tracker:
+            progress_tracker.set_stage("upload", "failed")
+        return False
+    finally:
+        shutil.rmtree(volume_dir, ignore_errors=True)
+    
+    metrics.STAGE_DURATION.labels("upload").observe(time.monotonic() - stage_started)
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "done")
+    upload_stats = uploader.stats()
+    logger.info(f"🎉 Uploaded {len(futures)} volumes and {manifest.name} "
+                f"({upload_stats['bytes_sent'] / 1024 / 1024:.1f} MB, "
+                f"{upload_stats['throughput_bps'] / 1024 / 1024:.2f} MB/s)")
+    return True
+
+
+def upload_dedup(source_dir: Path, folder_path: str = "", config_path: str = "config.json",
+                 index_path: str = None, compression_level: int = 6,
+                 checkpoint_interval: float = None, checkpoint_bytes: int = None,
+                 bandwidth: BandwidthLimiter = None, progress_tracker=None, workers: int = 4,
+                 path_filter: PathFilter = None) -> bool:
+    """
+    Upload a directory as a deduplicated snapshot.
+    
+    Files are split into content-defined chunks; only chunks that earlier
+    snapshots to the same folder did not already store are packed and uploaded
+    to ``<folder>/packs``. A manifest listing every file's chunks goes to
+    ``<folder>/manifests`` once all packs are uploaded.
+    
+    Args:
+        source_dir: Directory to snapshot
+        folder_path: SharePoint folder holding the packs and manifests
+        config_path: Path to configuration file
+        index_path: Local chunk index; defaults to one per destination folder
+        compression_level: zlib level for chunk data
+        checkpoint_interval: Seconds between resume-state checkpoints (optional)
+        checkpoint_bytes: Bytes of progress between resume-state checkpoints (optional)
+        bandwidth: Bandwidth limiter applied to chunk uploads (optional)
+        progress_tracker: Tracker that receives stages and per-pack progress (optional)
+        workers: Packs uploaded at the same time
+        path_filter: Include/exclude rules for the snapshot's files (optional)
+    
+    Returns:
+        True if every pack and the manifest were uploaded, False otherwise
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    work_dir = Path(tempfile.mkdtemp(prefix="sharepoint_dedup_", dir=source_dir.parent))
+    packs_folder = "/".join(filter(None, [folder_path.strip("/"), "packs"]))
+    manifests_folder = "/".join(filter(None, [folder_path.strip("/"), "manifests"]))
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "running")
+    stage_started = time.monotonic()
+    
+    index = None
+    try:
+        uploader = SharePointUploader(
+            get_access_token(), config_path,
+            checkpoint_interval=checkpoint_interval,
+            checkpoint_bytes=checkpoint_bytes,
+            bandwidth=bandwidth,
+            progress_tracker=progress_tracker
+        )
+        index = ChunkIndex(index_path or default_index_path(uploader.config, folder_path))
+        
+        logger.info(f"🧩 Chunking {source_dir} for deduplicated upload...")
+        if progress_tracker:
+            progress_tracker.set_stage("compress", "running")
+        snapshot = create_snapshot(
+            source_dir, index, work_dir,
+            upload_pack=lambda path: uploader.upload_file(str(path), packs_folder),
+            manifest_name=f"{source_dir.name}_{timestamp}.manifest.json",
+            compression_level=compression_level, workers=workers, path_filter=path_filter
+        )
+        if progress_tracker:
+            progress_tracker.set_stage("compress", "done")
+        uploader.upload_file(str(snapshot.manifest_path), manifests_folder)
+    except Exception as e:
+        logger.error(f"❌ SharePoint upload error: {e}")
+        if progress_tracker:
+            progress_tracker.set_stage("upload", "failed")
+        return False
+    finally:
+        if index is not None:
+            index.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    metrics.STAGE_DURATION.labels("upload").observe(time.monotonic() - stage_started)
+    if progress_tracker:
+        progress_tracker.set_stage("upload", "done")
+    stats = snapshot.stats
+    ratio = stats["bytes_scanned"] / stats["bytes_stored"] if stats["bytes_stored"] else float("inf")
+    logger.info(f"🎉 Snapshot {snapshot.manifest_path.name}: {stats['files']} files "
+                f"({stats['files_unchanged']} unchanged), {stats['chunks_new']}/{stats['chunks']} new chunks, "
+                f"{stats['bytes_stored'] / 1024 / 1024:.1f} MB stored in {stats['packs']} packs "
+                f"(dedup ratio {ratio:.1f}x over changed files)")
+    return True
+
+
+def download_from_sharepoint(remote_path: str, dest_path: Path, config_path: str = "config.json",
+                             extract_to: Path = None, workers: int = 4,
+                             bandwidth: BandwidthLimiter = None, progress_tracker=None) -> bool:
+    """
+    Download a file from SharePoint with parallel range requests.
+    
+    Args:
+        remote_path: Path of the file in the drive
+        dest_path: Local file or directory to download into
+        config_path: Path to configuration file
+        extract_to: Extract a ZIP into this directory while it downloads (optional)
+        workers: Ranges fetched in parallel
+        bandwidth: Bandwidth limiter applied to received bytes (optional)
+        progress_tracker: Tracker that receives download progress (optional)
+    
+    Returns:
+        True if the download completed and verified, False otherwise
+    """
+    if progress_tracker:
+        progress_tracker.set_stage("download", "running")
+    stage_started = time.monotonic()
+    try:
+        downloader = SharePointDownloader(
+            get_access_token(), config_path,
+            bandwidth=bandwidth,
+            progress_tracker=progress_tracker,
+            workers=workers
+        )
+        logger.info(f"📥 Downloading {remote_path} to {dest_path}...")
+        result = downloader.download_file(remote_path, dest_path, extract_to=extract_to)
+    except Exception as e:
+        logger.error(f"❌ SharePoint download error: {e}")
+        if progress_tracker:
+            progress_tracker.set_stage("download", "failed")
+        return False
+    
+    elapsed = time.monotonic() - stage_started
+    metrics.STAGE_DURATION.labels("download").observe(elapsed)
+    if progress_tracker:
+        progress_tracker.set_stage("download", "done")
+    logger.info(f"✅ Downloaded {result} ({downloader.bytes_received / 1024 / 1024:.1f} MB received, "
+                f"{downloader.bytes_received / max(elapsed, 1e-6) / 1024 / 1024:.2f} MB/s)")
+    if extract_to:
+        logger.info(f"📂 Extracted into {extract_to}")
+    return True
+
+
+def export_trace(tracer: tracing.Tracer, trace_file: str = None, print_summary: bool = False):
+    """
+    Writes the collected trace at the end of a run.
+    
+    Args:
+        tracer: Tracer returned by ``tracing.enable``
+        trace_file: Path for a Chrome trace-event JSON file (optional)
+        print_summary: Log a flame-style summary of where time was spent
+    """
+    if trace_file:
+        try:
+            tracer.write_chrome_trace(trace_file)
+            logger.info(f"🧭 Trace written to {trace_file} (open in chrome://tracing or Perfetto)")
+        except OSError as e:
+            logger.warning(f"⚠️  Could not write trace file: {e}")
+    if print_summary:
+        logger.info("🧭 Time by call path:\n" + tracer.flame_summary())
+
+
+def create_progress_tracker(mode: str = "rich", output: str = None, interval: float = None):
+    """
+    Returns the progress tracker for the selected ``--progress`` mode.
+    
+    Args:
+        mode: "rich" for the live terminal display, "json" for NDJSON events
+        output: Path, "fd:N" or "-" (stdout) for JSON events
+        interval: Seconds between JSON progress events
+    """
+    if mode == "json":
+        return HeadlessProgressTracker(output=output, interval=interval)
+    return ProgressTracker()
+
+
+def watch_folder(watch_dir: Path, folder_path: str = "", config_path: str = "config.json",
+                 state_path: str = None, stable_seconds: float = 2.0, poll_interval: float = 5.0,
+                 bandwidth: BandwidthLimiter = None):
+    """
+    Uploads new and modified files under ``watch_dir`` until interrupted.
+    
+    Args:
+        watch_dir: Directory to watch
+        folder_path: SharePoint folder mirroring ``watch_dir``
+        config_path: Path to configuration file
+        state_path: Cursor database; defaults to one per watched directory
+        stable_seconds: Quiet period before a changed file is uploaded
+        poll_interval: Seconds between rescans when inotify is unavailable
+        bandwidth: Bandwidth limiter applied to chunk uploads (optional)
+    """
+    token_provider = TokenProvider()
+    journal = TransferJournal(load_uploader_config(config_path).get("JOURNAL_PATH"))
+    
+    def upload(path, folder):
+        uploader = SharePointUploader(token_provider.get_token(), config_path,
+                                      journal=journal, bandwidth=bandwidth)
+        uploader.upload_file(str(path), folder)
+    
+    cursor = WatchCursor(state_path or default_cursor_path(watch_dir))
+    watcher = FolderWatcher(watch_dir, upload, cursor, folder=folder_path,
+                            stable_seconds=stable_seconds, poll_interval=poll_interval)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopping watch...")
+    finally:
+        watcher.stop()
+        cursor.close()
+        journal.close()
+    logger.info(f"👀 Watch ended: {watcher.uploaded} uploaded, {watcher.failed} failed")
+
+
+def job_from_args(args):
+    """
+    Builds a daemon job description from the transfer arguments.
+    
+    Returns:
+        (kind, params), or None if the arguments describe no transfer
+    """
+    if args.path or args.upload_only:
+        return "upload", {
+            "path": os.path.abspath(args.path or args.upload_only),
+            "folder": args.sharepoint_folder,
+            "compression_level": args.compression_level,
+        }
+    if args.use_ssh:
+        return "ssh", {
+            "remote_path": args.remote_path,
+            "ssh_host": args.ssh_host,
+            "ssh_port": args.ssh_port,
+            "ssh_user": args.ssh_user,
+            "ssh_pass": args.ssh_pass,
+            "ssh_key": os.path.abspath(args.ssh_key) if args.ssh_key else None,
+            "folder": args.sharepoint_folder,
+            "compression_level": args.compression_level,
+        }
+    return None
+
+
+# Transfer options the daemon does not apply to queued jobs; --submit refuses them
+# rather than queueing a job that behaves differently from a direct run
+SUBMIT_UNSUPPORTED_OPTIONS = (
+    "--local-path", "--direct-io", "--include", "--exclude", "--exclude-from", "--exclude-common",
+    "--newer-than", "--larger-than", "--shard", "--shard-mode", "--relay", "--relay-buffers",
+    "--keep-original", "--checkpoint-interval", "--checkpoint-bytes", "--bandwidth-limit",
+    "--bandwidth-schedule", "--bandwidth-control-file", "--stream", "--volume-size", "--dedup",
+    "--dedup-index", "--volume-workers",
+)
+
+
+def unsupported_submit_options(parser, args) -> list:
+    """Returns the options in ``SUBMIT_UNSUPPORTED_OPTIONS`` that were changed from their defaults."""
+    unsupported = []
+    for option in SUBMIT_UNSUPPORTED_OPTIONS:
+        dest = option[2:].replace("-", "_")
+        if getattr(args, dest) != parser.get_default(dest):
+            unsupported.append(option)
+    return unsupported
+
+
+def merge_shards(manifest_paths, output_path: str = None) -> int:
+    """
+    Check the shard manifests of one job and optionally write the combined manifest.
+    
+    Returns:
+        Exit code: 0 if every shard is present and complete with no overlap, 1 otherwise
+    """
+    try:
+        merged = merge_manifests(manifest_paths)
+    except ValueError as e:
+        logger.error(f"❌ Cannot merge shards: {e}")
+        return 1
+    
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=2)
+    logger.info(f"✅ {merged['shards']} shards of {merged['remote_root']}: {merged['total_files']} files, "
+                f"{merged['total_bytes'] / 1024 / 1024:.1f} MB")
+    return 0
+
+
+def submit_job(args) -> int:
+    """
+    Submits the transfer described by ``args`` to a daemon.
+    
+    Returns:
+        Exit code: 0 once queued (or, with --wait, once done), 1 otherwise
+    """
+    job = job_from_args(args)
+    if job is None:
+        logger.error("❌ Nothing to submit. Give a path, --upload-only or --use-ssh.")
+        return 1
+    kind, params = job
+    
+    if args.spool_dir and not os.path.exists(args.daemon_socket):
+        spooled = submit_to_spool(args.spool_dir, kind, params, args.priority)
+        logger.info(f"📨 Spooled {kind} job as {spooled}")
+        return 0
+    
+    client = DaemonClient(args.daemon_socket)
+    try:
+        job_id = client.submit(kind, params, args.priority)
+        logger.info(f"📨 Submitted {kind} job {job_id}")
+        if not args.wait:
+            return 0
+        result = client.wait(job_id)
+    except DaemonError as e:
+        logger.error(f"❌ {e}")
+        return 1
+    
+    if result["state"] == "done":
+        logger.info(f"🎉 Job {job_id} completed: {result['result'].get('name')}")
+        return 0
+    logger.error(f"❌ Job {job_id} {result['state']}: {result.get('error')}")
+    return 1
 
 
 def main():
@@ -164,6 +754,32 @@ def main():
     parser.add_argument("--ssh-pass", help="SSH password")
     parser.add_argument("--ssh-key", help="Path to SSH private key")
     parser.add_argument("--ssh-port", type=int, default=22, help="SSH port (default: 22)")
+    parser.add_argument("--direct-io", action="store_true",
+                       help="Write fetched files of 1 GiB or more with O_DIRECT, bypassing the page cache")
+    
+    # Filtering arguments (gitignore syntax, relative to the directory being transferred)
+    parser.add_argument("--include", action="append", metavar="PATTERN",
+                       help="Only transfer files matching PATTERN (repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="PATTERN",
+                       help="Skip files and directories matching PATTERN (repeatable)")
+    parser.add_argument("--exclude-from", action="append", metavar="FILE",
+                       help="Read exclude patterns from FILE, one per line like .gitignore (repeatable)")
+    parser.add_argument("--exclude-common", action="store_true",
+                       help="Skip VCS metadata, dependency and cache directories (.git, node_modules, ...)")
+    parser.add_argument("--newer-than", metavar="AGE",
+                       help="Only fetch remote files modified within AGE (e.g. 12h, 7d) or after a date (2026-01-31)")
+    parser.add_argument("--larger-than", metavar="SIZE",
+                       help="Only fetch remote files larger than SIZE (e.g. 10M)")
+    
+    # Sharding arguments: split one remote tree between several workers
+    parser.add_argument("--shard", metavar="K/N",
+                       help="Fetch and upload only shard K of N of the remote tree (e.g. 2/8)")
+    parser.add_argument("--shard-mode", choices=SHARD_MODES, default="hash",
+                       help="Assign files by a hash of their path, or by balanced byte totals (default: hash)")
+    parser.add_argument("--merge-shards", nargs="+", metavar="MANIFEST",
+                       help="Check that shard manifests cover a job without gaps or overlap, then exit")
+    parser.add_argument("--merge-output", metavar="FILE",
+                       help="Write the combined manifest of --merge-shards to FILE")
     
     # Compression arguments
     parser.add_argument("--compress", action="store_true", help="Compress downloaded directory before upload")
@@ -175,9 +791,158 @@ def main():
     parser.add_argument("--upload-to-sharepoint", action="store_true", help="Upload to SharePoint after processing")
     parser.add_argument("--upload-only", help="Upload existing file to SharePoint (skip SSH/compression)")
     parser.add_argument("--sharepoint-folder", help="SharePoint folder path for upload", default="")
+    parser.add_argument("--checkpoint-interval", type=float,
+                       help="Seconds between resume-state checkpoints (default: 5)")
+    parser.add_argument("--checkpoint-bytes", type=int,
+                       help="Bytes uploaded between resume-state checkpoints (default: 64 MiB)")
+    
+    # Bandwidth arguments
+    parser.add_argument("--bandwidth-limit",
+                       help="Cap transfer speed for uploads and SSH downloads, e.g. 10M or 512K (bytes/s)")
+    parser.add_argument("--bandwidth-schedule",
+                       help="Time-of-day caps, e.g. '08:00-18:00=10M,*=unlimited'")
+    parser.add_argument("--bandwidth-control-file",
+                       help="File holding a rate or schedule; re-read when it changes or on SIGHUP")
+    
+    # Progress reporting arguments
+    parser.add_argument("--progress", choices=["rich", "json"], default="rich",
+                       help="Progress output: live terminal display or newline-delimited JSON events")
+    parser.add_argument("--progress-file",
+                       help="Destination for JSON progress events: a path, fd:N, or - for stdout (default)")
+    parser.add_argument("--progress-interval", type=float, default=HeadlessProgressTracker.DEFAULT_INTERVAL,
+                       help="Seconds between JSON progress events (default: 5)")
+    
+    # Tracing arguments
+    parser.add_argument("--trace-file",
+                       help="Record spans for auth, upload, SFTP and compression to a Chrome trace JSON file")
+    parser.add_argument("--trace-summary", action="store_true",
+                       help="Log a flame-style summary of where time was spent at the end of the run")
+    
+    # Metrics arguments
+    parser.add_argument("--metrics-port", type=int,
+                       help="Serve Prometheus metrics at http://HOST:PORT/metrics while running")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                       help="Interface for the metrics endpoint; use 0.0.0.0 to expose it on every "
+                            "interface (default: 127.0.0.1)")
+    
+    # Download arguments
+    parser.add_argument("--download", metavar="REMOTE_PATH",
+                       help="Download a file from SharePoint (path within the drive) and exit")
+    parser.add_argument("--download-to", default=".",
+                       help="Local file or directory for --download (default: current directory)")
+    parser.add_argument("--extract-to",
+                       help="With --download, extract a ZIP into this directory while it downloads")
+    parser.add_argument("--download-workers", type=int, default=4,
+                       help="Range requests in flight for --download (default: 4)")
+    
+    # Streaming arguments
+    parser.add_argument("--stream", action="store_true",
+                       help="Compress directories straight into the upload, without a local ZIP file "
+                            "(not resumable)")
+    
+    # Relay arguments
+    parser.add_argument("--relay", action="store_true",
+                       help="Stream a single remote file straight into SharePoint without a local copy")
+    parser.add_argument("--relay-buffers", type=int, default=4,
+                       help="Chunks held in memory by --relay (default: 4)")
+    
+    # Volume arguments
+    parser.add_argument("--volume-size",
+                       help="Split directory archives into independent ZIP volumes of at most this size "
+                            "(e.g. 512M, 2G), uploaded while later volumes are built")
+    parser.add_argument("--volume-workers", type=int, default=4,
+                       help="Volumes or dedup packs uploaded in parallel (default: 4)")
+    
+    # Dedup arguments
+    parser.add_argument("--dedup", action="store_true",
+                       help="Upload directories as deduplicated snapshots: only chunks not stored by "
+                            "earlier runs to the same folder are uploaded")
+    parser.add_argument("--dedup-index",
+                       help="Chunk index database for --dedup (default: one per destination folder)")
+    parser.add_argument("--restore-dedup", metavar="MANIFEST",
+                       help="Restore a deduplicated snapshot from its manifest and exit")
+    parser.add_argument("--packs-dir",
+                       help="With --restore-dedup, directory holding the downloaded packs")
+    parser.add_argument("--restore-to",
+                       help="With --restore-dedup, directory to restore into")
+    
+    # Watch arguments
+    parser.add_argument("--watch", metavar="DIR",
+                       help="Upload new and modified files under DIR as they appear, until interrupted")
+    parser.add_argument("--watch-state",
+                       help="Cursor database recording uploaded files (default: one per directory under ~/.sharepoint_uploader/watch)")
+    parser.add_argument("--watch-stable", type=float, default=2.0,
+                       help="Seconds a file must stay unchanged before it is uploaded (default: 2)")
+    parser.add_argument("--watch-poll", type=float, default=5.0,
+                       help="Seconds between rescans when inotify is unavailable (default: 5)")
+    
+    # Daemon arguments
+    parser.add_argument("--daemon", action="store_true",
+                       help="Run as a daemon executing jobs submitted with --submit")
+    parser.add_argument("--submit", action="store_true",
+                       help="Queue this transfer in a running daemon instead of running it here "
+                            "(filter, shard, relay, stream, volume, dedup, checkpoint and bandwidth "
+                            "options are not supported)")
+    parser.add_argument("--daemon-socket", default=str(DEFAULT_SOCKET_PATH),
+                       help=f"Unix socket of the daemon (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--spool-dir",
+                       help="Spool directory: the daemon also takes job files from it, --submit writes to it")
+    parser.add_argument("--queue-db", default=str(DEFAULT_QUEUE_PATH),
+                       help=f"Daemon job queue database (default: {DEFAULT_QUEUE_PATH})")
+    parser.add_argument("--max-jobs", type=int, default=2,
+                       help="Jobs the daemon runs at the same time (default: 2)")
+    parser.add_argument("--priority", type=int, default=0,
+                       help="Priority of a submitted job; higher runs first (default: 0)")
+    parser.add_argument("--wait", action="store_true",
+                       help="With --submit, wait for the job and exit with its result")
     
     args = parser.parse_args()
 
+    volume_size = None
+    if args.volume_size:
+        try:
+            volume_size = parse_size(args.volume_size)
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        path_filter = PathFilter.from_options(args.include, args.exclude, args.exclude_from, args.exclude_common)
+    except OSError as e:
+        parser.error(f"cannot read exclude file: {e}")
+
+    selector = None
+    if args.shard or args.newer_than or args.larger_than:
+        try:
+            shard, shards = parse_shard(args.shard) if args.shard else (1, 1)
+            selector = FileSelector(shard, shards, args.shard_mode, newer_than=args.newer_than,
+                                    larger_than=parse_size(args.larger_than) if args.larger_than else None)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Combine the manifests of a sharded job
+    if args.merge_shards:
+        sys.exit(merge_shards(args.merge_shards, args.merge_output))
+
+    # Thin client: hand the transfer to the daemon
+    if args.submit:
+        unsupported = unsupported_submit_options(parser, args)
+        if unsupported:
+            parser.error(f"--submit does not support {', '.join(unsupported)}; run the transfer directly")
+        sys.exit(submit_job(args))
+
+    # Rebuild a deduplicated snapshot from downloaded packs
+    if args.restore_dedup:
+        if not args.restore_to:
+            parser.error("--restore-dedup requires --restore-to")
+        try:
+            count = restore_snapshot(args.restore_dedup, args.packs_dir or Path(args.restore_dedup).parent,
+                                     args.restore_to)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"❌ Restore failed: {e}")
+            sys.exit(1)
+        logger.info(f"✅ Restored {count} files to {args.restore_to}")
+        sys.exit(0)
+
     # Load configuration
     try:
         config = load_config(args.config)
@@ -186,6 +951,73 @@ def main():
         logger.error(f"❌ Error loading configuration: {e}")
         sys.exit(1)
 
+    # Set up bandwidth limiting
+    bandwidth = None
+    if args.bandwidth_limit or args.bandwidth_schedule or args.bandwidth_control_file:
+        try:
+            bandwidth = BandwidthLimiter(
+                rate=args.bandwidth_limit,
+                schedule=args.bandwidth_schedule,
+                control_file=args.bandwidth_control_file
+            )
+        except ValueError as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        bandwidth.install_signal_handler()
+        logger.info("🚦 Bandwidth limiting enabled")
+
+    # Enable tracing; the trace is exported however the run ends
+    if args.trace_file or args.trace_summary:
+        tracer = tracing.enable()
+        atexit.register(export_trace, tracer, args.trace_file, args.trace_summary)
+
+    # Start the metrics endpoint
+    if args.metrics_port is not None:
+        try:
+            metrics.start_metrics_server(args.metrics_port, args.metrics_host)
+        except OSError as e:
+            logger.error(f"❌ Could not start metrics endpoint: {e}")
+            sys.exit(1)
+
+    # Daemon mode: keep auth, connection pools and SSH sessions warm across jobs
+    if args.daemon:
+        try:
+            daemon = TransferDaemon(
+                args.config, JobQueue(args.queue_db),
+                socket_path=args.daemon_socket,
+                spool_dir=args.spool_dir,
+                max_jobs=args.max_jobs,
+                compress=compress_directory,
+                bandwidth=bandwidth
+            )
+            daemon.serve_forever()
+        except DaemonError as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    # Watch mode: incremental uploads driven by file system events
+    if args.watch:
+        watch_dir = Path(args.watch)
+        if not watch_dir.is_dir():
+            logger.error(f"❌ Not a directory: {watch_dir}")
+            sys.exit(1)
+        watch_folder(watch_dir, args.sharepoint_folder, args.config, args.watch_state,
+                     args.watch_stable, args.watch_poll, bandwidth)
+        sys.exit(0)
+
+    # Live display or JSON events, shared by every workflow
+    progress_tracker = create_progress_tracker(args.progress, args.progress_file, args.progress_interval)
+
+    # Download from SharePoint
+    if args.download:
+        progress_tracker.start()
+        success = download_from_sharepoint(args.download, Path(args.download_to), args.config,
+                                           Path(args.extract_to) if args.extract_to else None,
+                                           args.download_workers, bandwidth, progress_tracker)
+        progress_tracker.stop()
+        sys.exit(0 if success else 1)
+
     # Handle direct path upload (new feature)
     if args.path:
         path_to_upload = Path(args.path)
@@ -194,19 +1026,49 @@ def main():
             sys.exit(1)
         
         file_to_upload = None
+        progress_tracker.start()
         
         if path_to_upload.is_file():
             # Direct file upload
             file_to_upload = path_to_upload
             logger.info(f"📄 Uploading file: {file_to_upload}")
+        elif path_to_upload.is_dir() and args.dedup:
+            # Directory - upload only the chunks earlier snapshots did not store
+            success = upload_dedup(path_to_upload, args.sharepoint_folder, args.config, args.dedup_index,
+                                   args.compression_level, args.checkpoint_interval,
+                                   args.checkpoint_bytes, bandwidth, progress_tracker,
+                                   args.volume_workers, path_filter=path_filter)
+            progress_tracker.stop()
+            sys.exit(0 if success else 1)
+        elif path_to_upload.is_dir() and args.stream:
+            # Directory - compress into the upload session as it goes
+            success = stream_to_sharepoint(path_to_upload, args.sharepoint_folder, args.config,
+                                           args.compression_level, bandwidth, progress_tracker,
+                                           path_filter=path_filter)
+            progress_tracker.stop()
+            sys.exit(0 if success else 1)
+        elif path_to_upload.is_dir() and volume_size:
+            # Directory - archive into volumes uploaded as they are sealed
+            success = upload_volumes(path_to_upload, args.sharepoint_folder, args.config, volume_size,
+                                     args.compression_level, args.checkpoint_interval,
+                                     args.checkpoint_bytes, bandwidth, progress_tracker,
+                                     args.volume_workers, path_filter=path_filter)
+            progress_tracker.stop()
+            sys.exit(0 if success else 1)
         elif path_to_upload.is_dir():
             # Directory - compress first
             logger.info(f"📁 Compressing directory: {path_to_upload}")
-            file_to_upload = compress_directory(path_to_upload, compression_level=args.compression_level)
+            progress_tracker.set_stage("compress", "running")
+            file_to_upload = compress_directory(path_to_upload, compression_level=args.compression_level,
+                                                path_filter=path_filter)
+            progress_tracker.set_stage("compress", "done")
             logger.info(f"📦 Compressed to: {file_to_upload}")
         
         if file_to_upload:
-            success = upload_to_sharepoint(file_to_upload, args.sharepoint_folder, args.config)
+            success = upload_to_sharepoint(file_to_upload, args.sharepoint_folder, args.config,
+                                           args.checkpoint_interval, args.checkpoint_bytes, bandwidth,
+                                           progress_tracker)
+            progress_tracker.stop()
             
             # Clean up compressed file if it was a directory
             if path_to_upload.is_dir() and file_to_upload != path_to_upload:
@@ -228,7 +1090,11 @@ def main():
             logger.error(f"❌ File not found: {upload_file}")
             sys.exit(1)
             
-        success = upload_to_sharepoint(upload_file, args.sharepoint_folder, args.config)
+        progress_tracker.start()
+        success = upload_to_sharepoint(upload_file, args.sharepoint_folder, args.config,
+                                       args.checkpoint_interval, args.checkpoint_bytes, bandwidth,
+                                       progress_tracker)
+        progress_tracker.stop()
         sys.exit(0 if success else 1)
 
     # SSH transfer workflow
@@ -237,6 +1103,28 @@ def main():
             logger.error("❌ Error: --remote-path, --ssh-host, and --ssh-user are required for SSH transfer.")
             sys.exit(1)
         
+        # Relay mode: one remote file goes straight into an upload session
+        if args.relay:
+            fetcher = RemoteFetcher(
+                progress_tracker=progress_tracker,
+                hostname=args.ssh_host,
+                port=args.ssh_port,
+                username=args.ssh_user,
+                password=args.ssh_pass,
+                private_key_path=args.ssh_key
+            )
+            with progress_tracker:
+                try:
+                    with fetcher:
+                        success = relay_to_sharepoint(fetcher, args.remote_path, args.sharepoint_folder,
+                                                      args.config, args.checkpoint_interval,
+                                                      args.checkpoint_bytes, bandwidth, progress_tracker,
+                                                      args.relay_buffers)
+                except SSHConnectionError as e:
+                    logger.error(f"❌ SSH connection error: {e}")
+                    success = False
+            sys.exit(0 if success else 1)
+        
         # Determine local path
         if args.local_path:
             local_base_path = Path(args.local_path)
@@ -251,8 +1139,13 @@ def main():
         
         local_base_path.mkdir(parents=True, exist_ok=True)
         
+        # Partial downloads are journaled so an interrupted fetch resumes where it stopped
+        journal_path = load_uploader_config(args.config).get("JOURNAL_PATH") if os.path.exists(args.config) else None
+        fetch_journal = TransferJournal(journal_path)
+        atexit.register(fetch_journal.close)
+        
         # Initialize progress tracker
-        with ProgressTracker() as progress_tracker:
+        with progress_tracker:
             # Set up SSH connection
             fetcher = RemoteFetcher(
                 progress_tracker=progress_tracker,
@@ -260,7 +1153,12 @@ def main():
                 port=args.ssh_port,
                 username=args.ssh_user,
                 password=args.ssh_pass,
-                private_key_path=args.ssh_key
+                private_key_path=args.ssh_key,
+                bandwidth=bandwidth,
+                path_filter=path_filter,
+                selector=selector,
+                direct_io=args.direct_io,
+                journal=fetch_journal
             )
             
             try:
@@ -268,42 +1166,72 @@ def main():
                 
                 with fetcher:
                     logger.info(f"📥 Downloading from {args.remote_path} to {local_base_path}...")
-                    fetcher.fetch_directory(args.remote_path, local_base_path)
+                    progress_tracker.set_stage("fetch", "running")
+                    fetch_started = time.monotonic()
+                    downloaded_dir = fetcher.fetch_directory(args.remote_path, local_base_path)
+                    metrics.STAGE_DURATION.labels("fetch").observe(time.monotonic() - fetch_started)
+                    progress_tracker.set_stage("fetch", "done")
                     logger.info("✅ SSH download completed successfully!")
                 
                 # Determine what to process next
-                downloaded_dir = local_base_path / Path(args.remote_path).name
                 if not downloaded_dir.exists():
                     # If the expected directory doesn't exist, use the base path
                     downloaded_dir = local_base_path
                 
                 file_to_upload = None
                 
+                # Volume, dedup and stream modes: archive and upload overlap, so both happen here
+                if args.upload_to_sharepoint and (volume_size or args.dedup or args.stream):
+                    if args.stream:
+                        success = stream_to_sharepoint(downloaded_dir, args.sharepoint_folder, args.config,
+                                                       args.compression_level, bandwidth, progress_tracker)
+                    elif args.dedup:
+                        success = upload_dedup(downloaded_dir, args.sharepoint_folder, args.config,
+                                               args.dedup_index, args.compression_level,
+                                               args.checkpoint_interval, args.checkpoint_bytes, bandwidth,
+                                               progress_tracker, args.volume_workers)
+                    else:
+                        success = upload_volumes(downloaded_dir, args.sharepoint_folder, args.config,
+                                                 volume_size, args.compression_level, args.checkpoint_interval,
+                                                 args.checkpoint_bytes, bandwidth, progress_tracker,
+                                                 args.volume_workers)
+                    if not args.local_path:
+                        shutil.rmtree(local_base_path)
+                        logger.info(f"🧹 Cleaned up temporary directory: {local_base_path}")
+                    if not success:
+                        sys.exit(1)
+                    logger.info("🎉 All operations completed successfully!")
+                    return
+                
                 # Compression step
                 if args.compress:
                     logger.info("🗜️  Compression requested...")
+                    progress_tracker.set_stage("compress", "running")
                     compressed_file = compress_directory(downloaded_dir, compression_level=args.compression_level)
+                    progress_tracker.set_stage("compress", "done")
                     file_to_upload = compressed_file
                     
                     # Clean up original directory if not keeping it
                     if not args.keep_original and downloaded_dir != local_base_path:
-                        import shutil
                         shutil.rmtree(downloaded_dir)
                         logger.info(f"🧹 Removed original directory: {downloaded_dir}")
                 else:
                     # If not compressing, we need to compress anyway for SharePoint upload
                     if args.upload_to_sharepoint:
                         logger.info("🗜️  Compressing for SharePoint upload...")
+                        progress_tracker.set_stage("compress", "running")
                         compressed_file = compress_directory(downloaded_dir, compression_level=args.compression_level)
+                        progress_tracker.set_stage("compress", "done")
                         file_to_upload = compressed_file
                 
                 # SharePoint upload step
                 if args.upload_to_sharepoint and file_to_upload:
-                    success = upload_to_sharepoint(file_to_upload, args.sharepoint_folder, args.config)
+                    success = upload_to_sharepoint(file_to_upload, args.sharepoint_folder, args.config,
+                                                   args.checkpoint_interval, args.checkpoint_bytes, bandwidth,
+                                                   progress_tracker)
                     
                     # Clean up temporary files
                     if not args.local_path:  # Only clean up if using temporary directory
-                        import shutil
                         shutil.rmtree(local_base_path)
                         logger.info(f"🧹 Cleaned up temporary directory: {local_base_path}")
                     
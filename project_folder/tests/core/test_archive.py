@@ -0,0 +1,99 @@
+"""Tests for the archive module."""
+
+import json
+import os
+import zipfile
+
+import pytest
+from core.archive import create_volumes, parse_size, restore_volumes, sanitize_arcname
+
+MiB = 1024 * 1024
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Directory with a large incompressible file and several small ones."""
+    source = tmp_path / "data"
+    (source / "docs").mkdir(parents=True)
+    (source / "big.bin").write_bytes(os.urandom(5 * MiB))
+    for i in range(20):
+        (source / "docs" / f"note{i:02d}.txt").write_text(f"note {i}\n" * 500)
+    (source / "empty.txt").write_bytes(b"")
+    return source
+
+
+def test_volumes_are_bounded_and_independent(tmp_path, source):
+    """Test volume sizes, the sealing callback and that each volume opens on its own."""
+    sealed = []
+    manifest_path = create_volumes(source, tmp_path / "out", 2 * MiB, "data",
+                                   on_sealed=lambda path, index: sealed.append((index, path.exists())))
+    manifest = json.loads(manifest_path.read_text())
+
+    assert [index for index, _ in sealed] == list(range(len(manifest["volumes"])))
+    assert all(existed for _, existed in sealed)
+    assert len(manifest["volumes"]) >= 3
+    for volume in manifest["volumes"]:
+        path = tmp_path / "out" / volume["name"]
+        assert path.stat().st_size <= 2 * MiB
+        with zipfile.ZipFile(path) as zf:
+            assert zf.testzip() is None
+
+    big = next(f for f in manifest["files"] if f["path"] == "big.bin")
+    assert len(big["pieces"]) >= 3
+    assert sum(piece["length"] for piece in big["pieces"]) == 5 * MiB
+
+
+def test_restore_rebuilds_tree(tmp_path, source):
+    """Test that restoring the volumes reproduces every file."""
+    manifest_path = create_volumes(source, tmp_path / "out", 2 * MiB, "data")
+
+    restored = tmp_path / "restored"
+    count = restore_volumes(manifest_path, restored)
+
+    assert count == 22
+    for path in source.rglob("*"):
+        if path.is_file():
+            assert (restored / path.relative_to(source)).read_bytes() == path.read_bytes()
+
+
+def test_restore_detects_corruption(tmp_path, source):
+    """Test that a tampered manifest checksum is reported."""
+    manifest_path = create_volumes(source, tmp_path / "out", 2 * MiB, "data")
+    manifest = json.loads(manifest_path.read_text())
+    manifest["files"][0]["sha256"] = "0" * 64
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        restore_volumes(manifest_path, tmp_path / "restored")
+
+
+def test_parse_size_and_sanitize():
+    assert parse_size("512M") == 512 * MiB
+    assert parse_size("1.5G") == int(1.5 * 1024 * MiB)
+    assert parse_size(4096) == 4096
+    with pytest.raises(ValueError):
+        parse_size("lots")
+    with pytest.raises(ValueError):
+        parse_size("0")
+    assert sanitize_arcname('a:b|c?.txt') == "a_b_c_.txt"
+
+
+def test_volumes_with_many_small_files_stay_bounded(tmp_path):
+    """Test that the central directory of thousands of members is budgeted for."""
+    source = tmp_path / "many"
+    for d in range(10):
+        (source / f"directory_with_a_fairly_long_name_{d:02d}").mkdir(parents=True)
+        for i in range(500):
+            (source / f"directory_with_a_fairly_long_name_{d:02d}" / f"small_file_{i:04d}.dat").write_bytes(
+                os.urandom(200))
+    volume_size = 1100 * 1024
+
+    manifest_path = create_volumes(source, tmp_path / "out", volume_size, "many", compression_level=0)
+    manifest = json.loads(manifest_path.read_text())
+
+    assert len(manifest["volumes"]) >= 2
+    assert sum(volume["members"] for volume in manifest["volumes"]) == 5000
+    for volume in manifest["volumes"]:
+        assert (tmp_path / "out" / volume["name"]).stat().st_size <= volume_size
+    restore_volumes(manifest_path, tmp_path / "restored")
+    assert len(list((tmp_path / "restored").rglob("*.dat"))) == 5000
@@ -0,0 +1,194 @@
+"""Tests for the async uploader module."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from core.async_uploader import AsyncSharePointUploader
+from core.journal import TransferJournal, file_identity
+from core.progress import HeadlessProgressTracker
+from core.throttle import AsyncThrottleController
+
+SESSION_URL = "https://tenant.sharepoint.com/upload/session"
+
+
+class FakeGraph:
+    """Minimal upload-session server for httpx.MockTransport."""
+
+    def __init__(self, throttle_first_put=False, reject_stale_token=False):
+        self.received = bytearray()
+        self.requests = []
+        self.throttle_first_put = throttle_first_put
+        self.reject_stale_token = reject_stale_token
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.reject_stale_token and request.headers["Authorization"] == "Bearer stale":
+            return httpx.Response(401)
+        if request.method == "POST":
+            return httpx.Response(200, json={
+                "uploadUrl": SESSION_URL,
+                "expirationDateTime": "2099-01-01T00:00:00Z",
+            })
+        if request.method == "PUT":
+            if self.throttle_first_put:
+                self.throttle_first_put = False
+                return httpx.Response(429, headers={"Retry-After": "0.01"})
+            _, span = request.headers["Content-Range"].split(" ")
+            byte_range, total = span.split("/")
+            start, end = (int(x) for x in byte_range.split("-"))
+            assert start == len(self.received)
+            self.received.extend(request.content)
+            if end + 1 == int(total):
+                return httpx.Response(201, json={"id": "file_id", "size": len(self.received)})
+            return httpx.Response(202, json={"nextExpectedRanges": [f"{end + 1}-"]})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def make_uploader(tmp_path):
+    """Factory for an async uploader wired to a fake Graph handler."""
+    def factory(handler, **kwargs):
+        uploader = AsyncSharePointUploader(
+            kwargs.pop("token", "token"),
+            journal=TransferJournal(tmp_path / "journal.db"),
+            throttle=AsyncThrottleController(max_concurrency=8),
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            **kwargs,
+        )
+        uploader.config = {"SITE_ID": "site", "DRIVE_ID": "drive"}
+        uploader.CHUNK_SIZE = 1024
+        return uploader
+    return factory
+
+
+def test_requires_token_or_provider():
+    """Test that the uploader refuses to start without credentials."""
+    with pytest.raises(ValueError):
+        AsyncSharePointUploader()
+
+
+def test_upload_file_sends_all_chunks(make_uploader, tmp_path):
+    """Test a complete chunked upload."""
+    source = tmp_path / "data.bin"
+    source.write_bytes(bytes(range(256)) * 10)
+    graph = FakeGraph()
+    uploader = make_uploader(graph)
+
+    async def run():
+        async with uploader:
+            return await uploader.upload_file(str(source), "Backups")
+
+    result = asyncio.run(run())
+
+    assert result["id"] == "file_id"
+    assert bytes(graph.received) == source.read_bytes()
+    assert graph.requests[0].url.path.endswith("/root:/Backups/data.bin:/createUploadSession")
+
+
+def test_upload_file_retries_after_throttling(make_uploader, tmp_path):
+    """Test that a 429 pauses and resends the chunk."""
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"x" * 100)
+    graph = FakeGraph(throttle_first_put=True)
+    uploader = make_uploader(graph)
+
+    result = asyncio.run(uploader.upload_file(str(source)))
+
+    assert result["size"] == 100
+    assert uploader.throttle.throttle_events == 1
+
+
+def test_upload_file_refreshes_token_on_401(make_uploader, tmp_path):
+    """Test that a rejected token is refreshed once through the provider."""
+    class Provider:
+        token = "stale"
+        forced = 0
+
+        async def get_token_async(self, force_refresh=False):
+            if force_refresh:
+                self.forced += 1
+                self.token = "fresh"
+            return self.token
+
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"x" * 10)
+    provider = Provider()
+    uploader = make_uploader(FakeGraph(reject_stale_token=True), token=None, token_provider=provider)
+
+    result = asyncio.run(uploader.upload_file(str(source)))
+
+    assert result["id"] == "file_id"
+    assert provider.forced == 1
+
+
+def test_upload_files_runs_concurrently(make_uploader, tmp_path):
+    """Test uploading several files on one event loop."""
+    sources = []
+    for i in range(3):
+        path = tmp_path / f"file{i}.bin"
+        path.write_bytes(json.dumps({"i": i}).encode())
+        sources.append(str(path))
+
+    class PerFileGraph:
+        def __call__(self, request):
+            if request.method == "POST":
+                name = request.url.path.split("/root:/")[1].split(":")[0]
+                return httpx.Response(200, json={"uploadUrl": f"{SESSION_URL}/{name}"})
+            return httpx.Response(201, json={"name": request.url.path.split("/")[-1]})
+
+    uploader = make_uploader(PerFileGraph())
+    results = asyncio.run(uploader.upload_files(sources, concurrency=2))
+
+    assert [r["name"] for r in results] == ["file0.bin", "file1.bin", "file2.bin"]
+
+
+def test_upload_file_records_stats_progress_and_bandwidth(make_uploader, tmp_path):
+    """Test the per-upload stats, progress tracker and bandwidth hooks shared with the sync uploader."""
+    class Limiter:
+        def __init__(self):
+            self.consumed = []
+
+        def consume(self, nbytes):
+            self.consumed.append(nbytes)
+
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"x" * 2500)
+    tracker = HeadlessProgressTracker()
+    limiter = Limiter()
+    uploader = make_uploader(FakeGraph(), progress_tracker=tracker, bandwidth=limiter)
+
+    asyncio.run(uploader.upload_file(str(source)))
+
+    stats = uploader.stats()
+    assert stats["files"] == 1 and stats["chunks"] == 3 and stats["bytes_sent"] == 2500
+    assert limiter.consumed == [1024, 1024, 452]
+    assert tracker.completed_bytes == 2500 and tracker.completed_files == 1
+
+
+def test_upload_file_resumes_journaled_session(make_uploader, tmp_path):
+    """Test that a journaled session continues at the server's next expected range."""
+    source = tmp_path / "data.bin"
+    source.write_bytes(bytes(range(256)) * 8)
+    graph = FakeGraph()
+    graph.received.extend(source.read_bytes()[:1024])
+
+    def handler(request):
+        if request.method == "GET":
+            return httpx.Response(200, json={"nextExpectedRanges": ["1024-"],
+                                             "expirationDateTime": "2099-01-01T00:00:00Z"})
+        return graph(request)
+
+    uploader = make_uploader(handler)
+    uploader.journal.save(file_identity(str(source)), {
+        "file_path": str(source), "upload_url": SESSION_URL, "offset": 1024,
+        "expires_at": "2099-01-01T00:00:00Z",
+    })
+
+    asyncio.run(uploader.upload_file(str(source)))
+
+    assert bytes(graph.received) == source.read_bytes()
+    assert not [r for r in graph.requests if r.method == "POST"]
+    assert uploader.upload_stats[0].start_offset == 1024
+    assert uploader.journal.load(file_identity(str(source))) is None
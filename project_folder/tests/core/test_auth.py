@@ -102,4 +102,61 @@ def test_get_access_token_validates_token_format(mock_msal_success, mock_config)
         assert isinstance(token, str)
         assert len(token) > 0
         # JWT tokens have three parts separated by dots
-        assert token.count('.') == 2
\ No newline at end of file
+        assert token.count('.') == 2
+
+def test_token_provider_caches_token(mock_msal_success, mock_config):
+    """Test that TokenProvider reuses a token until it nears expiry."""
+    from core.auth import TokenProvider
+
+    mock_constructor, mock_app = mock_msal_success
+    mock_app.acquire_token_for_client.return_value = {
+        "access_token": MOCK_JWT_TOKEN, "expires_in": 3600
+    }
+    provider = TokenProvider(mock_config)
+
+    assert provider.get_token() == MOCK_JWT_TOKEN
+    assert provider.get_token() == MOCK_JWT_TOKEN
+    assert mock_app.acquire_token_for_client.call_count == 1
+    assert mock_constructor.call_count == 1
+
+    provider.get_token(force_refresh=True)
+    assert mock_app.acquire_token_for_client.call_count == 2
+
+
+def test_token_provider_async_refresh(mock_msal_success, mock_config):
+    """Test that concurrent async callers share one refresh."""
+    import asyncio
+    from core.auth import TokenProvider
+
+    _, mock_app = mock_msal_success
+    mock_app.acquire_token_for_client.return_value = {
+        "access_token": MOCK_JWT_TOKEN, "expires_in": 3600
+    }
+    provider = TokenProvider(mock_config)
+
+    async def fetch_many():
+        return await asyncio.gather(*(provider.get_token_async() for _ in range(5)))
+
+    assert asyncio.run(fetch_many()) == [MOCK_JWT_TOKEN] * 5
+    assert mock_app.acquire_token_for_client.call_count == 1
+
+
+def test_token_provider_async_fast_path(mock_msal_success, mock_config):
+    """Test that a fresh cached token is returned without the lock or a worker thread."""
+    import asyncio
+    from core.auth import TokenProvider
+
+    _, mock_app = mock_msal_success
+    mock_app.acquire_token_for_client.return_value = {
+        "access_token": MOCK_JWT_TOKEN, "expires_in": 3600
+    }
+    provider = TokenProvider(mock_config)
+    provider.get_token()
+
+    async def fetch_many():
+        return await asyncio.gather(*(provider.get_token_async() for _ in range(50)))
+
+    with patch("core.auth.asyncio.to_thread") as to_thread:
+        assert asyncio.run(fetch_many()) == [MOCK_JWT_TOKEN] * 50
+    to_thread.assert_not_called()
+    assert provider._async_lock is None
@@ -0,0 +1,87 @@
+"""Tests for the bandwidth module."""
+
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from core.bandwidth import BandwidthLimiter, TokenBucket, parse_rate, parse_schedule
+
+
+def test_parse_rate_units():
+    """Test rate parsing with binary suffixes."""
+    assert parse_rate("512K") == 512 * 1024
+    assert parse_rate("10M") == 10 * 1024 * 1024
+    assert parse_rate("1.5MB/s") == 1.5 * 1024 * 1024
+    assert parse_rate("2048") == 2048
+    assert parse_rate("unlimited") is None
+    assert parse_rate(None) is None
+    with pytest.raises(ValueError):
+        parse_rate("fast")
+
+
+def test_parse_schedule_windows():
+    """Test parsing a schedule with a default entry."""
+    schedule = parse_schedule("08:00-18:00=10M, *=unlimited")
+    assert schedule == [(480, 1080, 10 * 1024 * 1024), (None, None, None)]
+
+
+def test_scheduled_rate_wraps_midnight():
+    """Test that overnight windows apply on both sides of midnight."""
+    limiter = BandwidthLimiter(schedule="22:00-06:00=1M,*=5M")
+    one_mb, five_mb = 1024 * 1024, 5 * 1024 * 1024
+
+    assert limiter._scheduled_rate(datetime(2024, 1, 1, 23, 30)) == one_mb
+    assert limiter._scheduled_rate(datetime(2024, 1, 1, 5, 59)) == one_mb
+    assert limiter._scheduled_rate(datetime(2024, 1, 1, 12, 0)) == five_mb
+
+
+def test_token_bucket_unlimited_never_waits():
+    """Test that an uncapped bucket does not delay callers."""
+    bucket = TokenBucket()
+    assert bucket.reserve(10 ** 12) == 0.0
+
+
+def test_token_bucket_waits_only_for_debt():
+    """Test that waits match the bytes sent beyond the cap."""
+    bucket = TokenBucket(rate=1000)
+
+    assert bucket.reserve(1000) == 0.0  # Starts with one second of burst credit
+    assert bucket.reserve(500) == pytest.approx(0.5, abs=0.01)
+    assert bucket.reserve(500) == pytest.approx(1.0, abs=0.01)
+
+
+def test_token_bucket_sustains_cap():
+    """Test that consuming at full speed converges on the cap without extra stalls."""
+    bucket = TokenBucket(rate=200000, burst=10000)
+    start = time.monotonic()
+    for _ in range(10):
+        bucket.consume(10000)
+    elapsed = time.monotonic() - start
+
+    # 100 KB at 200 KB/s with 10 KB of initial credit: ~0.45 s
+    assert 0.4 <= elapsed < 0.6
+
+
+def test_control_file_changes_rate(tmp_path):
+    """Test runtime adjustment through the control file."""
+    control = tmp_path / "bandwidth"
+    control.write_text("1M")
+    limiter = BandwidthLimiter(control_file=str(control))
+    assert limiter.rate == 1024 * 1024
+
+    control.write_text("off")
+    limiter._maybe_reload(force=True)
+    assert limiter.rate is None
+
+
+def test_job_limiter_respects_both_caps():
+    """Test that a job waits for the stricter of its own and the global cap."""
+    limiter = BandwidthLimiter(rate=1000)
+    job = limiter.job(rate=100)
+
+    with patch("core.bandwidth.time.sleep") as mock_sleep:
+        job.consume(200)
+
+    # Job bucket: 100 credit, 100 debt at 100 B/s -> 1 s; global has enough credit
+    assert mock_sleep.call_args.args[0] == pytest.approx(1.0, abs=0.01)
@@ -0,0 +1,156 @@
+"""Tests for the daemon module."""
+
+import json
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+from core.daemon import DaemonClient, DaemonError, JobQueue, TransferDaemon, submit_to_spool
+from emulator import GraphEmulator, SFTPEmulator
+
+
+class FakeTokenProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def get_token(self, force_refresh=False):
+        self.calls += 1
+        return "daemon-token"
+
+
+def zip_directory(directory, compression_level=6):
+    archive = directory.parent / f"{directory.name}.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for path in directory.rglob("*"):
+            if path.is_file():
+                zf.write(path, path.relative_to(directory))
+    return archive
+
+
+@pytest.fixture
+def short_dir():
+    """Directory with a path short enough for a Unix socket."""
+    path = Path(tempfile.mkdtemp(prefix="spd"))
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def graph():
+    with GraphEmulator() as graph:
+        yield graph
+
+
+@pytest.fixture
+def daemon(short_dir, graph):
+    config = short_dir / "config.json"
+    config.write_text(json.dumps({
+        "TENANT_ID": "daemon-tenant",
+        "SITE_ID": "site",
+        "DRIVE_ID": "drive",
+        "GRAPH_BASE_URL": graph.base_url,
+        "JOURNAL_PATH": str(short_dir / "journal.db"),
+    }))
+    daemon = TransferDaemon(
+        str(config), JobQueue(short_dir / "queue.db"),
+        socket_path=short_dir / "d.sock",
+        spool_dir=short_dir / "spool",
+        token_provider=FakeTokenProvider(),
+        compress=zip_directory,
+    )
+    daemon.SPOOL_POLL_INTERVAL = 0.05
+    with daemon:
+        yield daemon
+
+
+def test_queue_orders_by_priority_and_survives_restart(tmp_path):
+    """Test claim order and that running jobs are re-queued after a restart."""
+    queue = JobQueue(tmp_path / "queue.db")
+    low = queue.submit("upload", {"path": "/a"})
+    high = queue.submit("upload", {"path": "/b"}, priority=5)
+    queue.submit("upload", {"path": "/c"})
+
+    assert queue.claim()["id"] == high
+    queue.close()
+
+    queue = JobQueue(tmp_path / "queue.db")
+    assert queue.requeue_interrupted() == 1
+    assert queue.claim()["id"] == high
+    assert queue.claim()["id"] == low
+    assert queue.cancel(low) is False
+    assert queue.counts() == {"running": 2, "queued": 1}
+
+    with pytest.raises(ValueError):
+        queue.submit("teleport", {})
+
+
+def test_socket_jobs_share_warm_state(short_dir, graph, daemon):
+    """Test that jobs submitted over the socket run and reuse one token provider."""
+    client = DaemonClient(daemon.socket_path)
+    ids = []
+    for i in range(3):
+        source = short_dir / f"file{i}.bin"
+        source.write_bytes(bytes([i]) * 3000)
+        ids.append(client.submit("upload", {"path": str(source), "folder": "Jobs"}))
+
+    jobs = [client.wait(job_id, timeout=30) for job_id in ids]
+    directory = short_dir / "photos"
+    directory.mkdir()
+    (directory / "a.jpg").write_bytes(b"jpeg")
+    directory_job = client.wait(client.submit("upload", {"path": str(directory)}), timeout=30)
+
+    assert [job["state"] for job in jobs] == ["done"] * 3
+    assert graph.store.read("Jobs/file2.bin") == b"\x02" * 3000
+    assert directory_job["result"]["name"] == "photos.zip"
+    assert not (short_dir / "photos.zip").exists()
+    assert daemon.token_provider.calls == 4
+    assert client.status()["jobs"] == {"done": 4}
+
+    with pytest.raises(DaemonError):
+        client.submit("upload", {})
+
+
+def test_spool_directory_and_ssh_jobs(short_dir, graph, daemon):
+    """Test an SSH job dropped into the spool directory, reusing the SSH connection."""
+    remote = short_dir / "remote" / "data"
+    remote.mkdir(parents=True)
+    (remote / "log.txt").write_text("entry")
+
+    with SFTPEmulator(short_dir / "remote") as sftp:
+        params = {"remote_path": "/data", "ssh_host": sftp.host, "ssh_port": sftp.port,
+                  "ssh_user": sftp.username, "ssh_pass": sftp.password, "folder": "Remote"}
+        submit_to_spool(daemon.spool_dir, "ssh", params)
+        (daemon.spool_dir / "broken.json").write_text("{not json")
+
+        client = DaemonClient(daemon.socket_path)
+        deadline = time.monotonic() + 10
+        while not list(daemon.spool_dir.glob("*.accepted")) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        accepted = json.loads(next(daemon.spool_dir.glob("*.accepted")).read_text())
+        assert "ssh_pass" not in accepted["params"] and accepted["params"]["ssh_user"] == sftp.username
+        first = client.wait(accepted["id"], timeout=30)
+        second = client.wait(client.submit("ssh", params), timeout=30)
+
+    assert first["state"] == "done" and second["state"] == "done"
+    assert graph.store.read("Remote/data.zip") is not None
+    assert daemon.ssh_pool.opened == 1 and daemon.ssh_pool.reused == 1
+    assert (daemon.spool_dir / "broken.rejected").exists()
+    assert len(list(daemon.spool_dir.glob("*.accepted"))) == 1
+
+
+def test_failed_job_is_recorded(short_dir, daemon):
+    """Test that a failing job is marked failed with its error."""
+    client = DaemonClient(daemon.socket_path)
+    job = client.wait(client.submit("upload", {"path": str(short_dir / "missing.bin")}), timeout=30)
+
+    assert job["state"] == "failed"
+    assert "Path not found" in job["error"]
+
+
+def test_client_without_daemon(short_dir):
+    """Test that an unreachable daemon raises DaemonError."""
+    with pytest.raises(DaemonError):
+        DaemonClient(short_dir / "none.sock").status()
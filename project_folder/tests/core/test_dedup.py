@@ -0,0 +1,138 @@
+"""Tests for the dedup module."""
+
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+
+import pytest
+from core.dedup import AVG_CHUNK, MAX_CHUNK, MIN_CHUNK, ChunkIndex, create_snapshot, iter_chunks, restore_snapshot
+
+KiB = 1024
+MiB = 1024 * KiB
+SMALL_CHUNKS = {"min_size": 16 * KiB, "avg_size": 64 * KiB, "max_size": 256 * KiB}
+
+
+def random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+class PackStore:
+    """Upload callback that copies packs into a directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.directory.mkdir()
+        self.uploaded = []
+
+    def __call__(self, path):
+        shutil.copy(path, self.directory / path.name)
+        self.uploaded.append(path.name)
+
+
+def chunk_hashes(data):
+    return [hashlib.sha256(c).hexdigest() for c in iter_chunks(io.BytesIO(data), **SMALL_CHUNKS)]
+
+
+def test_chunks_respect_bounds_and_resync_after_insert():
+    """Test chunk size bounds and that an insertion only changes nearby chunks."""
+    data = random_bytes(4 * MiB, seed=1)
+    chunks = list(iter_chunks(io.BytesIO(data), **SMALL_CHUNKS))
+    assert b"".join(chunks) == data
+    assert all(16 * KiB <= len(c) <= 256 * KiB for c in chunks[:-1])
+
+    edited = data[:MiB] + b"inserted bytes" + data[MiB:]
+    before, after = chunk_hashes(data), chunk_hashes(edited)
+    assert len(set(after) - set(before)) <= 3
+
+
+def test_mean_chunk_size_matches_average():
+    """Test that random data is cut into chunks averaging close to the configured size."""
+    scale = 16  # The default sizes scaled down, so enough chunks are cut to average
+    sizes = {"min_size": MIN_CHUNK // scale, "avg_size": AVG_CHUNK // scale, "max_size": MAX_CHUNK // scale}
+    chunks = [len(c) for c in iter_chunks(io.BytesIO(random_bytes(16 * MiB, seed=5)), **sizes)][:-1]
+    mean = sum(chunks) / len(chunks)
+    assert 0.8 * sizes["avg_size"] <= mean <= 1.2 * sizes["avg_size"]
+
+
+def test_second_snapshot_uploads_only_changed_chunks(tmp_path):
+    """Test that an unchanged file is skipped and an edited one only stores new chunks."""
+    source = tmp_path / "data"
+    source.mkdir()
+    (source / "static.bin").write_bytes(random_bytes(2 * MiB, seed=2))
+    (source / "log.bin").write_bytes(random_bytes(2 * MiB, seed=3))
+    packs = PackStore(tmp_path / "packs")
+    index = ChunkIndex(tmp_path / "index.db")
+
+    first = create_snapshot(source, index, tmp_path / "work1", packs, **SMALL_CHUNKS)
+    assert first.stats["bytes_new"] == 4 * MiB
+
+    with open(source / "log.bin", "r+b") as f:
+        f.seek(MiB)
+        f.write(b"edited")
+    second = create_snapshot(source, index, tmp_path / "work2", packs, **SMALL_CHUNKS)
+
+    assert second.stats["files_unchanged"] == 1
+    assert second.stats["bytes_scanned"] == 2 * MiB
+    assert 0 < second.stats["bytes_new"] < 512 * KiB
+    assert not list((tmp_path / "work2").glob("*.pack"))
+
+
+def test_restore_round_trip(tmp_path):
+    """Test that a snapshot restores byte for byte, including files deduplicated within it."""
+    source = tmp_path / "data"
+    (source / "sub").mkdir(parents=True)
+    payload = random_bytes(MiB, seed=4)
+    (source / "a.bin").write_bytes(payload)
+    (source / "sub" / "copy.bin").write_bytes(payload)
+    (source / "empty.txt").write_bytes(b"")
+    packs = PackStore(tmp_path / "packs")
+    index = ChunkIndex(tmp_path / "index.db")
+
+    snapshot = create_snapshot(source, index, tmp_path / "work", packs, pack_size=256 * KiB, **SMALL_CHUNKS)
+    assert snapshot.stats["bytes_new"] == MiB
+    assert len(packs.uploaded) > 1
+
+    restored = tmp_path / "restored"
+    assert restore_snapshot(snapshot.manifest_path, packs.directory, restored) == 3
+    for path in source.rglob("*"):
+        if path.is_file():
+            assert (restored / path.relative_to(source)).read_bytes() == path.read_bytes()
+
+
+def test_failed_pack_upload_is_not_indexed(tmp_path):
+    """Test that chunks of a pack that failed to upload are stored again next time."""
+    source = tmp_path / "data"
+    source.mkdir()
+    (source / "a.bin").write_bytes(random_bytes(MiB, seed=5))
+    index = ChunkIndex(tmp_path / "index.db")
+
+    def failing_upload(path):
+        raise RuntimeError("upload rejected")
+
+    with pytest.raises(RuntimeError):
+        create_snapshot(source, index, tmp_path / "work1", failing_upload, **SMALL_CHUNKS)
+    assert not (tmp_path / "work1" / "data.manifest.json").exists()
+
+    packs = PackStore(tmp_path / "packs")
+    retry = create_snapshot(source, index, tmp_path / "work2", packs, **SMALL_CHUNKS)
+    assert retry.stats["bytes_new"] == MiB
+
+
+def test_restore_detects_corrupt_chunk(tmp_path):
+    source = tmp_path / "data"
+    source.mkdir()
+    (source / "a.bin").write_bytes(random_bytes(256 * KiB, seed=6))
+    packs = PackStore(tmp_path / "packs")
+    snapshot = create_snapshot(source, ChunkIndex(tmp_path / "index.db"), tmp_path / "work", packs,
+                               compression_level=0, **SMALL_CHUNKS)
+    manifest = json.loads(snapshot.manifest_path.read_text())
+    pack_name, offset, length, _ = next(iter(manifest["chunks"].values()))
+    with open(packs.directory / pack_name, "r+b") as f:
+        f.seek(offset + length // 2)
+        f.write(os.urandom(16))
+
+    with pytest.raises(ValueError, match="Corrupt chunk"):
+        restore_snapshot(snapshot.manifest_path, packs.directory, tmp_path / "restored")
@@ -0,0 +1,139 @@
+"""Tests for the downloader module."""
+
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from core.downloader import SharePointDownloader, merge_ranges, missing_ranges
+from core.journal import TransferJournal
+from emulator import FaultInjector, GraphEmulator
+
+MiB = 1024 * 1024
+
+
+@pytest.fixture
+def graph():
+    with GraphEmulator(faults=FaultInjector()) as graph:
+        yield graph
+
+
+@pytest.fixture
+def config_path(tmp_path, graph):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({
+        "TENANT_ID": "test-tenant",
+        "SITE_ID": "test-site",
+        "DRIVE_ID": "test-drive",
+        "GRAPH_BASE_URL": graph.base_url,
+    }))
+    return str(path)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    with TransferJournal(tmp_path / "journal.db") as journal:
+        yield journal
+
+
+def make_downloader(config_path, journal, **kwargs):
+    downloader = SharePointDownloader("test-token", config_path, journal=journal,
+                                      range_size=MiB, workers=3, **kwargs)
+    downloader.RETRY_DELAY = 0
+    return downloader
+
+
+def test_parallel_download_matches_content(tmp_path, graph, config_path, journal):
+    """Test that a multi-range download reproduces the item and passes the hash check."""
+    data = os.urandom(5 * MiB + 123)
+    graph.store.write("Backups/db.bin", data)
+
+    result = make_downloader(config_path, journal).download_file("Backups/db.bin", tmp_path)
+
+    assert result == tmp_path / "db.bin"
+    assert result.read_bytes() == data
+    assert not (tmp_path / "db.bin.part").exists()
+    assert graph.stats["requests"] >= 7
+
+
+def test_failed_ranges_are_retried_and_resumed(tmp_path, graph, config_path, journal):
+    """Test that after failed ranges a second attempt only fetches the missing ones."""
+    data = os.urandom(4 * MiB)
+    graph.store.write("big.bin", data)
+    downloader = make_downloader(config_path, journal)
+    downloader.MAX_RETRIES = 1
+    item = downloader.get_item("big.bin")
+    downloader.get_item = lambda path: item  # Only the range requests should fail
+    graph.faults.schedule("error", count=3, method="GET", status=500)
+
+    with pytest.raises(Exception):
+        downloader.download_file("big.bin", tmp_path / "big.bin")
+    assert (tmp_path / "big.bin.part").exists()
+
+    resumed = make_downloader(config_path, journal)
+    resumed.download_file("big.bin", tmp_path / "big.bin")
+
+    assert (tmp_path / "big.bin").read_bytes() == data
+    assert resumed.bytes_received < len(data)
+
+
+def test_hash_mismatch_is_rejected(tmp_path, graph, config_path, journal):
+    graph.store.write("file.bin", os.urandom(MiB))
+    graph.store.item("file.bin")["file"]["hashes"]["quickXorHash"] = "AAAAAAAAAAAAAAAAAAAAAAAAAAA="
+
+    with pytest.raises(ValueError, match="quickXorHash mismatch"):
+        make_downloader(config_path, journal).download_file("file.bin", tmp_path)
+    assert not (tmp_path / "file.bin").exists()
+    assert not (tmp_path / "file.bin.part").exists()
+
+
+def test_extracts_zip_while_downloading(tmp_path, graph, config_path, journal):
+    """Test that members of a downloading ZIP are extracted."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        for i in range(4):
+            zf.writestr(f"dir/part{i}.bin", os.urandom(MiB))
+    graph.store.write("archive.zip", buffer.getvalue())
+
+    downloader = make_downloader(config_path, journal)
+    downloader.workers = 1
+    downloader.download_file("archive.zip", tmp_path, extract_to=tmp_path / "extracted")
+
+    with zipfile.ZipFile(tmp_path / "archive.zip") as zf:
+        for name in zf.namelist():
+            assert (tmp_path / "extracted" / name).read_bytes() == zf.read(name)
+
+
+def test_resume_with_every_range_present_still_extracts(tmp_path, graph, config_path, journal):
+    """Test that a resumed ZIP download with nothing left to fetch is extracted."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("done.txt", b"complete")
+    data = buffer.getvalue()
+    graph.store.write("archive.zip", data)
+    downloader = make_downloader(config_path, journal)
+    item = downloader.get_item("archive.zip")
+    dest = tmp_path / "archive.zip"
+    (tmp_path / "archive.zip.part").write_bytes(data)
+    journal.save_download(f"graph:{item['id']}|{dest.resolve()}", {
+        "dest_path": str(dest), "source": "archive.zip",
+        "etag": item.get("eTag") or item.get("cTag"), "size": len(data), "ranges": [[0, len(data)]],
+    })
+
+    downloader.download_file("archive.zip", dest, extract_to=tmp_path / "extracted")
+
+    assert downloader.bytes_received == 0
+    assert dest.read_bytes() == data
+    assert (tmp_path / "extracted" / "done.txt").read_bytes() == b"complete"
+
+
+def test_missing_item(tmp_path, config_path, journal):
+    with pytest.raises(FileNotFoundError):
+        make_downloader(config_path, journal).download_file("nope.bin", tmp_path)
+
+
+def test_range_helpers():
+    assert merge_ranges([[4, 6], [0, 2], [2, 3], [5, 8]]) == [[0, 3], [4, 8]]
+    assert missing_ranges([[0, 3], [4, 8]], 12, 2) == [(3, 4), (8, 10), (10, 12)]
+    assert missing_ranges([], 0, 2) == []
@@ -0,0 +1,72 @@
+"""Tests for the filters module."""
+
+import pytest
+from core.filters import COMMON_EXCLUDES, PathFilter, iter_files
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Small project tree with build output, dependencies and logs."""
+    for rel in ["src/app.py", "src/util.py", "src/data.json", "logs/a.log", "logs/keep.log",
+                "node_modules/pkg/index.js", "build/out.bin", "README.md", "src/build/gen.py"]:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel)
+    return tmp_path
+
+
+def _rel(root, paths):
+    return [p.relative_to(root).as_posix() for p in paths]
+
+
+def test_iter_files_without_filter_lists_everything_sorted(tree):
+    """Test that no filter yields every file in a stable order."""
+    files = _rel(tree, iter_files(tree))
+    assert len(files) == 9
+    assert files[:1] == ["README.md"]
+    assert files == _rel(tree, iter_files(tree))
+
+
+def test_excluded_directories_are_not_walked(tree, monkeypatch):
+    """Test that an excluded directory is pruned rather than filtered afterwards."""
+    path_filter = PathFilter(exclude=["node_modules/", "/build/", "*.log", "!keep.log"])
+    listed = []
+    real_skip = path_filter.skip_dir
+    monkeypatch.setattr(path_filter, "skip_dir", lambda rel: listed.append(rel) or real_skip(rel))
+
+    files = _rel(tree, iter_files(tree, path_filter))
+
+    # Files of a directory come before its subdirectories; only the top-level build/ is anchored
+    assert files == ["README.md", "logs/keep.log", "src/app.py", "src/data.json", "src/util.py",
+                     "src/build/gen.py"]
+    # Pruned at the top level; nothing below node_modules was ever considered
+    assert "node_modules" in listed and not any(rel.startswith("node_modules/") for rel in listed)
+
+
+def test_include_keeps_only_matching_files(tree):
+    """Test that include rules select files without pruning directories."""
+    path_filter = PathFilter(include=["*.py"], exclude=["build/"])
+    assert _rel(tree, iter_files(tree, path_filter)) == ["src/app.py", "src/util.py"]
+    assert path_filter.accept_file("deep/nested/x.py")
+    assert not path_filter.accept_file("src/data.json")
+
+
+def test_from_options(tmp_path):
+    """Test building a filter from command line options and exclude files."""
+    assert PathFilter.from_options() is None
+    assert PathFilter.from_options(exclude=["", "  "]) is None
+
+    ignore = tmp_path / ".transferignore"
+    ignore.write_text("# comment\n*.tmp\n\nscratch/\n")
+    path_filter = PathFilter.from_options(exclude=["*.bak"], exclude_from=[str(ignore)], exclude_common=True)
+
+    assert path_filter.skip_dir("scratch")
+    assert path_filter.skip_dir("a/b/.git")
+    assert not path_filter.accept_file("x.tmp")
+    assert not path_filter.accept_file("x.bak")
+    assert not path_filter.accept_file("pkg/__pycache__/mod.pyc")
+    assert path_filter.accept_file("src/main.py")
+    assert set(COMMON_EXCLUDES) <= set(path_filter.exclude_patterns)
+
+    with pytest.raises(OSError):
+        PathFilter.from_options(exclude_from=[str(tmp_path / "missing")])
@@ -0,0 +1,102 @@
+"""Tests for the transfer journal module."""
+
+import sqlite3
+
+import pytest
+from core.journal import TransferJournal, file_identity
+
+SESSION_URL = "https://tenant.sharepoint.com/upload/session"
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """Fixture for a journal that only commits when flushed explicitly."""
+    journal = TransferJournal(tmp_path / "journal.db", commit_interval=3600, max_pending=1000)
+    journal.flush()  # Reset the commit timer so buffered writes stay buffered
+    yield journal
+    journal.close()
+
+
+def test_journal_uses_wal_mode(journal):
+    """Test that the journal database is opened in WAL mode."""
+    mode = journal._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode.lower() == "wal"
+
+
+def test_save_is_visible_before_commit(journal):
+    """Test that buffered writes are returned by load before they are committed."""
+    journal.save("key", {"upload_url": SESSION_URL, "offset": 4096})
+
+    assert journal.load("key")["offset"] == 4096
+    rows = sqlite3.connect(journal.db_path).execute("SELECT COUNT(*) FROM upload_state").fetchone()
+    assert rows[0] == 0
+
+
+def test_flush_persists_state(tmp_path):
+    """Test that flushed state survives reopening the journal."""
+    db_path = tmp_path / "journal.db"
+    with TransferJournal(db_path) as journal:
+        journal.save("key", {
+            "upload_url": SESSION_URL,
+            "offset": 8192,
+            "ranges": [[0, 8191]],
+            "hashes": {"sha256": "abc"},
+            "expires_at": "2030-01-01T00:00:00Z",
+        })
+
+    with TransferJournal(db_path) as journal:
+        state = journal.load("key")
+
+    assert state["upload_url"] == SESSION_URL
+    assert state["offset"] == 8192
+    assert state["ranges"] == [[0, 8191]]
+    assert state["hashes"] == {"sha256": "abc"}
+    assert state["expires_at"] == "2030-01-01T00:00:00Z"
+
+
+def test_max_pending_forces_group_commit(tmp_path):
+    """Test that reaching max_pending commits all buffered writes at once."""
+    journal = TransferJournal(tmp_path / "journal.db", commit_interval=3600, max_pending=3)
+    journal.flush()
+    for i in range(3):
+        journal.save(f"key{i}", {"upload_url": SESSION_URL, "offset": i})
+
+    assert journal._pending == {}
+    rows = sqlite3.connect(journal.db_path).execute("SELECT COUNT(*) FROM upload_state").fetchone()
+    assert rows[0] == 3
+    journal.close()
+
+
+def test_clear_removes_state(journal):
+    """Test that cleared state is no longer returned."""
+    journal.save("key", {"upload_url": SESSION_URL, "offset": 0})
+    journal.flush()
+    journal.clear("key")
+
+    assert journal.load("key") is None
+    journal.flush()
+    assert journal.load("key") is None
+
+
+def test_load_many_batches_lookups(journal):
+    """Test bulk lookups across more keys than a single query can hold."""
+    for i in range(1200):
+        journal.save(f"key{i}", {"upload_url": SESSION_URL, "offset": i})
+    journal.flush()
+
+    states = journal.load_many([f"key{i}" for i in range(1200)] + ["missing"])
+
+    assert len(states) == 1200
+    assert states["key1199"]["offset"] == 1199
+    assert "missing" not in states
+
+
+def test_file_identity_changes_with_content(tmp_path):
+    """Test that modifying a file changes its journal key."""
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"a" * 10)
+    first = file_identity(path)
+    path.write_bytes(b"a" * 20)
+
+    assert file_identity(path) != first
+    assert str(path) in first
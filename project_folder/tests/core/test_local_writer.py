@@ -0,0 +1,86 @@
+"""Tests for the local_writer module."""
+
+import os
+
+import pytest
+from core import local_writer
+from core.local_writer import LocalFileWriter
+
+
+def _write(path, data, size=None, offset=0, block=32768, **kwargs):
+    with LocalFileWriter(path, len(data) if size is None else size, offset=offset, **kwargs) as writer:
+        for i in range(offset, len(data), block):
+            writer.write(data[i:i + block])
+    return writer
+
+
+def test_buffers_small_reads_into_large_writes(tmp_path, monkeypatch):
+    """Test that many small blocks reach the disk in WRITE_BUFFER-sized writes."""
+    data = os.urandom(3 * local_writer.WRITE_BUFFER + 1234)
+    sizes = []
+    real_pwrite = os.pwrite
+    monkeypatch.setattr(os, "pwrite", lambda fd, buf, pos: sizes.append(len(buf)) or real_pwrite(fd, buf, pos))
+
+    writer = _write(tmp_path / "out.bin", data)
+
+    assert (tmp_path / "out.bin").read_bytes() == data
+    assert sizes == [local_writer.WRITE_BUFFER] * 3 + [1234]
+    assert writer.position == len(data)
+
+
+def test_preallocates_and_trims(tmp_path, monkeypatch):
+    """Test that the file is reserved at its full size and trimmed to what arrived."""
+    reserved = []
+    monkeypatch.setattr(local_writer, "preallocate",
+                        lambda fd, size: reserved.append(size) or os.ftruncate(fd, size))
+
+    _write(tmp_path / "short.bin", b"x" * 1000, size=5000)
+
+    assert reserved == [5000]
+    assert (tmp_path / "short.bin").stat().st_size == 1000
+
+
+def test_resume_at_offset(tmp_path):
+    """Test continuing a partial file without touching the bytes already there."""
+    data = os.urandom(100_000)
+    path = tmp_path / "resumed.bin"
+    path.write_bytes(data[:40_000])
+
+    _write(path, data, offset=40_000)
+
+    assert path.read_bytes() == data
+
+
+def test_drop_behind_and_direct_io(tmp_path, monkeypatch):
+    """Test cache eviction windows and O_DIRECT with an unaligned tail."""
+    monkeypatch.setattr(local_writer, "DROP_BEHIND_MIN_SIZE", 1)
+    monkeypatch.setattr(local_writer, "DROP_BEHIND_WINDOW", local_writer.WRITE_BUFFER)
+    monkeypatch.setattr(local_writer, "DIRECT_IO_MIN_SIZE", 1)
+    hints = []
+    monkeypatch.setattr(local_writer, "advise", lambda fd, offset, length, advice: hints.append(advice))
+    data = os.urandom(2 * local_writer.WRITE_BUFFER + 5000)
+
+    writer = _write(tmp_path / "huge.bin", data, direct=True)
+
+    assert (tmp_path / "huge.bin").read_bytes() == data
+    assert hints[0] == "POSIX_FADV_SEQUENTIAL"
+    assert hints.count("POSIX_FADV_DONTNEED") == 3  # Two full windows and the rest on close
+    if not hasattr(os, "O_DIRECT"):
+        pytest.skip("O_DIRECT not available")
+    assert not writer.direct  # Switched off for the unaligned tail (or unsupported by the file system)
+
+
+def test_without_pwrite_or_fdatasync(tmp_path, monkeypatch):
+    """Test the seek + write and fsync fallbacks used on Windows and macOS."""
+    monkeypatch.delattr(os, "pwrite", raising=False)
+    monkeypatch.setattr(local_writer, "_fdatasync", os.fsync)
+    monkeypatch.setattr(local_writer, "DROP_BEHIND_MIN_SIZE", 1)
+    data = os.urandom(2 * local_writer.WRITE_BUFFER)
+    path = tmp_path / "portable.bin"
+    path.write_bytes(data[:1000])
+
+    with LocalFileWriter(path, len(data), offset=1000) as writer:
+        writer.write(data[1000:])
+        assert writer.sync() == local_writer.WRITE_BUFFER + 1000
+
+    assert path.read_bytes() == data
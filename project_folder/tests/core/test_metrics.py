@@ -0,0 +1,108 @@
+"""Tests for the metrics module."""
+
+import threading
+import urllib.request
+
+import pytest
+from core.metrics import MetricsRegistry, MetricsServer
+
+
+def test_counter_sums_shards_across_threads():
+    """Test that increments from many threads are all counted."""
+    registry = MetricsRegistry()
+    counter = registry.counter("bytes_total", "Bytes", ("direction",))
+
+    def work():
+        for _ in range(1000):
+            counter.labels(direction="upload").inc(2)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.labels("upload").value == 16000
+    assert 'bytes_total{direction="upload"} 16000' in registry.render()
+
+
+def test_shards_of_finished_threads_are_folded():
+    """Test that many short-lived threads keep their counts but not their shards."""
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs", ("kind",)).labels("upload")
+    gauge = registry.gauge("active", "Active", ("kind",)).labels("upload")
+    histogram = registry.histogram("seconds", "Seconds", ("kind",), buckets=(1.0,)).labels("upload")
+
+    def job():
+        counter.inc()
+        gauge.inc()
+        gauge.dec()
+        histogram.observe(0.5)
+
+    for batch in range(50):
+        threads = [threading.Thread(target=job) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert counter.value == (batch + 1) * 20
+
+    assert gauge.value == 0
+    assert histogram.snapshot() == ([1000, 1000], 1000, 500.0)
+    for child in (counter, gauge, histogram):
+        assert len(child._values._shards) <= 1  # At most this (main) thread's shard
+
+
+def test_gauge_set_and_adjust():
+    """Test that a gauge can be set and moved up and down."""
+    registry = MetricsRegistry()
+    gauge = registry.gauge("in_flight", "In flight")
+
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.labels().value == 1
+
+    gauge.set(0.25)
+    assert gauge.labels().value == 0.25
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test the Prometheus histogram exposition."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_count 4" in text
+    assert "latency_seconds_sum 4.25" in text
+
+
+def test_registry_rejects_conflicting_types():
+    """Test that a name cannot be registered as two metric types."""
+    registry = MetricsRegistry()
+    assert registry.counter("x", "X") is registry.counter("x", "X")
+    with pytest.raises(ValueError):
+        registry.gauge("x", "X")
+
+
+def test_metrics_server_serves_registry():
+    """Test scraping the HTTP endpoint."""
+    registry = MetricsRegistry()
+    registry.counter("retries_total", "Retries", ("status",)).labels(status=503).inc()
+    server = MetricsServer(registry, port=0, host="127.0.0.1").start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode()
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.stop()
+
+    assert content_type.startswith("text/plain")
+    assert 'retries_total{status="503"} 1' in body
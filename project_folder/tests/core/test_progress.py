@@ -0,0 +1,125 @@
+"""Tests for the progress module."""
+
+import json
+
+from core.progress import HeadlessProgressTracker, ProgressTracker
+
+
+def test_update_is_deferred_until_render():
+    """Test that updates only touch counters until the display refreshes."""
+    tracker = ProgressTracker()
+    task_id = tracker.add_task("file.bin", total_size=1000)
+
+    tracker.update(task_id, 100)
+    tracker.update(task_id, 150)
+
+    assert tracker.completed_bytes == 250
+    assert tracker.file_progress._tasks[task_id].completed == 0
+
+    tracker._create_layout()
+
+    assert tracker.file_progress._tasks[task_id].completed == 250
+    assert tracker.overall_progress.tasks[0].completed == 250
+
+
+def test_finished_tasks_are_evicted():
+    """Test that only a bounded number of finished tasks is kept."""
+    tracker = ProgressTracker()
+    for i in range(20):
+        task_id = tracker.add_task(f"file{i}", total_size=10)
+        tracker.update(task_id, 10)
+        tracker.complete_file(task_id)
+    tracker._create_layout()
+
+    assert tracker.completed_files == 20
+    assert len(tracker.file_progress.tasks) == ProgressTracker.KEEP_FINISHED_TASKS
+    assert len(tracker.tasks) == ProgressTracker.KEEP_FINISHED_TASKS
+
+
+def test_active_window_is_bounded():
+    """Test that queued tasks stay hidden until rows become free."""
+    tracker = ProgressTracker(max_visible_tasks=2)
+    task_ids = [tracker.add_task(f"file{i}", total_size=10) for i in range(4)]
+
+    visible = [task.fields["filename"] for task in tracker.file_progress.tasks if task.visible]
+    assert visible == ["file0", "file1"]
+
+    tracker.complete_file(task_ids[0])
+    tracker._create_layout()
+
+    visible = [task.fields["filename"] for task in tracker.file_progress.tasks if task.visible]
+    assert visible == ["file0", "file1", "file2"]
+
+
+def test_duplicate_names_are_tracked_separately():
+    """Test that files sharing a name between refreshes each complete and are evicted."""
+    tracker = ProgressTracker()
+    for _ in range(1000):
+        task_id = tracker.add_task("__init__.py", total_size=10)
+        tracker.update(task_id, 10)
+        tracker.complete_file(task_id)
+    first = tracker.add_task("package.json", total_size=10)
+    second = tracker.add_task("package.json", total_size=20)
+    tracker.update(second, 20)
+    tracker.complete_file(second)
+    tracker._create_layout()
+
+    assert tracker.completed_files == 1001
+    assert len(tracker.file_progress.tasks) == ProgressTracker.KEEP_FINISHED_TASKS + 1
+    assert tracker.file_progress._tasks[first].completed == 0
+    assert first in tracker.tasks and second in tracker.tasks
+
+
+def test_eta_info_uses_counters():
+    """Test ETA information before any render has happened."""
+    tracker = ProgressTracker()
+    task_id = tracker.add_task("file.bin", total_size=1000)
+    tracker.update(task_id, 500)
+
+    info = tracker.get_eta_info()
+
+    assert info["completed_bytes"] == 500
+    assert info["total_bytes"] == 1000
+    assert info["progress_percentage"] == 50
+
+
+def test_headless_tracker_writes_ndjson(tmp_path):
+    """Test that the headless tracker emits one JSON event per line."""
+    output = tmp_path / "progress.ndjson"
+    with HeadlessProgressTracker(output=str(output), interval=60) as tracker:
+        tracker.set_total_files(2)
+        tracker.set_stage("fetch", "running")
+        task_id = tracker.add_task("a.bin", total_size=100)
+        tracker.update(task_id, 100)
+        tracker.complete_file(task_id)
+        tracker.set_stage("fetch", "done")
+
+    events = [json.loads(line) for line in output.read_text().splitlines()]
+
+    assert [e["event"] for e in events] == ["start", "stage", "stage", "finish"]
+    assert events[1] == {**events[1], "stage": "fetch", "state": "running"}
+    final = events[-1]
+    assert final["bytes_done"] == 100
+    assert final["files_done"] == 1
+    assert final["files_total"] == 2
+    assert final["stages"]["fetch"]["state"] == "done"
+
+
+def test_headless_tracker_emits_periodic_progress(tmp_path):
+    """Test that progress events are written on the configured interval."""
+    output = tmp_path / "progress.ndjson"
+    tracker = HeadlessProgressTracker(output=str(output), interval=0.01)
+    tracker.start()
+    task_id = tracker.add_task("a.bin", total_size=1000)
+    tracker.update(task_id, 250)
+    deadline = 100
+    while "progress" not in output.read_text() and deadline:
+        deadline -= 1
+        tracker._stop_event.wait(0.01)
+    tracker.stop()
+
+    progress = [json.loads(line) for line in output.read_text().splitlines()
+                if json.loads(line)["event"] == "progress"]
+    assert progress
+    assert progress[-1]["bytes_total"] == 1000
+    assert progress[-1]["files_active"] == 1
@@ -0,0 +1,44 @@
+"""Tests for the quickxor module."""
+
+import base64
+import os
+
+import pytest
+from core.quickxor import QuickXorHash, quickxor_file
+
+
+def reference_quickxor(data):
+    """Byte-at-a-time port of Microsoft's reference implementation."""
+    cells = [0, 0, 0]
+    shift = 0
+    for byte in data:
+        index, offset = divmod(shift, 64)
+        width = 32 if index == 2 else 64
+        cells[index] ^= (byte << offset) & (2 ** 64 - 1)
+        if offset > width - 8:
+            cells[(index + 1) % 3] ^= byte >> (width - offset)
+        shift = (shift + 11) % 160
+    digest = bytearray(b"".join(cell.to_bytes(8, "little") for cell in cells)[:20])
+    for i, b in enumerate(len(data).to_bytes(8, "little")):
+        digest[12 + i] ^= b
+    return base64.b64encode(bytes(digest)).decode("ascii")
+
+
+@pytest.mark.parametrize("size", [0, 1, 159, 160, 161, 1000, 5000])
+def test_matches_reference(size):
+    data = os.urandom(size)
+    assert QuickXorHash(data).b64digest() == reference_quickxor(data)
+
+
+def test_incremental_updates_and_file(tmp_path):
+    """Test that uneven update sizes and hashing a file give the same digest."""
+    data = os.urandom(10_000)
+    digest = QuickXorHash()
+    for start in range(0, len(data), 37):
+        digest.update(data[start:start + 37])
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+
+    assert digest.b64digest() == reference_quickxor(data)
+    assert quickxor_file(path, block_size=999) == digest.b64digest()
+    assert QuickXorHash().b64digest() == "AAAAAAAAAAAAAAAAAAAAAAAAAAA="
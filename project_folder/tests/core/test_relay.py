@@ -0,0 +1,115 @@
+"""Tests for the relay module."""
+
+import json
+import os
+import threading
+
+import paramiko
+import pytest
+from core.journal import TransferJournal
+from core.relay import RelayAborted, RingBuffer, SFTPRelay
+from core.transport import SharedTransport
+from core.uploader import SharePointUploader
+from emulator import FaultInjector, GraphEmulator, SFTPEmulator
+
+MiB = 1024 * 1024
+CHUNK = 640 * 1024
+
+
+@pytest.fixture
+def remote(tmp_path):
+    root = tmp_path / "remote"
+    root.mkdir()
+    (root / "big.bin").write_bytes(os.urandom(5 * MiB + 4321))
+    return root
+
+
+@pytest.fixture
+def sftp(remote):
+    with SFTPEmulator(remote) as server:
+        transport = paramiko.Transport((server.host, server.port))
+        transport.connect(username=server.username, password=server.password)
+        client = paramiko.SFTPClient.from_transport(transport)
+        yield client
+        client.close()
+        transport.close()
+
+
+@pytest.fixture
+def graph():
+    with GraphEmulator(faults=FaultInjector()) as graph:
+        yield graph
+
+
+def make_uploader(tmp_path, graph):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"TENANT_ID": "relay-tenant", "SITE_ID": "s", "DRIVE_ID": "d",
+                                  "GRAPH_BASE_URL": graph.base_url}))
+    uploader = SharePointUploader("test-token", str(config), journal=TransferJournal(tmp_path / "journal.db"),
+                                  transport=SharedTransport(warm_up=False), checkpoint_interval=0)
+    uploader.RETRY_DELAY = 0
+    return uploader
+
+
+def test_relay_copies_remote_file(tmp_path, remote, sftp, graph):
+    """Test that a multi-chunk remote file arrives intact through the ring buffer."""
+    uploader = make_uploader(tmp_path, graph)
+
+    item = SFTPRelay(sftp, uploader, chunk_size=CHUNK, slots=3, readers=2).relay("/big.bin", "Relayed")
+
+    assert item["size"] == (remote / "big.bin").stat().st_size
+    assert graph.store.read("Relayed/big.bin") == (remote / "big.bin").read_bytes()
+    assert uploader.stats()["chunks"] == 9
+
+
+def test_relay_resumes_interrupted_transfer(tmp_path, remote, sftp, graph):
+    """Test that a rerun continues the journaled session from the server's offset."""
+    uploader = make_uploader(tmp_path, graph)
+    uploader.MAX_RETRIES = 1
+    sent = []
+    upload_chunk = uploader._upload_chunk_with_retry
+
+    def fail_after_three(url, data, offset, *args, **kwargs):
+        if len(sent) == 3:
+            graph.faults.schedule("error", status=500)
+        sent.append(offset)
+        return upload_chunk(url, data, offset, *args, **kwargs)
+
+    uploader._upload_chunk_with_retry = fail_after_three
+    with pytest.raises(Exception):
+        SFTPRelay(sftp, uploader, chunk_size=CHUNK).relay("/big.bin", "Relayed", source_id="test")
+
+    resumed = make_uploader(tmp_path, graph)
+    SFTPRelay(sftp, resumed, chunk_size=CHUNK).relay("/big.bin", "Relayed", source_id="test")
+
+    assert graph.store.read("Relayed/big.bin") == (remote / "big.bin").read_bytes()
+    assert resumed.stats()["bytes_sent"] == (remote / "big.bin").stat().st_size - 3 * CHUNK
+    assert graph.stats["sessions"] == 1
+
+
+def test_ring_buffer_bounds_readers():
+    """Test that readers cannot run more than the slot count ahead of the consumer."""
+    ring = RingBuffer(2, 4)
+    ring.reserve(0)[:4] = b"abcd"
+    ring.commit(0, 4)
+    ring.reserve(1)
+    blocked = threading.Event()
+
+    def reserve_third():
+        try:
+            ring.reserve(2)
+        except RelayAborted:
+            blocked.set()
+
+    thread = threading.Thread(target=reserve_third)
+    thread.start()
+    thread.join(timeout=0.2)
+    assert thread.is_alive()
+    assert bytes(ring.take(0)) == b"abcd"
+    ring.release(0)
+    thread.join(timeout=1)
+    assert not thread.is_alive() and not blocked.is_set()
+
+    ring.close()
+    with pytest.raises(RelayAborted):
+        ring.take(1)
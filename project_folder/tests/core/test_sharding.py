@@ -0,0 +1,106 @@
+"""Tests for the sharding module."""
+
+import json
+
+import pytest
+from core.sharding import (FileSelector, RemoteEntry, ShardManifest, balance, merge_manifests, parse_age,
+                           parse_shard, shard_of)
+
+NOW = 1_800_000_000
+
+
+@pytest.fixture
+def entries():
+    """A skewed tree: a few large files and many small ones."""
+    files = [RemoteEntry(f"big/{i}.bin", 100_000 * (i + 1), NOW - i * 3600) for i in range(4)]
+    files += [RemoteEntry(f"small/{i:03d}.txt", 1000 + i, NOW - i * 86400) for i in range(200)]
+    return files
+
+
+def test_parse_shard_and_age():
+    """Test parsing K/N shards, relative ages and dates."""
+    assert parse_shard("2/8") == (2, 8)
+    for bad in ("0/4", "5/4", "1-4", "x"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+    assert parse_age("36h", now=NOW) == NOW - 36 * 3600
+    assert parse_age("2w", now=NOW) == NOW - 14 * 86400
+    assert parse_age("2026-01-31") > parse_age("2026-01-30")
+    with pytest.raises(ValueError):
+        parse_age("yesterday")
+
+
+@pytest.mark.parametrize("mode", ["hash", "balanced"])
+def test_shards_are_disjoint_and_complete(entries, mode):
+    """Test that every file lands in exactly one shard."""
+    shards = [FileSelector(k, 4, mode).select(entries) for k in range(1, 5)]
+    paths = [e.path for shard in shards for e in shard]
+    assert sorted(paths) == sorted(e.path for e in entries)
+    assert all(shard for shard in shards)
+
+
+def test_balanced_shards_have_similar_totals(entries):
+    """Test that balanced mode evens out byte totals and is deterministic."""
+    plan = balance(entries, 4)
+    totals = [sum(e.size for e in plan[k]) for k in range(1, 5)]
+    # Each shard's last file went to the emptiest shard, so no shard is ahead by more than one file
+    assert max(totals) - min(totals) <= max(e.size for e in entries)
+    assert max(totals) == 400_000
+    assert balance(list(reversed(entries)), 4) == plan
+
+
+def test_hash_shard_is_stable():
+    """Test that a path's shard does not depend on the process or the rest of the tree."""
+    assert shard_of("a/b/c.txt", 8) == shard_of("a/b/c.txt", 8)
+    assert {shard_of(f"f{i}", 8) for i in range(200)} == set(range(1, 9))
+
+
+def test_metadata_filters(entries):
+    """Test selecting by size and modification time."""
+    selector = FileSelector(newer_than=NOW - 2 * 86400, larger_than=1000)
+    assert [e.path for e in selector.select(entries)] == [
+        "big/0.bin", "big/1.bin", "big/2.bin", "big/3.bin", "small/001.txt"
+    ]
+
+
+def _write_shard(tmp_path, k, count, entries, complete=True):
+    selector = FileSelector(k, count)
+    manifest = ShardManifest.create(tmp_path / selector.manifest_name, "/data", selector,
+                                    selector.select(entries))
+    if complete:
+        manifest.mark_complete()
+    return str(manifest.path)
+
+
+def test_manifests_reload_and_merge(tmp_path, entries):
+    """Test reusing a shard's plan and merging a complete job."""
+    paths = [_write_shard(tmp_path, k, 3, entries) for k in (1, 2, 3)]
+
+    assert ShardManifest.load(paths[0], "/data", FileSelector(1, 3)) is not None
+    assert ShardManifest.load(paths[0], "/data", FileSelector(1, 3, "balanced")) is None
+    assert ShardManifest.load(paths[0], "/other", FileSelector(1, 3)) is None
+
+    merged = merge_manifests(paths)
+    assert merged["total_files"] == len(entries)
+    assert merged["total_bytes"] == sum(e.size for e in entries)
+
+
+def test_merge_rejects_gaps_and_overlap(tmp_path, entries):
+    """Test that a missing, incomplete or overlapping shard is reported."""
+    first = _write_shard(tmp_path, 1, 3, entries)
+    second = _write_shard(tmp_path, 2, 3, entries, complete=False)
+    with pytest.raises(ValueError, match="Missing shards: \\[3\\]"):
+        merge_manifests([first, second])
+
+    third = _write_shard(tmp_path, 3, 3, entries)
+    with pytest.raises(ValueError, match="not completed: \\[2\\]"):
+        merge_manifests([first, second, third])
+
+    data = json.loads(open(second).read())
+    data["complete"] = True
+    data["files"].append(json.loads(open(first).read())["files"][0])
+    with open(second, "w") as f:
+        json.dump(data, f)
+    with pytest.raises(ValueError, match="is in shards 1 and 2"):
+        merge_manifests([first, second, third])
@@ -1,15 +1,37 @@
+import io
+import os
 import stat
 from pathlib import Path
-from unittest.mock import MagicMock, patch, ANY
+from unittest.mock import MagicMock, patch
 
 import paramiko
 import pytest
 import socket
 
+from core.filters import PathFilter
+from core.journal import TransferJournal
 from core.progress import ProgressTracker
+from core.sharding import FileSelector
 from core.ssh_copy import RemoteFetcher, SSHConnectionError
 
 
+class FakeRemoteFile(io.BytesIO):
+    """In-memory stand-in for paramiko.SFTPFile; ``chunks`` scripts the size of each read."""
+
+    def __init__(self, data=b"", chunks=None):
+        super().__init__(data)
+        self.chunks = list(chunks or [])
+        self.prefetched = None
+
+    def prefetch(self, file_size=None, max_concurrent_requests=None):
+        self.prefetched = (file_size, max_concurrent_requests)
+
+    def read(self, size=-1):
+        if self.chunks:
+            size = self.chunks.pop(0)
+        return super().read(size)
+
+
 @pytest.fixture
 def mock_progress_tracker():
     """Fixture for a mocked ProgressTracker."""
@@ -55,6 +77,12 @@ def mock_paramiko():
             mock_sftp_attr_file,
         ]
 
+        # Remote file contents by path; files not listed here are empty
+        mock_sftp_client.remote_files = {}
+        mock_sftp_client.open.side_effect = lambda path, mode="r", bufsize=-1: FakeRemoteFile(
+            mock_sftp_client.remote_files.get(path, b"")
+        )
+
         yield mock_paramiko_lib, mock_ssh_client, mock_sftp_client
 
 
@@ -158,6 +186,10 @@ def test_fetch_directory_happy_path(mock_paramiko, mock_progress_tracker, tmp_pa
         return []
 
     mock_sftp_client.listdir_attr.side_effect = listdir_attr_side_effect
+    mock_sftp_client.remote_files.update({
+        "/remote/source/file.txt": b"a" * 123,
+        "/remote/source/subdir/nested_file.txt": b"b" * 456,
+    })
 
     fetcher = RemoteFetcher(
         progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser"
@@ -170,19 +202,13 @@ def test_fetch_directory_happy_path(mock_paramiko, mock_progress_tracker, tmp_pa
     source_dir = tmp_path / "source"
     assert source_dir.is_dir()
     assert (source_dir / "subdir").is_dir()
-    assert not (source_dir / "file.txt").exists()  # get() is mocked, so file not created
-    assert not (source_dir / "subdir" / "nested_file.txt").exists()
+    assert (source_dir / "file.txt").read_bytes() == b"a" * 123
+    assert (source_dir / "subdir" / "nested_file.txt").read_bytes() == b"b" * 456
 
-    # Check that get was called for both files
-    assert mock_sftp_client.get.call_count == 2
-    mock_sftp_client.get.assert_any_call(
-        "/remote/source/file.txt", str(source_dir / "file.txt"), callback=ANY
-    )
-    mock_sftp_client.get.assert_any_call(
-        "/remote/source/subdir/nested_file.txt",
-        str(source_dir / "subdir" / "nested_file.txt"),
-        callback=ANY,
-    )
+    # Check that both files were opened for reading
+    assert sorted(c.args[0] for c in mock_sftp_client.open.call_args_list) == [
+        "/remote/source/file.txt", "/remote/source/subdir/nested_file.txt"
+    ]
 
     # Check progress tracker calls
     assert mock_progress_tracker.add_task.call_count == 2
@@ -190,6 +216,72 @@ def test_fetch_directory_happy_path(mock_paramiko, mock_progress_tracker, tmp_pa
     mock_progress_tracker.add_task.assert_any_call("nested_file.txt", total_size=456)
 
 
+def test_fetch_directory_applies_path_filter(mock_paramiko, mock_progress_tracker, tmp_path):
+    """Test that excluded directories are never listed and filtered files never fetched."""
+    _, _, mock_sftp_client = mock_paramiko
+
+    def attr(name, mode, size=0):
+        item = MagicMock()
+        item.filename, item.st_mode, item.st_size = name, mode, size
+        return item
+
+    tree = {
+        "/remote/source": [attr("node_modules", stat.S_IFDIR), attr("src", stat.S_IFDIR),
+                           attr("debug.log", stat.S_IFREG, 2048)],
+        "/remote/source/src": [attr("app.py", stat.S_IFREG, 10)],
+    }
+    mock_sftp_client.listdir_attr.side_effect = lambda path: tree[path]
+    mock_sftp_client.remote_files["/remote/source/src/app.py"] = b"print(1)\n\n"
+
+    fetcher = RemoteFetcher(
+        progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser",
+        path_filter=PathFilter(exclude=["node_modules/", "*.log"])
+    )
+    with fetcher:
+        fetcher.fetch_directory("/remote/source", tmp_path)
+
+    listed = [c.args[0] for c in mock_sftp_client.listdir_attr.call_args_list]
+    assert "/remote/source/node_modules" not in listed
+    assert not (tmp_path / "source" / "node_modules").exists()
+    mock_sftp_client.open.assert_called_once_with("/remote/source/src/app.py", "rb")
+    assert (tmp_path / "source" / "src" / "app.py").read_bytes() == b"print(1)\n\n"
+    assert (fetcher.skipped_files, fetcher.skipped_bytes) == (1, 2048)
+
+
+def test_fetch_directory_sharded_resumes_from_manifest(mock_paramiko, mock_progress_tracker, tmp_path):
+    """Test that a rerun of a shard reuses its manifest and skips files already fetched."""
+    _, _, mock_sftp_client = mock_paramiko
+
+    def attr(name, size):
+        item = MagicMock()
+        item.filename, item.st_mode, item.st_size, item.st_mtime = name, stat.S_IFREG, size, 1000
+        return item
+
+    mock_sftp_client.listdir_attr.side_effect = lambda path: [attr(f"f{i}.bin", 10 + i) for i in range(6)]
+    mock_sftp_client.remote_files.update({f"/remote/source/f{i}.bin": b"x" * (10 + i) for i in range(6)})
+    selector = FileSelector(1, 2, "balanced")
+
+    def fetch():
+        fetcher = RemoteFetcher(progress_tracker=mock_progress_tracker, hostname="testhost",
+                                username="testuser", selector=selector)
+        with fetcher:
+            return fetcher.fetch_directory("/remote/source", tmp_path)
+
+    shard_dir = fetch()
+    assert shard_dir == tmp_path / "source.shard-1-of-2"
+    fetched = sorted(c.args[0] for c in mock_sftp_client.open.call_args_list)
+    assert len(fetched) == 3
+
+    # Only the first file survived in full; the rerun must not list the tree again
+    for remote in fetched[1:]:
+        (shard_dir / remote.rsplit("/", 1)[1]).write_bytes(b"x")
+    mock_sftp_client.open.reset_mock()
+    mock_sftp_client.listdir_attr.reset_mock()
+    fetch()
+    mock_sftp_client.listdir_attr.assert_not_called()
+    assert sorted(c.args[0] for c in mock_sftp_client.open.call_args_list) == fetched[1:]
+
+
 def test_fetch_directory_remote_not_found(mock_paramiko, mock_progress_tracker, tmp_path):
     """Test that FileNotFoundError is raised if remote path does not exist."""
     _, _, mock_sftp_client = mock_paramiko
@@ -243,7 +335,7 @@ def test_fetch_directory_empty(mock_paramiko, mock_progress_tracker, tmp_path):
     empty_dir = tmp_path / "empty"
     assert empty_dir.is_dir()
     assert not any(empty_dir.iterdir())
-    mock_sftp_client.get.assert_not_called()
+    mock_sftp_client.open.assert_not_called()
 
 
 @pytest.mark.parametrize(
@@ -272,7 +364,7 @@ def test_fetch_directory_ignores_unsupported_file_types(
         fetcher.fetch_directory("/remote/source", tmp_path)
 
     # Verify that no download was attempted
-    mock_sftp_client.get.assert_not_called()
+    mock_sftp_client.open.assert_not_called()
 
     # Verify that the local directory was created but is empty
     assert tmp_path.is_dir()
@@ -305,6 +397,8 @@ def test_fetch_directory_with_special_characters_in_filenames(
         file_attr_2,
         file_attr_3,
     ]
+    for attr in (file_attr_1, file_attr_2, file_attr_3):
+        mock_sftp_client.remote_files[f"/remote/source/{attr.filename}"] = b"s" * attr.st_size
 
     fetcher = RemoteFetcher(
         progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser"
@@ -312,25 +406,12 @@ def test_fetch_directory_with_special_characters_in_filenames(
     with fetcher:
         fetcher.fetch_directory("/remote/source", tmp_path)
 
-    # Verify that get was called for all files with correct paths
+    # Verify that all files were read from the correct paths
     # The implementation creates a subdirectory with the remote path name
     source_dir = tmp_path / "source"
-    assert mock_sftp_client.get.call_count == 3
-    mock_sftp_client.get.assert_any_call(
-        f"/remote/source/{file_attr_1.filename}",
-        str(source_dir / file_attr_1.filename),
-        callback=ANY,
-    )
-    mock_sftp_client.get.assert_any_call(
-        f"/remote/source/{file_attr_2.filename}",
-        str(source_dir / file_attr_2.filename),
-        callback=ANY,
-    )
-    mock_sftp_client.get.assert_any_call(
-        f"/remote/source/{file_attr_3.filename}",
-        str(source_dir / file_attr_3.filename),
-        callback=ANY,
-    )
+    assert mock_sftp_client.open.call_count == 3
+    for attr in (file_attr_1, file_attr_2, file_attr_3):
+        mock_sftp_client.open.assert_any_call(f"/remote/source/{attr.filename}", "rb")
 
     # Verify progress tracker calls
     assert mock_progress_tracker.add_task.call_count == 3
@@ -343,22 +424,26 @@ def test_fetch_directory_with_special_characters_in_filenames(
     mock_progress_tracker.add_task.assert_any_call(
         file_attr_3.filename, total_size=300
     )
-    # Verify the source directory was created (files are mocked so won't exist)
-    assert source_dir.is_dir()
-    assert not any(source_dir.iterdir())  # No actual files since get() is mocked
+    # Verify the files were written under their own names
+    assert sorted(p.name for p in source_dir.iterdir()) == sorted(
+        attr.filename for attr in (file_attr_1, file_attr_2, file_attr_3)
+    )
+    assert (source_dir / file_attr_3.filename).stat().st_size == 300
 
 
 def test_download_file_failure_and_cleanup(mock_paramiko, mock_progress_tracker, tmp_path):
     """Test that a failed download cleans up the partial file."""
     _, _, mock_sftp_client = mock_paramiko
 
-    # Create a fake local file to simulate a partial download
+    # Create a fake partial file left by an earlier attempt
     local_file_path = tmp_path / "file.txt"
-    local_file_path.write_text("partial content")
-    assert local_file_path.exists()
+    part_file_path = tmp_path / "file.txt.part"
+    part_file_path.write_text("partial content")
 
-    # Mock sftp_client.get to raise an exception
-    mock_sftp_client.get.side_effect = Exception("Download failed")
+    # Fail in the middle of the transfer
+    remote = FakeRemoteFile(b"d" * 1024)
+    remote.read = MagicMock(side_effect=[b"d" * 512, Exception("Download failed")])
+    mock_sftp_client.open.side_effect = lambda path, mode="r", bufsize=-1: remote
 
     fetcher = RemoteFetcher(
         progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser"
@@ -367,10 +452,117 @@ def test_download_file_failure_and_cleanup(mock_paramiko, mock_progress_tracker,
         with pytest.raises(Exception, match="Download failed"):
             fetcher._download_file("/remote/file.txt", local_file_path, 1024)
 
-    # Verify that the partial file was cleaned up
+    # Without a journal there is nothing to resume from, so the partial file is cleaned up
+    assert not part_file_path.exists()
     assert not local_file_path.exists()
 
 
+def test_download_file_resumes_from_journal(mock_paramiko, mock_progress_tracker, tmp_path):
+    """Test that an interrupted download continues at the journaled offset."""
+    _, _, mock_sftp_client = mock_paramiko
+    data = bytes(range(256)) * 8
+    local_file_path = tmp_path / "file.bin"
+    journal = TransferJournal(":memory:")
+
+    failing = FakeRemoteFile(data)
+    failing.read = MagicMock(side_effect=[data[:600], Exception("Connection lost")])
+    resumed = FakeRemoteFile(data)
+    mock_sftp_client.open.side_effect = [failing, resumed]
+
+    fetcher = RemoteFetcher(
+        progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser", journal=journal
+    )
+    with fetcher:
+        with pytest.raises(Exception, match="Connection lost"):
+            fetcher._download_file("/remote/file.bin", local_file_path, len(data), 1700000000)
+        assert (tmp_path / "file.bin.part").stat().st_size == 600
+        assert not local_file_path.exists()
+
+        fetcher._download_file("/remote/file.bin", local_file_path, len(data), 1700000000)
+
+    assert local_file_path.read_bytes() == data
+    assert int(local_file_path.stat().st_mtime) == 1700000000
+    assert resumed.prefetched == (len(data), None)
+    assert fetcher.resumed_bytes == 600
+    mock_progress_tracker.add_task.assert_called_with("file.bin", total_size=len(data), completed=600)
+    assert journal.load_download(
+        f"sftp://testuser@testhost:22/remote/file.bin|{local_file_path.resolve()}"
+    ) is None
+
+
+def test_download_file_clears_checkpoints_of_fresh_download(mock_paramiko, mock_progress_tracker, tmp_path):
+    """Test that checkpoints written during an uninterrupted download are removed once it completes."""
+    _, _, mock_sftp_client = mock_paramiko
+    data = bytes(range(256)) * 8
+    local_file_path = tmp_path / "file.bin"
+    journal = TransferJournal(":memory:")
+    journal.save_download = MagicMock(wraps=journal.save_download)
+    mock_sftp_client.open.side_effect = lambda path, mode="r", bufsize=-1: FakeRemoteFile(data, chunks=[512] * 4)
+
+    fetcher = RemoteFetcher(
+        progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser", journal=journal
+    )
+    fetcher.CHECKPOINT_BYTES = 512
+    with fetcher:
+        fetcher._download_file("/remote/file.bin", local_file_path, len(data), 1700000000)
+
+    assert local_file_path.read_bytes() == data
+    assert journal.save_download.called
+    assert journal.load_download(
+        f"sftp://testuser@testhost:22/remote/file.bin|{local_file_path.resolve()}"
+    ) is None
+
+
+def test_download_file_restarts_when_remote_changed(mock_paramiko, mock_progress_tracker, tmp_path):
+    """Test that a partial file is discarded when the remote size or mtime no longer match."""
+    _, _, mock_sftp_client = mock_paramiko
+    journal = TransferJournal(":memory:")
+    local_file_path = tmp_path / "file.bin"
+    (tmp_path / "file.bin.part").write_bytes(b"old" * 100)
+    journal.save_download(f"sftp://testuser@testhost:22/remote/file.bin|{local_file_path.resolve()}", {
+        "dest_path": str(local_file_path), "etag": "300:1", "size": 300, "ranges": [[0, 300]],
+    })
+    mock_sftp_client.remote_files["/remote/file.bin"] = b"n" * 300
+
+    fetcher = RemoteFetcher(
+        progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser", journal=journal
+    )
+    with fetcher:
+        fetcher._download_file("/remote/file.bin", local_file_path, 300, 2)
+
+    assert local_file_path.read_bytes() == b"n" * 300
+    assert fetcher.resumed_bytes == 0
+
+
+def test_fetch_directory_skips_files_fetched_earlier(mock_paramiko, mock_progress_tracker, tmp_path):
+    """Test that a rerun does not download files whose size and mtime already match."""
+    _, _, mock_sftp_client = mock_paramiko
+
+    def attr(name, size, mtime):
+        item = MagicMock()
+        item.filename, item.st_mode, item.st_size, item.st_mtime = name, stat.S_IFREG, size, mtime
+        return item
+
+    mock_sftp_client.listdir_attr.return_value = [attr("same.txt", 4, 1000), attr("changed.txt", 4, 2000)]
+    mock_sftp_client.remote_files.update({"/remote/source/same.txt": b"same",
+                                          "/remote/source/changed.txt": b"new!"})
+    local = tmp_path / "source"
+    local.mkdir()
+    for name, mtime in (("same.txt", 1000), ("changed.txt", 1500)):
+        (local / name).write_bytes(b"old!")
+        os.utime(local / name, (mtime, mtime))
+
+    fetcher = RemoteFetcher(
+        progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser"
+    )
+    with fetcher:
+        fetcher.fetch_directory("/remote/source", tmp_path)
+
+    mock_sftp_client.open.assert_called_once_with("/remote/source/changed.txt", "rb")
+    assert (local / "changed.txt").read_bytes() == b"new!"
+    assert fetcher.skipped_complete == 1
+
+
 def test_download_large_file_with_progress_updates(mock_paramiko, tmp_path):
     """Test the progress callback logic with a simulated large file download."""
     _, _, mock_sftp_client = mock_paramiko
@@ -383,45 +575,34 @@ def test_download_large_file_with_progress_updates(mock_paramiko, tmp_path):
     mock_progress_tracker.file_progress.tasks = {0: mock_task}
     mock_progress_tracker.add_task.return_value = 0
 
-    # Capture the callback passed to sftp_client.get
-    captured_callback = None
-
-    def get_side_effect(remote, local, callback):
-        nonlocal captured_callback
-        captured_callback = callback
-
-    mock_sftp_client.get.side_effect = get_side_effect
+    large_file_size = 5 * 1024 * 1024  # 5 MB
+    # The SFTP stream returns 1 MB, then 2 MB, then 2 MB
+    mock_sftp_client.open.side_effect = lambda path, mode="r", bufsize=-1: FakeRemoteFile(
+        b"L" * large_file_size, chunks=[1024 * 1024, 2 * 1024 * 1024, 2 * 1024 * 1024]
+    )
 
     fetcher = RemoteFetcher(
         progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser"
     )
-    large_file_size = 5 * 1024 * 1024  # 5 MB
 
     with fetcher:
         fetcher._download_file(
             "/remote/large_file.bin", tmp_path / "large_file.bin", large_file_size
         )
-
-    # Simulate multiple progress updates for a large file
-    assert captured_callback is not None
-    captured_callback(1024 * 1024, large_file_size)  # 1 MB
-    mock_task.completed = 1024 * 1024  # Update the mock task
-    captured_callback(3 * 1024 * 1024, large_file_size)  # 3 MB
-    mock_task.completed = 3 * 1024 * 1024  # Update the mock task
-    captured_callback(large_file_size, large_file_size)  # 5 MB (complete)
+    assert (tmp_path / "large_file.bin").stat().st_size == large_file_size
 
     # Verify that the update method was called with the correct cumulative advances
     update_calls = mock_progress_tracker.update.call_args_list
     assert len(update_calls) == 3
 
     # Call 1: 1 MB transferred
-    assert update_calls[0].args == ("large_file.bin", 1024 * 1024)
+    assert update_calls[0].args == (0, 1024 * 1024)
 
     # Call 2: 2 MB transferred since last update
-    assert update_calls[1].args == ("large_file.bin", 2 * 1024 * 1024)
+    assert update_calls[1].args == (0, 2 * 1024 * 1024)
 
     # Call 3: 2 MB transferred since last update
-    assert update_calls[2].args == ("large_file.bin", 2 * 1024 * 1024)
+    assert update_calls[2].args == (0, 2 * 1024 * 1024)
 
 
 @patch("pathlib.Path.mkdir")
@@ -472,37 +653,50 @@ def test_download_progress_callback_logic(mock_paramiko, tmp_path):
 
     mock_progress_tracker.update.side_effect = update_side_effect
 
-    # Capture the callback passed to the `sftp_client.get` method
-    captured_callback = None
-
-    def get_side_effect(remote, local, callback):
-        nonlocal captured_callback
-        captured_callback = callback
-
-    mock_sftp_client.get.side_effect = get_side_effect
+    # The SFTP stream delivers the file in reads of 100, 412 and 512 bytes
+    mock_sftp_client.open.side_effect = lambda path, mode="r", bufsize=-1: FakeRemoteFile(
+        b"p" * 1024, chunks=[100, 412, 512]
+    )
 
     fetcher = RemoteFetcher(
         progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser"
     )
     with fetcher:
-        # This call will set up the callback
         fetcher._download_file("/remote/file.txt", tmp_path / "file.txt", 1024)
 
-    # Now, simulate the SFTP client calling the callback with progress updates
-    assert captured_callback is not None
-    captured_callback(100, 1024)  # 100 bytes transferred
-    captured_callback(512, 1024)  # 512 bytes transferred in total
-    captured_callback(1024, 1024)  # 1024 bytes transferred in total
-
     # Verify that our `update` method was called with the correct `advance` values
     update_calls = mock_progress_tracker.update.call_args_list
     assert len(update_calls) == 3
 
     # Call 1: advance should be 100 (100 - 0)
-    assert update_calls[0].args == ("file.txt", 100)
+    assert update_calls[0].args == (0, 100)
 
     # Call 2: advance should be 412 (512 - 100)
-    assert update_calls[1].args == ("file.txt", 412)
+    assert update_calls[1].args == (0, 412)
 
     # Call 3: advance should be 512 (1024 - 512)
-    assert update_calls[2].args == ("file.txt", 512)
\ No newline at end of file
+    assert update_calls[2].args == (0, 512)
+
+def test_download_file_applies_bandwidth_limit(mock_paramiko, tmp_path):
+    """Test that SFTP reads are charged against the bandwidth limiter."""
+    _, _, mock_sftp_client = mock_paramiko
+    mock_progress_tracker = MagicMock(spec=ProgressTracker)
+    mock_task = MagicMock()
+    mock_task.completed = 0
+    mock_progress_tracker.file_progress = MagicMock()
+    mock_progress_tracker.file_progress.tasks = {0: mock_task}
+    mock_progress_tracker.add_task.return_value = 0
+    limiter = MagicMock()
+
+    remote = FakeRemoteFile(b"b" * 65536)
+    mock_sftp_client.open.side_effect = lambda path, mode="r", bufsize=-1: remote
+
+    fetcher = RemoteFetcher(
+        progress_tracker=mock_progress_tracker, hostname="testhost", username="testuser",
+        bandwidth=limiter,
+    )
+    with fetcher:
+        fetcher._download_file("/remote/file.bin", tmp_path / "file.bin", 65536)
+
+    assert [c.args[0] for c in limiter.consume.call_args_list] == [32768, 32768]
+    assert remote.prefetched == (65536, RemoteFetcher.BANDWIDTH_PREFETCH_REQUESTS)
@@ -0,0 +1,89 @@
+"""Tests for the throttle module."""
+
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from core.throttle import ThrottleController, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    """Test parsing a delay in seconds."""
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+
+
+def test_parse_retry_after_http_date():
+    """Test parsing an HTTP date."""
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+    assert 25 <= delay <= 31
+
+
+def test_parse_retry_after_invalid():
+    """Test that missing or malformed values are ignored."""
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_for_tenant_returns_shared_controller():
+    """Test that controllers are shared per tenant."""
+    first = ThrottleController.for_tenant("tenant-a")
+    assert ThrottleController.for_tenant("tenant-a") is first
+    assert ThrottleController.for_tenant("tenant-b") is not first
+
+
+def test_throttle_halves_limit_once_per_episode():
+    """Test multiplicative decrease is applied once for a burst of 429s."""
+    controller = ThrottleController(max_concurrency=8)
+    controller.on_throttled(0.01)
+    controller.on_throttled(0.01)
+
+    assert controller.limit == 4
+    assert controller.throttle_events == 1
+
+
+def test_success_ramps_limit_back_up():
+    """Test additive increase after throttling."""
+    controller = ThrottleController(max_concurrency=8)
+    controller.limit = 2.0
+    for _ in range(4):
+        controller.on_success()
+
+    assert 3.0 <= controller.limit < 4.0
+
+
+def test_acquire_waits_for_pause():
+    """Test that all workers wait while the tenant is paused."""
+    controller = ThrottleController(max_concurrency=4)
+    controller.on_throttled(0.1)
+
+    start = time.monotonic()
+    with controller.slot():
+        waited = time.monotonic() - start
+
+    assert waited >= 0.09
+    assert controller.in_flight == 0
+
+
+def test_acquire_limits_concurrency():
+    """Test that no more than the current limit of slots are handed out."""
+    controller = ThrottleController(max_concurrency=2)
+    controller.acquire()
+    controller.acquire()
+
+    acquired = threading.Event()
+
+    def worker():
+        controller.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not acquired.wait(0.05)
+
+    controller.release()
+    assert acquired.wait(1)
+    thread.join()
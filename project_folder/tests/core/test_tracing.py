@@ -0,0 +1,90 @@
+"""Tests for the tracing module."""
+
+import json
+
+import pytest
+from core import tracing
+
+
+@pytest.fixture
+def tracer():
+    """Enable tracing for one test."""
+    tracer = tracing.enable()
+    yield tracer
+    tracing.disable()
+
+
+def test_disabled_tracing_records_nothing():
+    """Test that spans are shared no-ops while tracing is off."""
+    tracing.disable()
+    with tracing.span("upload.chunk_put", offset=0) as span:
+        span.set(status=202)
+    tracing.event("upload.retry")
+
+    assert tracing.get_tracer() is None
+    assert tracing.span("a") is tracing.span("b")
+
+
+def test_nested_spans_build_call_paths(tracer):
+    """Test that nested spans are attributed to their parent path."""
+    with tracing.span("upload.file"):
+        with tracing.span("upload.chunk_put") as span:
+            span.set(status=202)
+        tracing.event("upload.retry", status=503)
+
+    kinds_and_paths = [(r[0], r[2]) for r in tracer.records]
+    assert ("span", "upload.file;upload.chunk_put") in kinds_and_paths
+    assert ("event", "upload.file;upload.retry") in kinds_and_paths
+    assert ("span", "upload.file") in kinds_and_paths
+
+    summary = tracer.flame_summary()
+    assert "upload.file;upload.chunk_put" in summary
+    assert summary.splitlines()[1].endswith("upload.file")
+
+
+def test_span_records_errors(tracer):
+    """Test that a failing span is recorded with the exception type."""
+    with pytest.raises(ValueError):
+        with tracing.span("compress.file"):
+            raise ValueError("bad")
+
+    assert tracer.records[-1][6] == {"error": "ValueError"}
+
+
+def test_traced_decorator(tracer):
+    """Test that decorated functions are wrapped in a span."""
+    @tracing.traced("auth.acquire_token")
+    def acquire():
+        return "token"
+
+    assert acquire() == "token"
+    assert tracer.records[-1][1] == "auth.acquire_token"
+
+
+def test_chrome_trace_export(tracer, tmp_path):
+    """Test writing a Chrome trace-event file."""
+    with tracing.span("sftp.read", size=10):
+        pass
+    tracing.event("upload.throttled", retry_after=1.0)
+
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(path)
+    events = json.loads(path.read_text())["traceEvents"]
+
+    complete = [e for e in events if e["ph"] == "X"]
+    instant = [e for e in events if e["ph"] == "i"]
+    assert complete[0]["name"] == "sftp.read"
+    assert complete[0]["cat"] == "sftp"
+    assert complete[0]["args"] == {"size": 10}
+    assert instant[0]["args"] == {"retry_after": 1.0}
+    assert any(e["ph"] == "M" for e in events)
+
+
+def test_record_limit(tracer):
+    """Test that records beyond the limit are counted, not stored."""
+    tracer.max_records = 2
+    for _ in range(5):
+        tracing.event("x")
+
+    assert len(tracer.records) == 2
+    assert tracer.dropped == 3
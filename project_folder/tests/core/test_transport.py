@@ -0,0 +1,101 @@
+"""Tests for the transport module."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from core.transport import SharedTransport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers every request with an empty 200 over a persistent connection."""
+
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def _reply(self):
+        KeepAliveHandler.connections.add(self.client_address)
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        # Keep warm-up probes overlapping so each needs its own connection
+        time.sleep(0.1)
+        self._reply()
+
+    do_GET = do_PUT = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Fixture for a local keep-alive HTTP server."""
+    KeepAliveHandler.connections = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_sessions_share_connection_pool(server):
+    """Test that separate sessions reuse the same keep-alive connection."""
+    transport = SharedTransport(pool_maxsize=4, warm_up=False)
+    for _ in range(3):
+        session = transport.create_session()
+        session.put(f"{server}/upload", data=b"chunk")
+
+    stats = transport.stats()
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 2
+    assert len(KeepAliveHandler.connections) == 1
+    transport.close()
+
+
+def test_warm_up_opens_connections_once_per_host(server):
+    """Test that warm-up pre-opens connections and is not repeated."""
+    transport = SharedTransport(pool_maxsize=8)
+    session = transport.create_session()
+
+    transport.warm_up(session, f"{server}/upload/session", connections=2)
+    transport.warm_up(session, f"{server}/other/session", connections=2)
+
+    stats = transport.stats()
+    assert stats["requests"] == 2
+    assert stats["connections_opened"] == 2
+    transport.close()
+
+
+def test_warm_up_disabled(server):
+    """Test that warm-up can be turned off."""
+    transport = SharedTransport(warm_up=False)
+    transport.warm_up(transport.create_session(), f"{server}/upload")
+
+    assert transport.stats()["requests"] == 0
+
+
+def test_stats_unknown_without_pool_container(server):
+    """Test that stats report unknown counts if urllib3 no longer exposes its pool container."""
+    transport = SharedTransport(warm_up=False)
+    transport.create_session().put(f"{server}/upload", data=b"chunk")
+    transport.adapter.poolmanager.pools = SimpleNamespace(lock=threading.Lock())
+
+    stats = transport.stats()
+
+    assert stats["requests"] is None
+    assert stats["connections_reused"] is None
+
+
+def test_shared_returns_singleton():
+    """Test that the process-wide transport is created once."""
+    assert SharedTransport.shared() is SharedTransport.shared()
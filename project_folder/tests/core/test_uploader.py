@@ -2,7 +2,10 @@
 
 import pytest
 import os
+import requests
 from unittest.mock import patch, MagicMock, mock_open
+from core.journal import TransferJournal
+from core.transport import SharedTransport
 from core.uploader import SharePointUploader
 
 # Constants for testing
@@ -11,11 +14,16 @@ TEST_FILE_PATH = "/path/to/fake/large_file.bin"
 TEST_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 UPLOAD_URL = "https://graph.microsoft.com/v1.0/sites/root/drive/items/root:/large_file.bin:/createUploadSession"
 SESSION_URL = "https://graph.microsoft.com/v1.0/some/upload/session"
+SESSION = {"uploadUrl": SESSION_URL, "expirationDateTime": "2099-01-01T00:00:00.000Z"}
 
 @pytest.fixture
-def mock_uploader():
+def mock_uploader(tmp_path):
     """Fixture to create a SharePointUploader instance with a dummy token."""
-    return SharePointUploader(DUMMY_TOKEN)
+    return SharePointUploader(
+        DUMMY_TOKEN,
+        journal=TransferJournal(tmp_path / "journal.db"),
+        transport=SharedTransport(warm_up=False),
+    )
 
 @pytest.fixture
 def mock_requests_session():
@@ -99,13 +107,15 @@ def test_upload_file_full_success(mock_uploader, mock_os_stat, mock_file_open):
         "DRIVE_ID": "test-drive-id"
     }
     
+    # Checkpoint after every chunk
+    mock_uploader.checkpoint_interval = 0
+    
     # Mock session creation
-    with patch.object(mock_uploader, 'create_upload_session', return_value=SESSION_URL) as mock_create_session, \
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION) as mock_create_session, \
          patch.object(mock_uploader.session, 'put') as mock_put, \
-         patch('core.uploader.save_upload_state') as mock_save_state, \
-         patch('core.uploader.load_upload_state', return_value=None), \
-         patch('os.path.exists', return_value=False), \
-         patch('os.remove') as mock_remove:
+         patch.object(mock_uploader.journal, 'save') as mock_save_state, \
+         patch.object(mock_uploader.journal, 'load', return_value=None), \
+         patch.object(mock_uploader.journal, 'clear') as mock_clear:
 
         # Mock responses for each chunk upload
         mock_response_chunk1 = MagicMock(status_code=202, json=lambda: {"nextExpectedRanges": ["4194304-8388607"]})
@@ -121,23 +131,29 @@ def test_upload_file_full_success(mock_uploader, mock_os_stat, mock_file_open):
         # Verify all chunks were uploaded
         assert mock_put.call_count == 3
         
-        # Verify state was saved for each chunk
-        assert mock_save_state.call_count == 2 # First two chunks
+        # Verify state was saved for the new session and each acknowledged chunk
+        assert mock_save_state.call_count == 3 # New session + first two chunks
 
-        # Verify final result
+        # Verify final result and that the journal entry was cleared
         assert result['id'] == "file_id"
+        mock_clear.assert_called_once()
 
 def test_upload_file_resume_from_state(mock_uploader, mock_os_stat, mock_file_open):
     """Test resuming an upload from a saved state."""
     # Simulate a state where the first chunk was already uploaded
     saved_state = {"upload_url": SESSION_URL, "offset": 4194304}
     
-    with patch('core.uploader.load_upload_state', return_value=saved_state), \
-         patch('os.path.exists', return_value=True), \
-         patch('core.uploader.save_upload_state') as mock_save_state, \
-         patch('os.remove') as mock_remove, \
+    with patch.object(mock_uploader.journal, 'load', return_value=saved_state), \
+         patch.object(mock_uploader.journal, 'save') as mock_save_state, \
+         patch.object(mock_uploader.journal, 'clear') as mock_clear, \
+         patch.object(mock_uploader.session, 'get') as mock_get, \
          patch.object(mock_uploader.session, 'put') as mock_put:
 
+        # The server confirms it holds the first chunk
+        mock_get.return_value = MagicMock(
+            status_code=200, json=lambda: {"nextExpectedRanges": ["4194304-"]}
+        )
+
         # Mock responses for the remaining chunks
         mock_response_chunk2 = MagicMock(status_code=202, json=lambda: {"nextExpectedRanges": ["8388608-10485759"]})
         mock_response_final = MagicMock(status_code=201, json=lambda: {"id": "file_id"})
@@ -152,15 +168,14 @@ def test_upload_file_resume_from_state(mock_uploader, mock_os_stat, mock_file_op
         assert mock_put.call_count == 2
         assert result['id'] == "file_id"
         
-        # Verify state file was removed after successful upload
-        mock_remove.assert_called_once()
+        # Verify journal entry was cleared after successful upload
+        mock_clear.assert_called_once()
 
 def test_upload_chunk_retry_on_failure(mock_uploader, mock_os_stat, mock_file_open):
     """Test that the uploader retries a chunk upload on transient failure."""
-    with patch.object(mock_uploader, 'create_upload_session', return_value=SESSION_URL), \
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
          patch.object(mock_uploader.session, 'put') as mock_put, \
-         patch('core.uploader.load_upload_state', return_value=None), \
-         patch('os.path.exists', return_value=False), \
+         patch.object(mock_uploader.journal, 'load', return_value=None), \
          patch('time.sleep') as mock_sleep: # Mock sleep to speed up test
 
         # Simulate a network error followed by a success
@@ -178,4 +193,272 @@ def test_upload_chunk_retry_on_failure(mock_uploader, mock_os_stat, mock_file_op
         # Expecting more than the usual number of PUTs due to retry
         assert mock_put.call_count > 3
         assert mock_sleep.called  # Exponential backoff should trigger sleep
-        assert result['id'] == "file_id"
\ No newline at end of file
+        assert result['id'] == "file_id"
+
+def test_upload_file_debounces_checkpoints(mock_uploader, mock_os_stat, mock_file_open):
+    """Test that resume state is not rewritten after every chunk."""
+    mock_uploader.checkpoint_interval = 3600
+    mock_uploader.checkpoint_bytes = 8 * 1024 * 1024
+
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
+         patch.object(mock_uploader.session, 'put') as mock_put, \
+         patch.object(mock_uploader.journal, 'load', return_value=None), \
+         patch.object(mock_uploader.journal, 'save') as mock_save_state:
+
+        mock_put.side_effect = [
+            MagicMock(status_code=202),
+            MagicMock(status_code=202),
+            MagicMock(status_code=201, json=lambda: {"id": "file_id"}),
+        ]
+
+        mock_uploader.upload_file(TEST_FILE_PATH)
+
+        # New session, then a single checkpoint once 8 MB of progress accumulated
+        offsets = [c.args[1]["offset"] for c in mock_save_state.call_args_list]
+        assert offsets == [0, 8 * 1024 * 1024]
+
+
+def test_upload_file_flushes_checkpoint_on_failure(mock_uploader, mock_os_stat, mock_file_open):
+    """Test that the latest progress is journaled when an upload fails."""
+    mock_uploader.checkpoint_interval = 3600
+
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
+         patch.object(mock_uploader.session, 'put') as mock_put, \
+         patch.object(mock_uploader.journal, 'load', return_value=None), \
+         patch.object(mock_uploader.journal, 'save') as mock_save_state:
+
+        mock_failure = MagicMock(status_code=400)
+        mock_failure.raise_for_status.side_effect = Exception("Bad Request")
+        mock_put.side_effect = [MagicMock(status_code=202), mock_failure]
+
+        with pytest.raises(Exception, match="Bad Request"):
+            mock_uploader.upload_file(TEST_FILE_PATH)
+
+        assert mock_save_state.call_args.args[1]["offset"] == 4 * 1024 * 1024
+
+
+# --- Test Session Expiry and Recovery ---
+
+def test_resume_with_expired_session_creates_new_one(mock_uploader, mock_os_stat, mock_file_open):
+    """Test that an expired journaled session is replaced without querying it."""
+    saved_state = {
+        "upload_url": "https://expired/session",
+        "offset": 4194304,
+        "expires_at": "2000-01-01T00:00:00Z",
+    }
+
+    with patch.object(mock_uploader.journal, 'load', return_value=saved_state), \
+         patch.object(mock_uploader, '_request_upload_session', return_value=SESSION) as mock_create, \
+         patch.object(mock_uploader.session, 'get') as mock_get, \
+         patch.object(mock_uploader.session, 'put') as mock_put:
+
+        mock_put.side_effect = [
+            MagicMock(status_code=202),
+            MagicMock(status_code=202),
+            MagicMock(status_code=201, json=lambda: {"id": "file_id"}),
+        ]
+
+        result = mock_uploader.upload_file(TEST_FILE_PATH)
+
+        mock_get.assert_not_called()
+        mock_create.assert_called_once()
+        assert mock_put.call_args_list[0].args[0] == SESSION_URL
+        assert mock_put.call_args_list[0].kwargs["headers"]["Content-Range"].startswith("bytes 0-")
+        assert result["id"] == "file_id"
+
+
+def test_resume_uses_server_ranges_not_checkpoint(mock_uploader, mock_os_stat, mock_file_open):
+    """Test that resume starts where the server says, even past the local checkpoint."""
+    saved_state = {"upload_url": SESSION_URL, "offset": 0, "expires_at": "2099-01-01T00:00:00Z"}
+
+    with patch.object(mock_uploader.journal, 'load', return_value=saved_state), \
+         patch.object(mock_uploader.session, 'get') as mock_get, \
+         patch.object(mock_uploader.session, 'put') as mock_put:
+
+        mock_get.return_value = MagicMock(
+            status_code=200, json=lambda: {"nextExpectedRanges": ["8388608-10485759"]}
+        )
+        mock_put.return_value = MagicMock(status_code=201, json=lambda: {"id": "file_id"})
+
+        mock_uploader.upload_file(TEST_FILE_PATH)
+
+        mock_get.assert_called_once_with(SESSION_URL)
+        assert mock_put.call_count == 1
+        headers = mock_put.call_args.kwargs["headers"]
+        assert headers["Content-Range"] == f"bytes 8388608-{TEST_FILE_SIZE - 1}/{TEST_FILE_SIZE}"
+
+
+def test_session_lost_mid_upload_is_recreated(mock_uploader, mock_os_stat, mock_file_open):
+    """Test that a 404 on a chunk PUT transparently starts a new session."""
+    import requests
+
+    with patch.object(mock_uploader.journal, 'load', return_value=None), \
+         patch.object(mock_uploader, '_request_upload_session', return_value=SESSION) as mock_create, \
+         patch.object(mock_uploader.session, 'get') as mock_get, \
+         patch.object(mock_uploader.session, 'put') as mock_put:
+
+        gone = MagicMock(status_code=404)
+        gone.raise_for_status.side_effect = requests.exceptions.HTTPError(response=gone)
+        mock_get.return_value = MagicMock(status_code=404)
+        mock_put.side_effect = [
+            MagicMock(status_code=202),
+            gone,
+            MagicMock(status_code=202),
+            MagicMock(status_code=202),
+            MagicMock(status_code=201, json=lambda: {"id": "file_id"}),
+        ]
+
+        result = mock_uploader.upload_file(TEST_FILE_PATH)
+
+        assert mock_create.call_count == 2
+        assert result["id"] == "file_id"
+
+
+def test_session_expired_helper():
+    """Test expiry detection for Graph timestamps."""
+    from core.uploader import _session_expired
+
+    assert _session_expired("2000-01-01T00:00:00.0000000Z")
+    assert not _session_expired("2099-01-01T00:00:00Z")
+    assert not _session_expired(None)
+
+
+# --- Test Throttling ---
+
+def test_upload_chunk_honours_retry_after(mock_uploader):
+    """Test that a 429 pauses for Retry-After and then resends the chunk."""
+    from core.throttle import ThrottleController
+
+    mock_uploader.throttle = ThrottleController(max_concurrency=4)
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0.05"})
+    accepted = MagicMock(status_code=202)
+
+    with patch.object(mock_uploader.session, 'put', side_effect=[throttled, accepted]) as mock_put, \
+         patch('time.sleep') as mock_sleep:
+        response = mock_uploader._upload_chunk_with_retry(SESSION_URL, b"data", 0, 4, 4)
+
+    assert response is accepted
+    assert mock_put.call_count == 2
+    mock_sleep.assert_not_called()  # The pause is enforced by the shared controller
+    assert mock_uploader.throttle.throttle_events == 1
+    assert mock_uploader.throttle.limit < 4
+
+
+# --- Test Upload Metrics ---
+
+def test_upload_file_records_stats_and_progress(mock_uploader, mock_os_stat, mock_file_open):
+    """Test that bytes, chunks, retries and progress are reported for an upload."""
+    from core import metrics
+
+    tracker = MagicMock()
+    mock_uploader.progress_tracker = tracker
+    retries_before = metrics.RETRIES.labels(503).value
+    bytes_before = metrics.TRANSFER_BYTES.labels("upload").value
+    server_error = MagicMock(status_code=503, headers={})
+    accepted = MagicMock(status_code=202, json=lambda: {"nextExpectedRanges": ["4194304-"]})
+    accepted_2 = MagicMock(status_code=202, json=lambda: {"nextExpectedRanges": ["8388608-"]})
+    final = MagicMock(status_code=201, json=lambda: {"id": "file_id"})
+
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
+         patch.object(mock_uploader.session, 'put', side_effect=[server_error, accepted, accepted_2, final]), \
+         patch.object(mock_uploader.journal, 'load', return_value=None), \
+         patch('time.sleep'):
+        mock_uploader.upload_file(TEST_FILE_PATH)
+
+    stats = mock_uploader.stats()
+    assert stats["files"] == 1
+    assert stats["chunks"] == 3
+    assert stats["bytes_sent"] == TEST_FILE_SIZE
+    assert stats["retries"] == 1
+    assert stats["chunk_latency_max"] >= stats["chunk_latency_p50"] >= 0
+    assert metrics.RETRIES.labels(503).value == retries_before + 1
+    assert metrics.TRANSFER_BYTES.labels("upload").value == bytes_before + TEST_FILE_SIZE
+    assert metrics.CHUNKS_IN_FLIGHT.labels().value == 0
+
+    tracker.add_task.assert_called_once_with("large_file.bin", total_size=TEST_FILE_SIZE, completed=0)
+    assert sum(call.args[1] for call in tracker.update.call_args_list) == TEST_FILE_SIZE
+    tracker.complete_file.assert_called_once_with(tracker.add_task.return_value)
+    assert all(call.args[0] is tracker.add_task.return_value for call in tracker.update.call_args_list)
+
+
+def test_upload_stats_aggregate_across_files():
+    """Test that per-upload stats are summed without double counting time."""
+    from core.uploader import UploadStats
+
+    first = UploadStats("a", 100)
+    second = UploadStats("b", 300)
+    first.record_chunk(100, 0.5)
+    second.record_chunk(300, 1.5)
+    second.retries = 2
+    first.finish(100)
+    second.finish(300)
+
+    totals = UploadStats.aggregate([first, second])
+
+    assert totals["files"] == 2
+    assert totals["bytes_sent"] == 400
+    assert totals["retries"] == 2
+    assert totals["network_seconds"] == 2.0
+    assert totals["chunk_latency_p50"] == 0.5
+    assert totals["chunk_latency_max"] == 1.5
+
+
+# --- Test Streaming Uploads ---
+
+def test_stream_upload_sends_unknown_total_until_close(mock_uploader):
+    """Test that a stream sends aligned chunks with '*' totals and the real size last."""
+    chunk_size = mock_uploader.CHUNK_SIZE - mock_uploader.CHUNK_SIZE % mock_uploader.CHUNK_ALIGNMENT
+    accepted = MagicMock(status_code=202)
+    final = MagicMock(status_code=201, json=lambda: {"id": "file_id"})
+    total = 2 * chunk_size + 1000
+
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
+         patch.object(mock_uploader.session, 'put', side_effect=[accepted, accepted, final]) as mock_put:
+        with mock_uploader.open_stream("stream.zip") as sink:
+            data = b"x" * total
+            for start in range(0, total, 1000):
+                sink.write(data[start:start + 1000])
+        result = sink.result
+
+    assert result == {"id": "file_id"}
+    ranges = [call.kwargs["headers"]["Content-Range"] for call in mock_put.call_args_list]
+    assert ranges == [
+        f"bytes 0-{chunk_size - 1}/*",
+        f"bytes {chunk_size}-{2 * chunk_size - 1}/*",
+        f"bytes {2 * chunk_size}-{total - 1}/{total}",
+    ]
+    assert chunk_size % (320 * 1024) == 0
+    assert mock_uploader.stats()["bytes_sent"] == total
+
+
+def test_stream_upload_failure_cancels_session(mock_uploader):
+    """Test that a rejected chunk surfaces on the producer and the session is deleted."""
+    rejected = MagicMock(status_code=400, headers={})
+    rejected.raise_for_status.side_effect = requests.exceptions.HTTPError(response=rejected)
+
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
+         patch.object(mock_uploader.session, 'put', return_value=rejected), \
+         patch.object(mock_uploader.session, 'delete', return_value=MagicMock(status_code=204)) as mock_delete:
+        with pytest.raises(Exception):
+            with mock_uploader.open_stream("stream.zip") as sink:
+                for _ in range(64):
+                    sink.write(b"x" * (1024 * 1024))
+
+    mock_delete.assert_called_once_with(SESSION_URL)
+
+
+def test_stream_upload_failure_on_close_cancels_session(mock_uploader):
+    """Test that a rejected final chunk stops the upload thread and deletes the session."""
+    rejected = MagicMock(status_code=400, headers={})
+    rejected.raise_for_status.side_effect = requests.exceptions.HTTPError(response=rejected)
+
+    with patch.object(mock_uploader, '_request_upload_session', return_value=SESSION), \
+         patch.object(mock_uploader.session, 'put', return_value=rejected), \
+         patch.object(mock_uploader.session, 'delete', return_value=MagicMock(status_code=204)) as mock_delete:
+        with pytest.raises(Exception):
+            with mock_uploader.open_stream("stream.zip") as sink:
+                sink.write(b"x" * 1000)
+
+    assert not sink._thread.is_alive()
+    assert sink.stats.finished is not None
+    mock_delete.assert_called_once_with(SESSION_URL)
@@ -0,0 +1,170 @@
+"""Tests for the watch module."""
+
+import os
+import threading
+import time
+
+import pytest
+from core.watch import FolderWatcher, InotifyWatcher, WatchCursor
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        time.sleep(0.02)
+
+
+class Recorder:
+    """Upload callback recording (relative path, folder, content) per upload."""
+
+    def __init__(self, root):
+        self.root = root
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path, folder):
+        with self.lock:
+            self.calls.append((os.path.relpath(path, self.root), folder, path.read_bytes()))
+
+
+def start_watcher(root, cursor, use_inotify, **kwargs):
+    recorder = Recorder(root)
+    watcher = FolderWatcher(root, recorder, cursor, folder="Inbox", stable_seconds=0.2,
+                            poll_interval=0.1, use_inotify=use_inotify, **kwargs)
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    return watcher, recorder, thread
+
+
+def stop_watcher(watcher, thread):
+    watcher.stop()
+    thread.join(timeout=5)
+
+
+def inotify_available(tmp_path):
+    try:
+        InotifyWatcher(tmp_path).close()
+        return True
+    except OSError:
+        return False
+
+
+@pytest.mark.parametrize("use_inotify", [True, False], ids=["inotify", "polling"])
+def test_uploads_new_and_modified_files(tmp_path, use_inotify):
+    """Test that stable files are uploaded once, into mirrored folders, and again after edits."""
+    if use_inotify and not inotify_available(tmp_path):
+        pytest.skip("inotify not available")
+    root = tmp_path / "watched"
+    root.mkdir()
+    cursor = WatchCursor(tmp_path / "cursor.db")
+    watcher, recorder, thread = start_watcher(root, cursor, use_inotify)
+    try:
+        (root / "a.txt").write_text("one")
+        (root / "sub").mkdir()
+        (root / "sub" / "b.txt").write_text("two")
+        (root / ".hidden").write_text("skip")
+        wait_until(lambda: len(recorder.calls) == 2)
+
+        time.sleep(0.05)  # Make sure the edit gets a new mtime
+        (root / "a.txt").write_text("three")
+        wait_until(lambda: len(recorder.calls) == 3)
+    finally:
+        stop_watcher(watcher, thread)
+
+    assert sorted(recorder.calls[:2]) == [("a.txt", "Inbox", b"one"), ("sub/b.txt", "Inbox/sub", b"two")]
+    assert recorder.calls[2] == ("a.txt", "Inbox", b"three")
+
+
+@pytest.mark.parametrize("use_inotify", [True, False], ids=["inotify", "polling"])
+def test_files_under_ignored_directories_are_skipped(tmp_path, use_inotify):
+    """Test that files written below an ignored directory while watching are not uploaded."""
+    if use_inotify and not inotify_available(tmp_path):
+        pytest.skip("inotify not available")
+    root = tmp_path / "watched"
+    (root / ".git" / "objects").mkdir(parents=True)
+    cursor = WatchCursor(tmp_path / "cursor.db")
+    watcher, recorder, thread = start_watcher(root, cursor, use_inotify)
+    try:
+        if use_inotify:
+            assert not any(".git" in d for d in watcher.source._dirs.values())
+        (root / ".git" / "objects" / "abc").write_text("object")
+        (root / ".cache" / "nested").mkdir(parents=True)
+        (root / ".cache" / "nested" / "entry").write_text("cached")
+        time.sleep(0.1)
+        (root / "a.txt").write_text("one")
+        wait_until(lambda: recorder.calls)
+        time.sleep(0.4)
+    finally:
+        stop_watcher(watcher, thread)
+
+    assert recorder.calls == [("a.txt", "Inbox", b"one")]
+
+
+def test_waits_until_file_is_stable(tmp_path):
+    """Test that a file still being written is uploaded once, complete."""
+    root = tmp_path / "watched"
+    root.mkdir()
+    watcher, recorder, thread = start_watcher(root, WatchCursor(tmp_path / "cursor.db"), None)
+    try:
+        with open(root / "growing.bin", "wb") as f:
+            for _ in range(5):
+                f.write(b"x" * 1000)
+                f.flush()
+                time.sleep(0.1)
+        wait_until(lambda: recorder.calls)
+        time.sleep(0.4)
+    finally:
+        stop_watcher(watcher, thread)
+
+    assert recorder.calls == [("growing.bin", "Inbox", b"x" * 5000)]
+
+
+def test_cursor_skips_uploaded_files_after_restart(tmp_path):
+    """Test that a restart only uploads files that changed while stopped."""
+    root = tmp_path / "watched"
+    root.mkdir()
+    (root / "old.txt").write_text("old")
+    (root / "kept.txt").write_text("kept")
+
+    watcher, recorder, thread = start_watcher(root, WatchCursor(tmp_path / "cursor.db"), False)
+    wait_until(lambda: len(recorder.calls) == 2)
+    stop_watcher(watcher, thread)
+
+    (root / "old.txt").write_text("changed")
+    (root / "new.txt").write_text("new")
+    watcher, recorder, thread = start_watcher(root, WatchCursor(tmp_path / "cursor.db"), False)
+    try:
+        wait_until(lambda: len(recorder.calls) == 2)
+        time.sleep(0.4)
+    finally:
+        stop_watcher(watcher, thread)
+
+    assert sorted(name for name, _, _ in recorder.calls) == ["new.txt", "old.txt"]
+
+
+def test_failed_upload_is_retried(tmp_path):
+    """Test that a failed upload is queued again."""
+    root = tmp_path / "watched"
+    root.mkdir()
+    attempts = []
+
+    def flaky_upload(path, folder):
+        attempts.append(path.name)
+        if len(attempts) == 1:
+            raise RuntimeError("network down")
+
+    watcher = FolderWatcher(root, flaky_upload, WatchCursor(tmp_path / "cursor.db"),
+                            stable_seconds=0.1, poll_interval=0.1)
+    watcher.RETRY_DELAY = 0.2
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    try:
+        (root / "report.csv").write_text("data")
+        wait_until(lambda: watcher.uploaded == 1)
+    finally:
+        stop_watcher(watcher, thread)
+
+    assert attempts == ["report.csv", "report.csv"]
+    assert watcher.failed == 1
@@ -0,0 +1,149 @@
+"""Tests for the local Graph and SFTP emulators and the benchmark harness."""
+
+import json
+
+import pytest
+import requests
+from benchmarks.scenarios import SCENARIOS, Workspace
+from core.progress import HeadlessProgressTracker
+from core.ssh_copy import RemoteFetcher, SSHConnectionError
+from emulator import FaultInjector, GraphEmulator, SFTPEmulator
+
+
+@pytest.fixture
+def workspace():
+    """Temporary benchmark workspace."""
+    workspace = Workspace()
+    yield workspace
+    workspace.cleanup()
+
+
+def test_uploader_against_graph_emulator(workspace):
+    """Test a real multi-chunk upload over HTTP."""
+    source = workspace.path / "data.bin"
+    source.write_bytes(bytes(range(256)) * 40000)  # ~10 MB, three chunks
+
+    with GraphEmulator() as graph:
+        uploader = workspace.make_uploader(graph)
+        result = uploader.upload_file(str(source), "Backups")
+
+    assert result["size"] == source.stat().st_size
+    assert graph.store.read("Backups/data.bin") == source.read_bytes()
+    assert uploader.stats()["chunks"] == 3
+
+
+def test_graph_emulator_injects_throttling(workspace):
+    """Test that injected 429s are honoured by the uploader."""
+    source = workspace.path / "data.bin"
+    source.write_bytes(b"x" * 1000)
+    faults = FaultInjector(throttle_rate=0.5, retry_after=0.01, seed=3)
+
+    with GraphEmulator(faults=faults) as graph:
+        uploader = workspace.make_uploader(graph)
+        uploader.upload_file(str(source))
+
+    assert graph.stats["throttled"] > 0
+    assert graph.store.read("data.bin") == source.read_bytes()
+
+
+def test_graph_emulator_rejects_out_of_order_ranges():
+    """Test 416 for a chunk that does not start at the expected offset."""
+    with GraphEmulator() as graph:
+        session = requests.post(f"{graph.base_url}/sites/s/drives/d/root:/f.bin:/createUploadSession").json()
+        response = requests.put(session["uploadUrl"], data=b"abc",
+                                headers={"Content-Range": "bytes 5-7/10"})
+        status = requests.get(session["uploadUrl"]).json()
+
+    assert response.status_code == 416
+    assert status["nextExpectedRanges"] == ["0-"]
+
+
+def test_graph_emulator_drive_routes():
+    """Test simple uploads, downloads, children, delta and $batch."""
+    with GraphEmulator(delta_page_size=2) as graph:
+        drive = f"{graph.base_url}/drives/d"
+        created = requests.put(f"{drive}/root:/docs/a.txt:/content", data=b"hello")
+        replaced = requests.put(f"{drive}/root:/docs/a.txt:/content", data=b"hello world")
+        ranged = requests.get(f"{drive}/root:/docs/a.txt:/content", headers={"Range": "bytes=6-"})
+        children = requests.get(f"{drive}/root:/docs:/children").json()
+
+        pages = []
+        url = f"{drive}/root/delta"
+        while url:
+            page = requests.get(url).json()
+            pages.append(page)
+            url = page.get("@odata.nextLink")
+
+        batch = requests.post(f"{graph.base_url}/$batch", json={"requests": [
+            {"id": "1", "method": "GET", "url": "/drives/d/root:/docs/a.txt"},
+            {"id": "2", "method": "GET", "url": "/drives/d/root:/missing.txt"},
+        ]}).json()
+
+    assert (created.status_code, replaced.status_code) == (201, 200)
+    assert ranged.status_code == 206 and ranged.content == b"world"
+    assert [item["name"] for item in children["value"]] == ["a.txt"]
+    assert len(pages) == 2 and "@odata.deltaLink" in pages[-1]
+    assert {item["name"] for page in pages for item in page["value"]} == {"docs", "a.txt"}
+    assert [r["status"] for r in batch["responses"]] == [200, 404]
+
+
+def test_graph_emulator_persists_store(tmp_path):
+    """Test that a disk-backed drive survives an emulator restart."""
+    with GraphEmulator(store_dir=tmp_path / "drive") as graph:
+        session = requests.post(f"{graph.base_url}/me/drive/root:/f.bin:/createUploadSession").json()
+        requests.put(session["uploadUrl"], data=b"abc", headers={"Content-Range": "bytes 0-2/3"})
+
+    with GraphEmulator(store_dir=tmp_path / "drive") as graph:
+        item = requests.get(f"{graph.base_url}/me/drive/root:/f.bin").json()
+
+    assert item["size"] == 3
+    assert graph.store.read("f.bin") == b"abc"
+
+
+def test_graph_emulator_scheduled_faults(workspace):
+    """Test recovery from a dropped connection and an expired session."""
+    source = workspace.path / "data.bin"
+    source.write_bytes(b"y" * (11 * 1024 * 1024))
+    faults = FaultInjector()
+    faults.schedule("drop", method="PUT")
+    faults.schedule("expire", method="PUT")
+
+    with GraphEmulator(faults=faults) as graph:
+        uploader = workspace.make_uploader(graph)
+        uploader.upload_file(str(source))
+
+    assert graph.stats["dropped"] == 1
+    assert graph.stats["expired"] == 1
+    assert graph.store.read("data.bin") == source.read_bytes()
+
+
+def test_remote_fetcher_against_sftp_emulator(tmp_path):
+    """Test fetching a directory tree from the SFTP emulator."""
+    remote = tmp_path / "remote" / "data"
+    (remote / "sub").mkdir(parents=True)
+    (remote / "a.txt").write_text("hello")
+    (remote / "sub" / "b.txt").write_text("world")
+    local = tmp_path / "local"
+    local.mkdir()
+
+    with SFTPEmulator(tmp_path / "remote") as sftp:
+        tracker = HeadlessProgressTracker()
+        with RemoteFetcher(tracker, sftp.host, sftp.username, port=sftp.port,
+                           password=sftp.password) as fetcher:
+            fetcher.fetch_directory("/data", local)
+
+        with pytest.raises(SSHConnectionError):
+            RemoteFetcher(tracker, sftp.host, sftp.username, port=sftp.port, password="wrong").connect()
+
+    assert (local / "data" / "a.txt").read_text() == "hello"
+    assert (local / "data" / "sub" / "b.txt").read_text() == "world"
+    assert tracker.completed_files == 2
+
+
+def test_benchmark_scenario_reports_json():
+    """Test that a scenario result is JSON serialisable and complete."""
+    result = SCENARIOS["huge_file"](scale=0.001)
+
+    assert result["bytes"] == result["params"]["file_size"]
+    assert result["server"]["bytes_received"] == result["bytes"]
+    json.dumps(result)
@@ -1,9 +1,155 @@
-"""End-to-end integration tests."""
+"""End-to-end integration tests against the local SFTP and Graph emulators."""
+
+import io
+import json
+import sys
+import zipfile
+from unittest.mock import patch
 
 import pytest
+from emulator import FaultInjector, GraphEmulator, SFTPEmulator
+
+import main
+
+
+@pytest.fixture
+def remote_tree(tmp_path):
+    """Remote directory served by the SFTP emulator as /data."""
+    root = tmp_path / "remote"
+    data = root / "data"
+    (data / "logs").mkdir(parents=True)
+    (data / "readme.txt").write_text("hello")
+    (data / "logs" / "app.log").write_bytes(b"line\n" * 2000)
+    (data / "blob.bin").write_bytes(bytes(range(256)) * 24000)  # ~6 MB, two chunks
+    return root
+
+
+def run_pipeline(tmp_path, sftp, graph, *extra_args, remote_path="/data", local_path=True):
+    """Runs the SSH fetch, compress and upload flow; returns (exit code, NDJSON events)."""
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({
+        "TENANT_ID": "e2e-tenant",
+        "SITE_ID": "e2e-site",
+        "DRIVE_ID": "e2e-drive",
+        "GRAPH_BASE_URL": graph.base_url,
+        "JOURNAL_PATH": str(tmp_path / "journal.db"),
+    }))
+    progress = tmp_path / "events.ndjson"
+    argv = [
+        "main.py", "--config", str(config),
+        "--use-ssh", "--remote-path", remote_path,
+        "--ssh-host", sftp.host, "--ssh-port", str(sftp.port),
+        "--ssh-user", sftp.username, "--ssh-pass", sftp.password,
+        "--upload-to-sharepoint", "--sharepoint-folder", "Backups",
+        *(["--local-path", str(tmp_path / "local")] if local_path else []),
+        "--progress", "json", "--progress-file", str(progress),
+        *extra_args,
+    ]
+    with patch.object(sys, "argv", argv), patch("main.get_access_token", return_value="e2e-token"):
+        try:
+            main.main()
+            code = 0
+        except SystemExit as e:
+            code = e.code
+    events = [json.loads(line) for line in progress.read_text().splitlines()]
+    return code, events
+
+
+def uploaded_archive(graph):
+    """Returns the single archive uploaded to Backups as a ZipFile."""
+    items = graph.store.children("Backups")
+    assert len(items) == 1
+    return zipfile.ZipFile(io.BytesIO(graph.store.read("Backups/" + items[0]["name"])))
+
+
+def test_ssh_fetch_compress_upload(tmp_path, remote_tree):
+    """Test the whole pipeline and the archive that reaches the drive."""
+    with SFTPEmulator(remote_tree) as sftp, GraphEmulator() as graph:
+        code, events = run_pipeline(tmp_path, sftp, graph)
+        archive = uploaded_archive(graph)
+
+    assert code == 0
+    assert sorted(archive.namelist()) == ["blob.bin", "logs/app.log", "readme.txt"]
+    assert archive.read("blob.bin") == (remote_tree / "data" / "blob.bin").read_bytes()
+
+    stages = [(e["stage"], e["state"]) for e in events if e["event"] == "stage"]
+    assert stages == [("fetch", "running"), ("fetch", "done"), ("compress", "running"),
+                      ("compress", "done"), ("upload", "running"), ("upload", "done")]
+    assert events[-1]["event"] == "finish"
+    assert events[-1]["files_done"] >= 3
+
+
+def test_pipeline_recovers_from_faults(tmp_path, remote_tree):
+    """Test that 429s, a 503, a dropped connection and an expired session are survived."""
+    faults = FaultInjector(retry_after=0.01)
+    faults.schedule("throttle", method="PUT")
+    faults.schedule("error", method="PUT", status=503)
+    faults.schedule("drop", method="PUT")
+    faults.schedule("expire", method="PUT")
+
+    with SFTPEmulator(remote_tree) as sftp, GraphEmulator(faults=faults) as graph:
+        code, _ = run_pipeline(tmp_path, sftp, graph)
+        archive = uploaded_archive(graph)
+
+    assert code == 0
+    assert archive.read("readme.txt") == b"hello"
+    assert (graph.stats["throttled"], graph.stats["errors"], graph.stats["dropped"],
+            graph.stats["expired"]) == (1, 1, 1, 1)
+
+
+def test_pipeline_fails_when_upload_is_rejected(tmp_path, remote_tree):
+    """Test a non-zero exit when Graph keeps refusing the upload."""
+    faults = FaultInjector(error_rate=1.0, error_status=403)
+
+    with SFTPEmulator(remote_tree) as sftp, GraphEmulator(faults=faults) as graph:
+        code, events = run_pipeline(tmp_path, sftp, graph)
+
+    assert code == 1
+    assert ("upload", "failed") in [(e["stage"], e["state"]) for e in events if e["event"] == "stage"]
+
+
+def test_relay_single_remote_file(tmp_path, remote_tree):
+    """Test that --relay uploads a remote file without a local copy."""
+    with SFTPEmulator(remote_tree) as sftp, GraphEmulator() as graph:
+        code, events = run_pipeline(tmp_path, sftp, graph, "--relay", remote_path="/data/blob.bin")
+        uploaded = graph.store.read("Backups/blob.bin")
+
+    assert code == 0
+    assert uploaded == (remote_tree / "data" / "blob.bin").read_bytes()
+    assert not (tmp_path / "local").exists()
+    assert ("upload", "done") in [(e["stage"], e["state"]) for e in events if e["event"] == "stage"]
+
+
+def test_sharded_fetch_covers_tree_once(tmp_path, remote_tree):
+    """Test that two balanced shards upload disjoint archives whose manifests merge."""
+    with SFTPEmulator(remote_tree) as sftp, GraphEmulator() as graph:
+        codes = [run_pipeline(tmp_path, sftp, graph, "--shard", f"{k}/2", "--shard-mode", "balanced")[0]
+                 for k in (1, 2)]
+        archives = {item["name"]: zipfile.ZipFile(io.BytesIO(graph.store.read("Backups/" + item["name"])))
+                    for item in graph.store.children("Backups")}
+
+    assert codes == [0, 0]
+    assert sorted(name.split("_")[0] for name in archives) == ["data.shard-1-of-2", "data.shard-2-of-2"]
+    members = [name for zf in archives.values() for name in zf.namelist() if not name.startswith(".shard-")]
+    assert sorted(members) == ["blob.bin", "logs/app.log", "readme.txt"]
+
+    local = tmp_path / "local"
+    manifests = [str(local / f"data.shard-{k}-of-2" / f".shard-{k}-of-2.json") for k in (1, 2)]
+    merged = tmp_path / "merged.json"
+    with pytest.raises(SystemExit) as exit_info, \
+            patch.object(sys, "argv", ["main.py", "--merge-shards", *manifests, "--merge-output", str(merged)]):
+        main.main()
+    assert exit_info.value.code == 0
+    assert json.loads(merged.read_text())["total_files"] == 3
+
 
+def test_stream_mode_cleans_up_temporary_directory(tmp_path, remote_tree):
+    """Test that the fetched tree is removed after a --stream upload without --local-path."""
+    with SFTPEmulator(remote_tree) as sftp, GraphEmulator() as graph, \
+            patch("main.tempfile.mkdtemp", return_value=str(tmp_path / "scratch")):
+        code, _ = run_pipeline(tmp_path, sftp, graph, "--stream", local_path=False)
+        archive = uploaded_archive(graph)
 
-def test_end_to_end_placeholder():
-    """Placeholder for end-to-end tests."""
-    # TODO: Implement actual end-to-end integration tests
-    assert True
\ No newline at end of file
+    assert code == 0
+    assert sorted(archive.namelist()) == ["blob.bin", "logs/app.log", "readme.txt"]
+    assert not (tmp_path / "scratch").exists()
@@ -1,9 +1,250 @@
 """Tests for the main module."""
 
+import json
+import os
+import sys
+import time
+import zipfile
+from unittest.mock import patch
+
 import pytest
+from core.archive import restore_volumes
+from core.progress import HeadlessProgressTracker, ProgressTracker
+from emulator import FaultInjector, GraphEmulator
+
+import main
+
+
+@pytest.fixture
+def graph():
+    """Running Graph emulator."""
+    with GraphEmulator() as graph:
+        yield graph
+
+
+@pytest.fixture
+def config_path(tmp_path, graph):
+    """Configuration pointing the uploader at the emulator."""
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({
+        "TENANT_ID": "test-tenant",
+        "SITE_ID": "test-site",
+        "DRIVE_ID": "test-drive",
+        "GRAPH_BASE_URL": graph.base_url,
+        "JOURNAL_PATH": str(tmp_path / "journal.db"),
+    }))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def fake_token():
+    """Skip MSAL authentication."""
+    with patch("main.get_access_token", return_value="test-token"):
+        yield
+
+
+def run_main(*args):
+    """Runs the CLI and returns its exit code."""
+    with patch.object(sys, "argv", ["main.py", *args]):
+        with pytest.raises(SystemExit) as exit_info:
+            main.main()
+    return exit_info.value.code
+
+
+def test_compress_directory(tmp_path):
+    """Test that every file ends up in the archive under its relative path."""
+    source = tmp_path / "data"
+    (source / "sub").mkdir(parents=True)
+    (source / "a.txt").write_text("alpha")
+    (source / "sub" / "b.txt").write_text("beta")
+
+    archive = main.compress_directory(source, tmp_path / "data.zip")
+
+    with zipfile.ZipFile(archive) as zf:
+        assert sorted(zf.namelist()) == ["a.txt", "sub/b.txt"]
+        assert zf.read("sub/b.txt") == b"beta"
+
+
+def test_compress_directory_with_filter(tmp_path):
+    """Test that excluded files and directories are left out of the archive."""
+    source = tmp_path / "data"
+    (source / ".git" / "objects").mkdir(parents=True)
+    (source / "a.txt").write_text("alpha")
+    (source / "a.tmp").write_text("scratch")
+    (source / ".git" / "objects" / "pack").write_text("git")
+
+    path_filter = main.PathFilter.from_options(exclude=["*.tmp"], exclude_common=True)
+    archive = main.compress_directory(source, tmp_path / "data.zip", path_filter=path_filter)
+
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.namelist() == ["a.txt"]
+
+
+def test_create_progress_tracker(tmp_path):
+    """Test selecting the live display or the NDJSON stream."""
+    assert isinstance(main.create_progress_tracker("rich"), ProgressTracker)
+    headless = main.create_progress_tracker("json", str(tmp_path / "events.ndjson"), 1.0)
+    assert isinstance(headless, HeadlessProgressTracker)
+    assert headless.interval == 1.0
+
+
+def test_upload_to_sharepoint(tmp_path, graph, config_path):
+    """Test a successful upload reporting the upload stage."""
+    source = tmp_path / "report.bin"
+    source.write_bytes(b"r" * 5000)
+    tracker = HeadlessProgressTracker()
+
+    assert main.upload_to_sharepoint(source, "Reports", config_path, progress_tracker=tracker)
+
+    assert graph.store.read("Reports/report.bin") == source.read_bytes()
+    assert tracker.stages["upload"]["state"] == "done"
+
+
+def test_upload_to_sharepoint_failure(tmp_path, graph, config_path):
+    """Test that a failing upload returns False instead of raising."""
+    source = tmp_path / "report.bin"
+    source.write_bytes(b"r" * 5000)
+    graph.faults = FaultInjector(error_rate=1.0, error_status=400)
+    tracker = HeadlessProgressTracker()
+
+    assert not main.upload_to_sharepoint(source, "", config_path, progress_tracker=tracker)
+    assert tracker.stages["upload"]["state"] == "failed"
+
+
+def test_main_uploads_directory_path(tmp_path, graph, config_path):
+    """Test the direct path flow: compress a directory, upload it, remove the archive."""
+    source = tmp_path / "photos"
+    source.mkdir()
+    (source / "img.jpg").write_bytes(b"\xff\xd8" * 100)
+
+    code = run_main(str(source), "--config", config_path, "--progress", "json",
+                    "--progress-file", str(tmp_path / "events.ndjson"))
+
+    uploaded = [item["name"] for item in graph.store.children("")]
+    assert code == 0
+    assert len(uploaded) == 1 and uploaded[0].startswith("photos_")
+    assert not list(tmp_path.glob("photos_*.zip"))
+
+
+def test_main_upload_only(tmp_path, graph, config_path):
+    """Test the upload-only flow and its exit codes."""
+    source = tmp_path / "backup.tar"
+    source.write_bytes(b"t" * 2048)
+    progress = tmp_path / "events.ndjson"
+
+    code = run_main("--upload-only", str(source), "--sharepoint-folder", "Backups",
+                    "--config", config_path, "--progress", "json", "--progress-file", str(progress))
+    missing = run_main("--upload-only", str(tmp_path / "missing.tar"), "--config", config_path)
+
+    assert code == 0
+    assert missing == 1
+    assert graph.store.read("Backups/backup.tar") == source.read_bytes()
+    events = [json.loads(line)["event"] for line in progress.read_text().splitlines()]
+    assert events[0] == "start" and events[-1] == "finish"
+
+
+def test_upload_volumes(tmp_path, graph, config_path):
+    """Test that every volume and the manifest reach the drive and can be restored."""
+    source = tmp_path / "dataset"
+    source.mkdir()
+    (source / "big.bin").write_bytes(os.urandom(3 * 1024 * 1024))
+    (source / "small.txt").write_text("small")
+
+    assert main.upload_volumes(source, "Volumes", config_path, volume_size=2 * 1024 * 1024, workers=2)
+
+    names = sorted(item["name"] for item in graph.store.children("Volumes"))
+    manifest_name = next(name for name in names if name.endswith(".manifest.json"))
+    assert len(names) >= 3
+    downloaded = tmp_path / "downloaded"
+    downloaded.mkdir()
+    for name in names:
+        (downloaded / name).write_bytes(graph.store.read(f"Volumes/{name}"))
+    restore_volumes(downloaded / manifest_name, tmp_path / "restored")
+    assert (tmp_path / "restored" / "big.bin").read_bytes() == (source / "big.bin").read_bytes()
+    assert not list(tmp_path.glob("sharepoint_volumes_*"))
+
+
+def test_upload_volumes_bounds_sealed_volumes_on_disk(tmp_path, graph, config_path):
+    """Test that archiving waits for uploads instead of piling up sealed volumes."""
+    source = tmp_path / "dataset"
+    source.mkdir()
+    (source / "big.bin").write_bytes(os.urandom(10 * 1024 * 1024))
+    on_disk = []
+    real_upload = main.SharePointUploader.upload_file
+
+    def slow_upload(self, file_path, folder_path=""):
+        on_disk.append(len(list(tmp_path.glob("sharepoint_volumes_*/*.zip"))))
+        time.sleep(0.2)
+        return real_upload(self, file_path, folder_path)
+
+    with patch.object(main.SharePointUploader, "upload_file", slow_upload):
+        assert main.upload_volumes(source, "Volumes", config_path, volume_size=2 * 1024 * 1024, workers=2)
+
+    assert len(on_disk) >= 5
+    assert max(on_disk) <= 3  # Two sealed volumes being uploaded plus the one being written
+
+
+def test_upload_dedup_second_run_stores_only_changes(tmp_path, graph, config_path):
+    """Test that a repeated dedup upload adds no packs and the snapshot restores."""
+    source = tmp_path / "dataset"
+    source.mkdir()
+    (source / "big.bin").write_bytes(os.urandom(3 * 1024 * 1024))
+    (source / "small.txt").write_text("small")
+    index_path = tmp_path / "index.db"
+
+    assert main.upload_dedup(source, "Backups", config_path, index_path=str(index_path))
+    packs = [item["name"] for item in graph.store.children("Backups/packs")]
+    assert main.upload_dedup(source, "Backups", config_path, index_path=str(index_path))
+
+    assert [item["name"] for item in graph.store.children("Backups/packs")] == packs
+    manifests = sorted(item["name"] for item in graph.store.children("Backups/manifests"))
+    assert len(manifests) >= 1
+    downloaded = tmp_path / "downloaded"
+    downloaded.mkdir()
+    for name in packs:
+        (downloaded / name).write_bytes(graph.store.read(f"Backups/packs/{name}"))
+    (downloaded / manifests[-1]).write_bytes(graph.store.read(f"Backups/manifests/{manifests[-1]}"))
+    assert run_main("--restore-dedup", str(downloaded / manifests[-1]), "--restore-to", str(tmp_path / "restored")) == 0
+    assert (tmp_path / "restored" / "big.bin").read_bytes() == (source / "big.bin").read_bytes()
+    assert not list(tmp_path.glob("sharepoint_dedup_*"))
+
+
+def test_main_downloads_file(tmp_path, graph, config_path):
+    """Test the --download flow against the emulator."""
+    data = os.urandom(3 * 1024 * 1024)
+    graph.store.write("Restore/archive.bin", data)
+
+    assert run_main("--config", config_path, "--progress", "json", "--progress-file", str(tmp_path / "events"),
+                    "--download", "Restore/archive.bin", "--download-to", str(tmp_path)) == 0
+    assert (tmp_path / "archive.bin").read_bytes() == data
+    assert run_main("--config", config_path, "--download", "Restore/missing.bin",
+                    "--download-to", str(tmp_path)) == 1
+
+
+def test_submit_rejects_options_the_daemon_ignores(tmp_path, capsys):
+    """Test that --submit refuses transfer options a queued job would silently drop."""
+    with patch.object(main, "submit_job", return_value=0) as submit_job:
+        assert run_main(str(tmp_path), "--submit", "--compress", "--compression-level", "9") == 0
+        assert run_main(str(tmp_path), "--submit", "--exclude", "*.log", "--volume-size", "1G") == 2
+
+    assert submit_job.call_count == 1
+    assert "--submit does not support --exclude, --volume-size" in capsys.readouterr().err
+
+
+def test_stream_to_sharepoint(tmp_path, graph, config_path):
+    """Test that a directory streamed into an upload session arrives as a valid ZIP."""
+    source = tmp_path / "dataset"
+    source.mkdir()
+    (source / "big.bin").write_bytes(os.urandom(9 * 1024 * 1024))
+    (source / "small.txt").write_text("small")
 
+    assert main.stream_to_sharepoint(source, "Streams", config_path)
 
-def test_main_placeholder():
-    """Placeholder test for main module."""
-    # TODO: Implement actual main module tests
-    assert True
\ No newline at end of file
+    [item] = graph.store.children("Streams")
+    assert item["name"].startswith("dataset_") and item["name"].endswith(".zip")
+    archive = tmp_path / "downloaded.zip"
+    archive.write_bytes(graph.store.read(f"Streams/{item['name']}"))
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        assert zf.read("big.bin") == (source / "big.bin").read_bytes()
+    assert [path.name for path in tmp_path.glob("*.zip")] == ["downloaded.zip"]